@@ -0,0 +1,789 @@
+"""
+Benchmarks of the hot flows, run against a synthetic dataset, see
+api.apps.core.libs.synthetic_data.
+
+A benchmark prepares its input outside of the timed block and times the
+flow itself in ``context.measure()``, which records the wall time and the
+SQL queries run on the calling thread. Every iteration runs in a
+transaction that is rolled back, so each run sees the same dataset and
+results are comparable across commits.
+"""
+import io
+import itertools
+import math
+import platform
+import random
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from pydantic import BaseModel
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.apps.core.libs.synthetic_data import (
+    SYNTHETIC_PREFIX,
+    dataset_summary,
+    get_synthetic_user,
+)
+from api.apps.encounters import models as enc_models
+from api.apps.encounters.serializers import EncounterSerializer
+from api.apps.finance import models as finance_models
+from api.apps.finance.libs.billing import Billing
+from api.apps.finance.libs.invoice import Invoice
+from api.apps.finance.libs.billable_item import BillableItemLib
+from api.apps.finance.libs.price_list import PriceListLib
+from api.apps.finance.libs.reports.summary_report import SummaryReportGenerator
+from api.apps.finance.serializers import BillsPaymentSerializer
+from api.apps.imaging import models as img_models
+from api.apps.imaging.libs.imaging_obv_orders_factory import ImagingObvOrderFactory
+from api.apps.laboratory import models as lab_models
+from api.apps.laboratory.libs import LabPanelsAndOrders, LabResultGenerator
+from api.apps.patient import models as patient_models
+from api.apps.pharmacy import models as pharm_models
+from api.apps.pharmacy.libs.prescription_result_generator import (
+    PrescriptionResultGenerator,
+)
+from api.apps.patient.serializers import PatientSerializer
+from api.includes import exceptions, file_utils, metrics, utils
+from config.middlewares.db_routing import DatabaseTypes, ThreadLocal
+
+# candidate rows a benchmark picks its input from
+CANDIDATES_LIMIT = 1000
+PRICE_LIST_ROWS = 500
+# bills on the invoice of the invoice benchmarks, and bills added to it
+INVOICE_LINES = 1000
+INVOICE_ADDED_BILLS = 20
+BENCHMARK_PRICE_LIST = f"{SYNTHETIC_PREFIX} Benchmark Tariff"
+REPORTS = {
+    "patients": "/api/v1/patient/reports/",
+    "encounters": "/api/v1/encounters/reports/",
+    "laboratory": "/api/v1/laboratory/reports/",
+    "imaging": "/api/v1/imaging/reports/",
+    "payments_summary": "/api/v1/finance/reports/payments/summary/",
+    "payments_detailed": "/api/v1/finance/reports/payments/detailed/",
+    "revenue_summary": "/api/v1/finance/reports/revenue/summary/",
+    "revenue_detailed": "/api/v1/finance/reports/revenue/detailed/",
+}
+CATALOGS = {
+    "laboratory.unit_group": "/api/v1/laboratory/lab_panel/unit_group/",
+    "imaging.modality_group": "/api/v1/imaging/imaging_observation/modality_group/",
+}
+
+
+class Benchmark(NamedTuple):
+    name: str
+    func: Callable[["BenchmarkContext"], None]
+    # runs once before the iterations, outside of their transactions
+    setup: Optional[Callable[["BenchmarkContext"], None]]
+
+
+class Sample(NamedTuple):
+    seconds: float
+    queries: int
+    query_seconds: float
+
+
+class BenchmarkResult(BaseModel):
+    name: str
+    iterations: int = 0
+    mean: float = 0
+    median: float = 0
+    p95: float = 0
+    min: float = 0
+    max: float = 0
+    stdev: float = 0
+    queries: float = 0
+    query_seconds: float = 0
+    error: Optional[str] = None
+
+    @classmethod
+    def from_samples(cls, name: str, samples: List[Sample]) -> "BenchmarkResult":
+        if not samples:
+            return cls(name=name, error="No iteration was measured")
+        timings = sorted(sample.seconds for sample in samples)
+        return cls(
+            name=name,
+            iterations=len(samples),
+            mean=statistics.mean(timings),
+            median=statistics.median(timings),
+            p95=timings[math.ceil(0.95 * len(timings)) - 1],
+            min=timings[0],
+            max=timings[-1],
+            stdev=statistics.stdev(timings) if len(timings) > 1 else 0,
+            queries=statistics.mean(sample.queries for sample in samples),
+            query_seconds=statistics.mean(sample.query_seconds for sample in samples),
+        )
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, setup: Callable[["BenchmarkContext"], None] = None):
+    """Registers a benchmark under a name"""
+
+    def decorator(func):
+        if name in BENCHMARKS:
+            raise ValueError(f"Benchmark {name} is already registered")
+        BENCHMARKS[name] = Benchmark(name, func, setup)
+        return func
+
+    return decorator
+
+
+class BenchmarkContext:
+    """Input and measurements shared by the iterations of the benchmarks"""
+
+    def __init__(
+        self,
+        alias: str = "default",
+        seed: int = 0,
+        report_days: int = 30,
+        export_format: str = str(file_utils.ExportFormat.XLSX),
+    ):
+        """
+        Args:
+            alias [str]: database the benchmarks run against
+            seed [int]: seed of the random generator picking inputs
+            report_days [int]: period covered by the reports
+            export_format [str]: format reports are exported in
+        """
+        self.alias = alias
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.report_days = report_days
+        self.export_format = export_format
+        self.user = get_synthetic_user()
+        self.user_data = utils.trim_user_data(utils.model_to_dict(self.user))
+        self.request = APIRequestFactory().get("/")
+        self.request.user = self.user
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.headers = (
+            {"HTTP_DB_TYPE": str(DatabaseTypes.SANDBOX)} if alias == "sandbox" else {}
+        )
+        # data prepared by the setup of the current benchmark
+        self.data: dict = {}
+        self.samples: List[Sample] = []
+        self._candidates: Dict[str, List[int]] = {}
+
+    def choice(self, key: str, queryset: QuerySet) -> int:
+        """Picks the id of a random row of a queryset, the candidate ids are
+        cached under the key as rows are not changed by the iterations
+
+        Raises:
+            exceptions.NotFoundException: If the queryset is empty
+        """
+        ids = self._candidates.get(key)
+        if ids is None:
+            ids = list(
+                queryset.order_by("pk").values_list("pk", flat=True)[:CANDIDATES_LIMIT]
+            )
+            if not ids:
+                raise exceptions.NotFoundException(
+                    f"No data for {key}, run generate_synthetic_data first"
+                )
+            self._candidates[key] = ids
+        return self.random.choice(ids)
+
+    @contextmanager
+    def measure(self):
+        """Times the block and counts its SQL queries"""
+        recorder = metrics.QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            yield
+        self.samples.append(
+            Sample(time.perf_counter() - start, recorder.count, recorder.duration)
+        )
+
+
+def run_benchmark(
+    context: BenchmarkContext, bench: Benchmark, iterations: int, warmup: int
+) -> BenchmarkResult:
+    """Runs a benchmark, each iteration in a rolled back transaction"""
+    context.data = {}
+    context.samples = []
+    try:
+        if bench.setup:
+            bench.setup(context)
+        for _ in range(warmup + iterations):
+            with transaction.atomic(using=context.alias):
+                try:
+                    bench.func(context)
+                finally:
+                    transaction.set_rollback(True, using=context.alias)
+    except Exception as e:
+        return BenchmarkResult(name=bench.name, error=f"{type(e).__name__}: {e}")
+    return BenchmarkResult.from_samples(bench.name, context.samples[warmup:])
+
+
+def run_benchmarks(
+    names: Iterable[str] = None,
+    iterations: int = 20,
+    warmup: int = 2,
+    alias: str = "default",
+    seed: int = 0,
+    report_days: int = 30,
+    export_format: str = str(file_utils.ExportFormat.XLSX),
+    log: Callable[[BenchmarkResult], None] = None,
+) -> dict:
+    """Runs benchmarks and returns their results with the environment they
+    ran in
+
+    Args:
+        names [Iterable[str]]: benchmarks to run, all when empty
+        iterations [int]: measured iterations per benchmark
+        warmup [int]: iterations run before measuring
+        alias [str]: database to run against
+        seed [int]: seed of the random generator picking inputs
+        report_days [int]: period covered by the reports
+        export_format [str]: format reports are exported in
+        log [Callable]: receives each result as it completes
+
+    Returns:
+        dict: environment and results
+    """
+    names = list(names or BENCHMARKS)
+    unknown = set(names).difference(BENCHMARKS)
+    if unknown:
+        raise exceptions.BadRequest(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    setattr(ThreadLocal, "DB", alias)
+    context = BenchmarkContext(
+        alias=alias, seed=seed, report_days=report_days, export_format=export_format
+    )
+    results = []
+    for name in names:
+        result = run_benchmark(context, BENCHMARKS[name], iterations, warmup)
+        results.append(result.dict())
+        if log:
+            log(result)
+    return {
+        "environment": environment(alias),
+        "parameters": {
+            "iterations": iterations,
+            "warmup": warmup,
+            "seed": seed,
+            "report_days": report_days,
+            "export_format": export_format,
+        },
+        "results": results,
+    }
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=10,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment(alias: str) -> dict:
+    """Describes the code, runtime and dataset results were measured on"""
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "timestamp": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connections[alias].vendor,
+        "database_version": getattr(connections[alias], "pg_version", None),
+        "dataset": dataset_summary(),
+    }
+
+
+def compare_results(baseline: dict, current: dict) -> List[dict]:
+    """Compares the mean timings of two runs of the benchmarks
+
+    Args:
+        baseline [dict]: results of run_benchmarks
+        current [dict]: results of run_benchmarks
+
+    Returns:
+        List[dict]: name, means and change of each benchmark in both runs
+    """
+    baseline_results = {
+        result["name"]: result
+        for result in baseline.get("results", [])
+        if not result.get("error")
+    }
+    comparison = []
+    for result in current.get("results", []):
+        before = baseline_results.get(result["name"])
+        if before is None or result.get("error"):
+            continue
+        comparison.append(
+            {
+                "name": result["name"],
+                "baseline": before["mean"],
+                "current": result["mean"],
+                "change": (result["mean"] - before["mean"]) / before["mean"]
+                if before["mean"]
+                else 0,
+                "baseline_queries": before["queries"],
+                "current_queries": result["queries"],
+            }
+        )
+    return comparison
+
+
+############################ benchmarks ############################
+
+
+def uncleared_self_bills() -> QuerySet:
+    return finance_models.Bill.objects.filter(
+        cleared_status=str(finance_models.BillStatus.UNCLEARED),
+        billed_to_type=str(finance_models.PayerSchemeType.SELF_PREPAID),
+        is_invoiced=False,
+        is_reserved=False,
+    )
+
+
+@benchmark("patient.registration")
+def patient_registration(context: BenchmarkContext):
+    index = context.random.randint(0, 10**8)
+    serializer = PatientSerializer(
+        data={
+            "salutation": "Mr",
+            "firstname": "Benchmark",
+            "lastname": f"Patient{index}",
+            "gender": "Male",
+            "date_of_birth": "1990-01-01",
+            "phone_number": f"081{index:08d}",
+            "email": f"benchmark.{index}@example.com",
+            "home_address": {"street": "1 Hospital Road", "city": "Lagos"},
+        }
+    )
+    serializer.is_valid(raise_exception=True)
+    with context.measure():
+        serializer.save()
+
+
+@benchmark("encounter.create")
+def encounter_create(context: BenchmarkContext):
+    clinic = enc_models.Clinic.objects.get(
+        id=context.choice("clinic", enc_models.Clinic.objects.all())
+    )
+    patient = patient_models.Patient.objects.get(
+        id=context.choice("patient", patient_models.Patient.objects.all())
+    )
+    serializer = EncounterSerializer(
+        data={
+            "clinic": utils.model_to_dict(clinic),
+            "patient": utils.model_to_dict(patient),
+            "provider": context.user_data,
+            "encounter_type": "Walk In",
+            "chief_complaint": "headache",
+        },
+        context={"request": context.request},
+    )
+    serializer.is_valid(raise_exception=True)
+    with context.measure():
+        serializer.save()
+
+
+def charted_encounter(context: BenchmarkContext) -> str:
+    """Chart url of a random seen encounter, which has a synthetic chart"""
+    encounter_id = context.choice(
+        "charted_encounter", enc_models.Encounter.objects.filter(status="Signed")
+    )
+    return f"/api/v1/encounters/{encounter_id}/charts/"
+
+
+@benchmark("encounter.chart_add")
+def encounter_chart_add(context: BenchmarkContext):
+    url = charted_encounter(context)
+    data = {
+        "title": "Progress Note",
+        "description": "benchmark",
+        "content": ["stable, continue treatment"],
+        "orders": {},
+        "diagnosis": [],
+    }
+    with context.measure():
+        response = context.client.post(url, data, format="json", **context.headers)
+    if response.status_code != 200:
+        raise exceptions.ServerError(f"{url} responded with {response.status_code}")
+
+
+@benchmark("encounter.chart_list")
+def encounter_chart_list(context: BenchmarkContext):
+    url = charted_encounter(context)
+    with context.measure():
+        response = context.client.get(url, **context.headers)
+    if response.status_code != 200:
+        raise exceptions.ServerError(f"{url} responded with {response.status_code}")
+
+
+def catalog_benchmark(url: str, cached: bool):
+    def run_catalog(context: BenchmarkContext):
+        if cached:
+            context.client.get(url, **context.headers)
+        else:
+            cache.clear()
+        with context.measure():
+            response = context.client.get(url, **context.headers)
+        if response.status_code != 200:
+            raise exceptions.ServerError(f"{url} responded with {response.status_code}")
+
+    return run_catalog
+
+
+for catalog_name, catalog_url in CATALOGS.items():
+    benchmark(catalog_name)(catalog_benchmark(catalog_url, cached=False))
+    benchmark(f"{catalog_name}_cached")(catalog_benchmark(catalog_url, cached=True))
+
+
+@benchmark("finance.bills_payment")
+def bills_payment(context: BenchmarkContext):
+    bill = finance_models.Bill.objects.get(
+        id=context.choice("uncleared_self_bill", uncleared_self_bills())
+    )
+    bills = list(uncleared_self_bills().filter(patient__id=bill.patient["id"]))
+    cash = finance_models.PaymentMethod.objects.get(name="cash")
+    total = sum(patient_bill.selling_price for patient_bill in bills)
+    serializer = BillsPaymentSerializer(
+        data={
+            "patient": bill.patient["id"],
+            "bills": [patient_bill.id for patient_bill in bills],
+            "payments": [{"payment_method": cash.id, "amount": str(total)}],
+        },
+        context={"request": context.request},
+    )
+    serializer.is_valid(raise_exception=True)
+    with context.measure():
+        serializer.save()
+
+
+@benchmark("finance.invoice_confirm")
+def invoice_confirm(context: BenchmarkContext):
+    invoice = finance_models.Invoice.objects.get(
+        id=context.choice(
+            "draft_invoice",
+            finance_models.Invoice.objects.filter(
+                status=str(finance_models.InvoiceStatus.DRAFT)
+            ),
+        )
+    )
+    patient = patient_models.Patient.objects.get(id=invoice.patient["id"])
+    invoice_lib = Invoice(patient=patient, user_data=context.user_data, invoice=invoice)
+    with context.measure():
+        invoice_lib.confirm_invoice()
+
+
+def large_invoice(
+    context: BenchmarkContext,
+) -> Tuple[Invoice, List[finance_models.Bill]]:
+    """Creates a draft invoice of INVOICE_LINES bills of a patient, and bills
+    of the patient left out of it"""
+    patient = patient_models.Patient.objects.get(
+        id=context.choice("patient", patient_models.Patient.objects.all())
+    )
+    patient_data = utils.model_to_dict(patient)
+    item_ids = [
+        context.choice("billable_item", finance_models.BillableItem.objects.all())
+        for _ in range(INVOICE_LINES + INVOICE_ADDED_BILLS)
+    ]
+    items = finance_models.BillableItem.objects.in_bulk(item_ids)
+    bills = finance_models.Bill.objects.bulk_create(
+        [
+            finance_models.Bill(
+                bill_item_code=items[item_id].item_code,
+                cost_price=items[item_id].cost or 0,
+                selling_price=items[item_id].selling_price or 0,
+                co_pay=0,
+                cleared_status=str(finance_models.BillStatus.UNCLEARED),
+                bill_source=items[item_id].module,
+                billed_to_type=str(finance_models.PayerSchemeType.SELF_PREPAID),
+                description=items[item_id].description,
+                is_service_rendered=True,
+                patient=patient_data,
+                updated_by=context.user_data,
+            )
+            for item_id in item_ids
+        ]
+    )
+    invoice = Invoice(patient=patient, user_data=context.user_data).create_invoice(
+        bills[:INVOICE_LINES]
+    )
+    invoice_lib = Invoice(patient=patient, user_data=context.user_data, invoice=invoice)
+    return invoice_lib, bills[INVOICE_LINES:]
+
+
+@benchmark("finance.invoice_add_bills")
+def invoice_add_bills(context: BenchmarkContext):
+    invoice_lib, bills = large_invoice(context)
+    with context.measure():
+        invoice_lib.add_bills(bills)
+
+
+@benchmark("finance.invoice_pay")
+def invoice_pay(context: BenchmarkContext):
+    invoice_lib, _ = large_invoice(context)
+    invoice_lib.confirm_invoice()
+    cash = finance_models.PaymentMethod.objects.get(name="cash")
+    payments = [
+        finance_models.PaymentMethodStruct(
+            payment_method=utils.model_to_dict(cash),
+            amount=invoice_lib.invoice.balance,
+        )
+    ]
+    with context.measure():
+        invoice_lib.add_payments(payments)
+
+
+def create_lab_panel_orders_benchmark(panels: int):
+    def run_create_lab_panel_orders(context: BenchmarkContext):
+        lab_order = lab_models.LabOrder.objects.get(
+            id=context.choice("lab_order", lab_models.LabOrder.objects.all())
+        )
+        lab_panels = lab_models.LabPanel.objects.in_bulk(
+            [
+                context.choice("lab_panel", lab_models.LabPanel.objects.all())
+                for _ in range(panels)
+            ]
+        )
+        lab_lib = LabPanelsAndOrders(
+            lab_order_id=lab_order.id,
+            lab_panels=list(lab_panels.values()),
+            user_data=context.user_data,
+            audit_fields={},
+            payment_scheme=None,
+        )
+        with context.measure():
+            lab_lib.populate_lab_panel_orders()
+
+    return run_create_lab_panel_orders
+
+
+benchmark("laboratory.create_lab_panel_order")(create_lab_panel_orders_benchmark(1))
+# the query count of lab panel orders does not depend on the number of panels
+benchmark("laboratory.create_lab_panel_orders_5")(create_lab_panel_orders_benchmark(5))
+
+
+def create_img_obv_orders_benchmark(img_obvs: int):
+    def run_create_img_obv_orders(context: BenchmarkContext):
+        img_order = img_models.ImagingOrder.objects.get(
+            id=context.choice("img_order", img_models.ImagingOrder.objects.all())
+        )
+        observations = img_models.ImagingObservation.objects.in_bulk(
+            [
+                context.choice("img_obv", img_models.ImagingObservation.objects.all())
+                for _ in range(img_obvs)
+            ]
+        )
+        factory = ImagingObvOrderFactory(
+            img_order_id=img_order.id,
+            img_obvs=list(observations.values()),
+            user_data=context.user_data,
+            audit_fields={},
+            payment_scheme=None,
+        )
+        with context.measure():
+            factory.populate_img_obv_orders()
+
+    return run_create_img_obv_orders
+
+
+benchmark("imaging.create_img_obv_order")(create_img_obv_orders_benchmark(1))
+# the query count of imaging orders does not depend on the number of studies
+benchmark("imaging.create_img_obv_orders_5")(create_img_obv_orders_benchmark(5))
+
+
+@benchmark("laboratory.lab_result_html")
+def lab_result_html(context: BenchmarkContext):
+    approved = lab_models.LabPanelOrder.objects.filter(status__iexact="approved")
+    lab_order = lab_models.LabOrder.objects.get(
+        id=context.choice(
+            "approved_lab_order",
+            lab_models.LabOrder.objects.filter(id__in=approved.values("lab_order_id")),
+        )
+    )
+    with context.measure():
+        LabResultGenerator(lab_order=lab_order).render_template_to_html()
+
+
+@benchmark("pharmacy.prescription_html")
+def prescription_html(context: BenchmarkContext):
+    prescription = pharm_models.Prescription.objects.get(
+        id=context.choice(
+            "confirmed_prescription",
+            pharm_models.Prescription.objects.filter(
+                status=pharm_models.PrescriptionStatus.CONFIRMED
+            ),
+        )
+    )
+    with context.measure():
+        PrescriptionResultGenerator(prescription).render_to_html()
+
+
+def create_bills_benchmark(items: int):
+    def run_create_bills(context: BenchmarkContext):
+        patient = patient_models.Patient.objects.get(
+            id=context.choice("patient", patient_models.Patient.objects.all())
+        )
+        bill_item_ids = [
+            context.choice("billable_item", finance_models.BillableItem.objects.all())
+            for _ in range(items)
+        ]
+        bill_items = finance_models.BillableItem.objects.in_bulk(bill_item_ids)
+        billable_items_qty = [{1: bill_items[item_id]} for item_id in bill_item_ids]
+        patient_data = utils.model_to_dict(patient)
+        with context.measure():
+            Billing.create_bills(
+                module=str(utils.Modules.NURSING),
+                patient=patient_data,
+                billable_items_qty=billable_items_qty,
+            )
+
+    return run_create_bills
+
+
+# the query count of create_bills does not depend on the number of items
+for bill_items_count in (1, 20):
+    benchmark(f"finance.create_bills_{bill_items_count}")(
+        create_bills_benchmark(bill_items_count)
+    )
+
+
+def price_list_upload_setup(context: BenchmarkContext):
+    price_list, _ = finance_models.PriceList.objects.get_or_create(
+        name=BENCHMARK_PRICE_LIST
+    )
+    rows = [
+        {
+            "bill_item_code": item.item_code,
+            "description": item.description,
+            "selling_price": str(item.selling_price),
+            "co_pay_value": 0,
+            "co_pay_type": str(finance_models.CoPayValueType.AMOUNT),
+            "module": item.module,
+            "auth_required": False,
+            "capitated": False,
+            "excluded": False,
+            "post_auth_allowed": False,
+        }
+        for item in finance_models.BillableItem.objects.order_by("pk")[:PRICE_LIST_ROWS]
+    ]
+    context.data["price_list"] = price_list
+    excel_file = file_utils.FileUtils().write_excel_file(rows)
+    context.data["excel_file"] = excel_file.getvalue()
+
+
+@benchmark("finance.price_list_upload", setup=price_list_upload_setup)
+def price_list_upload(context: BenchmarkContext):
+    price_list_lib = PriceListLib(
+        context.data["price_list"],
+        context.user_data,
+        excel_file=io.BytesIO(context.data["excel_file"]),
+    )
+    with context.measure():
+        price_list_lib.upload()
+
+
+def billable_items_upload_setup(context: BenchmarkContext):
+    records = list(
+        itertools.islice(
+            BillableItemLib(context.user_data).iter_billable_items(), PRICE_LIST_ROWS
+        )
+    )
+    # iterations alternate between the stored prices and raised prices, so
+    # every iteration updates the items
+    raised = [
+        {**record, "selling_price": (record["selling_price"] or 0) + 1}
+        for record in records
+    ]
+    file_util = file_utils.FileUtils()
+    context.data["excel_files"] = [
+        file_util.write_excel_file(sheet).getvalue() for sheet in (raised, records)
+    ]
+    context.data["uploads"] = 0
+
+
+@benchmark("finance.billable_items_upload", setup=billable_items_upload_setup)
+def billable_items_upload(context: BenchmarkContext):
+    excel_files = context.data["excel_files"]
+    excel_file = excel_files[context.data["uploads"] % len(excel_files)]
+    context.data["uploads"] += 1
+    billable_item_lib = BillableItemLib(context.user_data)
+    with context.measure():
+        billable_item_lib.upload_billable_items_excel(io.BytesIO(excel_file))
+
+
+def download(context: BenchmarkContext, url: str, params: dict):
+    """Gets a file and reads it to the end"""
+    response = context.client.get(url, params, **context.headers)
+    if response.status_code != 200:
+        raise exceptions.ServerError(
+            f"{url} responded with status {response.status_code}"
+        )
+    # the test client closes the response once its content is consumed
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+
+
+@benchmark("finance.price_list_download", setup=price_list_upload_setup)
+def price_list_download(context: BenchmarkContext):
+    price_list = context.data["price_list"]
+    if not price_list.pricelistitem_set.exists():
+        PriceListLib(
+            price_list,
+            context.user_data,
+            excel_file=io.BytesIO(context.data["excel_file"]),
+        ).upload()
+    url = (
+        f"/api/v1/finance/price_lists/{price_list.id}"
+        "/price_list_items/spreadsheet_download/"
+    )
+    with context.measure():
+        download(context, url, {"export_format": context.export_format})
+
+
+@benchmark("finance.billable_items_download")
+def billable_items_download(context: BenchmarkContext):
+    url = "/api/v1/finance/billable_items/spreadsheet_download/"
+    with context.measure():
+        download(context, url, {"export_format": context.export_format})
+
+
+def report_benchmark(url: str):
+    def run_report(context: BenchmarkContext):
+        date_before = timezone.now().date()
+        params = {
+            "to_excel": "true",
+            "export_format": context.export_format,
+            "date_after": str(date_before - timedelta(days=context.report_days)),
+            "date_before": str(date_before),
+        }
+        with context.measure():
+            download(context, url, params)
+
+    return run_report
+
+
+for report_name, report_url in REPORTS.items():
+    benchmark(f"reports.{report_name}")(report_benchmark(report_url))
+
+
+@benchmark("reports.financial_summary")
+def financial_summary(context: BenchmarkContext):
+    with context.measure():
+        SummaryReportGenerator().generate_excel_report()
@@ -0,0 +1,1068 @@
+"""
+Synthetic hospital dataset for benchmarks and load tests.
+
+Catalog rows (clinics, lab panels, imaging observations, products and an
+insurance scheme) are created through the models so that their signals
+create billable items as in production. Clinical and financial records
+are bulk inserted in batches, each in its own transaction, with serial
+ids allocated up front from the id sequences, so that millions of rows
+are generated in constant memory. The same seed and scale always produce
+the same records.
+"""
+import random
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.utils import timezone
+from pydantic import BaseModel
+
+from api.apps.encounters import models as enc_models
+from api.apps.encounters import utils as enc_utils
+from api.apps.facilities import models as facility_models
+from api.apps.finance import models as finance_models
+from api.apps.finance.libs import price_index
+from api.apps.finance.libs.invoice import (
+    line_totals,
+    to_bill_lines,
+    to_line_rows,
+    to_payment_rows,
+)
+from api.apps.imaging import models as img_models
+from api.apps.inventory import models as inv_models
+from api.apps.laboratory import models as lab_models
+from api.apps.patient import models as patient_models
+from api.apps.pharmacy import models as pharm_models
+from api.includes import utils
+
+SYNTHETIC_USERNAME = "synthetic_clinician"
+SYNTHETIC_PREFIX = "Synthetic"
+
+FIRSTNAMES = (
+    "Ada Bola Chidi Dayo Emeka Funmi Gbenga Halima Ifeoma Jide Kemi Lola Musa "
+    "Ngozi Obinna Segun Tobi Uche Yemi Zainab"
+).split()
+LASTNAMES = (
+    "Adeyemi Bello Chukwu Danjuma Eze Fashola Garba Ibrahim Johnson Kalu Lawal "
+    "Mohammed Nwosu Okafor Okonkwo Salami Taiwo Usman Williams Yusuf"
+).split()
+CHART_WORDS = (
+    "patient reports mild severe pain fever cough since days history of no known "
+    "allergies examination reveals tenderness normal vitals stable plan review in "
+    "two weeks advised fluids rest and analgesics"
+).split()
+CLINICS = (
+    ("General Outpatient", 5000),
+    ("Paediatrics", 6000),
+    ("Obstetrics", 8000),
+    ("Surgery", 10000),
+    ("Emergency", 12000),
+)
+LAB_PANELS = (
+    ("Full Blood Count", 4500),
+    ("Malaria Parasite", 1500),
+    ("Lipid Profile", 7000),
+    ("Liver Function Test", 8000),
+    ("Electrolytes Urea Creatinine", 6500),
+    ("Fasting Blood Sugar", 1200),
+    ("Urinalysis", 1000),
+    ("Widal", 1800),
+)
+IMAGING_OBSERVATIONS = (
+    ("Chest X-Ray", 8000),
+    ("Abdominal Ultrasound", 10000),
+    ("Pelvic Ultrasound", 9000),
+    ("CT Head", 60000),
+    ("MRI Spine", 120000),
+)
+DRUGS = (
+    ("Paracetamol", "Tablet", 50),
+    ("Amoxicillin", "Capsule", 150),
+    ("Artemether Lumefantrine", "Tablet", 800),
+    ("Metformin", "Tablet", 120),
+    ("Amlodipine", "Tablet", 200),
+    ("Ciprofloxacin", "Tablet", 300),
+    ("Omeprazole", "Capsule", 180),
+    ("Ibuprofen", "Tablet", 80),
+)
+
+COST_RATIO = Decimal("0.6")
+SCHEME_PRICE_RATIO = Decimal("1.25")
+INSURED_PATIENT_RATIO = 0.3
+INSURED_BILL_RATIO = 0.6
+DEPOSIT_PATIENT_RATIO = 0.3
+SERVICE_RENDERED_RATIO = 0.8
+PREPAID_RATIO = 0.5
+INVOICE_CONFIRMED_RATIO = 0.85
+INVOICE_PAID_RATIO = 0.7
+PRESCRIPTION_CONFIRMED_RATIO = 0.6
+PARAGRAPH_POOL_SIZE = 500
+
+
+class SyntheticDataScale(BaseModel):
+    """Number of records to generate, derived counts default to ratios of bills"""
+
+    patients: int = 1000
+    bills: int = 10000
+    encounters: Optional[int]
+    lab_orders: Optional[int]
+    imaging_orders: Optional[int]
+    prescriptions: Optional[int]
+    products: int = 200
+    chart_entries: int = 30
+    days: int = 365
+
+    def get_encounters(self) -> int:
+        return self.bills // 10 if self.encounters is None else self.encounters
+
+    def get_lab_orders(self) -> int:
+        return self.bills // 10 if self.lab_orders is None else self.lab_orders
+
+    def get_imaging_orders(self) -> int:
+        return self.bills // 20 if self.imaging_orders is None else self.imaging_orders
+
+    def get_prescriptions(self) -> int:
+        return self.bills // 20 if self.prescriptions is None else self.prescriptions
+
+
+class BillLine(NamedTuple):
+    """A service to bill a patient for"""
+
+    patient: patient_models.Patient
+    bill_item: finance_models.BillableItem
+    module: str
+    quantity: int
+    is_service_rendered: bool
+
+
+def dataset_summary() -> Dict[str, int]:
+    """Counts the records benchmarks depend on, to tell datasets apart"""
+    counted_models = (
+        patient_models.Patient,
+        enc_models.Encounter,
+        lab_models.LabOrder,
+        lab_models.LabPanelOrder,
+        img_models.ImagingOrder,
+        img_models.ImagingObservationOrder,
+        pharm_models.Prescription,
+        inv_models.Stock,
+        finance_models.BillableItem,
+        finance_models.PriceListItem,
+        finance_models.Bill,
+        finance_models.Invoice,
+        finance_models.Payment,
+    )
+    return {model._meta.label: model.objects.count() for model in counted_models}
+
+
+def get_synthetic_user() -> User:
+    user, created = User.objects.get_or_create(
+        username=SYNTHETIC_USERNAME,
+        defaults={
+            "first_name": "Synthetic",
+            "last_name": "Clinician",
+            "email": "synthetic.clinician@example.com",
+            "is_staff": True,
+            "is_superuser": True,
+        },
+    )
+    if created:
+        user.set_unusable_password()
+        user.save()
+    return user
+
+
+class SyntheticDataGenerator:
+    """Generates a hospital dataset of a given scale"""
+
+    def __init__(
+        self,
+        scale: SyntheticDataScale,
+        seed: int = 0,
+        batch_size: int = 1000,
+        log: Callable[[str], None] = None,
+    ):
+        """
+        Args:
+            scale [SyntheticDataScale]: number of records to generate
+            seed [int]: seed of the random generator
+            batch_size [int]: records inserted per transaction
+            log [Callable]: receives progress messages
+        """
+        self.scale = scale
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.end = timezone.now()
+        self.start = self.end - timedelta(days=scale.days)
+        self.patient_ids: List[int] = []
+        self.bills_created = 0
+        self.paragraphs: List[str] = []
+
+    ############################ catalog ############################
+
+    def _get_or_create_billable(
+        self, model, name: str, price: int, **fields
+    ) -> models.Model:
+        """Creates a catalog row whose signal creates its billable item"""
+        instance = model.objects.filter(name=name).first()
+        if instance is None:
+            instance = model(name=name, **fields)
+            instance._created_by = self.user_data
+            instance._bill_price = Decimal(price)
+            instance._cost_price = Decimal(price) * COST_RATIO
+            instance.save()
+        return instance
+
+    def create_catalog(self):
+        self.user = get_synthetic_user()
+        self.user_data = utils.trim_user_data(utils.model_to_dict(self.user))
+
+        department, _ = facility_models.Department.objects.get_or_create(
+            name=f"{SYNTHETIC_PREFIX} Medicine",
+            defaults={"description": "Synthetic", "display_name": "Medicine"},
+        )
+        department_data = utils.model_to_dict(department)
+        self.clinics = []
+        for name, price in CLINICS:
+            clinic = self._get_or_create_billable(
+                enc_models.Clinic, name, price, department=department
+            )
+            self.clinics.append(
+                (clinic, {**utils.model_to_dict(clinic), "department": department_data})
+            )
+
+        self.create_laboratory_catalog()
+        self.create_imaging_catalog()
+        self.create_pharmacy_catalog()
+        self.create_finance_catalog()
+        self.log(
+            f"catalog: {len(self.clinics)} clinics, {len(self.lab_panels)} lab panels,"
+            f" {len(self.img_observations)} imaging observations,"
+            f" {len(self.products)} products"
+        )
+
+    def create_laboratory_catalog(self):
+        center, _ = lab_models.ServiceCenter.objects.get_or_create(
+            name=f"{SYNTHETIC_PREFIX} Laboratory"
+        )
+        self.lab_center = utils.model_to_dict(center)
+        specimen, _ = lab_models.LabSpecimen.objects.get_or_create(name="Blood")
+        specimen_type, _ = lab_models.LabSpecimenType.objects.get_or_create(
+            name="Whole Blood",
+            defaults={"color": "purple", "description": "EDTA", "specimen": specimen},
+        )
+        lab_unit, _ = lab_models.LabUnit.objects.get_or_create(
+            name=f"{SYNTHETIC_PREFIX} Chemistry"
+        )
+        self.lab_panels = []
+        for index, (name, price) in enumerate(LAB_PANELS):
+            observations = [
+                lab_models.LabObservation.objects.get_or_create(
+                    name=f"{name} {parameter}",
+                    defaults={
+                        "uom": "mg/dL",
+                        "reference_range": {"min": 1, "max": 10},
+                        "type": {"type": "numeric"},
+                    },
+                )[0].to_dict()
+                for parameter in ("A", "B", "C")
+            ]
+            panel = self._get_or_create_billable(
+                lab_models.LabPanel,
+                name,
+                price,
+                obv=observations,
+                specimen_type=specimen_type,
+                lab_unit=lab_unit,
+            )
+            # panel snapshot as stored on orders by LabPanelsAndOrders
+            panel_data = panel.to_dict()
+            panel_data.pop("active")
+            panel_data.pop("created_at", None)
+            for field in ("id", "status", "created_at"):
+                panel_data["specimen_type"].pop(field, None)
+            self.lab_panels.append((panel, panel_data))
+
+    def create_imaging_catalog(self):
+        center, _ = img_models.ServiceCenter.objects.get_or_create(
+            name=f"{SYNTHETIC_PREFIX} Radiology"
+        )
+        self.img_center = utils.model_to_dict(center)
+        modality, _ = img_models.Modality.objects.get_or_create(
+            name=f"{SYNTHETIC_PREFIX} Radiography"
+        )
+        self.img_observations = []
+        for name, price in IMAGING_OBSERVATIONS:
+            observation = self._get_or_create_billable(
+                img_models.ImagingObservation, name, price, modality=modality
+            )
+            observation_data = observation.to_dict()
+            observation_data.pop("audit_log", None)
+            observation_data.pop("created_at", None)
+            self.img_observations.append((observation, observation_data))
+
+    def create_pharmacy_catalog(self):
+        store, _ = inv_models.Store.objects.get_or_create(
+            name=f"{SYNTHETIC_PREFIX} Pharmacy",
+            defaults={"type": inv_models.StoreTypes.STORE, "is_pharmacy": True},
+        )
+        self.store = utils.model_to_dict(store)
+        self.dosing = {
+            "dose": pharm_models.Dose.objects.get_or_create(
+                name="1", defaults={"multiplier": 1}
+            )[0],
+            "unit": pharm_models.Unit.objects.get_or_create(name="tab")[0],
+            "route": pharm_models.Route.objects.get_or_create(name="oral")[0],
+            "frequency": pharm_models.Frequency.objects.get_or_create(
+                name="tds", defaults={"multiplier": 3}
+            )[0],
+            "direction": pharm_models.Direction.objects.get_or_create(
+                name="after meals"
+            )[0],
+            "duration": pharm_models.Duration.objects.get_or_create(
+                name="5 days", defaults={"multiplier": 5}
+            )[0],
+        }
+        self.dosing = {
+            key: utils.model_to_dict(value) for key, value in self.dosing.items()
+        }
+        generic_drugs = {
+            name: utils.model_to_dict(
+                pharm_models.GenericDrug.objects.get_or_create(
+                    name=name, defaults={"category": {}}
+                )[0]
+            )
+            for name, _, _ in DRUGS
+        }
+        self.products = []
+        for index in range(self.scale.products):
+            name, uom, price = DRUGS[index % len(DRUGS)]
+            strength = 5 * (index // len(DRUGS) + 1)
+            generic_drug_data = generic_drugs[name]
+            product = self._get_or_create_billable(
+                inv_models.Product,
+                f"{name} {strength}mg {uom}",
+                price + strength,
+                uom=uom,
+                cost=Decimal(price + strength) * COST_RATIO,
+                divider=1,
+                is_drug=True,
+                generic_drug=generic_drug_data,
+            )
+            self.products.append(
+                (product, utils.model_to_dict(product), generic_drug_data)
+            )
+
+    def create_finance_catalog(self):
+        self.cash, _ = finance_models.PaymentMethod.objects.get_or_create(name="cash")
+        self.cash_data = utils.model_to_dict(self.cash)
+        payer, _ = finance_models.Payer.objects.get_or_create(
+            name=f"{SYNTHETIC_PREFIX} Health Insurance"
+        )
+        price_list, _ = finance_models.PriceList.objects.get_or_create(
+            name=f"{SYNTHETIC_PREFIX} HMO Tariff"
+        )
+        self.scheme, _ = finance_models.PayerScheme.objects.get_or_create(
+            name=f"{SYNTHETIC_PREFIX} HMO Standard",
+            defaults={
+                "payer": payer,
+                "price_list": price_list,
+                "type": str(finance_models.PayerSchemeType.INSURANCE),
+            },
+        )
+        catalog = [clinic for clinic, _ in self.clinics]
+        catalog += [panel for panel, _ in self.lab_panels]
+        catalog += [observation for observation, _ in self.img_observations]
+        catalog += [product for product, _, _ in self.products]
+        self.bill_items: Dict[str, finance_models.BillableItem] = {
+            item.item_code: item
+            for item in finance_models.BillableItem.objects.filter(
+                item_code__in=[entry.bill_item_code for entry in catalog]
+            )
+        }
+        existing_codes = set(
+            finance_models.PriceListItem.objects.filter(
+                price_list=price_list
+            ).values_list("bill_item_code", flat=True)
+        )
+        finance_models.PriceListItem.objects.bulk_create(
+            [
+                finance_models.PriceListItem(
+                    bill_item_code=item.item_code,
+                    selling_price=item.selling_price * SCHEME_PRICE_RATIO,
+                    price_list=price_list,
+                    module=item.module,
+                    created_by=self.user_data,
+                )
+                for item in self.bill_items.values()
+                if item.item_code not in existing_codes
+            ]
+        )
+        price_index.bump_version([price_list.id])
+        self.scheme_prices: Dict[str, Decimal] = dict(
+            finance_models.PriceListItem.objects.filter(
+                price_list=price_list
+            ).values_list("bill_item_code", "selling_price")
+        )
+        self.scheme_data = {
+            "id": self.scheme.id,
+            "name": self.scheme.name,
+            "type": self.scheme.type,
+        }
+
+    ############################ helpers ############################
+
+    def batches(self, total: int):
+        """Yields (batch size, batch date), dates spread over the period"""
+        if total <= 0:
+            return
+        batch_count = -(-total // self.batch_size)
+        for index in range(batch_count):
+            size = min(self.batch_size, total - index * self.batch_size)
+            offset = (index + 0.5) / batch_count
+            yield size, self.start + (self.end - self.start) * offset
+
+    def backdate(self, model, instances: list, **fields):
+        """Sets auto_now(_add) fields, which bulk_create overwrites"""
+        model.objects.filter(pk__in=[instance.pk for instance in instances]).update(
+            **fields
+        )
+
+    def sample_patients(self, count: int) -> List[patient_models.Patient]:
+        ids = [self.random.choice(self.patient_ids) for _ in range(count)]
+        patients = patient_models.Patient.objects.in_bulk(set(ids))
+        return [patients[patient_id] for patient_id in ids]
+
+    def patient_dicts(self, patients: List[patient_models.Patient]) -> Dict[int, dict]:
+        unique = list({patient.id: patient for patient in patients}.values())
+        return {
+            patient.id: data
+            for patient, data in zip(unique, utils.models_to_dicts(unique))
+        }
+
+    def chart_text(self, words: int) -> str:
+        return " ".join(self.random.choices(CHART_WORDS, k=words))
+
+    def chart_paragraph(self) -> str:
+        if not self.paragraphs:
+            self.paragraphs = [
+                self.chart_text(self.random.randint(20, 60))
+                for _ in range(PARAGRAPH_POOL_SIZE)
+            ]
+        return self.random.choice(self.paragraphs)
+
+    ############################ records ############################
+
+    def create_patients(self):
+        today = self.end.date()
+        for size, when in self.batches(self.scale.patients):
+            uhids = patient_models.UHID_SEQUENCE.next_ids(size)
+            patients = []
+            for uhid in uhids:
+                firstname = self.random.choice(FIRSTNAMES)
+                lastname = self.random.choice(LASTNAMES)
+                insured = self.random.random() < INSURED_PATIENT_RATIO
+                deposit = (
+                    Decimal(self.random.randrange(5000, 200000, 500))
+                    if self.random.random() < DEPOSIT_PATIENT_RATIO
+                    else Decimal(0)
+                )
+                patients.append(
+                    patient_models.Patient(
+                        uhid=uhid,
+                        salutation=self.random.choice(("Mr", "Mrs", "Miss", "Dr")),
+                        firstname=firstname,
+                        lastname=lastname,
+                        middlename=self.random.choice(FIRSTNAMES),
+                        gender=self.random.choice(("Male", "Female")),
+                        date_of_birth=today
+                        - timedelta(days=self.random.randint(0, 90 * 365)),
+                        marital_status=self.random.choice(("Single", "Married")),
+                        nationality="Nigerian",
+                        phone_number=f"080{self.random.randint(0, 99999999):08d}",
+                        email=f"{firstname}.{lastname}.{uhid}@example.com".lower(),
+                        home_address={"street": "1 Hospital Road", "city": "Lagos"},
+                        payment_scheme=[
+                            {
+                                "payer_scheme": self.scheme_data,
+                                "enrollee_id": f"ENR{uhid}",
+                                "relationship": "PRINCIPAL",
+                                "exp_date": None,
+                            }
+                        ]
+                        if insured
+                        else [],
+                        deposit=deposit,
+                    )
+                )
+            with transaction.atomic():
+                patients = patient_models.Patient.objects.bulk_create(patients)
+                self.backdate(patient_models.Patient, patients, created_at=when)
+                entries = patient_models.PatientBalanceEntry.objects.bulk_create(
+                    [
+                        patient_models.PatientBalanceEntry(
+                            patient=patient,
+                            entry_type=str(patient_models.BalanceEntryType.DEPOSIT),
+                            deposit_change=patient.deposit,
+                        )
+                        for patient in patients
+                        if patient.deposit
+                    ]
+                )
+                self.backdate(
+                    patient_models.PatientBalanceEntry, entries, created_at=when
+                )
+            self.patient_ids.extend(patient.id for patient in patients)
+        self.log(f"patients: {len(self.patient_ids)}")
+
+    def create_bills(
+        self, lines: List[BillLine], when, patient_data: Dict[int, dict]
+    ) -> List[finance_models.Bill]:
+        """
+        Bills services and settles them the way the finance flows would.
+        Rendered services are invoiced per patient and payer, confirmed
+        invoices of self paying patients are partly paid, and the others
+        are reserved from deposits or left uncleared.
+
+        Args:
+            lines [List[BillLine]]: services to bill
+            when [datetime]: date of the transactions
+            patient_data [dict]: patient snapshots by id
+
+        Returns:
+            List[Bill]: bills, in the order of lines
+        """
+        self_prepaid = str(finance_models.PayerSchemeType.SELF_PREPAID)
+        bills: List[finance_models.Bill] = []
+        invoice_groups: Dict[tuple, List[int]] = defaultdict(list)
+        reserved: Dict[int, List[int]] = defaultdict(list)
+        for line in lines:
+            item = line.bill_item
+            insured = (
+                bool(line.patient.payment_scheme)
+                and item.item_code in self.scheme_prices
+                and self.random.random() < INSURED_BILL_RATIO
+            )
+            unit_price = (
+                self.scheme_prices[item.item_code] if insured else item.selling_price
+            )
+            bill = finance_models.Bill(
+                bill_item_code=item.item_code,
+                cost_price=(item.cost or 0) * line.quantity,
+                selling_price=unit_price * line.quantity,
+                cleared_status=str(
+                    finance_models.BillStatus.CLEARED
+                    if insured
+                    else finance_models.BillStatus.UNCLEARED
+                ),
+                quantity=line.quantity,
+                bill_source=line.module,
+                billed_to=self.scheme if insured else None,
+                billed_to_type=self.scheme.type if insured else self_prepaid,
+                description=item.description,
+                is_service_rendered=line.is_service_rendered,
+                serviced_rendered_at=when if line.is_service_rendered else None,
+                patient=patient_data[line.patient.id],
+                updated_by=self.user_data,
+            )
+            if line.is_service_rendered:
+                key = (line.patient.id, bill.billed_to_type)
+                invoice_groups[key].append(len(bills))
+            elif not insured and self.random.random() < PREPAID_RATIO:
+                bill.cleared_status = str(finance_models.BillStatus.CLEARED)
+                bill.is_reserved = True
+                reserved[line.patient.id].append(len(bills))
+            bills.append(bill)
+
+        invoices: List[finance_models.Invoice] = []
+        paid_invoices: List[finance_models.Invoice] = []
+        for (patient_id, scheme_type), indexes in invoice_groups.items():
+            group = [bills[index] for index in indexes]
+            total = sum(bill.selling_price for bill in group)
+            invoice = finance_models.Invoice(
+                patient=patient_data[patient_id],
+                scheme_type=scheme_type,
+                payer_scheme=group[0].billed_to,
+                total_charge=0,
+                balance=0,
+                status=str(finance_models.InvoiceStatus.DRAFT),
+                created_by=self.user_data,
+            )
+            if self.random.random() < INVOICE_CONFIRMED_RATIO:
+                invoice.total_charge = total
+                invoice.balance = total
+                invoice.status = str(finance_models.InvoiceStatus.OPEN)
+                invoice.confirmed_by = self.user_data
+                invoice.confirmed_at = when
+                invoice.due_date = when
+                if (
+                    scheme_type == self_prepaid
+                    and self.random.random() < INVOICE_PAID_RATIO
+                ):
+                    invoice.paid_amount = total
+                    invoice.balance = 0
+                    invoice.status = str(finance_models.InvoiceStatus.PAID)
+                    paid_invoices.append(invoice)
+                    for bill in group:
+                        bill.cleared_status = str(finance_models.BillStatus.CLEARED)
+            invoice._bill_indexes = indexes
+            invoices.append(invoice)
+
+        confirmed = [invoice for invoice in invoices if invoice.confirmed_at]
+        for invoice, inv_id in zip(
+            confirmed, finance_models.INVOICE_ID_SEQUENCE.next_ids(len(confirmed))
+        ):
+            invoice.inv_id = inv_id
+        invoices = finance_models.Invoice.objects.bulk_create(invoices)
+        for invoice in invoices:
+            for index in invoice._bill_indexes:
+                bills[index].invoice = invoice
+                bills[index].is_invoiced = True
+        bills = finance_models.Bill.objects.bulk_create(bills)
+        bill_lines = to_bill_lines(bills)
+
+        payments: List[finance_models.Payment] = []
+        for invoice in paid_invoices:
+            payments.append(
+                self.payment(
+                    [bill_lines[index] for index in invoice._bill_indexes],
+                    finance_models.PaymentType.INVOICE,
+                    invoice.patient,
+                    invoice=invoice,
+                )
+            )
+        patients: Dict[int, patient_models.Patient] = {
+            line.patient.id: line.patient for line in lines
+        }
+        for patient_id, indexes in reserved.items():
+            patients[patient_id].reserve += sum(
+                bills[index].selling_price for index in indexes
+            )
+            payments.append(
+                self.payment(
+                    [bill_lines[index] for index in indexes],
+                    finance_models.PaymentType.DEPOSIT,
+                    patient_data[patient_id],
+                )
+            )
+        payments = finance_models.Payment.objects.bulk_create(payments)
+        invoice_payments = to_payment_rows(
+            [payment for payment in payments if payment.invoice_id]
+        )
+        for invoice, invoice_payment in zip(paid_invoices, invoice_payments):
+            invoice_payment.invoice = invoice
+        invoice_lines: List[finance_models.InvoiceBillLine] = []
+        for invoice in invoices:
+            lines = to_line_rows([bill_lines[index] for index in invoice._bill_indexes])
+            for line in lines:
+                line.invoice = invoice
+            invoice.lines_total, invoice.reserved_total = line_totals(lines)
+            invoice_lines += lines
+        finance_models.InvoiceBillLine.objects.bulk_create(invoice_lines)
+        finance_models.InvoicePayment.objects.bulk_create(invoice_payments)
+        finance_models.Invoice.objects.bulk_update(
+            invoices, ["lines_total", "reserved_total"]
+        )
+        if reserved:
+            patient_models.Patient.objects.bulk_update(
+                [patients[patient_id] for patient_id in reserved], ["reserve"]
+            )
+            # the bills were reserved from deposits paid for them
+            entries = []
+            for patient_id, indexes in reserved.items():
+                amount = sum(bills[index].selling_price for index in indexes)
+                entries += [
+                    patient_models.PatientBalanceEntry(
+                        patient_id=patient_id,
+                        entry_type=str(patient_models.BalanceEntryType.DEPOSIT),
+                        deposit_change=amount,
+                    ),
+                    patient_models.PatientBalanceEntry(
+                        patient_id=patient_id,
+                        entry_type=str(patient_models.BalanceEntryType.RESERVE),
+                        deposit_change=-amount,
+                        reserve_change=amount,
+                    ),
+                ]
+            entries = patient_models.PatientBalanceEntry.objects.bulk_create(entries)
+            self.backdate(patient_models.PatientBalanceEntry, entries, created_at=when)
+
+        self.backdate(
+            finance_models.Bill, bills, transaction_date=when, updated_at=when
+        )
+        self.backdate(
+            finance_models.Invoice, invoices, created_at=when, updated_at=when
+        )
+        self.backdate(finance_models.Payment, payments, created_at=when)
+        self.bills_created += len(bills)
+        return bills
+
+    def payment(
+        self,
+        bill_lines: List[dict],
+        payment_type: finance_models.PaymentType,
+        patient: dict,
+        invoice: finance_models.Invoice = None,
+    ) -> finance_models.Payment:
+        total = sum(Decimal(bill_line["selling_price"]) for bill_line in bill_lines)
+        method_struct = finance_models.PaymentMethodStruct(
+            payment_method=self.cash_data, amount=str(total)
+        ).dict()
+        return finance_models.Payment(
+            bills=[
+                {key: value for key, value in bill_line.items() if key != "_id"}
+                for bill_line in bill_lines
+            ],
+            patient=patient,
+            payment_method=self.cash_data,
+            payment_type=str(payment_type),
+            invoice=invoice,
+            total_amount=total,
+            audit_log=[
+                utils.AuditLog(
+                    user=self.user_data,
+                    event=utils.AuditEvent.CREATE,
+                    fields=method_struct,
+                ).dict()
+            ],
+            created_by=self.user_data,
+        )
+
+    def encounter_chart(self, when) -> List[dict]:
+        return [
+            enc_models.EncounterChart(
+                chart={
+                    "title": "Progress Note",
+                    "description": self.chart_text(8),
+                    "content": [self.chart_paragraph() for _ in range(3)],
+                    "orders": {},
+                    "diagnosis": [],
+                    "is_active": False,
+                },
+                created_at=(when + timedelta(minutes=10 * index)).isoformat(),
+                created_by=self.user_data,
+            ).dict()
+            for index in range(self.scale.chart_entries)
+        ]
+
+    def create_encounters(self):
+        total = 0
+        for size, when in self.batches(self.scale.get_encounters()):
+            patients = self.sample_patients(size)
+            patient_data = self.patient_dicts(patients)
+            encounter_ids = enc_utils.ENCOUNTER_ID_SEQUENCE.next_ids(size)
+            visits = [
+                (
+                    patient,
+                    self.random.choice(self.clinics),
+                    self.random.random() < SERVICE_RENDERED_RATIO,
+                )
+                for patient in patients
+            ]
+            with transaction.atomic():
+                bills = self.create_bills(
+                    [
+                        BillLine(
+                            patient,
+                            self.bill_items[clinic.bill_item_code],
+                            str(utils.Modules.ENCOUNTERS),
+                            1,
+                            seen,
+                        )
+                        for patient, (clinic, _), seen in visits
+                    ],
+                    when,
+                    patient_data,
+                )
+                encounters = []
+                for encounter_id, bill, (patient, (_, clinic_data), seen) in zip(
+                    encounter_ids, bills, visits
+                ):
+                    encounters.append(
+                        enc_models.Encounter(
+                            encounter_id=encounter_id,
+                            clinic=clinic_data,
+                            status="Signed" if seen else "New",
+                            acknowledged_by=self.user_data if seen else {},
+                            acknowledged_at=when if seen else None,
+                            signed_by=self.user_data if seen else {},
+                            signed_date=when if seen else None,
+                            provider=self.user_data,
+                            patient=patient_data[patient.id],
+                            encounter_type=self.random.choice(
+                                ("Walk In", "Appointment", "Referral")
+                            ),
+                            chief_complaint=self.chart_text(6),
+                            bill=str(bill.id),
+                        )
+                    )
+                encounters = enc_models.Encounter.objects.bulk_create(encounters)
+                enc_models.EncounterChartEntry.objects.bulk_create(
+                    [
+                        enc_models.EncounterChartEntry.from_chart(encounter.id, chart)
+                        for encounter, (_, _, seen) in zip(encounters, visits)
+                        if seen
+                        for chart in self.encounter_chart(when)
+                    ],
+                    batch_size=self.batch_size,
+                )
+                self.backdate(
+                    enc_models.Encounter,
+                    encounters,
+                    created_datetime=when,
+                    encounter_datetime=when,
+                )
+            total += len(encounters)
+        self.log(f"encounters: {total}")
+
+    def create_lab_orders(self):
+        total = 0
+        for size, when in self.batches(self.scale.get_lab_orders()):
+            patients = self.sample_patients(size)
+            patient_data = self.patient_dicts(patients)
+            asns = lab_models.LAB_ORDER_SEQUENCE.next_ids(size)
+            orders = [
+                (
+                    patient,
+                    self.random.sample(self.lab_panels, self.random.randint(1, 3)),
+                )
+                for patient in patients
+            ]
+            with transaction.atomic():
+                lab_orders = lab_models.LabOrder.objects.bulk_create(
+                    [
+                        lab_models.LabOrder(
+                            patient=patient_data[patient.id],
+                            asn=asn,
+                            service_center=self.lab_center,
+                            lab_panels=[panel.id for panel, _ in panels],
+                            ordered_by=self.user_data,
+                        )
+                        for asn, (patient, panels) in zip(asns, orders)
+                    ]
+                )
+                lines, panel_orders = [], []
+                for lab_order, (patient, panels) in zip(lab_orders, orders):
+                    for panel, panel_data in panels:
+                        done = self.random.random() < SERVICE_RENDERED_RATIO
+                        lines.append(
+                            BillLine(
+                                patient,
+                                self.bill_items[panel.bill_item_code],
+                                str(utils.Modules.LABORATORY),
+                                1,
+                                done,
+                            )
+                        )
+                        panel_orders.append(
+                            lab_models.LabPanelOrder(
+                                patient=patient_data[patient.id],
+                                lab_order=lab_order,
+                                panel=panel_data,
+                                status="APPROVED" if done else "NEW",
+                                approved_by=self.user_data if done else {},
+                                approved_on=when if done else None,
+                                is_result_sent=done,
+                            )
+                        )
+                bills = self.create_bills(lines, when, patient_data)
+                for panel_order, bill in zip(panel_orders, bills):
+                    panel_order.bill = str(bill.id)
+                panel_orders = lab_models.LabPanelOrder.objects.bulk_create(
+                    panel_orders
+                )
+                for lab_order in lab_orders:
+                    lab_order.lab_panel_orders = [
+                        panel_order.id
+                        for panel_order in panel_orders
+                        if panel_order.lab_order_id == lab_order.id
+                    ]
+                lab_models.LabOrder.objects.bulk_update(
+                    lab_orders, ["lab_panel_orders"]
+                )
+                self.backdate(lab_models.LabOrder, lab_orders, ordered_datetime=when)
+                self.backdate(lab_models.LabPanelOrder, panel_orders, created_at=when)
+            total += len(lab_orders)
+        self.log(f"lab orders: {total}")
+
+    def create_imaging_orders(self):
+        total = 0
+        for size, when in self.batches(self.scale.get_imaging_orders()):
+            patients = self.sample_patients(size)
+            patient_data = self.patient_dicts(patients)
+            img_ids = img_models.IMAGING_ORDER_SEQUENCE.next_ids(size)
+            orders = [
+                (
+                    patient,
+                    self.random.sample(
+                        self.img_observations, self.random.randint(1, 2)
+                    ),
+                )
+                for patient in patients
+            ]
+            with transaction.atomic():
+                img_orders = img_models.ImagingOrder.objects.bulk_create(
+                    [
+                        img_models.ImagingOrder(
+                            patient=patient_data[patient.id],
+                            img_id=img_id,
+                            service_center=self.img_center,
+                            img_obv=[observation.id for observation, _ in observations],
+                            ordered_by=self.user_data,
+                        )
+                        for img_id, (patient, observations) in zip(img_ids, orders)
+                    ]
+                )
+                lines, obv_orders = [], []
+                for img_order, (patient, observations) in zip(img_orders, orders):
+                    for observation, observation_data in observations:
+                        done = self.random.random() < SERVICE_RENDERED_RATIO
+                        lines.append(
+                            BillLine(
+                                patient,
+                                self.bill_items[observation.bill_item_code],
+                                str(utils.Modules.IMAGING),
+                                1,
+                                done,
+                            )
+                        )
+                        obv_orders.append(
+                            img_models.ImagingObservationOrder(
+                                patient=patient_data[patient.id],
+                                img_order=img_order,
+                                img_obv=observation_data,
+                                status="APPROVED" if done else "NEW",
+                                report=self.chart_text(80) if done else None,
+                                reported_by=self.user_data if done else {},
+                                reported_on=when if done else None,
+                                approved_by=self.user_data if done else {},
+                                approved_on=when if done else None,
+                            )
+                        )
+                bills = self.create_bills(lines, when, patient_data)
+                for obv_order, bill in zip(obv_orders, bills):
+                    obv_order.bill = str(bill.id)
+                obv_orders = img_models.ImagingObservationOrder.objects.bulk_create(
+                    obv_orders
+                )
+                for img_order in img_orders:
+                    img_order.img_obv_orders = [
+                        obv_order.id
+                        for obv_order in obv_orders
+                        if obv_order.img_order_id == img_order.id
+                    ]
+                img_models.ImagingOrder.objects.bulk_update(
+                    img_orders, ["img_obv_orders"]
+                )
+                self.backdate(
+                    img_models.ImagingOrder, img_orders, ordered_datetime=when
+                )
+                self.backdate(
+                    img_models.ImagingObservationOrder, obv_orders, created_at=when
+                )
+            total += len(img_orders)
+        self.log(f"imaging orders: {total}")
+
+    def create_prescriptions(self):
+        total = 0
+        for size, when in self.batches(self.scale.get_prescriptions()):
+            patients = self.sample_patients(size)
+            patient_data = self.patient_dicts(patients)
+            prc_ids = pharm_models.PRESCRIPTION_SEQUENCE.next_ids(size)
+            prescriptions = []
+            for prc_id, patient in zip(prc_ids, patients):
+                confirmed = self.random.random() < PRESCRIPTION_CONFIRMED_RATIO
+                details = [
+                    {
+                        "id": f"RXD_{prc_id}_{index}",
+                        "generic_drug": generic_drug_data,
+                        "product": product_data,
+                        **self.dosing,
+                        "dispense_quantity": self.random.randint(1, 30),
+                        "status": str(pharm_models.PrescriptionDetailStatus.IN_FILLED),
+                    }
+                    for index, (_, product_data, generic_drug_data) in enumerate(
+                        self.random.sample(self.products, self.random.randint(1, 4))
+                    )
+                ]
+                prescriptions.append(
+                    pharm_models.Prescription(
+                        prc_id=prc_id,
+                        patient=patient_data[patient.id],
+                        source=pharm_models.PrescriptionSources.OPD,
+                        prescribing_physician=self.user_data,
+                        details=details,
+                        store=self.store,
+                        status=pharm_models.PrescriptionStatus.CONFIRMED
+                        if confirmed
+                        else pharm_models.PrescriptionStatus.NEW,
+                        confirmed_by=self.user_data if confirmed else {},
+                        confirmed_at=when if confirmed else None,
+                        created_by=self.user_data,
+                    )
+                )
+            with transaction.atomic():
+                prescriptions = pharm_models.Prescription.objects.bulk_create(
+                    prescriptions
+                )
+                self.backdate(
+                    pharm_models.Prescription,
+                    prescriptions,
+                    created_at=when,
+                    updated_at=when,
+                )
+            total += len(prescriptions)
+        self.log(f"prescriptions: {total}")
+
+    def create_dispensing_bills(self):
+        """Bills drugs dispensed to patients up to the requested bill count"""
+        remaining = max(0, self.scale.bills - self.bills_created)
+        for size, when in self.batches(remaining):
+            patients = self.sample_patients(size)
+            patient_data = self.patient_dicts(patients)
+            lines = []
+            for patient in patients:
+                product = self.random.choice(self.products)[0]
+                lines.append(
+                    BillLine(
+                        patient,
+                        self.bill_items[product.bill_item_code],
+                        str(utils.Modules.INVENTORY),
+                        self.random.randint(1, 30),
+                        self.random.random() < SERVICE_RENDERED_RATIO,
+                    )
+                )
+            with transaction.atomic():
+                self.create_bills(lines, when, patient_data)
+        self.log(f"bills: {self.bills_created}")
+
+    def create_stock(self):
+        stocks = [
+            inv_models.Stock(
+                store=self.store,
+                product=product_data,
+                quantity=self.random.randint(100, 10000),
+            )
+            for _, product_data, _ in self.products
+            if not inv_models.Stock.filter_store_product(
+                self.store["id"], product_data["id"]
+            ).exists()
+        ]
+        inv_models.Stock.objects.bulk_create(stocks)
+        self.log(f"stock: {len(stocks)}")
+
+    def generate(self):
+        self.create_catalog()
+        self.create_patients()
+        if not self.patient_ids:
+            return
+        self.create_encounters()
+        self.create_lab_orders()
+        self.create_imaging_orders()
+        self.create_prescriptions()
+        self.create_dispensing_bills()
+        self.create_stock()
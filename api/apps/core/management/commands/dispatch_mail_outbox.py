@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.includes.mail_dispatcher import MailOutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = "send the mails queued in the mail outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="send one batch from every database and exit",
+        )
+        parser.add_argument("--batch-size", type=int, help="mails claimed at a time")
+        parser.add_argument(
+            "--base-url", help="mail provider base url, e.g. of a fake mailgun"
+        )
+        parser.add_argument(
+            "--database",
+            action="append",
+            dest="databases",
+            help="database to drain, drains all databases when omitted",
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = MailOutboxDispatcher.from_settings(
+            batch_size=options.get("batch_size"),
+            base_url=options.get("base_url"),
+            databases=options.get("databases"),
+        )
+        if options.get("once"):
+            for alias, sent in dispatcher.dispatch_once().items():
+                self.stdout.write(self.style.SUCCESS(f"{alias}: sent {sent} mails"))
+            return
+        poll_interval = getattr(settings, "MAIL_OUTBOX", {}).get("POLL_INTERVAL", 5)
+        self.stdout.write(self.style.SUCCESS("dispatching mail outbox"))
+        try:
+            dispatcher.run(poll_interval=poll_interval)
+        except KeyboardInterrupt:
+            pass
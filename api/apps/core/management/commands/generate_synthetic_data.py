@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+
+from api.apps.core.libs.synthetic_data import (
+    SyntheticDataGenerator,
+    SyntheticDataScale,
+    dataset_summary,
+)
+from config.middlewares.db_routing import ThreadLocal
+
+
+class Command(BaseCommand):
+    help = "generate a synthetic hospital dataset, e.g. for benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--patients", type=int, default=1000)
+        parser.add_argument("--bills", type=int, default=10000)
+        parser.add_argument(
+            "--encounters", type=int, help="defaults to a tenth of the bills"
+        )
+        parser.add_argument(
+            "--lab-orders", type=int, help="defaults to a tenth of the bills"
+        )
+        parser.add_argument(
+            "--imaging-orders", type=int, help="defaults to a twentieth of the bills"
+        )
+        parser.add_argument(
+            "--prescriptions", type=int, help="defaults to a twentieth of the bills"
+        )
+        parser.add_argument(
+            "--products", type=int, default=200, help="drugs in the catalog"
+        )
+        parser.add_argument(
+            "--chart-entries", type=int, default=30, help="chart entries per encounter"
+        )
+        parser.add_argument(
+            "--days", type=int, default=365, help="period the records are spread over"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="records per transaction"
+        )
+        parser.add_argument(
+            "--database", default="default", choices=["default", "sandbox"]
+        )
+
+    def handle(self, *args, **options):
+        setattr(ThreadLocal, "DB", options["database"])
+        scale = SyntheticDataScale(
+            patients=options["patients"],
+            bills=options["bills"],
+            encounters=options.get("encounters"),
+            lab_orders=options.get("lab_orders"),
+            imaging_orders=options.get("imaging_orders"),
+            prescriptions=options.get("prescriptions"),
+            products=options["products"],
+            chart_entries=options["chart_entries"],
+            days=options["days"],
+        )
+        generator = SyntheticDataGenerator(
+            scale,
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            log=lambda message: self.stdout.write(message),
+        )
+        generator.generate()
+        for label, count in dataset_summary().items():
+            self.stdout.write(self.style.SUCCESS(f"{label}: {count}"))
@@ -0,0 +1,101 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.apps.core.libs.benchmarks import (
+    BENCHMARKS,
+    BenchmarkResult,
+    compare_results,
+    run_benchmarks,
+)
+from api.includes import exceptions, file_utils
+
+
+class Command(BaseCommand):
+    help = (
+        "time the hot flows against a synthetic dataset (see"
+        " generate_synthetic_data) and write the results as json"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--benchmark",
+            action="append",
+            dest="benchmarks",
+            help="benchmark to run, may be repeated, all by default",
+        )
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--output", help="file the json results are written to")
+        parser.add_argument(
+            "--compare", help="json results of a previous run to compare with"
+        )
+        parser.add_argument(
+            "--report-days", type=int, default=30, help="period covered by reports"
+        )
+        parser.add_argument(
+            "--export-format",
+            default=str(file_utils.ExportFormat.XLSX),
+            choices=[str(export_format) for export_format in file_utils.ExportFormat],
+        )
+        parser.add_argument(
+            "--database", default="default", choices=["default", "sandbox"]
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--list", action="store_true", help="list the benchmarks and exit"
+        )
+
+    def log_result(self, result: BenchmarkResult):
+        if result.error:
+            self.stdout.write(self.style.ERROR(f"{result.name}: {result.error}"))
+            return
+        self.stdout.write(
+            f"{result.name}: mean {result.mean * 1000:.1f}ms"
+            f" p95 {result.p95 * 1000:.1f}ms queries {result.queries:.0f}"
+        )
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for name in BENCHMARKS:
+                self.stdout.write(name)
+            return
+
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        try:
+            results = run_benchmarks(
+                names=options["benchmarks"],
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                alias=options["database"],
+                seed=options["seed"],
+                report_days=options["report_days"],
+                export_format=options["export_format"],
+                log=self.log_result,
+            )
+        except exceptions.BadRequest as e:
+            raise CommandError(str(e))
+
+        if options["output"]:
+            with open(options["output"], "w") as output_file:
+                json.dump(results, output_file, indent=2)
+            self.stdout.write(
+                self.style.SUCCESS(f"results written to {options['output']}")
+            )
+        else:
+            self.stdout.write(json.dumps(results, indent=2))
+
+        if baseline:
+            for comparison in compare_results(baseline, results):
+                change = comparison["change"] * 100
+                style = self.style.ERROR if change > 0 else self.style.SUCCESS
+                self.stdout.write(
+                    style(
+                        f"{comparison['name']}: {comparison['baseline'] * 1000:.1f}ms"
+                        f" -> {comparison['current'] * 1000:.1f}ms ({change:+.1f}%)"
+                    )
+                )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.includes.fake_mailgun import FakeMailgunServer
+
+
+class Command(BaseCommand):
+    help = "serve a local fake of the mailgun messages endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8025)
+
+    def handle(self, *args, **options):
+        server = FakeMailgunServer(host=options["host"], port=options["port"])
+        self.stdout.write(self.style.SUCCESS(f"fake mailgun on {server.base_url}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.includes import sequences
+
+
+class Command(BaseCommand):
+    help = "seed id sequence counters of the current period from existing data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sequence",
+            action="append",
+            dest="sequences",
+            help="name of sequence to seed, seeds all sequences when omitted",
+        )
+
+    def handle(self, *args, **options):
+        names = options.get("sequences") or list(sequences.SEQUENCES)
+        for name in names:
+            sequence = sequences.SEQUENCES.get(name)
+            if sequence is None:
+                self.stdout.write(self.style.ERROR(f"unknown sequence {name}"))
+                continue
+            for key, value in sequence.seed().items():
+                self.stdout.write(self.style.SUCCESS(f"{key}: {value}"))
@@ -0,0 +1,78 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:56
+
+from django.db import migrations, models
+import uuid
+
+# tables of each catalog, see api.includes.catalog_cache.Catalogs
+CATALOG_TABLES = {
+    "lab_units": ["laboratory_labpanel", "laboratory_labunit"],
+    "imaging_modalities": ["imaging_imagingobservation", "imaging_modality"],
+}
+
+# a random uuid, as gen_random_uuid() needs postgres 13 or pgcrypto
+NEW_VERSION = "md5(random()::text || clock_timestamp()::text)::uuid"
+
+# replaces the version stamp of the catalog named by the trigger argument,
+# once per statement so bulk writes are caught too
+CREATE_TRIGGERS = [
+    f"""
+    CREATE FUNCTION core_bump_catalog_version() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO core_catalogversion (name, version, updated_at)
+        VALUES (TG_ARGV[0], {NEW_VERSION}, now())
+        ON CONFLICT (name) DO UPDATE SET
+            version = EXCLUDED.version,
+            updated_at = EXCLUDED.updated_at;
+        RETURN NULL;
+    END;
+    $$
+    """,
+] + [
+    f"""
+    CREATE TRIGGER {table}_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+    FOR EACH STATEMENT EXECUTE FUNCTION core_bump_catalog_version('{name}')
+    """
+    for name, tables in CATALOG_TABLES.items()
+    for table in tables
+]
+# first stamps, so reads find the version row before any write
+CREATE_VERSIONS = [
+    f"""
+    INSERT INTO core_catalogversion (name, version, updated_at)
+    VALUES ('{name}', {NEW_VERSION}, now())
+    """
+    for name in CATALOG_TABLES
+]
+DROP_TRIGGERS = [
+    f"DROP TRIGGER {table}_catalog_version ON {table}"
+    for tables in CATALOG_TABLES.values()
+    for table in tables
+] + ["DROP FUNCTION core_bump_catalog_version()"]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_mailoutbox'),
+        ('imaging', '0008_json_key_indexes'),
+        ('laboratory', '0013_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=256, unique=True)),
+                ('version', models.UUIDField(default=uuid.uuid4)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'CatalogVersions',
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        migrations.RunSQL(CREATE_VERSIONS, migrations.RunSQL.noop),
+    ]
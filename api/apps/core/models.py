@@ -1,5 +1,7 @@
+import uuid
 from enum import Enum
 from django.db import models
+from django.utils import timezone
 
 from api.includes import utils, exceptions
 from api.includes.models import DateHistoryTracker
@@ -204,3 +206,83 @@ class AppPreferences(DateHistoryTracker):
     def save(self, *args, **kwargs) -> None:
         self._validate_value()
         return super().save(*args, **kwargs)
+
+
+class SequenceCounter(models.Model):
+    """Holds the last serial allocated for a human readable id sequence.
+    Rows are keyed by sequence name, prefix and period, see
+    api.includes.sequences
+    """
+
+    key = models.CharField(max_length=256, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "SequenceCounters"
+
+    def __str__(self):
+        return self.key
+
+
+class CatalogVersion(models.Model):
+    """Version stamp of a catalog served from cache. Triggers on the tables
+    of the catalog replace the stamp on every write, see
+    api.includes.catalog_cache
+    """
+
+    name = models.CharField(max_length=256, unique=True)
+    version = models.UUIDField(default=uuid.uuid4)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "CatalogVersions"
+
+    def __str__(self):
+        return self.name
+
+
+class MailOutboxStatus(models.TextChoices):
+    PENDING = "PENDING"
+    SENT = "SENT"
+    DEAD = "DEAD"
+
+
+class MailOutbox(DateHistoryTracker):
+    """
+    Mails waiting to be sent by the outbox dispatcher.
+    Rows are written in the transaction of the action that triggers the
+    mail. The attachment is either stored as is or rendered at dispatch
+    time by a registered attachment renderer, see api.includes.mail_utils
+    """
+
+    subject = models.CharField(max_length=256)
+    body = models.TextField(blank=True)
+    receiver_mail = models.CharField(max_length=256)
+    file_name = models.CharField(max_length=256, null=True, blank=True)
+    attachment = models.BinaryField(null=True, blank=True)
+    attachment_renderer = models.CharField(max_length=256, null=True, blank=True)
+    attachment_kwargs = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=128,
+        choices=MailOutboxStatus.choices,
+        default=MailOutboxStatus.PENDING,
+    )
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "MailOutbox"
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                name="core_mailoutbox_pending_idx",
+                condition=models.Q(status="PENDING"),
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.receiver_mail}: {self.subject}"
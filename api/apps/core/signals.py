@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from config import preferences
+from api.apps.core.models import AppPreferences
+
+
+@receiver(post_save, sender=AppPreferences)
+@receiver(post_delete, sender=AppPreferences)
+def invalidate_preferences_cache(sender, instance, using, **kwargs):
+    """Invalidates cached app preferences in every worker process"""
+    preferences.notify_preferences_changed(using)
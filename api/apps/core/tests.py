@@ -1,3 +1,727 @@
+import io
+import json
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import pandas
+import psycopg2
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.db import OperationalError, connection
 from django.test import TestCase
+from django.template import Context
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.apps.core import models
+from api.apps.core import views as core_views
+from api.apps.core.libs import benchmarks, synthetic_data
+from api.apps.imaging import models as img_models
+from api.apps.imaging import views as img_views
+from api.apps.inventory import models as inv_models
+from api.apps.patient.libs import balance_ledger
+from api.includes import (
+    exceptions,
+    file_utils,
+    json_keys,
+    mail_utils,
+    metrics,
+    pagination,
+    pdf_generator,
+    sequences,
+    snapshots,
+    template_cache,
+    utils,
+)
+from api.includes.fake_mailgun import FakeMailgunServer
+from api.includes.mail_dispatcher import MailOutboxDispatcher
+from config import preferences
+
+
+@mail_utils.attachment_renderer("core.test_attachment")
+def render_test_attachment(content: str):
+    return content.encode()
+
+
+class MailOutboxTest(TestCase):
+    def setUp(self) -> None:
+        self.mailgun = FakeMailgunServer().start()
+        self.dispatcher = MailOutboxDispatcher(
+            batch_size=10,
+            max_attempts=2,
+            retry_base_delay=0,
+            retry_max_delay=0,
+            lease=60,
+            timeout=5,
+            base_url=self.mailgun.base_url,
+            databases=["default"],
+        )
+
+    def tearDown(self) -> None:
+        self.mailgun.stop()
+
+    def queue_mail(self, **kwargs) -> models.MailOutbox:
+        return mail_utils.EmailUtil(
+            subject="Lab Results",
+            body="Hello",
+            receiver_mail="patient@mail.com",
+            **kwargs,
+        ).queue_mail()
+
+    def test_dispatch_sends_rendered_attachment(self):
+        mail = self.queue_mail(
+            file_name="report.pdf",
+            attachment_renderer="core.test_attachment",
+            attachment_kwargs={"content": "report"},
+        )
+        self.assertEqual({"default": 1}, self.dispatcher.dispatch_once())
+        mail.refresh_from_db()
+        self.assertEqual(models.MailOutboxStatus.SENT, mail.status)
+        self.assertEqual(1, len(self.mailgun.messages))
+        message = self.mailgun.messages[0]
+        self.assertEqual("patient@mail.com", message["fields"]["to"])
+        self.assertEqual(b"report", message["attachments"][0]["content"])
+
+    def test_failed_mail_is_retried_then_dead_lettered(self):
+        mail = self.queue_mail()
+        self.mailgun.fail_next(count=2, status=503)
+        self.dispatcher.dispatch_once()
+        mail.refresh_from_db()
+        self.assertEqual(models.MailOutboxStatus.PENDING, mail.status)
+        self.assertEqual(1, mail.attempts)
+        self.dispatcher.dispatch_once()
+        mail.refresh_from_db()
+        self.assertEqual(models.MailOutboxStatus.DEAD, mail.status)
+        self.assertEqual([], self.mailgun.messages)
+
+    def test_rejected_mail_is_dead_lettered(self):
+        mail = self.queue_mail()
+        self.mailgun.fail_next(status=400)
+        self.dispatcher.dispatch_once()
+        mail.refresh_from_db()
+        self.assertEqual(models.MailOutboxStatus.DEAD, mail.status)
+
+
+class SnapshotTest(TestCase):
+    def setUp(self) -> None:
+        self.group = Group.objects.create(name="cashier")
+        self.user = User.objects.create_user(
+            username="snapshot", email="snapshot@mail.com", password="pass432dsd**"
+        )
+        self.user.groups.add(self.group)
+
+    def reference_snapshot(self, instance, exclude_fields=()):
+        class Serializer(serializers.ModelSerializer):
+            class Meta:
+                model = type(instance)
+                depth = 1
+                exclude = tuple(exclude_fields)
+
+        return json.loads(json.dumps(Serializer(instance).data))
+
+    def test_snapshot_matches_model_serializer(self):
+        for exclude_fields in (set(), {"password", "user_permissions"}):
+            self.assertEqual(
+                json.dumps(self.reference_snapshot(self.user, exclude_fields)),
+                json.dumps(utils.model_to_dict(self.user, exclude_fields)),
+            )
+        self.assertEqual(
+            [self.reference_snapshot(self.group)],
+            utils.models_to_dicts([self.group]),
+        )
+
+    def test_snapshot_memo_drops_saved_instances(self):
+        with snapshots.snapshot_memo():
+            first = utils.model_to_dict(self.user)
+            first["username"] = "changed"
+            self.assertEqual("snapshot", utils.model_to_dict(self.user)["username"])
+            with self.assertNumQueries(0):
+                utils.model_to_dict(self.user)
+            self.user.first_name = "Ada"
+            self.user.save()
+            self.assertEqual("Ada", utils.model_to_dict(self.user)["first_name"])
+
+
+class PreferencesCacheTest(TestCase):
+    def setUp(self) -> None:
+        preferences.preferences_cache.invalidate()
+        self.addCleanup(preferences.preferences_cache.invalidate)
+
+    def test_preferences_are_loaded_once(self):
+        self.assertEqual("HealthApp", preferences.AppPreferences().company_name)
+        with self.assertNumQueries(0):
+            self.assertEqual("HealthApp", preferences.AppPreferences().company_name)
+            self.assertTrue(preferences.AppPreferences().billing_enabled)
+
+    def test_changed_preferences_are_reloaded_on_commit(self):
+        self.assertEqual("HealthApp", preferences.AppPreferences().company_name)
+        row = models.AppPreferences.objects.get(title="COMPANY NAME")
+        row.value = "Riverside Clinic"
+        with self.captureOnCommitCallbacks(execute=True):
+            row.save()
+            self.assertEqual("HealthApp", preferences.AppPreferences().company_name)
+        self.assertEqual("Riverside Clinic", preferences.AppPreferences().company_name)
+
+    def test_listener_invalidates_the_notified_alias(self):
+        class Stop(Exception):
+            pass
+
+        class NotifiedCache:
+            def __init__(self):
+                self.aliases = []
+
+            def invalidate(self, alias=None):
+                self.aliases.append(alias)
+                raise Stop()
+
+        cache = NotifiedCache()
+        listener = preferences.PreferencesChangeListener(cache, aliases=["default"])
+        listener.POLL_TIMEOUT = 0.1
+
+        def listen():
+            try:
+                listener._listen()
+            except Stop:
+                pass
+
+        thread = threading.Thread(target=listen, daemon=True)
+        thread.start()
+        # notifications are sent from another connection, committed at once,
+        # until the listener has started listening and receives one
+        notifier = psycopg2.connect(**connection.get_connection_params())
+        notifier.autocommit = True
+        try:
+            with notifier.cursor() as cursor:
+                for _ in range(50):
+                    cursor.execute(
+                        "SELECT pg_notify(%s, %s)",
+                        [preferences.PREFERENCES_CHANGED_CHANNEL, "default"],
+                    )
+                    thread.join(0.1)
+                    if not thread.is_alive():
+                        break
+        finally:
+            notifier.close()
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(["default"], cache.aliases)
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed = False
+
+    async def newPage(self):
+        return FakePage()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePage:
+    async def setContent(self, html_string: str):
+        self.html_string = html_string
+
+    async def waitForSelector(self, selector: str):
+        pass
+
+    async def pdf(self, options: dict) -> bytes:
+        if self.html_string == "crash":
+            raise ConnectionError("browser closed unexpectedly")
+        return f"%PDF {self.html_string}".encode()
+
+    async def close(self):
+        pass
+
+
+class PDFRendererPoolTest(TestCase):
+    def setUp(self) -> None:
+        self.browsers = []
+
+        async def launch(options: dict) -> FakeBrowser:
+            self.browsers.append(FakeBrowser())
+            return self.browsers[-1]
+
+        patcher = mock.patch.object(pdf_generator, "launch", launch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def pool(self, **config) -> pdf_generator.PDFRendererPool:
+        return pdf_generator.PDFRendererPool(
+            **{
+                "concurrency": 1,
+                "timeout": 5,
+                "max_jobs_per_worker": 2,
+                "max_pending": 1,
+                "queue_timeout": 5,
+                **config,
+            }
+        )
+
+    def test_browsers_are_checked_out_and_returned(self):
+        pool = self.pool()
+        self.assertEqual(b"%PDF one", pool.render("one"))
+        self.assertEqual(b"%PDF two", pool.render("two"))
+        self.assertEqual(1, len(self.browsers))
+        # browsers are restarted after max_jobs_per_worker documents
+        self.assertEqual(b"%PDF three", pool.render("three"))
+        self.assertEqual([True, False], [browser.closed for browser in self.browsers])
+        self.assertEqual(1, pool._get_idle_workers().qsize())
+
+    def test_crashed_browser_is_replaced(self):
+        pool = self.pool()
+        with self.assertRaises(ConnectionError):
+            pool.render("crash")
+        self.assertTrue(self.browsers[0].closed)
+        self.assertEqual(b"%PDF after", pool.render("after"))
+        self.assertEqual(2, len(self.browsers))
+        self.assertEqual(1, pool._get_idle_workers().qsize())
+
+    def test_busy_pool_rejects_renders(self):
+        pool = self.pool(max_pending=0, queue_timeout=0)
+        pool._slots.acquire()
+        with self.assertRaises(exceptions.ServerError):
+            pool.render("queued")
+        self.assertEqual([], self.browsers)
+
+
+class ExportTest(TestCase):
+    def setUp(self) -> None:
+        self.consumed = 0
+
+    def records(self, count: int):
+        for index in range(count):
+            self.consumed += 1
+            yield {"code": f"S{index}", "price": Decimal("12.50"), "note": None}
+
+    def test_export_format_is_parsed(self):
+        self.assertEqual(
+            file_utils.ExportFormat.XLSX, file_utils.get_export_format(None)
+        )
+        self.assertEqual(
+            file_utils.ExportFormat.CSV, file_utils.get_export_format("CSV")
+        )
+        with self.assertRaises(exceptions.BadRequest):
+            file_utils.get_export_format("pdf")
+
+    def test_csv_is_streamed_as_records_are_read(self):
+        response = file_utils.export_response(
+            self.records(3), "services", file_utils.ExportFormat.CSV
+        )
+        self.assertEqual(0, self.consumed)
+        self.assertEqual("text/csv", response["Content-Type"])
+        self.assertEqual(
+            "attachment; filename=services.csv", response["Content-Disposition"]
+        )
+        with mock.patch.object(file_utils, "EXPORT_STREAM_BLOCK_SIZE", 10):
+            blocks = list(response.streaming_content)
+        self.assertEqual(3, len(blocks))
+        self.assertEqual(
+            "code,price,note\r\nS0,12.5,\r\nS1,12.5,\r\nS2,12.5,\r\n",
+            b"".join(blocks).decode(),
+        )
+
+    def test_excel_is_streamed_from_the_records(self):
+        response = file_utils.export_response(self.records(3), "services")
+        self.assertEqual(0, self.consumed)
+        self.assertEqual(
+            "attachment; filename=services.xlsx", response["Content-Disposition"]
+        )
+        sheet = pandas.read_excel(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(["code", "price", "note"], list(sheet.columns))
+        self.assertEqual(["S0", "S1", "S2"], list(sheet["code"]))
+        self.assertEqual([12.5] * 3, list(sheet["price"]))
+
+
+class MetricsTest(TestCase):
+    def test_registry_renders_the_prometheus_text_format(self):
+        registry = metrics.MetricsRegistry()
+        counter = registry.counter("jobs_total", "Jobs run", ("queue",))
+        histogram = registry.histogram("job_seconds", "Job time", buckets=(0.1, 1))
+        counter.inc(queue='mail "out"')
+        counter.inc(2, queue='mail "out"')
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        self.assertEqual(
+            "\n".join(
+                [
+                    "# HELP jobs_total Jobs run",
+                    "# TYPE jobs_total counter",
+                    'jobs_total{queue="mail \\"out\\""} 3',
+                    "# HELP job_seconds Job time",
+                    "# TYPE job_seconds histogram",
+                    'job_seconds_bucket{le="0.1"} 1',
+                    'job_seconds_bucket{le="1"} 2',
+                    'job_seconds_bucket{le="+Inf"} 3',
+                    "job_seconds_sum 5.55",
+                    "job_seconds_count 3",
+                ]
+            )
+            + "\n",
+            registry.render(),
+        )
+        with self.assertRaises(ValueError):
+            registry.counter("jobs_total", "Jobs run again")
+
+    def test_registry_sums_the_processes_sharing_a_directory(self):
+        def make_registry():
+            registry = metrics.MetricsRegistry(directory, flush_interval=60)
+            counter = registry.counter("jobs_total", "Jobs run", ("queue",))
+            histogram = registry.histogram("job_seconds", "Job time", buckets=(1,))
+            return registry, counter, histogram
+
+        with tempfile.TemporaryDirectory() as directory:
+            first, first_counter, first_histogram = make_registry()
+            second, second_counter, second_histogram = make_registry()
+            first_counter.inc(queue="mail")
+            first_histogram.observe(0.5)
+            second_counter.inc(2, queue="mail")
+            second_counter.inc(queue="sms")
+            second_histogram.observe(2)
+            second.flush_if_due()
+            # not due yet, the snapshot on disk misses this increment
+            second_counter.inc(queue="sms")
+            second.flush_if_due()
+
+            self.assertEqual(
+                "\n".join(
+                    [
+                        "# HELP jobs_total Jobs run",
+                        "# TYPE jobs_total counter",
+                        'jobs_total{queue="mail"} 3',
+                        'jobs_total{queue="sms"} 1',
+                        "# HELP job_seconds Job time",
+                        "# TYPE job_seconds histogram",
+                        'job_seconds_bucket{le="1"} 1',
+                        'job_seconds_bucket{le="+Inf"} 2',
+                        "job_seconds_sum 2.5",
+                        "job_seconds_count 2",
+                    ]
+                )
+                + "\n",
+                first.render(),
+            )
+            # rendering flushes the rendering process
+            self.assertIn('jobs_total{queue="sms"} 2', second.render())
+
+    @override_settings(MONITORING_TOKEN="secret")
+    def test_requests_are_recorded_by_route(self):
+        key = ("metrics", "GET", "200")
+        requests = metrics.HTTP_REQUESTS._values.get(key, 0)
+        timed = metrics.HTTP_REQUEST_DURATION._values.get(key[:2], [0, 0, 0])[2]
+
+        self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(requests + 1, metrics.HTTP_REQUESTS._values[key])
+        self.assertEqual(timed + 1, metrics.HTTP_REQUEST_DURATION._values[key[:2]][2])
+        self.assertIn(key[:2], metrics.HTTP_REQUEST_DB_QUERIES._values)
+
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual("text/plain; version=0.0.4", response["Content-Type"])
+        content = response.content.decode()
+        self.assertIn("# TYPE http_requests_total counter", content)
+        self.assertIn(
+            'http_requests_total{route="metrics",method="GET",status="200"} '
+            f"{requests + 1}",
+            content,
+        )
+
+    def test_monitoring_endpoints_require_the_token(self):
+        for path in ("/metrics", "/healthz"):
+            self.assertEqual(403, self.client.get(path).status_code)
+            with override_settings(MONITORING_TOKEN="secret"):
+                self.assertEqual(403, self.client.get(path).status_code)
+                response = self.client.get(path, HTTP_AUTHORIZATION="Bearer wrong")
+                self.assertEqual(403, response.status_code)
+
+    @override_settings(MONITORING_TOKEN="secret")
+    def test_healthz_checks_every_database(self):
+        # only the default database is reachable from a test case
+        with mock.patch.object(core_views, "connections", {"default": connection}):
+            response = self.client.get("/healthz", HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(
+                {"status": "ok", "databases": {"default": "ok"}}, response.json()
+            )
+
+            with mock.patch.object(
+                connection,
+                "cursor",
+                side_effect=OperationalError("password authentication failed"),
+            ), self.assertLogs(core_views.logger, "ERROR"):
+                response = self.client.get(
+                    "/healthz", HTTP_AUTHORIZATION="Bearer secret"
+                )
+        self.assertEqual(503, response.status_code)
+        # the error, which may name hosts or users, is only logged
+        self.assertEqual(
+            {"status": "unavailable", "databases": {"default": "error"}},
+            response.json(),
+        )
+
+
+class SequenceTest(TestCase):
+    def setUp(self) -> None:
+        self.sequence = sequences.PeriodSequence(
+            name="core_test_servicearm",
+            model="core.ServiceArm",
+            field="name",
+            prefix="SA",
+            period_format="%Y%m",
+            padding=3,
+        )
+        self.addCleanup(sequences.SEQUENCES.pop, self.sequence.name)
+        self.id_prefix = f"SA{timezone.now():%Y%m}"
+
+    def counter_value(self, id_prefix: str) -> int:
+        return models.SequenceCounter.objects.get(
+            key=self.sequence.key(id_prefix)
+        ).value
+
+    def test_ids_are_allocated_after_the_stored_ids(self):
+        models.ServiceArm.objects.create(name=f"{self.id_prefix}007")
+        self.assertEqual(f"{self.id_prefix}008", self.sequence.next_id())
+        self.assertEqual(
+            [f"{self.id_prefix}009", f"{self.id_prefix}010"],
+            self.sequence.next_ids(2),
+        )
+        self.assertEqual(f"XY{timezone.now():%Y%m}001", self.sequence.next_id("XY"))
+        self.assertEqual(10, self.counter_value(self.id_prefix))
+
+    def test_counters_restart_each_period(self):
+        self.sequence.next_ids(3)
+        next_month = timezone.now() + timedelta(days=32)
+        with mock.patch.object(sequences.timezone, "now", return_value=next_month):
+            self.assertEqual(f"SA{next_month:%Y%m}001", self.sequence.next_id())
+        self.assertEqual(f"{self.id_prefix}004", self.sequence.next_id())
+
+    def test_seeded_counters_are_only_raised(self):
+        key = "core_test_counter"
+        self.assertEqual(5, sequences.seed_counter(key, 5))
+        self.assertEqual(5, sequences.seed_counter(key, 3))
+        self.assertEqual(range(6, 8), sequences.allocate(key, count=2))
+        self.assertEqual(9, sequences.seed_counter(key, 9))
+
+    def test_seed_sequences_command(self):
+        models.ServiceArm.objects.create(name=f"{self.id_prefix}041")
+        out = io.StringIO()
+        call_command(
+            "seed_sequences",
+            "--sequence",
+            self.sequence.name,
+            "--sequence",
+            "missing",
+            stdout=out,
+        )
+        self.assertEqual(41, self.counter_value(self.id_prefix))
+        self.assertIn(f"{self.sequence.key(self.id_prefix)}: 41", out.getvalue())
+        self.assertIn("unknown sequence missing", out.getvalue())
+        self.assertEqual(f"{self.id_prefix}042", self.sequence.next_id())
+
+
+class JSONKeyFilterTest(TestCase):
+    def setUp(self) -> None:
+        self.stocks = [
+            inv_models.Stock.objects.create(
+                store={"id": store_id, "name": "Main"},
+                product={"id": product_id, "name": f"Drug{product_id}"},
+                quantity=1,
+            )
+            for store_id in (1, 2)
+            for product_id in (1, 11)
+        ]
+
+    def test_filter_key_matches_text_of_key(self):
+        stock = inv_models.Stock.filter_store_product("2", 11).get()
+        self.assertEqual(self.stocks[3], stock)
+        stocks = json_keys.filter_key(
+            inv_models.Stock.objects.all(), "product", "id", [1, "11"]
+        )
+        self.assertEqual(4, stocks.count())
+        stocks = json_keys.filter_key(
+            inv_models.Stock.objects.all(), "product", "name", "drug1", upper=True
+        )
+        self.assertEqual([self.stocks[0], self.stocks[2]], list(stocks.order_by("id")))
+        stocks = json_keys.filter_key(
+            inv_models.Stock.objects.all(), "product", "code", None
+        )
+        self.assertEqual(4, stocks.count())
+
+
+class KeysetPaginationTest(TestCase):
+    class View:
+        keyset_fields = ("date_joined", "id")
+
+    def setUp(self) -> None:
+        now = timezone.now()
+        # pairs of users joined at the same time are ordered on their id
+        self.users = [
+            User.objects.create(
+                username=f"user{index}",
+                date_joined=now - timedelta(hours=index // 2),
+            )
+            for index in range(7)
+        ]
+
+    def paginate(self, url: str):
+        paginator = pagination.KeysetPagination()
+        request = Request(APIRequestFactory().get(url))
+        users = paginator.paginate_queryset(
+            User.objects.order_by("-id"), request, self.View()
+        )
+        return users, paginator.get_paginated_response([]).data
+
+    def test_pages_follow_cursors_in_both_directions(self):
+        users, data = self.paginate("/users/?size=3&cursor=")
+        expected = sorted(
+            self.users, key=lambda user: (user.date_joined, user.id), reverse=True
+        )
+        self.assertEqual(expected[:3], users)
+        self.assertEqual(7, data["total_count"])
+        self.assertEqual(3, data["total_pages"])
+        self.assertIsNone(data["current_page"])
+        self.assertIsNone(data["previous"])
+        pages = [users]
+        while data["next"]:
+            users, data = self.paginate(data["next"])
+            pages.append(users)
+        self.assertEqual([expected[:3], expected[3:6], expected[6:]], pages)
+        users, data = self.paginate(data["previous"])
+        self.assertEqual(expected[3:6], users)
+        users, data = self.paginate(data["previous"])
+        self.assertEqual(expected[:3], users)
+        self.assertIsNone(data["previous"])
+
+    def test_page_numbers_without_cursor(self):
+        users, data = self.paginate("/users/?size=3&page=3&count=estimated")
+        self.assertEqual(1, len(users))
+        self.assertEqual(7, data["total_count"])
+        self.assertEqual(3, data["current_page"])
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_superuser(username="radiographer")
+        self.factory = APIRequestFactory()
+        modalities = img_models.Modality.objects.bulk_create(
+            [img_models.Modality(name="X-Ray"), img_models.Modality(name="CT")]
+        )
+        img_models.ImagingObservation.objects.bulk_create(
+            [
+                img_models.ImagingObservation(
+                    name=f"Study {index}", modality=modalities[index % 2]
+                )
+                for index in range(4)
+            ]
+        )
+
+    def modality_group(self, **headers):
+        view = img_views.ImagingObservationViewSet.as_view({"get": "group_by_modality"})
+        request = self.factory.get("/", **headers)
+        force_authenticate(request, self.user)
+        return view(request)
+
+    def test_catalog_is_grouped_cached_and_revalidated(self):
+        response = self.modality_group()
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            ["X-Ray", "CT"], [group["modality"] for group in response.data]
+        )
+        self.assertEqual(
+            ["Study 0", "Study 2"],
+            [img_obv["name"] for img_obv in response.data[0]["img_observations"]],
+        )
+        # only the version stamp is read once the catalog is cached
+        with self.assertNumQueries(1):
+            cached = self.modality_group()
+        self.assertEqual(response.data, cached.data)
+        with self.assertNumQueries(1):
+            not_modified = self.modality_group(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(304, not_modified.status_code)
+        self.assertEqual(response["ETag"], not_modified["ETag"])
+
+    def test_weak_and_listed_etags_are_matched(self):
+        etag = self.modality_group()["ETag"]
+
+        response = self.modality_group(HTTP_IF_NONE_MATCH=f'"stale", W/{etag}')
+
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(
+            200, self.modality_group(HTTP_IF_NONE_MATCH='"stale"').status_code
+        )
+
+    def test_writes_to_catalog_tables_move_the_etag(self):
+        etag = self.modality_group()["ETag"]
+        img_models.Modality.objects.filter(name="CT").update(name="Tomography")
+
+        response = self.modality_group(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+        self.assertEqual("Tomography", response.data[1]["modality"])
+
+
+class TemplateCacheTest(TestCase):
+    def setUp(self) -> None:
+        template_cache.clear()
+
+    def test_templates_are_compiled_once_per_source(self):
+        template = template_cache.get_template("Hello {{ name }}")
+
+        self.assertIs(template, template_cache.get_template("Hello {{ name }}"))
+        changed = template_cache.get_template("Hi {{ name }}")
+        self.assertIsNot(template, changed)
+        self.assertEqual("Hi Ada", changed.render(Context({"name": "Ada"})))
+
+    @override_settings(TEMPLATE_CACHE_SIZE=2)
+    def test_least_recently_rendered_templates_are_dropped(self):
+        first = template_cache.get_template("first")
+        second = template_cache.get_template("second")
+        template_cache.get_template("first")
+        template_cache.get_template("third")
+
+        self.assertIs(first, template_cache.get_template("first"))
+        self.assertIsNot(second, template_cache.get_template("second"))
+
+    def test_context_is_formatted_with_resolved_settings(self):
+        format_settings = utils.FormatSettings(
+            dateformat="%d/%m/%Y %H:%M",
+            timezone="Africa/Lagos",
+            company_theme_color="white",
+            text_color="black",
+            font_size="14",
+        )
+
+        data = utils.ContextFormatter(
+            {"panel": {"approved_on": "2026-10-01T08:30:00"}, "name": "Ada"},
+            format_settings,
+        ).process()
+
+        self.assertEqual("01/10/2026 09:30", data["panel"]["approved_on"])
+        self.assertEqual("Ada", data["name"])
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self) -> None:
+        synthetic_data.SyntheticDataGenerator(
+            synthetic_data.SyntheticDataScale(
+                patients=20, bills=200, products=10, chart_entries=2
+            ),
+            batch_size=50,
+        ).generate()
 
-# Create your tests here.
+    def test_benchmarks_run_without_changing_the_dataset(self):
+        summary = synthetic_data.dataset_summary()
+        self.assertEqual(200, summary["finance.Bill"])
+        self.assertEqual([], balance_ledger.reconcile_balances())
+        results = benchmarks.run_benchmarks(iterations=1, warmup=0)
+        for result in results["results"]:
+            self.assertIsNone(result["error"], result["name"])
+            self.assertEqual(1, result["iterations"])
+        self.assertEqual(summary, synthetic_data.dataset_summary())
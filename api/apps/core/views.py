@@ -1,11 +1,22 @@
+import functools
+import hmac
+import logging
+
 from rest_framework import viewsets
 from rest_framework import filters as rf_filters
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+
+from api.includes import metrics
 
 from .serializers import *
 from . import models
 from . import filters
 
+logger = logging.getLogger(__name__)
+
 
 class SalutationListView(viewsets.ReadOnlyModelViewSet):
     queryset = models.Salutation.objects.all()
@@ -107,3 +118,49 @@ class DocumentTypeView(viewsets.ModelViewSet):
         rf_filters.OrderingFilter,
     ]
     search_fields = ["name"]
+
+
+def monitoring_token_required(view):
+    """Answers 403 unless the request bears the MONITORING_TOKEN setting as
+    a bearer token. The token is checked without the database so that
+    healthz still answers when a database is down.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = settings.MONITORING_TOKEN
+        authorization = request.headers.get("Authorization", "")
+        if not token or not hmac.compare_digest(
+            authorization.encode(), f"Bearer {token}".encode()
+        ):
+            return JsonResponse({"detail": "Forbidden"}, status=403)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@monitoring_token_required
+def metrics_view(request):
+    """Serves the metrics in the prometheus text format"""
+    return HttpResponse(
+        metrics.registry.render(), content_type="text/plain; version=0.0.4"
+    )
+
+
+@monitoring_token_required
+def healthz(request):
+    """Checks that every database accepts queries"""
+    databases = {}
+    for alias in connections:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT 1")
+            databases[alias] = "ok"
+        except Exception:
+            logger.exception("Health check of database %s failed", alias)
+            databases[alias] = "error"
+    is_healthy = all(state == "ok" for state in databases.values())
+    return JsonResponse(
+        {"status": "ok" if is_healthy else "unavailable", "databases": databases},
+        status=200 if is_healthy else 503,
+    )
@@ -4,6 +4,7 @@ from django.db.models import Q, QuerySet
 from django.contrib.auth.models import User
 
 from api.apps.facilities import models as facilities_models
+from api.includes import json_keys
 from .models import Encounter, Clinic, EncounterTemplate
 
 
@@ -31,15 +32,17 @@ class EncounterReportsFilter(FilterSet):
     )
     clinic = django_filters.ModelMultipleChoiceFilter(
         label="Clinic ID",
-        field_name="clinic__id",
+        field_name="clinic",
         to_field_name="id",
         queryset=Clinic.objects.all(),
+        method="filter_json_id",
     )
     provider = django_filters.ModelMultipleChoiceFilter(
         label="Provider ID",
-        field_name="provider__id",
+        field_name="provider",
         to_field_name="id",
         queryset=User.objects.all(),
+        method="filter_json_id",
     )
     status = django_filters.CharFilter(
         label="status", field_name="status", lookup_expr="iexact"
@@ -59,6 +62,11 @@ class EncounterReportsFilter(FilterSet):
         model = Encounter
         fields = ["date", "department", "clinic", "provider", "status"]
 
+    def filter_json_id(self, queryset, name, value):
+        if not value:
+            return queryset
+        return json_keys.filter_key(queryset, name, "id", value)
+
 
 class EncounterFilter(EncounterReportsFilter):
     class Meta:
@@ -93,7 +101,7 @@ class EncounterFilter(EncounterReportsFilter):
         )
 
     def filter_patient_uhid(self, queryset, name, value):
-        return queryset.filter(patient__uhid__iexact=value)
+        return json_keys.filter_key(queryset, "patient", "uhid", value, upper=True)
 
     def filter_worklist(self, queryset, name, value):
         if value:
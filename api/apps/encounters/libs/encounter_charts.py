@@ -0,0 +1,62 @@
+from typing import Iterable
+
+from django.contrib.postgres.aggregates import JSONBAgg
+from django.db import transaction
+from django.db.models import JSONField, OuterRef, QuerySet, Subquery
+
+from api.apps.encounters import models
+
+
+def chart_entries(encounter_id: int, newest_first: bool = False) -> QuerySet:
+    """Chart entries of an encounter, in the order of the chart index"""
+    entries = models.EncounterChartEntry.objects.filter(encounter_id=encounter_id)
+    if newest_first:
+        return entries.order_by("-created_at", "-id")
+    return entries.order_by("created_at", "id")
+
+
+def with_diagnosis_charts(encounters: QuerySet) -> QuerySet:
+    """Annotates encounters with the diagnosis charts moved to their chart
+    entries, as diagnosis_charts, in one grouped subquery that is read with
+    the encounters, also when they are read with a server side cursor"""
+    diagnosis_charts = (
+        models.EncounterChartEntry.objects.filter(
+            encounter=OuterRef("pk"), extra__type="diag"
+        )
+        .order_by()
+        .values("encounter")
+        .annotate(charts=JSONBAgg("extra", ordering=("created_at", "id")))
+        .values("charts")
+    )
+    return encounters.annotate(
+        diagnosis_charts=Subquery(diagnosis_charts, output_field=JSONField())
+    )
+
+
+def convert_legacy_charts(encounter_ids: Iterable[int]) -> int:
+    """Moves the charts kept on encounter rows to chart entries
+
+    Args:
+        encounter_ids [Iterable[int]]: ids of the encounters to convert
+
+    Returns:
+        int: number of encounters converted
+    """
+    with transaction.atomic():
+        encounters = list(
+            models.Encounter.objects.select_for_update()
+            .filter(id__in=list(encounter_ids))
+            .exclude(legacy_chart_entries=[])
+            .only("id", "legacy_chart_entries")
+        )
+        models.EncounterChartEntry.objects.bulk_create(
+            [
+                models.EncounterChartEntry.from_chart(encounter.id, chart)
+                for encounter in encounters
+                for chart in encounter.legacy_chart_entries
+            ]
+        )
+        models.Encounter.objects.filter(
+            id__in=[encounter.id for encounter in encounters]
+        ).update(legacy_chart_entries=[])
+    return len(encounters)
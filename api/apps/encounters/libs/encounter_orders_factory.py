@@ -117,6 +117,8 @@ class EncounterServicesOrderFactory:
         self._prescription_serializer = pharm_serializers.PrescriptionSerializer
         self._nursing_serializer = nursing_serializers.NursingOrderSerializer
         self._serializer_context = {"request": self.request}
+        # orders made, appended to the encounter orders once all are made
+        self._orders: List[dict] = []
 
     def _validate_init(self):
         if (
@@ -228,7 +230,7 @@ class EncounterServicesOrderFactory:
                 value=json.loads(json.dumps(ordered_lab.dict(), cls=DjangoJSONEncoder)),
                 created_by=user_data,
             )
-            self.encounter.orders.append(enc_order_struct.dict())
+            self._orders.append(enc_order_struct.dict())
             return ordered_lab.dict()
 
     def _order_imaging(self):
@@ -247,7 +249,7 @@ class EncounterServicesOrderFactory:
                 value=ordered_img.dict(),
                 created_by=user_data,
             )
-            self.encounter.orders.append(enc_order_struct.dict())
+            self._orders.append(enc_order_struct.dict())
             return ordered_img.dict()
         return None
 
@@ -269,7 +271,7 @@ class EncounterServicesOrderFactory:
                 ),
                 created_by=user_data,
             )
-            self.encounter.orders.append(enc_order_struct.dict())
+            self._orders.append(enc_order_struct.dict())
             return ordered_presc.dict()
 
     def _order_nursing(self):
@@ -292,7 +294,7 @@ class EncounterServicesOrderFactory:
                 ),
                 created_by=user_data,
             )
-            self.encounter.orders.append(enc_order_struct.dict())
+            self._orders.append(enc_order_struct.dict())
             return ordered_nursing.dict()
 
     @transaction.atomic
@@ -306,7 +308,7 @@ class EncounterServicesOrderFactory:
         img_order = self._order_imaging()
         prc_order = self._order_prescriptions()
         nursing_order = self._order_nursing()
-        self.encounter.save()
+        self.encounter.append("orders", self._orders)
         return EncounterServicesOrderReturnDict(
             laboratory=lab_order or None,
             imaging=img_order or None,
@@ -43,9 +43,21 @@ class EncounterReportStruct(BaseModel):
 
     @classmethod
     def _get_diagnosis(cls, instance: Encounter):
+        # diagnosis charts are either still on the row or moved to chart
+        # entries, read with the encounters by with_diagnosis_charts
+        if hasattr(instance, "diagnosis_charts"):
+            diagnosis_charts = instance.diagnosis_charts or []
+        else:
+            diagnosis_charts = list(
+                instance.chart_entries.filter(extra__type="diag").values_list(
+                    "extra", flat=True
+                )
+            )
         try:
             diagnosis_list: list[dict] = [
-                chart for chart in instance.chart if chart.get("type") == "diag"
+                chart
+                for chart in instance.legacy_chart_entries + diagnosis_charts
+                if chart.get("type") == "diag"
             ]
             diagnosis_list = [
                 f"{diag.get('value', {}).get('comment', {}).get('code')}-{diag.get('value', {}).get('comment', {}).get('case')}-{diag.get('value', {}).get('option', {})}"
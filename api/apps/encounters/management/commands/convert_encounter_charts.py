@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from api.apps.encounters.libs import encounter_charts
+from api.apps.encounters.models import Encounter
+
+
+class Command(BaseCommand):
+    help = (
+        "move the json charts of encounters to the chart entry table, run once"
+        " after migrating"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="encounters converted per transaction",
+        )
+
+    def handle(self, *args, **options):
+        encounters = (
+            Encounter.objects.exclude(legacy_chart_entries=[])
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        converted, last_id = 0, 0
+        while True:
+            encounter_ids = list(
+                encounters.filter(id__gt=last_id)[: options["batch_size"]]
+            )
+            if not encounter_ids:
+                break
+            converted += encounter_charts.convert_legacy_charts(encounter_ids)
+            last_id = encounter_ids[-1]
+            self.stdout.write(f"converted encounters up to id {last_id}")
+        self.stdout.write(self.style.SUCCESS(f"{converted} encounters converted"))
@@ -0,0 +1,34 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:04
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.fields.json
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('encounters', '0010_rename_is_private_encountertemplate_is_active_and_more'),
+    ]
+
+    # encounters looked up by the patient id or uhid, clinic and provider
+    operations = [
+        AddIndexConcurrently(
+            model_name='encounter',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('id', 'patient'), name='encounter_patient_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='encounter',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.fields.json.KeyTextTransform('uhid', 'patient')), name='encounter_patient_uhid_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='encounter',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('id', 'clinic'), name='encounter_clinic_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='encounter',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('id', 'provider'), name='encounter_provider_id_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:08
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('encounters', '0011_encounter_json_key_indexes'),
+    ]
+
+    # keyset pagination of the encounter list on (created_datetime, id)
+    operations = [
+        AddIndexConcurrently(
+            model_name='encounter',
+            index=models.Index(fields=['created_datetime', 'id'], name='encounter_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:48
+
+import api.apps.encounters.models.encounter
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encounters', '0012_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='encounter',
+            old_name='chart',
+            new_name='legacy_chart_entries',
+        ),
+        migrations.AlterField(
+            model_name='encounter',
+            name='legacy_chart_entries',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='EncounterChartEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_id', models.CharField(default=api.apps.encounters.models.encounter.new_chart_id, max_length=50)),
+                ('chart', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_by', models.JSONField(default=dict)),
+                ('encounter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chart_entries', to='encounters.encounter')),
+            ],
+            options={
+                'verbose_name_plural': 'Encounter Chart Entries',
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='encounterchartentry',
+            index=models.Index(fields=['encounter', 'created_at', 'id'], name='encounterchart_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='encounterchartentry',
+            index=models.Index(fields=['encounter', 'entry_id'], name='encounterchart_entry_idx'),
+        ),
+    ]
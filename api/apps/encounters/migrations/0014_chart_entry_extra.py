@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-17 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encounters', '0013_chart_entries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='encounterchartentry',
+            name='extra',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
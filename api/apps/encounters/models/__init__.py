@@ -3,6 +3,7 @@ from .encounter import (
     Encounter,
     EncounterOrderChoices,
     EncounterChart,
+    EncounterChartEntry,
     EncounterObservation,
     DiagnosisStatus,
 )
@@ -1,3 +1,4 @@
+from datetime import datetime
 from enum import Enum
 from typing import Union, List
 import uuid
@@ -6,7 +7,7 @@ from django.db import models
 from django.utils import timezone
 from pydantic import BaseModel, Field
 
-from api.includes import utils as generic_utils, exceptions
+from api.includes import utils as generic_utils, exceptions, json_keys
 from config import preferences
 from api.apps.encounters import utils
 
@@ -18,8 +19,12 @@ class DiagnosisStatus(models.TextChoices):
     CONFIRMED = "confirmed"
 
 
+def new_chart_id() -> str:
+    return str(uuid.uuid4())
+
+
 class EncounterChart(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_chart_id)
     chart: dict
     created_at: str = Field(default_factory=lambda: timezone.now().isoformat())
     created_by: dict
@@ -72,7 +77,8 @@ class Encounter(models.Model):
     )
     clinic = models.JSONField()
     status = models.CharField(max_length=200, null=True, blank=True)
-    chart: list = models.JSONField(default=list)
+    # charts kept on the row before chart entries, see convert_encounter_charts
+    legacy_chart_entries: list = models.JSONField(default=list, blank=True)
     legacy_chart: dict = models.JSONField(default=generic_utils.jsonfield_default_value)
     acknowledged_by = models.JSONField(default=dict)
     acknowledged_at = models.DateTimeField(default=None, null=True, blank=True)
@@ -95,6 +101,17 @@ class Encounter(models.Model):
     class Meta:
         verbose_name_plural = "Encounters"
         ordering = ["-created_datetime"]
+        indexes = [
+            json_keys.key_index("patient", "id", "encounter_patient_id_idx"),
+            json_keys.key_index(
+                "patient", "uhid", "encounter_patient_uhid_idx", upper=True
+            ),
+            json_keys.key_index("clinic", "id", "encounter_clinic_id_idx"),
+            json_keys.key_index("provider", "id", "encounter_provider_id_idx"),
+            models.Index(
+                fields=["created_datetime", "id"], name="encounter_keyset_idx"
+            ),
+        ]
         permissions = (
             ("take_vitals", "Can take vitals"),
             ("sign_encounter", "Can sign encounter"),
@@ -120,3 +137,93 @@ class Encounter(models.Model):
 
     def post_payment_action(self, bill):
         ...
+
+    @property
+    def chart(self) -> List[dict]:
+        """Chart entries of the encounter, oldest first"""
+        entries = getattr(self, "_prefetched_objects_cache", {}).get("chart_entries")
+        if entries is None:
+            entries = self.chart_entries.all()
+        return self.legacy_chart_entries + [entry.to_chart() for entry in entries]
+
+    def append(self, field: str, items: List[dict]):
+        """Appends items to a JSON array field in the database, without
+        rewriting the rest of the array, and to the loaded array
+
+        Args:
+            field [str]: JSON array field, vitals, orders, diagnosis or audit_log
+            items [List[dict]]: items to append
+        """
+        if not items:
+            return
+        now = timezone.now()
+        Encounter.objects.filter(pk=self.pk).update(
+            **{field: json_keys.append_items(field, items)},
+            encounter_datetime=now,
+        )
+        getattr(self, field).extend(items)
+        self.encounter_datetime = now
+
+
+class EncounterChartEntry(models.Model):
+    """Chart entry of an encounter, written once and never moved, so adding
+    an entry costs the same however long the chart is"""
+
+    encounter = models.ForeignKey(
+        Encounter, on_delete=models.CASCADE, related_name="chart_entries"
+    )
+    entry_id = models.CharField(max_length=50, default=new_chart_id)
+    chart = models.JSONField(default=dict)
+    # other top level keys of charts moved from the encounter row, such as
+    # the type and value of diagnosis charts
+    extra = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    created_by = models.JSONField(default=dict)
+
+    class Meta:
+        verbose_name_plural = "Encounter Chart Entries"
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(
+                fields=["encounter", "created_at", "id"],
+                name="encounterchart_created_idx",
+            ),
+            models.Index(
+                fields=["encounter", "entry_id"], name="encounterchart_entry_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return self.entry_id
+
+    @classmethod
+    def from_chart(cls, encounter_id: int, chart: dict) -> "EncounterChartEntry":
+        """Chart entry of a chart dict, as EncounterChart gives and lists keep"""
+        created_at = chart.get("created_at")
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at)
+        return cls(
+            encounter_id=encounter_id,
+            entry_id=chart.get("id") or new_chart_id(),
+            chart=chart.get("chart") or {},
+            extra={
+                key: value
+                for key, value in chart.items()
+                if key not in EncounterChart.__fields__
+            },
+            created_at=created_at or timezone.now(),
+            created_by=chart.get("created_by") or {},
+        )
+
+    def to_chart(self) -> dict:
+        chart = EncounterChart(
+            id=self.entry_id,
+            chart=self.chart,
+            created_at=self.created_at.isoformat(),
+            created_by=self.created_by,
+        ).dict()
+        if self.extra and not self.chart:
+            # charts moved from the row without a chart, such as diagnoses,
+            # keep their own shape
+            chart.pop("chart")
+        return {**self.extra, **chart}
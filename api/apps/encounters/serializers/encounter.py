@@ -22,10 +22,11 @@ from api.includes import utils as generics_utils
 class EncounterSerializer(serializers.ModelSerializer):
     payment_scheme = serializers.IntegerField(required=False, write_only=True)
     bill = serializers.SerializerMethodField()
+    chart = serializers.JSONField(read_only=True)
 
     class Meta:
         model = models.Encounter
-        fields = "__all__"
+        exclude = ("legacy_chart_entries",)
         read_only_fields = (
             "encounter_id",
             "bill",
@@ -89,8 +90,7 @@ class EncounterSerializer(serializers.ModelSerializer):
                 ).dict()
             instance = super().update(instance, validated_data)
             if audit_log:
-                instance.audit_log.append(audit_log)
-                instance.save()
+                instance.append("audit_log", [audit_log])
             return instance
 
 
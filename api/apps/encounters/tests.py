@@ -1,3 +1,119 @@
+import io
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.apps.encounters import models as enc_models
+from api.apps.encounters import views as enc_views
+from api.includes import utils
+
+
+class EncounterChartTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_superuser(username="clinician")
+        self.user_data = utils.trim_user_data(utils.model_to_dict(self.user))
+        self.patient = {"id": 1, "uhid": "UHID1", "gender": "Female"}
+        # bulk created, an encounter saved alone is billed
+        [self.encounter] = enc_models.Encounter.objects.bulk_create(
+            [
+                enc_models.Encounter(
+                    clinic={"name": "GOPD"},
+                    patient=self.patient,
+                    status="New",
+                    legacy_chart_entries=[
+                        enc_models.EncounterChart(
+                            chart={"title": f"note {index}"},
+                            created_at=timezone.make_aware(
+                                datetime(2026, 10, 1, 9, index)
+                            ).isoformat(),
+                            created_by=self.user_data,
+                        ).dict()
+                        for index in range(15)
+                    ],
+                )
+            ]
+        )
+        self.factory = APIRequestFactory()
+
+    def charts(self, method: str, actions: dict, data=None, **kwargs):
+        view = enc_views.EncounterChartsViewset.as_view(actions)
+        request = getattr(self.factory, method)("/", data, format="json")
+        force_authenticate(request, self.user)
+        return view(request, encounter_pk=self.encounter.id, **kwargs)
+
+    def test_chart_entries_are_converted_and_paged_newest_first(self):
+        response = self.charts("get", {"get": "list"})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(15, response.data["total_count"])
+        titles = [chart["chart"]["title"] for chart in response.data["results"]]
+        self.assertEqual([f"note {index}" for index in range(14, 4, -1)], titles)
+        self.encounter.refresh_from_db()
+        self.assertEqual([], self.encounter.legacy_chart_entries)
+        self.assertEqual(15, self.encounter.chart_entries.count())
+
+        with self.assertNumQueries(3):
+            self.charts("get", {"get": "list"}, {"page": 2})
+
+    def test_charts_and_observations_are_appended(self):
+        response = self.charts(
+            "post",
+            {"post": "create"},
+            {
+                "title": "note 15",
+                "content": [],
+                "orders": {},
+                "diagnosis": [{"status": "working", "diagnosis": {"code": "A00"}}],
+            },
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(16, len(response.data))
+        chart = response.data[-1]
+        self.assertEqual("note 15", chart["chart"]["title"])
+
+        response = self.charts(
+            "put", {"put": "update"}, {"title": "edited"}, pk=chart["id"]
+        )
+        self.assertEqual("edited", response.data["chart"]["title"])
+        self.encounter.refresh_from_db()
+        self.assertEqual("edited", self.encounter.chart[-1]["chart"]["title"])
+        self.assertEqual(1, len(self.encounter.diagnosis))
+
+        self.encounter.append("vitals", [{"id": "1"}])
+        self.encounter.append("vitals", [{"id": "2"}])
+        self.assertEqual([{"id": "1"}, {"id": "2"}], self.encounter.vitals)
+        self.encounter.refresh_from_db()
+        self.assertEqual([{"id": "1"}, {"id": "2"}], self.encounter.vitals)
+
+    def test_diagnosis_charts_are_reported_after_conversion(self):
+        diagnosis_chart = {
+            "id": "diag-1",
+            "type": "diag",
+            "value": {"comment": {"code": "A00", "case": "Cholera"}, "option": "main"},
+            "created_at": timezone.make_aware(datetime(2026, 10, 1, 8)).isoformat(),
+            "created_by": self.user_data,
+        }
+        [encounter] = enc_models.Encounter.objects.bulk_create(
+            [
+                enc_models.Encounter(
+                    clinic={"name": "GOPD"},
+                    patient=self.patient,
+                    status="New",
+                    provider={},
+                    legacy_chart_entries=[diagnosis_chart],
+                )
+            ]
+        )
+        call_command("convert_encounter_charts", stdout=io.StringIO())
+        encounter.refresh_from_db()
+        self.assertEqual([], encounter.legacy_chart_entries)
+        self.assertEqual([diagnosis_chart], encounter.chart)
 
-# Create your tests here.
+        view = enc_views.EncounterReportsViewset.as_view({"get": "list"})
+        request = self.factory.get("/", {"to_excel": "true", "export_format": "csv"})
+        force_authenticate(request, self.user)
+        report = b"".join(view(request).streaming_content).decode()
+        self.assertIn("A00-Cholera-main", report)
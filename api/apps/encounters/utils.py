@@ -2,7 +2,7 @@ from enum import Enum
 
 from django.contrib.auth.models import User
 
-from api.includes.utils import is_table_exist
+from api.includes import sequences
 from config import preferences
 
 
@@ -15,19 +15,17 @@ class EncounterStatus(str, Enum):
         return self.value
 
 
+ENCOUNTER_ID_SEQUENCE = sequences.PeriodSequence(
+    name="encounters_encounter",
+    model="encounters.Encounter",
+    field="encounter_id",
+    prefix=lambda: preferences.AppPreferences().encounter_id_prefix_code,
+    padding=6,
+)
+
+
 def generate_encounter_id():
-    from api.apps.encounters.models import Encounter
-
-    config = preferences.AppPreferences()
-    serial_no = 1
-    if is_table_exist("encounters_encounter"):
-        if Encounter.objects.count() > 0:
-            last_encounter = Encounter.objects.latest("id")
-            if last_encounter is not None:
-                serial_no = last_encounter.id + 1
-    serial_no = str(serial_no).zfill(6)
-    unique_id = f"{config.encounter_id_prefix_code}{serial_no}"
-    return unique_id
+    return ENCOUNTER_ID_SEQUENCE.next_id()
 
 
 def has_encounter_status_perm(user: User, status: str):
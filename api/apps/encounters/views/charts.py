@@ -9,6 +9,7 @@ from rest_framework.generics import get_object_or_404
 from drf_spectacular.utils import extend_schema
 
 from .. import models, serializers
+from ..libs import encounter_charts
 from ..libs.encounter_orders_factory import EncounterServicesOrderFactory
 from api.includes import exceptions, utils as generic_utils
 
@@ -25,16 +26,24 @@ class EncounterChartsViewset(viewsets.GenericViewSet):
         if self.action in ["list", "retrieve"]:
             return serializers.EncounterChartSerializer
 
-    def get_object(self):
+    def get_encounter(self) -> models.Encounter:
         encounter: models.Encounter = get_object_or_404(
-            models.Encounter, pk=self.kwargs["encounter_pk"]
+            models.Encounter.objects.only("id", "legacy_chart_entries"),
+            pk=self.kwargs["encounter_pk"],
         )
-        chart: dict = next(
-            (chart for chart in encounter.chart if chart["id"] == self.kwargs["pk"]),
-            None,
+        if encounter.legacy_chart_entries:
+            encounter_charts.convert_legacy_charts([encounter.id])
+        return encounter
+
+    def get_object(self) -> models.EncounterChartEntry:
+        encounter = self.get_encounter()
+        entry = (
+            encounter_charts.chart_entries(encounter.id)
+            .filter(entry_id=self.kwargs["pk"])
+            .first()
         )
-        if chart:
-            return encounter, chart
+        if entry:
+            return entry
         raise exceptions.NotFoundException("Encounter chart does not exist")
 
     @extend_schema(responses=serializers.EncounterChartSerializer)
@@ -46,15 +55,18 @@ class EncounterChartsViewset(viewsets.GenericViewSet):
                 "You don't have permission to view encounter"
             )
 
-        encounter = get_object_or_404(models.Encounter, pk=self.kwargs["encounter_pk"])
-        serializer = serializers.EncounterChartSerializer(encounter.chart, many=True)
-        # paginate records
-        charts = serializer.data[::-1]
-        page = self.paginate_queryset(charts)
+        encounter = self.get_encounter()
+        # paginate records, newest first
+        entries = encounter_charts.chart_entries(encounter.id, newest_first=True)
+        page = self.paginate_queryset(entries)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
+            serializer = self.get_serializer(
+                [entry.to_chart() for entry in page], many=True
+            )
             return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(encounter.diagnosis, many=True)
+        serializer = self.get_serializer(
+            [entry.to_chart() for entry in entries], many=True
+        )
         return Response(serializer.data)
 
     @extend_schema(
@@ -102,7 +114,7 @@ class EncounterChartsViewset(viewsets.GenericViewSet):
                 ).dict()
                 for value in diagnosis
             ]
-            encounter.diagnosis.extend(diagnosis)
+            encounter.append("diagnosis", diagnosis)
 
         chart_data["orders"] = orders
         chart_data["diagnosis"] = diagnosis
@@ -110,18 +122,19 @@ class EncounterChartsViewset(viewsets.GenericViewSet):
             chart=chart_data,
             created_by=generic_utils.trim_user_data(generic_utils.model_to_dict(user)),
         )
-        encounter.chart.append(enc_chart.dict())
-        encounter.save()
-        serializer = serializers.EncounterSerializer(encounter)
-        return Response(serializer.data.get("chart"))
+        if encounter.legacy_chart_entries:
+            encounter_charts.convert_legacy_charts([encounter.id])
+        models.EncounterChartEntry.from_chart(encounter.id, enc_chart.dict()).save()
+        entries = encounter_charts.chart_entries(encounter.id)
+        return Response([entry.to_chart() for entry in entries])
 
     @extend_schema(
         request=None,
         responses=serializers.EncounterChartSerializer,
     )
     def retrieve(self, request, *args, **kwargs):
-        _, chart = self.get_object()
-        serializer = self.get_serializer(data=chart)
+        entry = self.get_object()
+        serializer = self.get_serializer(data=entry.to_chart())
         serializer.is_valid(raise_exception=True)
         return Response(data=serializer.data)
 
@@ -133,16 +146,13 @@ class EncounterChartsViewset(viewsets.GenericViewSet):
         """
         updates encounter chart
         """
-        encounter, chart = self.get_object()
+        entry = self.get_object()
         user = request.user
-        if chart["created_by"].get("id") != user.id:
+        if entry.created_by.get("id") != user.id:
             raise exceptions.PermissionDenied("Inadequate permissions to update chart")
         # serializer = serializers.EncounterChartValueSerializer(data=request.data)
         # serializer.is_valid(raise_exception=True)
         chart_data: dict = request.data
-        chart_index = encounter.chart.index(chart)
-        chart_update = chart.copy()
-        chart_update["chart"].update(chart_data)
-        encounter.chart[chart_index] = chart_update
-        encounter.save()
-        return Response(chart_update)
+        entry.chart.update(chart_data)
+        entry.save(update_fields=["chart"])
+        return Response(entry.to_chart())
@@ -68,8 +68,7 @@ class EncounterDiagnosisViewset(viewsets.GenericViewSet):
             value=serializer.validated_data,
             created_by=user_data,
         )
-        encounter.diagnosis.append(enc_data.dict())
-        encounter.save()
+        encounter.append("diagnosis", [enc_data.dict()])
         return Response(data=enc_data.dict(), status=status.HTTP_201_CREATED)
 
     @extend_schema(request=None, responses=serializers.DiagnosisSerializer)
@@ -11,8 +11,8 @@ from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema
 
-from api.includes import exceptions, utils
-from api.includes.pagination import CustomPagination
+from api.includes import exceptions, json_keys, utils
+from api.includes.pagination import CustomPagination, KeysetPagination
 from api.apps.users.serializers import UserSerializer
 from .. import models, serializers, filters as enc_filters
 from ..libs.encounter_orders_factory import EncounterServicesOrderFactory
@@ -25,7 +25,8 @@ logger = logging.getLogger(__name__)
 class EncounterViewSet(viewsets.ModelViewSet):
     queryset = models.Encounter.objects.all()
     serializer_class = serializers.EncounterSerializer
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
+    keyset_fields = ("created_datetime", "id")
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_class = enc_filters.EncounterFilter
     search_fields = [
@@ -37,6 +38,12 @@ class EncounterViewSet(viewsets.ModelViewSet):
     ]
     ordering = ["-id"]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            return queryset.prefetch_related("chart_entries")
+        return queryset
+
     def get_serializer_context(self):
         context = super(EncounterViewSet, self).get_serializer_context()
         context.update({"request": self.request})
@@ -120,7 +127,12 @@ def get_providers(request, group_name):
 @permission_classes([permissions.IsAuthenticated])
 def get_all_patients_encounter(request, patient_id):
     paginator = CustomPagination()
-    patient_encounters = models.Encounter.objects.filter(patient__id=patient_id)
+    patient_encounters = json_keys.filter_key(
+        models.Encounter.objects.prefetch_related("chart_entries"),
+        "patient",
+        "id",
+        patient_id,
+    )
     paginated_data = paginator.paginate_queryset(patient_encounters, request)
     serializer = serializers.EncounterSerializer(paginated_data, many=True)
     return paginator.get_paginated_response(serializer.data)
@@ -1,7 +1,3 @@
-import json
-
-from django.http import HttpResponse
-from django.core.serializers.json import DjangoJSONEncoder
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
@@ -11,6 +7,7 @@ from rest_framework import viewsets, filters, permissions, serializers
 from .. import filters as enc_filters
 from .. import models
 from .. import serializers
+from ..libs import encounter_charts
 from api.includes import utils, file_utils
 
 
@@ -20,6 +17,9 @@ class EncounterReportsViewset(viewsets.GenericViewSet):
     filter_backends = [filters.OrderingFilter, DjangoFilterBackend]
     filterset_class = enc_filters.EncounterReportsFilter
 
+    def get_queryset(self):
+        return encounter_charts.with_diagnosis_charts(super().get_queryset())
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -27,45 +27,34 @@ class EncounterReportsViewset(viewsets.GenericViewSet):
                 location=OpenApiParameter.QUERY,
                 description="Print excel",
                 type=OpenApiTypes.BOOL,
-            )
+            ),
+            OpenApiParameter(
+                name="export_format",
+                location=OpenApiParameter.QUERY,
+                description="Format of exported file, xlsx or csv",
+                type=OpenApiTypes.STR,
+            ),
         ]
     )
     def list(self, request, *args):
         """Get reports data"""
         queryset = self.filter_queryset(self.get_queryset())
-        to_excel: bool = request.query_params.get("to_excel")
+        to_excel: bool = utils.str_to_bool(request.query_params.get("to_excel"))
+        if to_excel:
+            records = file_utils.iter_serialized_records(
+                queryset,
+                self.get_serializer_class(),
+                context=self.get_serializer_context(),
+            )
+            return file_utils.export_response(
+                records,
+                "encounter_reports",
+                file_utils.get_export_format(request.query_params.get("export_format")),
+            )
 
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            data = serializer.data
-            if not to_excel:
-                return self.get_paginated_response(data)
-            else:
-                serializer = self.get_serializer(queryset, many=True)
-                data = utils.to_report_structure(
-                    json.loads(json.dumps(serializer.data, cls=DjangoJSONEncoder))
-                )
-                excel_bytes = file_utils.FileUtils().write_excel_file(data)
-                response = HttpResponse(
-                    excel_bytes, content_type="application/vnd.ms-excel"
-                )
-                response[
-                    "Content-Disposition"
-                ] = "attachment; filename=ecounter_reports.xlsx"
-                return response
-        else:
-            serializer = self.get_serializer(queryset, many=True)
-            data = serializer.data
-            if not to_excel:
-                return Response(data)
-            else:
-                data = utils.to_report_structure(
-                    json.loads(json.dumps(serializer.data, cls=DjangoJSONEncoder))
-                )
-                excel_bytes = file_utils.FileUtils().write_excel_file(data)
-                response = HttpResponse(
-                    excel_bytes, content_type="application/vnd.ms-excel"
-                )
-                response["Content-Disposition"] = "attachment; filename=encounters.xlsx"
-                return response
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
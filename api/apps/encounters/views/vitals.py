@@ -63,6 +63,5 @@ class EncounterVitalsViewset(viewsets.GenericViewSet):
             value=serializer.validated_data["value"],
             created_by=user_data,
         )
-        encounter.vitals.append(enc_data.dict())
-        encounter.save()
+        encounter.append("vitals", [enc_data.dict()])
         return Response(data=enc_data.dict(), status=status.HTTP_201_CREATED)
@@ -5,7 +5,7 @@ from django.contrib.auth.models import User
 import django_filters
 
 from . import models
-from api.includes import utils
+from api.includes import json_keys, utils
 
 
 class PaymentMethodFilter(FilterSet):
@@ -105,7 +105,7 @@ class BillFilter(FilterSet):
     cost_price = django_filters.RangeFilter(field_name="cost_price", label="Cost Price")
 
     def filter_patient(self, queryset: QuerySet, name, value):
-        return queryset.filter(patient__id__iexact=value)
+        return json_keys.filter_key(queryset, "patient", "id", value)
 
     def filter_module(self, queryset: QuerySet, name, value):
         return queryset.filter(module__icontains=value)
@@ -182,7 +182,7 @@ class InvoiceFilter(FilterSet):
     patient = django_filters.CharFilter(method="filter_patient", label="Patient ID")
 
     def filter_patient(self, queryset: QuerySet, name, value):
-        return queryset.filter(patient__id__iexact=value)
+        return json_keys.filter_key(queryset, "patient", "id", value)
 
 
 class PaymentFilter(FilterSet):
@@ -196,15 +196,17 @@ class PaymentFilter(FilterSet):
     )
     payment_method = django_filters.ModelMultipleChoiceFilter(
         label="Payment Method ID",
-        field_name="payment_method__id",
+        field_name="payment_method",
         to_field_name="id",
         queryset=models.PaymentMethod.objects.all(),
+        method="filter_json_id",
     )
     cashier = django_filters.ModelMultipleChoiceFilter(
         label="Cashier ID",
-        field_name="created_by__id",
+        field_name="created_by",
         to_field_name="id",
         queryset=User.objects.all(),
+        method="filter_json_id",
     )
 
     class Meta:
@@ -219,7 +221,7 @@ class PaymentFilter(FilterSet):
         ]
 
     def filter_patient(self, queryset: QuerySet, name, value):
-        return queryset.filter(patient__id__iexact=value)
+        return json_keys.filter_key(queryset, "patient", "id", value)
 
     def filter_patient_name(self, queryset, name, value):
         return queryset.filter(
@@ -229,7 +231,12 @@ class PaymentFilter(FilterSet):
         )
 
     def filter_patient_uhid(self, queryset, name, value):
-        return queryset.filter(patient__uhid__iexact=value)
+        return json_keys.filter_key(queryset, "patient", "uhid", value, upper=True)
+
+    def filter_json_id(self, queryset, name, value):
+        if not value:
+            return queryset
+        return json_keys.filter_key(queryset, name, "id", value)
 
 
 class RevenueFilter(FilterSet):
@@ -261,4 +268,22 @@ class RevenueFilter(FilterSet):
         )
 
     def filter_patient_uhid(self, queryset, name, value):
-        return queryset.filter(patient__uhid__iexact=value)
+        return json_keys.filter_key(queryset, "patient", "uhid", value, upper=True)
+
+
+class DailyRevenueFilter(FilterSet):
+    """RevenueFilter on the daily revenue rollups, which have no patients"""
+
+    date = django_filters.DateFromToRangeFilter(field_name="day")
+    bill_source = django_filters.ChoiceFilter(
+        field_name="module", choices=utils.Modules.search_choices()
+    )
+
+    class Meta:
+        model = models.DailyRevenue
+        fields = [
+            "date",
+            "bill_source",
+            "billed_to_type",
+            "billed_to",
+        ]
@@ -1,10 +1,29 @@
-from typing import List
-from concurrent.futures import ThreadPoolExecutor
+import itertools
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+
+import pandas
+from django.db import transaction
+from django.utils import timezone
+from pydantic import BaseModel
 
 from api.apps.finance import models
+from api.apps.finance.libs.price_list import MAX_SELLING_PRICE
+from api.apps.finance.models.billable_items import BILLABLE_ITEM_SEQUENCE
 from api.includes import exceptions, utils, file_utils
 
 
+class BillableItemUploadResult(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors: List[file_utils.SheetRowError] = []
+
+    @property
+    def failed_item_codes(self) -> List[Optional[str]]:
+        return [error.code for error in self.errors]
+
+
 class BillableItemLib:
     """Handler for billable item library"""
 
@@ -34,103 +53,189 @@ class BillableItemLib:
             "post_auth_allowed",
         )
 
-    def __parse_price_list_data_template(
-        self, billable_items: List[models.BillableItem]
-    ):
-        """parses list of price list items to list of dictionaries"""
-        price_list_items_values = []
-        for billable_item in billable_items:
-            price_list_item_value = {
-                "bill_item_code": billable_item.item_code,
-                "module": billable_item.module,
-                "selling_price": billable_item.selling_price,
-                "description": billable_item.description,
-                "co_pay_value": 0,
-                "co_pay_type": str(models.CoPayValueType.AMOUNT),
-                "auth_required": True,
-                "capitated": False,
-                "excluded": False,
-                "post_auth_allowed": False,
-            }
-            price_list_items_values.append(price_list_item_value)
-        return price_list_items_values
-
-    def __update_billable_item(self, billable_item: dict):
-        """Update billable item"""
-        bill_item = models.BillableItem.objects.filter(
-            item_code=billable_item["item_code"]
-        )
-
-        if bill_item.exists():
-            bill_item_obj: models.BillableItem = bill_item.first()
-            bill_item_obj.cost = billable_item["cost"]
-            bill_item_obj.selling_price = billable_item["selling_price"]
-            bill_item_obj.save()
-            return None
-        return billable_item["bill_item_code"]
-
-    def get_billable_item_excel(self, module: str = None):
-        """Gets spreedset bytes of billable item excel file
+    def iter_billable_items(self, module: str = None) -> Iterator[dict]:
+        """Gets the billable items for a spreadsheet, read in chunks
 
         Args:
             module: module of billable item
 
         Returns:
-            bytes of excel file
+            Iterator[dict]: billable item records
         """
         billable_items = models.BillableItem.objects.all()
         if module:
             module = utils.Modules.get_module_value(module)
             billable_items = billable_items.filter(module=module)
-        billable_items = billable_items.order_by("item_code")
-        billable_items_values = [
-            utils.model_to_dict(
-                billable_item,
-                exclude_fields={"created_by", "updated_by", "created_at", "updated_at"},
-            )
-            for billable_item in billable_items
-        ]
-        excel_bytes = file_utils.FileUtils().write_excel_file(billable_items_values)
-        return excel_bytes
+        billable_items = billable_items.order_by("item_code").values(
+            "id", "item_code", "description", "cost", "selling_price", "module"
+        )
+        return file_utils.iter_serialized_records(
+            billable_items, report_structure=False
+        )
+
+    def __validate(
+        self, rows: pandas.DataFrame, bill_items: Dict[str, models.BillableItem]
+    ) -> List[file_utils.SheetRowError]:
+        """Validates and normalizes the rows in place, column by column,
+        and drops the rows that cannot be imported
+
+        Args:
+            rows [pandas.DataFrame]: rows of the sheet, by sheet row number
+            bill_items [Dict[str, BillableItem]]: existing items by code
+
+        Returns:
+            List[SheetRowError]: errors of the dropped rows
+        """
+        modules = {}
+        for module in utils.Modules:
+            modules[module.name.casefold()] = module.value
+            modules[module.value.casefold()] = module.value
+
+        codes = rows["item_code"].fillna("").astype(str).str.strip()
+        descriptions = rows["description"].fillna("").astype(str).str.strip()
+        module_values = (
+            rows["module"].fillna("").astype(str).str.strip().str.casefold()
+        ).map(modules)
+        costs = pandas.to_numeric(rows["cost"], errors="coerce")
+        selling_prices = pandas.to_numeric(rows["selling_price"], errors="coerce")
+        is_new = codes == ""
+
+        checks = (
+            (~is_new & ~codes.isin(bill_items.keys()), "Billable item does not exist"),
+            (is_new & module_values.isna(), "A valid module is required"),
+            (is_new & (descriptions == ""), "Description is required"),
+            (rows["cost"].notna() & costs.isna(), "Cost must be a number"),
+            (selling_prices.isna(), "Selling price must be a number"),
+            (
+                (costs < 0)
+                | (costs > MAX_SELLING_PRICE)
+                | (selling_prices < 0)
+                | (selling_prices > MAX_SELLING_PRICE),
+                "Price is out of range",
+            ),
+            (
+                ~is_new & codes.duplicated(keep="last"),
+                "Item code is repeated on a later row",
+            ),
+        )
+        errors = file_utils.sheet_row_errors(codes, checks)
 
-    def upload_billable_items_excel(self, excel_file) -> List[str]:
-        """Uploads billable items excel file
+        rows["item_code"] = codes
+        rows["description"] = descriptions
+        rows["module"] = module_values
+        rows["cost"] = costs.fillna(0).round(2)
+        rows["selling_price"] = selling_prices.round(2)
+        rows.drop(index=[error.row for error in errors], inplace=True)
+        return errors
+
+    def upload_billable_items_excel(self, excel_file) -> BillableItemUploadResult:
+        """Imports billable items from an excel file
+
+        Rows with an item code update the prices of that item, rows without
+        one create a new item. The sheet is diffed against the stored items
+        in memory and every change is written in bulk in one transaction,
+        new items taking item codes allocated together.
 
         Args:
             excel_file: excel file
 
         Returns:
-            list of billable items that were not uploaded
+            BillableItemUploadResult: rows imported and errors by row
+
+        Raises:
+            exceptions.BadRequest: If the excel file or its headers are invalid
         """
         try:
-            file_util = file_utils.FileUtils()
-            excel_data = file_util.read_excel_file(excel_file)
-            headers = excel_data.headers
-            excel_content = excel_data.body
-
-            caseless_headers = [header.lower() for header in headers]
-            caseless_self_headers = [header.lower() for header in self.BILLABLE_HEADERS]
-
-            if set(caseless_self_headers).difference(set(caseless_headers)):
-                raise exceptions.BadRequest(
-                    "Invalid headers in excel file. Expected headers: {}".format(
-                        self.BILLABLE_HEADERS
+            rows = file_utils.FileUtils().read_excel_dataframe(excel_file)
+        except ValueError:
+            raise exceptions.BadRequest("Invalid excel file")
+        rows.columns = [str(column).strip().lower() for column in rows.columns]
+        if set(self.BILLABLE_HEADERS).difference(set(rows.columns)):
+            raise exceptions.BadRequest(
+                "Invalid headers in excel file. Expected headers: {}".format(
+                    self.BILLABLE_HEADERS
+                )
+            )
+        # rows are numbered as in the sheet, below the header row
+        rows.index += 2
+
+        codes = set(rows["item_code"].dropna().astype(str).str.strip()) - {""}
+        bill_items = models.BillableItem.objects.in_bulk(codes, field_name="item_code")
+        errors = self.__validate(rows, bill_items)
+
+        now = timezone.now()
+        new_items: List[models.BillableItem] = []
+        changed_items: List[models.BillableItem] = []
+        for row in rows.itertuples():
+            cost = Decimal(str(row.cost))
+            selling_price = Decimal(str(row.selling_price))
+            if not row.item_code:
+                new_items.append(
+                    models.BillableItem(
+                        description=row.description,
+                        cost=cost,
+                        selling_price=selling_price,
+                        module=row.module,
+                        created_by=self.user_data,
                     )
                 )
+                continue
+            bill_item = bill_items[row.item_code]
+            if (bill_item.cost, bill_item.selling_price) != (cost, selling_price):
+                bill_item.cost = cost
+                bill_item.selling_price = selling_price
+                bill_item.updated_by = self.user_data
+                bill_item.updated_at = now
+                changed_items.append(bill_item)
+
+        with transaction.atomic():
+            new_items.sort(key=lambda bill_item: bill_item.module)
+            for module, module_items in itertools.groupby(
+                new_items, key=lambda bill_item: bill_item.module
+            ):
+                module_items = list(module_items)
+                item_codes = BILLABLE_ITEM_SEQUENCE.next_ids(
+                    len(module_items), prefix=module
+                )
+                for bill_item, item_code in zip(module_items, item_codes):
+                    bill_item.item_code = item_code
+            models.BillableItem.objects.bulk_create(
+                new_items, batch_size=file_utils.EXPORT_CHUNK_SIZE
+            )
+            models.BillableItem.objects.bulk_update(
+                changed_items,
+                ["cost", "selling_price", "updated_by", "updated_at"],
+                batch_size=file_utils.EXPORT_CHUNK_SIZE,
+            )
+        return BillableItemUploadResult(
+            inserted=len(new_items),
+            updated=len(changed_items),
+            unchanged=len(rows) - len(new_items) - len(changed_items),
+            errors=errors,
+        )
 
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                bill_items = executor.map(self.__update_billable_item, excel_content)
-                return bill_items
-        except ValueError as e:
-            raise exceptions.BadRequest("Invalid excel file")
-
-    def get_price_list_excel(self, module: str = None):
-        """Gets spreadsheet template for  price list items
-        of a payerscheme from billable items
+    def iter_price_list_template(self, module: str = None) -> Iterator[dict]:
+        """Gets the spreadsheet template for price list items of a payer
+        scheme, one row per billable item, read in chunks
         """
         billable_items = models.BillableItem.objects.all()
         if module:
             billable_items = billable_items.filter(module=module)
-        price_list_items_values = self.__parse_price_list_data_template(billable_items)
-        excel_bytes = file_utils.FileUtils().write_excel_file(price_list_items_values)
-        return excel_bytes
+        billable_items = billable_items.order_by("item_code").values(
+            "item_code", "module", "selling_price", "description"
+        )
+        for billable_item in file_utils.iter_serialized_records(
+            billable_items, report_structure=False
+        ):
+            yield {
+                "bill_item_code": billable_item["item_code"],
+                "module": billable_item["module"],
+                "selling_price": billable_item["selling_price"],
+                "description": billable_item["description"],
+                "co_pay_value": 0,
+                "co_pay_type": str(models.CoPayValueType.AMOUNT),
+                "auth_required": True,
+                "capitated": False,
+                "excluded": False,
+                "post_auth_allowed": False,
+            }
@@ -1,9 +1,15 @@
-from typing import List, Union, Dict, Optional
+from decimal import Decimal
+from typing import Iterable, List, Union, Dict, Optional, Tuple
 import logging
 
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
 from pydantic import BaseModel
 
+from config import preferences
 from .. import models as finance_models
+from .price_index import PriceEntry, price_index
 from api.includes import exceptions, utils
 from api.apps.patient import models as patient_models
 
@@ -20,6 +26,235 @@ class BillingDataResponse(BaseModel):
         arbitrary_types_allowed = True
 
 
+class BillingResolver:
+    """
+    Loads what the bills of a patient are priced from, whatever the number
+    of items: the billable items, the patient payer schemes, the prices
+    of those schemes, from the price index, and the patient bill package
+    subscriptions.
+    """
+
+    def __init__(
+        self,
+        patient: dict,
+        bill_item_codes: Iterable[str] = (),
+        billed_to: finance_models.PayerScheme = None,
+        bill_items: Iterable[finance_models.BillableItem] = (),
+    ):
+        """
+        Args:
+            patient [dict]: patient billed
+            bill_item_codes [Iterable[str]]: codes of the billable items
+            billed_to [PayerScheme]: scheme billed instead of the patient's
+            bill_items [Iterable[BillableItem]]: billable items already loaded
+        """
+        self.patient = patient
+        self.bill_items: Dict[str, finance_models.BillableItem] = {
+            bill_item.item_code: bill_item for bill_item in bill_items
+        }
+        missing_codes = set(bill_item_codes) - self.bill_items.keys()
+        if missing_codes:
+            self.bill_items.update(
+                (bill_item.item_code, bill_item)
+                for bill_item in finance_models.BillableItem.objects.filter(
+                    item_code__in=missing_codes
+                )
+            )
+        self.billed_to = billed_to
+        self.schemes: List[finance_models.PayerScheme] = (
+            [billed_to] if billed_to else self.__get_patient_schemes()
+        )
+        self.prices = self.__get_prices()
+        self._subscriptions: Optional[
+            List[finance_models.PatientBillPackageSubscription]
+        ] = None
+        self._used_quantities: Dict[Tuple[int, int], int] = {}
+
+    def __get_patient_schemes(self) -> List[finance_models.PayerScheme]:
+        """Gets patient schemes"""
+        payment_scheme = (
+            patient_models.Patient.objects.filter(id=self.patient.get("id"))
+            .values_list("payment_scheme", flat=True)
+            .first()
+        )
+        if not payment_scheme:
+            return []
+        patient_scheme_ids = [
+            scheme.get("payer_scheme", {}).get("id") for scheme in payment_scheme
+        ]
+        schemes = finance_models.PayerScheme.objects.filter(
+            id__in=patient_scheme_ids
+        ).annotate(price_list_version=F("price_list__version"))
+        return list(schemes)
+
+    def __get_prices(self) -> Dict[int, Dict[str, PriceEntry]]:
+        """Gets the prices of the scheme price lists, by price list"""
+        return {
+            scheme.price_list_id: price_index.prices(
+                scheme.price_list_id, getattr(scheme, "price_list_version", None)
+            )
+            for scheme in self.schemes
+            if scheme.price_list_id
+        }
+
+    def get_bill_item(self, bill_item_code: str) -> finance_models.BillableItem:
+        """Get billable item"""
+        try:
+            return self.bill_items[bill_item_code]
+        except KeyError:
+            raise exceptions.NotFoundException("Billable Item not found")
+
+    def get_payer_scheme(
+        self, bill_item_code: str
+    ) -> Tuple[Optional[finance_models.PayerScheme], Optional[PriceEntry]]:
+        """Gets the first scheme pricing a billable item and its price list item,
+        the billed_to scheme if given
+
+        Args:
+            bill_item_code: bill item code
+
+        Returns:
+            payer scheme and price of the item, None for both if no scheme
+            of the patient prices the item
+
+        Raises:
+            BadRequest: the billed_to scheme does not price the item
+        """
+        for scheme in self.schemes:
+            prices = self.prices.get(scheme.price_list_id, {})
+            price_list_item = prices.get(bill_item_code)
+            if price_list_item:
+                return scheme, price_list_item
+        if self.billed_to:
+            raise exceptions.BadRequest(
+                f"Payer scheme {self.billed_to.name} has no price for billable "
+                f"item {bill_item_code}"
+            )
+        return None, None
+
+    def __load_subscriptions(self):
+        self._subscriptions = list(
+            finance_models.PatientBillPackageSubscription.objects.filter(
+                patient__id=self.patient.get("id"),
+                expiration_date__gt=timezone.now(),
+            ).order_by("expiration_date")
+        )
+        if not self._subscriptions:
+            return
+        used_quantities = (
+            finance_models.PatientBillPackageUsage.objects.filter(
+                package_subscription__in=self._subscriptions
+            )
+            .values("package_subscription", "billable_item__id")
+            .annotate(total_qty=Sum("quantity"))
+        )
+        for used in used_quantities:
+            key = (used["package_subscription"], used["billable_item__id"])
+            self._used_quantities[key] = used["total_qty"]
+
+    def get_package_subscription(
+        self, bill_item: finance_models.BillableItem
+    ) -> Optional[finance_models.PatientBillPackageSubscription]:
+        """Gets the patient subscription with a package containing the billable
+        item, if it is not totally consumed"""
+        if self._subscriptions is None:
+            self.__load_subscriptions()
+        for subscription in self._subscriptions:
+            package_item = subscription.get_billable_item(bill_item.pk)
+            if package_item:
+                used = self._used_quantities.get((subscription.pk, bill_item.pk), 0)
+                if package_item["quantity"] - used == 0:
+                    return None
+                return subscription
+        return None
+
+    def use_bill_package(
+        self, bill_item: finance_models.BillableItem, quantity: int
+    ) -> Optional[finance_models.PatientBillPackageUsage]:
+        """
+        check if patient has an active bill package containing billable_item
+        if true, then build an unsaved bill package usage of the subscription
+
+        The quantity is checked against the quantities used so far, loaded
+        with the subscriptions and counting the usages built since, so the
+        usages can be inserted in bulk with the bills.
+        """
+        subscription = self.get_package_subscription(bill_item)
+        if not subscription:
+            return None
+        key = (subscription.pk, bill_item.pk)
+        used = self._used_quantities.get(key, 0) + quantity
+        if used > subscription.get_billable_item(bill_item.pk)["quantity"]:
+            logger.info("total quantity is greater than quantity permitted in package")
+            return None
+        self._used_quantities[key] = used
+        return finance_models.PatientBillPackageUsage(
+            package_subscription=subscription,
+            billable_item=utils.model_to_dict(bill_item),
+            quantity=quantity,
+        )
+
+
+class DepositReserver:
+    """Reserves self paid bills from the patient deposit, bill by bill"""
+
+    def __init__(self, patient_id: int):
+        self.patient_id = patient_id
+
+    def reserve(self, amount: Union[Decimal, float]) -> bool:
+        """Moves an amount from deposit to reserve if the deposit suffices"""
+        try:
+            patient_models.PatientBalanceEntry.record(
+                self.patient_id,
+                patient_models.BalanceEntryType.RESERVE,
+                deposit_change=-amount,
+                reserve_change=amount,
+            )
+        except exceptions.BadRequest:
+            return False
+        return True
+
+    def commit(self) -> None:
+        pass
+
+
+class BatchDepositReserver(DepositReserver):
+    """
+    Reserves the bills of a batch from the patient deposit, locked at the
+    first reservation, and records their total as one ledger entry on
+    commit. Must be used within a transaction.
+    """
+
+    def __init__(self, patient_id: int):
+        super().__init__(patient_id)
+        self.deposit: Optional[Decimal] = None
+        self.reserved = Decimal(0)
+
+    def reserve(self, amount: Union[Decimal, float]) -> bool:
+        if self.deposit is None:
+            deposit = (
+                patient_models.Patient.objects.select_for_update()
+                .filter(id=self.patient_id)
+                .values_list("deposit", flat=True)
+                .first()
+            )
+            self.deposit = deposit or Decimal(0)
+        amount = Decimal(str(amount))
+        if self.deposit - self.reserved < amount:
+            return False
+        self.reserved += amount
+        return True
+
+    def commit(self) -> None:
+        patient_models.PatientBalanceEntry.record(
+            self.patient_id,
+            patient_models.BalanceEntryType.RESERVE,
+            deposit_change=-self.reserved,
+            reserve_change=self.reserved,
+        )
+        self.reserved = Decimal(0)
+
+
 class Billing:
     def __init__(
         self,
@@ -30,16 +265,20 @@ class Billing:
         description: str,
         billed_to: finance_models.PayerScheme = None,
         bill: finance_models.Bill = None,
+        resolver: BillingResolver = None,
+        reserver: DepositReserver = None,
     ):
         self.patient: dict = patient
-        self.bill_item: finance_models.BillableItem = self.__get_bill_item(
-            bill_item_code
+        self.resolver = resolver or BillingResolver(
+            patient, [bill_item_code], billed_to=billed_to
         )
-        payer_scheme, price_list_item = self.__get_payer_scheme(
-            bill_item_code, billed_to
+        self.reserver = reserver or DepositReserver(patient.get("id"))
+        self.bill_item: finance_models.BillableItem = self.resolver.get_bill_item(
+            bill_item_code
         )
+        payer_scheme, price_list_item = self.resolver.get_payer_scheme(bill_item_code)
         self.payer_scheme: finance_models.PayerScheme = payer_scheme
-        self.price_list_item: finance_models.PriceListItem = price_list_item
+        self.price_list_item: PriceEntry = price_list_item
         self.billed_to_type: finance_models.PayerSchemeType = None
         self.bill_source: str = module_name
         self.selling_price: float
@@ -60,104 +299,6 @@ class Billing:
         )
         self.bill = bill
 
-    def __use_bill_package(self):
-        """
-        check if patient has an active bill package containing billable_item
-        if true, then get the subscription and create a bill package usage
-        """
-        active_sub = finance_models.PatientBillPackageSubscription.get_patient_active_billable_item_subscription(
-            patient_id=self.patient.get("id"), billable_item_id=self.bill_item.pk
-        )
-        if not active_sub:
-            return
-        try:
-            package_sub_usage = finance_models.PatientBillPackageUsage.objects.create(
-                package_subscription=active_sub,
-                billable_item=utils.model_to_dict(self.bill),
-                quantity=self.quantity,
-            )
-            return package_sub_usage
-        except exceptions.BadRequest as e:
-            logger.info(str(e))
-            return None
-
-    def __get_bill_item(self, bill_item_code: str) -> finance_models.BillableItem:
-        """Get billable item"""
-        try:
-            bill_item = finance_models.BillableItem.objects.get(
-                item_code=bill_item_code
-            )
-            return bill_item
-        except finance_models.BillableItem.DoesNotExist:
-            raise exceptions.NotFoundException("Billable Item not found")
-
-    def __get_patient_schemes(self) -> Union[List[finance_models.PayerScheme], None]:
-        """Gets patient schemes" """
-        patient: "patient_models.Patient" = patient_models.Patient.objects.get(
-            id=self.patient.get("id")
-        )
-        if patient.payment_scheme is not None:
-            patient_scheme_ids = [
-                scheme.get("payer_scheme", {}).get("id")
-                for scheme in patient.payment_scheme
-            ]
-            patient_scheme_objs = finance_models.PayerScheme.objects.filter(
-                id__in=patient_scheme_ids
-            )
-            return (
-                list(patient_scheme_objs) if patient_scheme_objs.count() != 0 else None
-            )
-        return None
-
-    def __get_price_list_item(
-        self,
-        bill_item_code: str,
-        payer_scheme: finance_models.PayerScheme = None,
-    ) -> finance_models.PriceListItem:
-        """Gets price list item
-
-        Args:
-            bill_item_code: bill item code
-            payer_scheme: payer scheme
-
-        Returns:
-            price list item
-        """
-        if payer_scheme:
-            price_list = payer_scheme.price_list
-            if price_list:
-                price_list_item = finance_models.PriceListItem.objects.filter(
-                    bill_item_code=bill_item_code, price_list=price_list
-                )
-                if price_list_item.exists():
-                    return price_list_item.first()
-        return None
-
-    def __get_payer_scheme(
-        self,
-        bill_item_code: str,
-        payer_scheme: finance_models.PayerScheme = None,
-    ) -> Union[finance_models.PayerScheme, None]:
-        """Gets payer scheme
-
-        Args:
-            bill_item_code: bill item code
-            payer_scheme: payer scheme
-
-        Returns:
-            payer scheme
-        """
-        if payer_scheme:
-            price_list_item = self.__get_price_list_item(bill_item_code, payer_scheme)
-            return (payer_scheme, price_list_item) if price_list_item else None
-        patient_schemes = self.__get_patient_schemes()
-        if patient_schemes:
-            for scheme in patient_schemes:
-                price_list_item = self.__get_price_list_item(bill_item_code, scheme)
-                if price_list_item:
-                    return scheme, price_list_item
-        return None, None
-
     def get_unit_selling_price(self) -> float:
         """Gets unit selling price
         Will retrieve price list from patient payment scheme
@@ -211,17 +352,11 @@ class Billing:
                         return str(finance_models.BillStatus.CLEARED)
                     return str(finance_models.BillStatus.CLEARED)
 
-        # check patient deposit
-        patient: "patient_models.Patient" = patient_models.Patient.objects.get(
-            id=self.patient.get("id")
-        )
-        if patient.deposit >= self.selling_price:
-            patient.send_to_reserve(
-                self.selling_price
-            )  # reserve bills if balance suffices
-            self.is_reserved = True
-            return str(finance_models.BillStatus.CLEARED)
-        return str(finance_models.BillStatus.UNCLEARED)
+        # reserve bills if patient deposit suffices
+        if not self.reserver.reserve(self.selling_price):
+            return str(finance_models.BillStatus.UNCLEARED)
+        self.is_reserved = True
+        return str(finance_models.BillStatus.CLEARED)
 
     def get_billed_to_type(self):
         """Gets type of entity to whom bill is billed to"""
@@ -229,11 +364,10 @@ class Billing:
             return self.payer_scheme.type
         return str(finance_models.PayerSchemeType.SELF_PREPAID)
 
-    def create_bill(
-        self,
-    ) -> BillingDataResponse:
-        """Creates bill for a service"""
-        package_usage = self.__use_bill_package()
+    def build_bill(self) -> BillingDataResponse:
+        """Prices the bill of a service, or uses a bill package covering it,
+        unsaved"""
+        package_usage = self.resolver.use_bill_package(self.bill_item, self.quantity)
         if package_usage:
             return BillingDataResponse(bill_package_usage=package_usage, bill=None)
         self.selling_price = (
@@ -252,7 +386,7 @@ class Billing:
             else str(finance_models.BillStatus.CLEARED)
         )
 
-        bill_obj = finance_models.Bill.objects.create(
+        bill_obj = finance_models.Bill(
             bill_item_code=self.bill_item.item_code,
             cost_price=self.cost_price,
             selling_price=self.selling_price,
@@ -272,26 +406,134 @@ class Billing:
         )
         return BillingDataResponse(bill_package_usage=None, bill=bill_obj)
 
+    def create_bill(
+        self,
+    ) -> BillingDataResponse:
+        """Creates bill for a service"""
+        response = self.build_bill()
+        if response.bill:
+            response.bill.save()
+        if response.bill_package_usage:
+            # checked by the resolver, see BillingResolver.use_bill_package
+            finance_models.PatientBillPackageUsage.objects.bulk_create(
+                [response.bill_package_usage]
+            )
+        return response
+
     @classmethod
     def create_bills(
         cls,
         module: str,
         patient: dict,
         billable_items_qty: List[Dict[int, finance_models.BillableItem]],
+        billed_to: finance_models.PayerScheme = None,
+        descriptions: List[str] = None,
     ) -> List[BillingDataResponse]:
-        """Creates Bills in bulk for set of services"""
-        bills = []
-        for billable_item in billable_items_qty:
-            for quantity, billable_item in billable_item.items():
-                bill = cls(
+        """Creates Bills in bulk for set of services
+
+        The items, schemes, price lists and packages are resolved for all
+        the services at once, self paid bills are reserved from the deposit
+        together and the bills and package usages are inserted in one query
+        each, so the number of queries does not grow with the number of
+        services.
+
+        Args:
+            module [str]: module billing the services
+            patient [dict]: patient billed
+            billable_items_qty [List[Dict[int, BillableItem]]]: billable
+                items by quantity
+            billed_to [PayerScheme]: scheme billed instead of the patient's
+            descriptions [List[str]]: description of the bill of each item,
+                the description of the billable item by default
+
+        Returns:
+            List[BillingDataResponse]: bill or package usage of each service
+        """
+        items = [
+            (quantity, billable_item)
+            for billable_item_qty in billable_items_qty
+            for quantity, billable_item in billable_item_qty.items()
+        ]
+        if descriptions is None:
+            descriptions = [billable_item.description for _, billable_item in items]
+        resolver = BillingResolver(
+            patient,
+            billed_to=billed_to,
+            bill_items=[billable_item for _, billable_item in items],
+        )
+        with transaction.atomic():
+            reserver = BatchDepositReserver(patient.get("id"))
+            responses = [
+                cls(
                     bill_item_code=billable_item.item_code,
                     quantity=quantity,
                     module_name=module,
                     patient=patient,
-                    description=billable_item.description,
-                ).create_bill()
-                bills.append(bill)
-        return bills
+                    description=description,
+                    billed_to=billed_to,
+                    resolver=resolver,
+                    reserver=reserver,
+                ).build_bill()
+                for (quantity, billable_item), description in zip(items, descriptions)
+            ]
+            reserver.commit()
+            finance_models.Bill.objects.bulk_create(
+                [response.bill for response in responses if response.bill]
+            )
+            finance_models.PatientBillPackageUsage.objects.bulk_create(
+                [
+                    response.bill_package_usage
+                    for response in responses
+                    if response.bill_package_usage
+                ]
+            )
+        return responses
+
+    @classmethod
+    def bill_service_orders(
+        cls,
+        orders: list,
+        module: str,
+        payment_scheme: finance_models.PayerScheme = None,
+    ):
+        """Bills unsaved service orders as one set, as saving each would, and
+        sets the bill or package usage of each order
+
+        Args:
+            orders [list]: orders of one patient, each with the _bill_item_code,
+                _quantity and _name of the service ordered
+            module [str]: module billing the services
+            payment_scheme [PayerScheme]: scheme billed instead of the patient's
+        """
+        if preferences.AppPreferences().billing_enabled:
+            codes = [order._bill_item_code for order in orders]
+            bill_items: Dict[str, finance_models.BillableItem] = {
+                bill_item.item_code: bill_item
+                for bill_item in finance_models.BillableItem.objects.filter(
+                    item_code__in=codes
+                )
+            }
+            if not set(codes) <= bill_items.keys():
+                raise exceptions.NotFoundException("Billable Item not found")
+            responses = cls.create_bills(
+                module=module,
+                patient=orders[0].patient,
+                billable_items_qty=[
+                    {order._quantity: bill_items[order._bill_item_code]}
+                    for order in orders
+                ],
+                billed_to=payment_scheme,
+                descriptions=[order._name for order in orders],
+            )
+            for order, response in zip(orders, responses):
+                order.bill = str(response.bill.pk) if response.bill else None
+                order.bill_package_usage = (
+                    str(response.bill_package_usage.pk)
+                    if response.bill_package_usage
+                    else None
+                )
+        for order in orders:
+            order._validate_bill_package()
 
     def transfer(
         self, scheme_type: finance_models.PayerSchemeType
@@ -1,15 +1,136 @@
 import uuid
-from typing import List, Dict, Union, Optional
+from decimal import Decimal
+from typing import Iterable, List, Dict, Tuple, Union, Optional
 
 from django.utils import timezone
-from django.db.models import QuerySet
+from django.db import transaction
+from django.db.models import F, Max, QuerySet
 from django.contrib.auth.models import User
 
-from api.includes import utils, exceptions
+from api.includes import utils, exceptions, json_keys
 from api.apps.finance import models
 from api.apps.patient import models as patient_models
 
 
+def to_bill_lines(bills: List[models.Bill]) -> List[dict]:
+    """Snapshots bills as invoice bill lines"""
+    bill_lines = utils.models_to_dicts(bills, exclude_fields={"invoice", "patient"})
+    for bill_line in bill_lines:
+        bill_line["_id"] = str(uuid.uuid4())
+    return bill_lines
+
+
+def to_line_rows(
+    bill_lines: List[dict], position: int = 0
+) -> List[models.InvoiceBillLine]:
+    """Unsaved invoice lines of bill lines, positioned from the given position"""
+    return [
+        models.InvoiceBillLine.from_line(bill_line, position + index)
+        for index, bill_line in enumerate(bill_lines)
+    ]
+
+
+def to_payment_rows(payments: List[models.Payment]) -> List[models.InvoicePayment]:
+    """Unsaved invoice payments of payments made to an invoice"""
+    payment_lines = utils.models_to_dicts(
+        payments, exclude_fields={"invoice", "audit_log", "patient"}
+    )
+    return [models.InvoicePayment.from_line(line) for line in payment_lines]
+
+
+def line_totals(lines: Iterable[models.InvoiceBillLine]) -> Tuple[Decimal, Decimal]:
+    """Total charge and reserved charge of invoice lines"""
+    lines_total, reserved_total = Decimal(0), Decimal(0)
+    for line in lines:
+        lines_total += line.charge
+        reserved_total += line.reserved_charge
+    return lines_total, reserved_total
+
+
+def create_invoice_with_lines(bills: List[models.Bill], **fields) -> models.Invoice:
+    """Creates a draft invoice of bills and invoices the bills
+
+    Args:
+        bills [List[models.Bill]]: bills of the invoice
+        fields: fields of the invoice
+
+    Returns:
+        models.Invoice: invoice created
+    """
+    lines = to_line_rows(to_bill_lines(bills))
+    lines_total, reserved_total = line_totals(lines)
+    invoice = models.Invoice.objects.create(
+        **fields,
+        total_charge=0,
+        balance=0,
+        lines_total=lines_total,
+        reserved_total=reserved_total,
+        status=str(models.InvoiceStatus.DRAFT),
+    )
+    for line in lines:
+        line.invoice = invoice
+    models.InvoiceBillLine.objects.bulk_create(lines)
+    bills: QuerySet[models.Bill] = utils.list_to_queryset(models.Bill, bills)
+    bills.update(is_invoiced=True, invoice=invoice)
+    return invoice
+
+
+def convert_legacy_lines(invoice_ids: Iterable[int]) -> int:
+    """Moves the json bill and payment lines of invoices into the line tables,
+    invoices already converted are skipped
+
+    Args:
+        invoice_ids [Iterable[int]]: ids of the invoices to convert
+
+    Returns:
+        int: number of invoices converted
+    """
+    with transaction.atomic():
+        invoices = list(
+            models.Invoice.objects.select_for_update()
+            .filter(id__in=invoice_ids)
+            .exclude(legacy_bill_lines=[], legacy_payment_lines=[])
+        )
+        lines: List[models.InvoiceBillLine] = []
+        payments: List[models.InvoicePayment] = []
+        for invoice in invoices:
+            # snapshots of the patient were dropped from the lines of newer
+            # invoices, and the audit log from their payments
+            invoice_lines = to_line_rows(
+                [
+                    utils.copy_dict(bill_line, bill_line.keys() - {"patient"})
+                    for bill_line in invoice.legacy_bill_lines
+                ]
+            )
+            invoice_payments = [
+                models.InvoicePayment.from_line(
+                    utils.copy_dict(
+                        payment_line, payment_line.keys() - {"patient", "audit_log"}
+                    )
+                )
+                for payment_line in invoice.legacy_payment_lines
+            ]
+            for line in invoice_lines + invoice_payments:
+                line.invoice = invoice
+            invoice.lines_total, invoice.reserved_total = line_totals(invoice_lines)
+            invoice.legacy_bill_lines = []
+            invoice.legacy_payment_lines = []
+            lines += invoice_lines
+            payments += invoice_payments
+        models.InvoiceBillLine.objects.bulk_create(lines)
+        models.InvoicePayment.objects.bulk_create(payments)
+        models.Invoice.objects.bulk_update(
+            invoices,
+            [
+                "lines_total",
+                "reserved_total",
+                "legacy_bill_lines",
+                "legacy_payment_lines",
+            ],
+        )
+    return len(invoices)
+
+
 class Invoice:
     def __init__(
         self,
@@ -22,6 +143,40 @@ class Invoice:
         self.patient: patient_models.Patient = patient
         self.user_data: dict = user_data
         self.kwargs: dict = kwargs
+        # invoices not converted yet by convert_invoice_lines are converted
+        # before their lines are read or changed
+        if invoice and (invoice.legacy_bill_lines or invoice.legacy_payment_lines):
+            convert_legacy_lines([invoice.id])
+            invoice.refresh_from_db()
+
+    def __bill_ids(self) -> QuerySet:
+        """Ids of the bills on the invoice"""
+        return self.invoice.lines.filter(bill__isnull=False).values("bill_id")
+
+    def __add_to_totals(
+        self,
+        lines_total: Decimal = 0,
+        reserved_total: Decimal = 0,
+        paid_amount: Decimal = 0,
+    ):
+        """Adds to the running totals of the invoice in one update, which locks
+        the invoice until the transaction ends, and reads them back"""
+        models.Invoice.objects.filter(id=self.invoice.id).update(
+            lines_total=F("lines_total") + lines_total,
+            reserved_total=F("reserved_total") + reserved_total,
+            paid_amount=F("paid_amount") + paid_amount,
+            balance=F("balance") - paid_amount,
+            updated_at=timezone.now(),
+        )
+        self.invoice.refresh_from_db(
+            fields=[
+                "lines_total",
+                "reserved_total",
+                "paid_amount",
+                "balance",
+                "updated_at",
+            ]
+        )
 
     def __pay_reserved_bills(self, bills: QuerySet[models.Bill]):
         """
@@ -52,12 +207,9 @@ class Invoice:
                 event=utils.AuditEvent.CREATE,
                 fields=method_struct,
             ).dict()
-            bills_data = [
-                utils.model_to_dict(
-                    instance=bill, exclude_fields={"invoice", "patient"}
-                )
-                for bill in reserved_bills
-            ]
+            bills_data = utils.models_to_dicts(
+                reserved_bills, exclude_fields={"invoice", "patient"}
+            )
 
             payment = models.Payment.objects.create(
                 bills=bills_data,
@@ -105,8 +257,7 @@ class Invoice:
         bills = bills.filter(is_reserved=True)
         total_amount = sum(list(bills.values_list("selling_price", flat=True)))
         bills.update(is_reserved=False)
-        patient.pay_from_reserve(total_amount)
-        patient.add_deposit(total_amount)
+        patient.release_reserve(total_amount)
         return None
 
     def __get_status(self, balance: float, total_charge: float):
@@ -142,6 +293,7 @@ class Invoice:
             [models.Payment]: Payment created
         """
         payments_obj_list = []
+        bill_lines = self.invoice.bill_lines
         for payment in payments:
             audit_log = utils.AuditLog(
                 user=self.user_data,
@@ -150,7 +302,7 @@ class Invoice:
             ).dict()
 
             payment_obj = models.Payment(
-                bills=self.invoice.bill_lines,
+                bills=bill_lines,
                 patient=utils.model_to_dict(self.patient),
                 payment_type=str(models.PaymentType.INVOICE),
                 total_amount=payment.amount,
@@ -192,11 +344,9 @@ class Invoice:
         payer_scheme: models.PayerScheme = None,
     ) -> QuerySet[models.Invoice]:
         """Gets Invoice"""
-        invoices = models.Invoice.objects.filter(
-            patient__id=patient_id,
-            status=str(invoice_status),
-            scheme_type=scheme_type,
-        )
+        invoices = json_keys.filter_key(
+            models.Invoice.objects.all(), "patient", "id", patient_id
+        ).filter(status=str(invoice_status), scheme_type=scheme_type)
         if payer_scheme:
             return invoices.filter(payer_scheme=payer_scheme)
         return invoices.filter(payer_scheme__isnull=True)
@@ -209,29 +359,12 @@ class Invoice:
         Returns:
             [models.Invoice]: Invoice created
         """
-        bill_lines = list(
-            map(
-                lambda bill: utils.model_to_dict(
-                    instance=bill,
-                    exclude_fields={"invoice", "patient"},
-                    _id=str(uuid.uuid4()),
-                ),
-                bills,
-            )
-        )
-
-        invoice = models.Invoice.objects.create(
+        return create_invoice_with_lines(
+            bills,
             **self.kwargs,
             patient=utils.model_to_dict(self.patient),
-            bill_lines=bill_lines,
-            total_charge=0,
-            balance=0,
-            status=str(models.InvoiceStatus.DRAFT),
             created_by=self.user_data,
         )
-        bills: QuerySet[models.Bill] = utils.list_to_queryset(models.Bill, bills)
-        bills.update(is_invoiced=True, invoice=invoice)
-        return invoice
 
     @classmethod
     def create_invoices(
@@ -280,29 +413,9 @@ class Invoice:
 
             # create a new invoice if no invoice exist
             else:
-                bill_lines = list(
-                    map(
-                        lambda bill: utils.model_to_dict(
-                            instance=bill,
-                            exclude_fields={"invoice", "patient"},
-                            _id=str(uuid.uuid4()),
-                        ),
-                        group_bills,
-                    )
-                )
-
-                invoice = models.Invoice.objects.create(
-                    patient=patient,
-                    bill_lines=bill_lines,
-                    total_charge=0,
-                    balance=0,
-                    status=str(models.InvoiceStatus.DRAFT),
-                    created_by=created_by,
-                )
-                update_bills: QuerySet[models.Bill] = utils.list_to_queryset(
-                    models.Bill, group_bills
+                invoice = create_invoice_with_lines(
+                    group_bills, patient=patient, created_by=created_by
                 )
-                update_bills.update(is_invoiced=True, invoice=invoice)
                 invoices.append(invoice)
         return invoices
 
@@ -318,14 +431,9 @@ class Invoice:
         if self.invoice.status.casefold() != str(models.InvoiceStatus.DRAFT).casefold():
             raise exceptions.BadRequest("Invoice is already confirmed")
 
-        db_bills = models.Bill.objects.filter(
-            id__in=[bill["id"] for bill in self.invoice.bill_lines if bill.get("id")]
-        )
+        db_bills = models.Bill.objects.filter(id__in=self.__bill_ids())
 
-        total_charge = sum(
-            float(bill.get("selling_price", 0)) * float(bill.get("quantity", 1))
-            for bill in self.invoice.bill_lines
-        )
+        total_charge = self.invoice.lines_total
         self.invoice.total_charge = total_charge
         self.invoice.balance = total_charge
 
@@ -333,28 +441,20 @@ class Invoice:
         payment: models.Payment = self.__pay_reserved_bills(db_bills)
         self.invoice.status = str(models.InvoiceStatus.OPEN)
         if payment:
-            self.invoice.balance = float(self.invoice.balance) - float(
-                payment.total_amount
-            )
-            self.invoice.paid_amount = float(self.invoice.paid_amount) + float(
-                payment.total_amount
-            )
-            self.invoice.payment_lines.append(
-                utils.model_to_dict(
-                    payment, exclude_fields={"invoice", "audit_log", "patient"}
-                )
-            )
+            self.invoice.balance = self.invoice.balance - payment.total_amount
+            self.invoice.paid_amount = self.invoice.paid_amount + payment.total_amount
+            invoice_payment = to_payment_rows([payment])[0]
+            invoice_payment.invoice = self.invoice
+            invoice_payment.save()
 
         # settle auth bills
         total_auth_amount_clearance = self.__get_cleared_auth_bills_total_amount(
             bills=db_bills
         )
         if total_auth_amount_clearance:
-            self.invoice.balance = float(self.invoice.balance) - float(
-                total_auth_amount_clearance
-            )
-            self.invoice.paid_amount = float(self.invoice.paid_amount) + float(
-                total_auth_amount_clearance
+            self.invoice.balance = self.invoice.balance - total_auth_amount_clearance
+            self.invoice.paid_amount = (
+                self.invoice.paid_amount + total_auth_amount_clearance
             )
 
         self.invoice.status = self.__get_status(
@@ -363,7 +463,18 @@ class Invoice:
         self.invoice.confirmed_by = self.user_data
         self.invoice.confirmed_at = timezone.now()
         self.invoice.due_date = timezone.now()
-        self.invoice.save()
+        self.invoice.save(
+            update_fields=[
+                "total_charge",
+                "balance",
+                "paid_amount",
+                "status",
+                "confirmed_by",
+                "confirmed_at",
+                "due_date",
+                "updated_at",
+            ]
+        )
         self.invoice.set_invoice_id()
         db_bills.update(is_invoiced=True, invoice=self.invoice)
         return self.invoice
@@ -395,33 +506,22 @@ class Invoice:
             paid_amount = sum(payment.amount for payment in payments)
             self.__pay_from_deposit(payments=payments, patient=self.patient)
             payments_objs = self.__record_payments(payments)
-            payment_parsed_data = list(
-                map(
-                    lambda payment: utils.model_to_dict(
-                        payment, exclude_fields={"invoice", "patient", "audit_log"}
-                    ),
-                    payments_objs,
-                )
-            )
-            self.invoice.payment_lines.extend(payment_parsed_data)
-            self.invoice.paid_amount = float(self.invoice.paid_amount) + float(
-                paid_amount
-            )
-            self.invoice.balance = float(self.invoice.balance) - float(paid_amount)
+            invoice_payments = to_payment_rows(payments_objs)
+            for invoice_payment in invoice_payments:
+                invoice_payment.invoice = self.invoice
+            models.InvoicePayment.objects.bulk_create(invoice_payments)
+            self.__add_to_totals(paid_amount=Decimal(str(paid_amount)))
             self.invoice.status = self.__get_status(
                 self.invoice.balance, self.invoice.total_charge
             )
-            self.invoice.updated_at = timezone.now()
             self.invoice.updated_by = self.user_data
-            self.invoice.save()
+            self.invoice.save(update_fields=["status", "updated_by", "updated_at"])
 
             if (
                 self.invoice.status.casefold()
                 == str(models.InvoiceStatus.PAID).casefold()
             ):
-                bills = models.Bill.objects.filter(
-                    id__in=[bill.get("id") for bill in self.invoice.bill_lines]
-                )
+                bills = models.Bill.objects.filter(id__in=self.__bill_ids())
                 bills.update(cleared_status=str(models.BillStatus.CLEARED))
             return self.invoice
 
@@ -430,77 +530,96 @@ class Invoice:
 
     def get_bills(self) -> List[str]:
         """Return all bills in an invoice"""
-        bills = self.invoice.bill_lines
-        bill_ids = [bill["id"] for bill in bills]
-        return bill_ids
+        return list(self.__bill_ids().values_list("bill_id", flat=True))
 
     def edit_bills(self, bills: List[dict], user: User) -> models.Invoice:
         """Edit bills
         Bills can be added, removed and modified directly from here
         """
         # unreserve db bills
-        db_bill_ids = [bill["id"] for bill in self.invoice.bill_lines if bill.get("id")]
-        db_bills = models.Bill.objects.filter(id__in=db_bill_ids)
+        db_bills = models.Bill.objects.filter(id__in=self.__bill_ids())
         self.__unreserve_bills(patient=self.patient, bills=db_bills)
         bills: List[dict] = [{**bill, "is_reserved": False} for bill in bills]
 
-        modified_bills_ids: List[uuid.UUID] = [bill.get("_id") for bill in bills]
-        invoice_bills: List[dict] = self.invoice.bill_lines
-        invoice_bills_ids: List[uuid.UUID] = [bill.get("_id") for bill in invoice_bills]
+        modified_bills: Dict[str, dict] = {str(bill.get("_id")): bill for bill in bills}
+        invoice_lines: Dict[str, models.InvoiceBillLine] = {
+            str(line.line_id): line for line in self.invoice.lines.all()
+        }
 
         # get added,removed and comman bills
-        removed_bills = set(invoice_bills_ids).difference(set(modified_bills_ids))
-        added_bills = set(modified_bills_ids).difference(set(invoice_bills_ids))
-        common_bills = set(invoice_bills_ids).intersection(set(modified_bills_ids))
+        removed_bills = invoice_lines.keys() - modified_bills.keys()
+        added_bills = modified_bills.keys() - invoice_lines.keys()
+        common_bills = invoice_lines.keys() & modified_bills.keys()
 
         if len(removed_bills) > 0 and not user.has_perm("finance.remove_bills"):
             raise exceptions.PermissionDenied("Inadequate permissions to remove bills")
         if len(added_bills) > 0 and not user.has_perm("finance.add_bill"):
             raise exceptions.PermissionDenied("Inadequate permissions to add bills")
-        if len(modified_bills_ids) > 0 and not user.has_perm("finance.edit_bills"):
+        if len(modified_bills) > 0 and not user.has_perm("finance.edit_bills"):
             raise exceptions.PermissionDenied("Inadequate permissions to edit bills")
-        if len(common_bills) > 0:
-            for bill_id in list(common_bills):
-                db_bill_detail = next(
-                    (bill for bill in invoice_bills if bill["_id"] == bill_id), {}
-                )
-                modified_bill_detail = next(
-                    (bill for bill in bills if bill["_id"] == bill_id), {}
-                )
 
-                if float(modified_bill_detail.get("selling_price", 0)) > float(
-                    db_bill_detail.get("selling_price", 0)
+        removed_lines = [invoice_lines[line_id] for line_id in removed_bills]
+        lines_total, reserved_total = line_totals(removed_lines)
+        lines_total, reserved_total = -lines_total, -reserved_total
+        updated_lines: List[models.InvoiceBillLine] = []
+        added_lines: List[models.InvoiceBillLine] = []
+        for position, bill in enumerate(bills):
+            line_id = str(bill.get("_id"))
+            if line_id in common_bills:
+                line = invoice_lines[line_id]
+                selling_price = float(bill.get("selling_price", 0))
+                if selling_price > float(
+                    line.data.get("selling_price", 0)
                 ) and not user.has_perm("finance.markup_price"):
                     raise exceptions.PermissionDenied(
                         "Inadequate permissions to add mark up price"
                     )
 
-                if float(modified_bill_detail.get("selling_price", 0)) < float(
-                    db_bill_detail.get("selling_price", 0)
+                if selling_price < float(
+                    line.data.get("selling_price", 0)
                 ) and not user.has_perm("finance.markdown_price"):
                     raise exceptions.PermissionDenied(
                         "Inadequate permissions to add mark down price"
                     )
 
-                index = bills.index(modified_bill_detail)
-                db_bill_detail.update(modified_bill_detail)
-                bills[index] = db_bill_detail
-
-        if len(added_bills) > 0:
-            for bill_id in list(added_bills):
-                new_bill = next((bill for bill in bills if bill["_id"] == bill_id), {})
-                new_bill_index = bills.index(new_bill)
-                new_bill["transaction_date"] = new_bill.get(
+                lines_total -= line.charge
+                reserved_total -= line.reserved_charge
+                line.set_data({**line.data, **bill})
+                line.position = position
+                updated_lines.append(line)
+            elif line_id in added_bills:
+                bill["transaction_date"] = bill.get(
                     "transaction_date"
                 ) or timezone.now().strftime("%Y-%m-%dT%H:%M:%SZ")
-                new_bill["serviced_rendered_at"] = new_bill.get("transaction_date")
-                new_bill["is_service_rendered"] = True
-
-                index = bills.index(new_bill)
-                bills[new_bill_index] = new_bill
-
-        self.invoice.bill_lines = bills
-        self.invoice.save()
+                bill["serviced_rendered_at"] = bill.get("transaction_date")
+                bill["is_service_rendered"] = True
+                line = models.InvoiceBillLine.from_line(bill, position)
+                line.invoice = self.invoice
+                added_lines.append(line)
+                # a line sent twice is added once
+                added_bills.discard(line_id)
+            else:
+                continue
+            lines_total += line.charge
+            reserved_total += line.reserved_charge
+
+        models.InvoiceBillLine.objects.filter(
+            id__in=[line.id for line in removed_lines]
+        ).delete()
+        models.InvoiceBillLine.objects.bulk_update(
+            updated_lines,
+            [
+                "position",
+                "bill",
+                "bill_item_code",
+                "selling_price",
+                "quantity",
+                "is_reserved",
+                "data",
+            ],
+        )
+        models.InvoiceBillLine.objects.bulk_create(added_lines)
+        self.__add_to_totals(lines_total=lines_total, reserved_total=reserved_total)
         return self.invoice
 
     def remove_bills(self, bills: List[models.Bill]) -> models.Invoice:
@@ -527,14 +646,15 @@ class Invoice:
                 f"Service for the following bill ids have been rendered {error_bill_ids}"
             )
 
-        invoice_bills_id = [bill["id"] for bill in self.invoice.bill_lines]
-        if not set(bill_ids).issubset(set(invoice_bills_id)):
+        lines = list(self.invoice.lines.filter(bill__in=bill_ids))
+        if not set(bill_ids).issubset({line.bill_id for line in lines}):
             raise exceptions.BadRequest("Bill ids not found in invoice")
 
-        self.invoice.bill_lines = [
-            bill for bill in self.invoice.bill_lines if bill["id"] not in bill_ids
-        ]
-        self.invoice.save()
+        models.InvoiceBillLine.objects.filter(
+            id__in=[line.id for line in lines]
+        ).delete()
+        lines_total, reserved_total = line_totals(lines)
+        self.__add_to_totals(lines_total=-lines_total, reserved_total=-reserved_total)
 
         for bill in bills:
             bill.is_invoiced = False
@@ -563,46 +683,58 @@ class Invoice:
             error_bill_ids = [bill.id for bill in invoiced_bills]
             raise exceptions.BadRequest(f"Bill ids {error_bill_ids} have been invoiced")
 
-        invoice_bills_id = [bill["id"] for bill in self.invoice.bill_lines]
+        invoice_bills_id = set(
+            self.invoice.lines.filter(bill__in=bill_ids).values_list(
+                "bill_id", flat=True
+            )
+        )
         unadded_bills = [bill for bill in bills if bill.id not in invoice_bills_id]
         if unadded_bills:
             # find bills that have the same bill item code in the invoice
             # update the item quantity, selling price,
-            invoice_bills: List[dict] = self.invoice.bill_lines
-            for bill in unadded_bills:
-                invoice_bill = next(
-                    (
-                        line
-                        for line in invoice_bills
-                        if line["bill_item_code"] == bill.bill_item_code
-                    ),
-                    None,
+            code_lines: Dict[str, models.InvoiceBillLine] = {
+                line.bill_item_code: line
+                for line in self.invoice.lines.filter(
+                    bill_item_code__in={bill.bill_item_code for bill in unadded_bills}
                 )
+                .order_by("bill_item_code", "position", "id")
+                .distinct("bill_item_code")
+            }
+            position = self.invoice.lines.aggregate(position=Max("position"))
+            position = (
+                -1 if position["position"] is None else position["position"]
+            ) + 1
+            lines_total, reserved_total = Decimal(0), Decimal(0)
+            updated_lines: Dict[int, models.InvoiceBillLine] = {}
+            added_lines: List[models.InvoiceBillLine] = []
+            for bill, bill_line in zip(unadded_bills, to_bill_lines(unadded_bills)):
+                invoice_bill = code_lines.get(bill.bill_item_code)
                 if invoice_bill:
-                    index = invoice_bills.index(invoice_bill)
-                    invoice_bill["quantity"] = bill.quantity + int(
-                        invoice_bill.get("quantity")
-                    )
-                    invoice_bill["co_pay"] = str(
-                        float(bill.co_pay) + float(invoice_bill.get("co_pay"))
+                    lines_total -= invoice_bill.charge
+                    reserved_total -= invoice_bill.reserved_charge
+                    data = invoice_bill.data
+                    data["quantity"] = bill.quantity + int(data.get("quantity"))
+                    data["co_pay"] = str(
+                        float(bill.co_pay or 0) + float(data.get("co_pay") or 0)
                     )
-                    invoice_bills[index] = invoice_bill
+                    invoice_bill.set_data(data)
+                    if invoice_bill.id:
+                        updated_lines[invoice_bill.id] = invoice_bill
 
                 else:
-                    kwargs = {"_id": str(uuid.uuid4())}
-                    invoice_bills.append(
-                        utils.model_to_dict(
-                            bill,
-                            exclude_fields={
-                                "invoice",
-                                "patient",
-                            },
-                            **kwargs,
-                        )
-                    )
-
-            self.invoice.bill_lines = invoice_bills
-            self.invoice.save()
+                    invoice_bill = models.InvoiceBillLine.from_line(bill_line, position)
+                    invoice_bill.invoice = self.invoice
+                    position += 1
+                    code_lines[bill.bill_item_code] = invoice_bill
+                    added_lines.append(invoice_bill)
+                lines_total += invoice_bill.charge
+                reserved_total += invoice_bill.reserved_charge
+
+            models.InvoiceBillLine.objects.bulk_update(
+                updated_lines.values(), ["quantity", "data"]
+            )
+            models.InvoiceBillLine.objects.bulk_create(added_lines)
+            self.__add_to_totals(lines_total=lines_total, reserved_total=reserved_total)
 
             for bill in unadded_bills:
                 bill.is_invoiced = True
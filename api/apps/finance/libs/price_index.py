@@ -0,0 +1,135 @@
+import threading
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F
+from pydantic import BaseModel
+
+from api.apps.finance import models
+from config.middlewares.db_routing import get_current_db
+
+PRICE_FIELDS = (
+    "id",
+    "bill_item_code",
+    "price_list_id",
+    "selling_price",
+    "co_pay",
+    "is_auth_req",
+    "is_capitated",
+    "is_exclusive",
+    "post_auth_allowed",
+)
+
+
+class PriceEntry(BaseModel):
+    """Price of a billable item on a price list, as billed"""
+
+    id: int
+    bill_item_code: str
+    price_list_id: int
+    selling_price: Decimal
+    co_pay: dict
+    is_auth_req: bool
+    is_capitated: bool
+    is_exclusive: bool
+    post_auth_allowed: bool
+
+
+_Prices = Dict[str, PriceEntry]
+
+
+class PriceIndex:
+    """Process local index of price list items by bill item code.
+
+    A price list is loaded in a single query the first time it is read,
+    per database alias (default/sandbox), and reloaded when the version
+    of the price list read by the caller differs from the version it was
+    loaded at. The version is bumped in the database on every change of
+    the price list or its items, see bump_version, so callers reading it
+    along with the payer scheme never get stale prices.
+    """
+
+    def __init__(self):
+        self._prices: Dict[Tuple[str, int], Tuple[int, _Prices]] = {}
+        self._lock = threading.RLock()
+
+    def prices(self, price_list_id: int, version: Optional[int] = None) -> _Prices:
+        """Gets the prices of a price list by bill item code
+
+        Args:
+            price_list_id [int]: price list id
+            version [int]: current version of the price list, read from the
+                database if not given
+
+        Returns:
+            Dict[str, PriceEntry]: prices by bill item code, empty if the
+            price list does not exist
+        """
+        key = (get_current_db(), price_list_id)
+        if version is None:
+            version = (
+                models.PriceList.objects.filter(id=price_list_id)
+                .values_list("version", flat=True)
+                .first()
+            )
+            if version is None:
+                return {}
+        loaded = self._prices.get(key)
+        if loaded and loaded[0] == version:
+            return loaded[1]
+        with self._lock:
+            loaded = self._prices.get(key)
+            if loaded and loaded[0] == version:
+                return loaded[1]
+            prices: _Prices = {}
+            # the oldest item prices an item listed more than once
+            for price in (
+                models.PriceListItem.objects.filter(price_list_id=price_list_id)
+                .order_by("-id")
+                .values(*PRICE_FIELDS)
+            ):
+                prices[price["bill_item_code"]] = PriceEntry(**price)
+            self._prices[key] = (version, prices)
+            return prices
+
+    def get(
+        self,
+        price_list_id: int,
+        bill_item_code: str,
+        version: Optional[int] = None,
+    ) -> Optional[PriceEntry]:
+        """Gets the price of a billable item on a price list"""
+        return self.prices(price_list_id, version).get(bill_item_code)
+
+    def invalidate(self, price_list_ids: Iterable[int] = None, alias: str = None):
+        """Drops loaded price lists, all of them by default"""
+        alias = alias or get_current_db()
+        with self._lock:
+            if price_list_ids is None:
+                self._prices.clear()
+                return
+            for price_list_id in price_list_ids:
+                self._prices.pop((alias, price_list_id), None)
+
+
+price_index = PriceIndex()
+
+
+def bump_version(price_list_ids: Iterable[int], using: str = None):
+    """Bumps the version of price lists whose items changed, so every process
+    reloads their prices. Bulk writes to price list items, which send no
+    signals, must call it once they are done.
+
+    Args:
+        price_list_ids [Iterable[int]]: ids of the price lists changed
+        using [str]: database alias, the current one by default
+    """
+    using = using or get_current_db()
+    price_list_ids = set(price_list_ids)
+    models.PriceList.objects.using(using).filter(id__in=price_list_ids).update(
+        version=F("version") + 1
+    )
+    transaction.on_commit(
+        lambda: price_index.invalidate(price_list_ids, using), using=using
+    )
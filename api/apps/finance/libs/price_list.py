@@ -1,10 +1,68 @@
-import io
-from decimal import Decimal
-from typing import List
-from concurrent.futures import ThreadPoolExecutor
+import json
+from typing import Iterator, List, Optional
 
-from api.includes import file_utils, utils, exceptions
+import pandas
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+from django.db.models import OuterRef, Subquery
+from pydantic import BaseModel
+
+from api.includes import file_utils, exceptions
 from api.apps.finance import models
+from api.apps.finance.libs import price_index
+
+# upper bound of the selling price column, numeric(10, 2)
+MAX_SELLING_PRICE = 99_999_999.99
+TRUTHY_VALUES = ("true", "1", "1.0", "yes")
+# fields of price list items posted as json, by upload column
+ITEM_FIELD_COLUMNS = {
+    "is_auth_req": "auth_required",
+    "is_capitated": "capitated",
+    "is_exclusive": "excluded",
+}
+
+UPSERT_PRICE_LIST_ITEMS = """
+INSERT INTO {table} (
+    price_list_id, bill_item_code, selling_price, co_pay, module, is_auth_req,
+    is_capitated, is_exclusive, post_auth_allowed, created_by, created_at,
+    updated_by, updated_at
+)
+SELECT
+    %(price_list_id)s, item.bill_item_code, item.selling_price,
+    item.co_pay::jsonb, item.module, item.is_auth_req, item.is_capitated,
+    item.is_exclusive, item.post_auth_allowed, %(user)s::jsonb, now(),
+    '{{}}'::jsonb, now()
+FROM unnest(
+    %(bill_item_code)s::varchar[], %(selling_price)s::numeric[],
+    %(co_pay)s::text[], %(module)s::varchar[], %(is_auth_req)s::boolean[],
+    %(is_capitated)s::boolean[], %(is_exclusive)s::boolean[],
+    %(post_auth_allowed)s::boolean[]
+) AS item(
+    bill_item_code, selling_price, co_pay, module, is_auth_req, is_capitated,
+    is_exclusive, post_auth_allowed
+)
+ON CONFLICT (price_list_id, bill_item_code) DO UPDATE SET
+    selling_price = EXCLUDED.selling_price,
+    co_pay = EXCLUDED.co_pay,
+    module = EXCLUDED.module,
+    is_auth_req = EXCLUDED.is_auth_req,
+    is_capitated = EXCLUDED.is_capitated,
+    is_exclusive = EXCLUDED.is_exclusive,
+    post_auth_allowed = EXCLUDED.post_auth_allowed,
+    updated_by = EXCLUDED.created_by,
+    updated_at = EXCLUDED.updated_at
+RETURNING xmax = 0
+"""
+
+
+class PriceListUploadResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    errors: List[file_utils.SheetRowError] = []
+
+    @property
+    def failed_item_codes(self) -> List[Optional[str]]:
+        return [error.code for error in self.errors]
 
 
 class PriceListLib:
@@ -69,142 +127,214 @@ class PriceListLib:
             )
         )
 
-    def __parse_co_pay_in(self, co_pay_value: str, co_pay_type: str) -> dict:
-        value_type = models.CoPayValueType.AMOUNT
-        if co_pay_type.casefold() == str(models.CoPayValueType.PERCENTAGE).casefold():
-            value_type = models.CoPayValueType.PERCENTAGE
+    def __read_rows(self) -> pandas.DataFrame:
+        """Reads the uploaded rows into a frame of upload columns
 
-        return models.CoPaySchema(value=float(co_pay_value), type=value_type).dict()
+        Raises:
+            exceptions.BadRequest: If the excel file headers are invalid
+        """
+        if not self.excel_file:
+            rows = pandas.DataFrame.from_records(self.price_list_items or [])
+            if "co_pay" in rows:
+                co_pay = rows.pop("co_pay").apply(
+                    lambda value: value if isinstance(value, dict) else {}
+                )
+                rows["co_pay_value"] = co_pay.str.get("value")
+                rows["co_pay_type"] = co_pay.str.get("type")
+            # rows are numbered from 1
+            rows.index += 1
+            return rows.rename(columns=ITEM_FIELD_COLUMNS)
+
+        try:
+            rows = file_utils.FileUtils().read_excel_dataframe(self.excel_file)
+        except ValueError as e:
+            raise exceptions.BadRequest(str(e))
+        rows.columns = [str(column).strip().lower() for column in rows.columns]
+        caseless_self_headers = [header.lower() for header in self.OUTPUT_HEADERS]
+        if set(rows.columns).difference(set(caseless_self_headers)):
+            raise exceptions.BadRequest(
+                "Invalid excel file headers. Expected: {}".format(self.INPUT_HEADERS)
+            )
+        # rows are numbered as in the sheet, below the header row
+        rows.index += 2
+        return rows
 
-    def __parse_price_list_item_out(
-        self, price_list_item: models.PriceListItem
-    ) -> dict:
-        """Parses price list item to dictionary
+    def __validate(self, rows: pandas.DataFrame) -> List[file_utils.SheetRowError]:
+        """Validates and normalizes the rows in place, column by column,
+        and drops the rows that cannot be written
 
         Args:
-            price_list_item: Price list item object
+            rows [pandas.DataFrame]: rows read by __read_rows
 
         Returns:
-            price_list_item_data: Dictionary containing price list item data
+            List[SheetRowError]: errors of the dropped rows
         """
-        billable_item = models.BillableItem.objects.filter(
-            item_code=price_list_item.bill_item_code
+        for column in self.OUTPUT_HEADERS:
+            if column not in rows:
+                rows[column] = None
+
+        codes = rows["bill_item_code"].fillna("").astype(str).str.strip()
+        bill_item_modules = dict(
+            models.BillableItem.objects.filter(item_code__in=set(codes)).values_list(
+                "item_code", "module"
+            )
         )
+        selling_prices = pandas.to_numeric(rows["selling_price"], errors="coerce")
+        co_pay_values = pandas.to_numeric(rows["co_pay_value"], errors="coerce")
 
-        price_list_item_data = {
-            "bill_item_code": price_list_item.bill_item_code,
-            "description": (
-                billable_item.first().description if billable_item.exists() else None
+        checks = (
+            (codes == "", "Bill item code is required"),
+            (
+                (codes != "") & ~codes.isin(bill_item_modules.keys()),
+                "Billable item does not exist",
             ),
-            "selling_price": price_list_item.selling_price,
-            "co_pay_value": price_list_item.co_pay["value"],
-            "co_pay_type": price_list_item.co_pay["type"],
-            "auth_required": bool(price_list_item.is_auth_req),
-            "capitated": bool(price_list_item.is_capitated),
-            "module": price_list_item.module,
-            "is_exclusive": bool(price_list_item.is_exclusive),
-            "post_auth_allowed": bool(price_list_item.post_auth_allowed),
-        }
-        return price_list_item_data
-
-    def __parse_price_list_item_in(self, price_list_item: dict) -> dict:
-        """Parses dictionary to price_list_item
-
-        Args:
-            price_list_item: dict
-
-        Returns:
-            dict: parsed
-        """
-        price_list_item_data = {
-            "bill_item_code": price_list_item["bill_item_code"],
-            "selling_price": Decimal(price_list_item["selling_price"]),
-            "price_list": self.price_list,
-            "co_pay": self.__parse_co_pay_in(
-                price_list_item["co_pay_value"], price_list_item["co_pay_type"]
+            (selling_prices.isna(), "Selling price must be a number"),
+            (
+                (selling_prices < 0) | (selling_prices > MAX_SELLING_PRICE),
+                "Selling price is out of range",
+            ),
+            (
+                rows["co_pay_value"].notna() & co_pay_values.isna(),
+                "Co-pay value must be a number",
             ),
-            "is_auth_req": utils.str_to_bool(price_list_item["auth_required"]),
-            "is_capitated": utils.str_to_bool(price_list_item["capitated"]),
-            "module": price_list_item["module"],
-            "is_exclusive": utils.str_to_bool(price_list_item["excluded"]),
-            "post_auth_allowed": utils.str_to_bool(
-                price_list_item["post_auth_allowed"]
+            (
+                (codes != "") & codes.duplicated(keep="last"),
+                "Bill item code is repeated on a later row",
             ),
-        }
-        return price_list_item_data
+        )
+        errors = file_utils.sheet_row_errors(codes, checks)
+
+        is_percentage = (
+            rows["co_pay_type"].fillna("").astype(str).str.casefold()
+            == str(models.CoPayValueType.PERCENTAGE).casefold()
+        )
+        rows["bill_item_code"] = codes
+        rows["selling_price"] = selling_prices.round(2)
+        rows["co_pay_value"] = co_pay_values
+        rows["co_pay_type"] = is_percentage.map(
+            {
+                True: str(models.CoPayValueType.PERCENTAGE),
+                False: str(models.CoPayValueType.AMOUNT),
+            }
+        )
+        rows["module"] = rows["module"].where(
+            rows["module"].notna() & (rows["module"] != ""),
+            codes.map(bill_item_modules),
+        )
+        for column in ("auth_required", "capitated", "excluded", "post_auth_allowed"):
+            rows[column] = (
+                rows[column].astype(str).str.strip().str.lower().isin(TRUTHY_VALUES)
+            )
 
-    def __create_update_data(self, price_list_item_data: dict):
-        """Creates or updates price list items in database
+        rows.drop(index=[error.row for error in errors], inplace=True)
+        return errors
 
-        Args:
-            price_list_items: List of price list items
+    def __upsert(self, rows: pandas.DataFrame) -> int:
+        """Inserts the rows or updates the price list items of their codes,
+        in a single statement
 
         Returns:
-            bill_item_code: str: returns bill item code of items that fails to upload
+            int: number of price list items created
         """
-        if (
-            models.BillableItem.objects.filter(
-                item_code=price_list_item_data["bill_item_code"]
-            ).count()
-            > 0
-        ):
-            models.PriceListItem.objects.update_or_create(
-                bill_item_code=price_list_item_data["bill_item_code"],
-                price_list=self.price_list,
-                defaults=price_list_item_data,
+        # items without a co-pay value have no co-pay
+        co_pay = [
+            json.dumps({} if pandas.isna(value) else {"value": value, "type": kind})
+            for value, kind in zip(rows["co_pay_value"], rows["co_pay_type"])
+        ]
+        table = models.PriceListItem._meta.db_table
+        using = router.db_for_write(models.PriceListItem)
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                UPSERT_PRICE_LIST_ITEMS.format(table=table),
+                {
+                    "price_list_id": self.price_list.id,
+                    "user": json.dumps(self.user, cls=DjangoJSONEncoder),
+                    "bill_item_code": rows["bill_item_code"].tolist(),
+                    "selling_price": rows["selling_price"].tolist(),
+                    "co_pay": co_pay,
+                    "module": rows["module"].tolist(),
+                    "is_auth_req": rows["auth_required"].tolist(),
+                    "is_capitated": rows["capitated"].tolist(),
+                    "is_exclusive": rows["excluded"].tolist(),
+                    "post_auth_allowed": rows["post_auth_allowed"].tolist(),
+                },
             )
-            return None
-        return price_list_item_data["bill_item_code"]
+            return sum(created for created, in cursor.fetchall())
 
-    def upload(self):
-        """Uploads large content to price list item
+    def upload(self) -> PriceListUploadResult:
+        """Uploads price list items from the excel file or the items given
 
-        Args:
-            file: File object
-            price_list_id: Id of price list
+        The rows are validated together and written at once: every valid
+        row creates the price list item of its code or updates it, and
+        invalid rows are reported rather than failing the upload.
+
+        Returns:
+            PriceListUploadResult: items created and updated, errors by row
 
         Raises:
             exceptions.BadRequest: If excel file is invalid
         """
-        if self.excel_file:
-            file_handler = file_utils.FileUtils()
-            excel_file_schema = file_handler.read_excel_file(self.excel_file)
-            excel_file_content = excel_file_schema.body
-            excel_file_headers = excel_file_schema.headers
-
-            caseless_headers = [header.lower() for header in excel_file_headers]
-            caseless_self_headers = [header.lower() for header in self.OUTPUT_HEADERS]
-
-            if set(caseless_headers).difference(set(caseless_self_headers)):
-                raise exceptions.BadRequest(
-                    "Invalid excel file headers. Expected: {}".format(
-                        self.INPUT_HEADERS
-                    )
-                )
-            try:
-                self.price_list_items = [
-                    self.__parse_price_list_item_in(price_list_item)
-                    for price_list_item in excel_file_content
-                ]
-            except ValueError as e:
-                raise exceptions.BadRequest(str(e))
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            failed_bill_item_codes = executor.map(
-                self.__create_update_data, self.price_list_items
+        rows = self.__read_rows()
+        if rows.empty:
+            return PriceListUploadResult()
+        if "bill_item_code" not in rows or "selling_price" not in rows:
+            raise exceptions.BadRequest(
+                "bill_item_code and selling_price columns are required"
             )
-            return failed_bill_item_codes
+        errors = self.__validate(rows)
+        if rows.empty:
+            return PriceListUploadResult(errors=errors)
+        with transaction.atomic(using=router.db_for_write(models.PriceListItem)):
+            created = self.__upsert(rows)
+            price_index.bump_version([self.price_list.id])
+        return PriceListUploadResult(
+            created=created, updated=len(rows) - created, errors=errors
+        )
+
+    def iter_price_list_items(self, module: str = None) -> Iterator[dict]:
+        """Gets the price list items for a spreadsheet, with the description
+        of their billable items, in a single query read in chunks
 
-    def download(self, module: str = None) -> io.BytesIO:
-        """Creates an excel file for download"""
-        price_list_items = models.PriceListItem.objects.filter(
-            price_list=self.price_list
+        Args:
+            module [str]: module of the items, all modules by default
+
+        Returns:
+            Iterator[dict]: price list item records, in the upload columns
+        """
+        descriptions = models.BillableItem.objects.filter(
+            item_code=OuterRef("bill_item_code")
+        ).values("description")
+        price_list_items = (
+            models.PriceListItem.objects.filter(price_list=self.price_list)
+            .annotate(description=Subquery(descriptions[:1]))
+            .order_by("bill_item_code")
+            .values(
+                "bill_item_code",
+                "description",
+                "selling_price",
+                "co_pay__value",
+                "co_pay__type",
+                "is_auth_req",
+                "is_capitated",
+                "module",
+                "is_exclusive",
+                "post_auth_allowed",
+            )
         )
         if module:
             price_list_items = price_list_items.filter(module=module)
-
-        price_list_items_out = [
-            self.__parse_price_list_item_out(price_list_item)
-            for price_list_item in price_list_items
-        ]
-        file_handler = file_utils.FileUtils()
-        return file_handler.write_excel_file(price_list_items_out)
+        for item in file_utils.iter_serialized_records(
+            price_list_items, report_structure=False
+        ):
+            yield {
+                "bill_item_code": item["bill_item_code"],
+                "description": item["description"],
+                "selling_price": item["selling_price"],
+                "co_pay_value": item["co_pay__value"],
+                "co_pay_type": item["co_pay__type"],
+                "auth_required": item["is_auth_req"],
+                "capitated": item["is_capitated"],
+                "module": item["module"],
+                "excluded": item["is_exclusive"],
+                "post_auth_allowed": item["post_auth_allowed"],
+            }
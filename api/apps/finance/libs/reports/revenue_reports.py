@@ -1,5 +1,5 @@
 from collections import OrderedDict
-from typing import Optional, TypedDict
+from typing import Optional, TypedDict, Union
 from decimal import Decimal
 from datetime import datetime
 
@@ -7,6 +7,7 @@ from django.db.models import Sum, Count, F
 from django.db.models.query import QuerySet
 
 from api.apps.finance.models.bills import Bill
+from api.apps.finance.models.revenue import DailyRevenue
 from api.includes import utils
 
 
@@ -26,23 +27,39 @@ class ReportDetailStruct(TypedDict):
 
 
 class RevenueSummaryReportGenerator:
-    def __init__(self, bills: QuerySet[Bill], is_invoiced: bool):
+    """Revenue of each module, summed in one query from the daily revenue
+    rollups, or from the bills when they are filtered on what is not rolled up
+    """
+
+    def __init__(self, bills: QuerySet[Union[DailyRevenue, Bill]], is_invoiced: bool):
         self.modules = [module.value for module in utils.Modules]
         self.bills = bills
         self.is_invoiced = is_invoiced
 
-    def _compute_report_data(self, module: str) -> ReportSummaryStruct:
-        bills = self.bills.filter(is_invoiced=self.is_invoiced, bill_source=module)
-        data = ReportSummaryStruct(
-            module=module,
-            total_amount=bills.aggregate(Sum("selling_price"))["selling_price__sum"]
-            or 0,
-            count=bills.count(),
-        )
-        return data
+    def _module_totals(self) -> dict:
+        revenue = self.bills.filter(is_invoiced=self.is_invoiced)
+        if revenue.model is DailyRevenue:
+            revenue = revenue.values("module").annotate(
+                total_amount=Sum("selling_total"), count=Sum("count")
+            )
+        else:
+            revenue = revenue.values(module=F("bill_source")).annotate(
+                total_amount=Sum("selling_price"), count=Count("id")
+            )
+        return {totals["module"]: totals for totals in revenue.order_by()}
 
     def _compute_report(self) -> list:
-        response_data = [self._compute_report_data(module) for module in self.modules]
+        totals = self._module_totals()
+        response_data = []
+        for module in self.modules:
+            module_totals = totals.get(module, {})
+            response_data.append(
+                ReportSummaryStruct(
+                    module=module,
+                    total_amount=module_totals.get("total_amount") or 0,
+                    count=module_totals.get("count") or 0,
+                )
+            )
         return response_data
 
     def to_response_struct(self):
@@ -72,3 +89,8 @@ class RevenueDetailReportGenerator:
 
     def to_report_struct(self):
         return utils.to_report_structure(list(self.bills))
+
+    def iter_report_struct(self, chunk_size: int = 1000):
+        """Yields report records without loading the whole result"""
+        for bill in self.bills.iterator(chunk_size=chunk_size):
+            yield from utils.to_report_structure([bill])
@@ -1,12 +1,15 @@
 import io
 import datetime as mod_datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.db.models import Q, Sum
 from django.utils import timezone
 from pydantic import BaseModel
-from typing import List
 
-from api.includes import file_utils, mail_utils, utils
+from api.includes import file_utils, json_keys, mail_utils, utils
 from .report_gen_abstraction import ReportGenAbstract
-from api.apps.finance.models import Bill, InvoiceStatus, Payment
+from api.apps.finance.models import Bill, InvoiceStatus, Payment, PaymentMethod
 from config import preferences
 
 
@@ -42,27 +45,56 @@ class PaymentReportStruct(BaseModel):
     month_date_amount: float
 
 
-class SummaryReportGenerator(ReportGenAbstract):
-    """Generates Summary Report for finance"""
-
-    def __init__(self):
-        pass
-
-    def get_date_payment_summary(
-        self,
-        payment_method_name,
-        min_date: mod_datetime.datetime,
-        max_date: mod_datetime.datetime,
-    ) -> PaymentReportStruct:
-        """ """
-        min_date = min_date.replace(tzinfo=mod_datetime.timezone.utc)
-        max_date = max_date.replace(tzinfo=mod_datetime.timezone.utc)
-
-        payments = Payment.objects.filter(
-            payment_method__name=payment_method_name,
-            created_at__range=[min_date, max_date],
+class SummaryPeriods(BaseModel):
+    """Periods a summary report covers: the day, the week and the month to
+    date, from their local midnight"""
+
+    end: mod_datetime.datetime
+    day_start: mod_datetime.datetime
+    week_start: mod_datetime.datetime
+    month_start: mod_datetime.datetime
+
+    @classmethod
+    def ending(cls, end: mod_datetime.datetime = None) -> "SummaryPeriods":
+        end = end or timezone.now()
+        day_start = timezone.localtime(end).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        return cls(
+            end=end,
+            day_start=day_start,
+            week_start=day_start - mod_datetime.timedelta(days=day_start.weekday()),
+            month_start=day_start.replace(day=1),
         )
-        return sum(payment.total_amount for payment in payments)
+
+    @property
+    def start(self) -> mod_datetime.datetime:
+        return min(self.day_start, self.week_start, self.month_start)
+
+    def conditions(self, field: str) -> Dict[str, Q]:
+        """Conditions of a date field falling in each period, by period"""
+        return {
+            "date": Q(**{f"{field}__gte": self.day_start}),
+            "week_date": Q(**{f"{field}__gte": self.week_start}),
+            "month_date": Q(**{f"{field}__gte": self.month_start}),
+        }
+
+
+class SummaryReportGenerator(ReportGenAbstract):
+    """Generates Summary Report for finance
+
+    Each fact table is summed in one query over the three periods, with an
+    aggregate filtered on each period, grouped by module for bills and by
+    payment method for payments.
+    """
+
+    def __init__(self, end: mod_datetime.datetime = None):
+        """
+        Args:
+            end [datetime]: end of the periods reported, now by default
+        """
+        self.periods = SummaryPeriods.ending(end)
+        self._modules_report: Optional[Dict[str, PeriodReportStruct]] = None
 
     def get_payment_methods_summary(self) -> List[PaymentReportStruct]:
         """Gets all payment methods used and gets
@@ -70,118 +102,90 @@ class SummaryReportGenerator(ReportGenAbstract):
 
         PaymentMethod   Deposit     Insurance
         """
-        payment_methods = list(
-            Payment.objects.distinct("payment_method__name").values_list(
-                "payment_method__name", flat=True
+        aggregates = {
+            f"{period}_amount": Sum("total_amount", filter=condition)
+            for period, condition in self.periods.conditions("created_at").items()
+        }
+        totals = {
+            row.pop("method"): row
+            for row in Payment.objects.filter(
+                created_at__range=[self.periods.start, self.periods.end]
             )
-        )
-        end_date = timezone.now()
-        daily_start_date = end_date - mod_datetime.timedelta(days=1)
-        week_start_date = (
-            end_date
-            if end_date.weekday() == 0
-            else end_date - mod_datetime.timedelta(days=end_date.weekday())
-        )
-        month_start_date = (
-            end_date
-            if end_date.day == 1
-            else end_date - mod_datetime.timedelta(days=(end_date.day - 1))
-        )
-
-        report_objects: List[PaymentReportStruct] = []
-        for method in payment_methods:
-            report = PaymentReportStruct(
+            .values(method=json_keys.key_text("payment_method", "name"))
+            .annotate(**aggregates)
+            .order_by()
+        }
+        # methods not paid with in the month are reported with no amount
+        for method in PaymentMethod.objects.values_list("name", flat=True):
+            totals.setdefault(method, {})
+        return [
+            PaymentReportStruct(
                 payment_method=method or "None",
-                date_amount=self.get_date_payment_summary(
-                    method, daily_start_date, end_date
-                ),
-                week_date_amount=self.get_date_payment_summary(
-                    method, week_start_date, end_date
-                ),
-                month_date_amount=self.get_date_payment_summary(
-                    method, month_start_date, end_date
-                ),
+                **{name: amounts.get(name) or 0 for name in aggregates},
+            )
+            for method, amounts in sorted(
+                totals.items(), key=lambda item: item[0] or ""
             )
-            report_objects.append(report)
-        return report_objects
+        ]
 
-    def get_summarised_report(
-        self,
-        module: utils.Modules,
-        min_date: mod_datetime.datetime,
-        max_date: mod_datetime.datetime,
-    ) -> SummaryReportStruct:
-        """Generates summarised financial report for a duration of time in a module
-
-        Args:
-            module [lib.Modules]: module to get financial reports
-            min_date [datetime]: lower boundary of datetime
-            max_date [datetime]: higher boundary of datetime
+    def get_modules_summary(self) -> Dict[str, PeriodReportStruct]:
+        """Quantities and amounts billed on confirmed invoices per module and
+        period, for all modules
 
         Returns:
-            SummaryReportStruct: object of SummaryReportStruct
+            Dict[str, PeriodReportStruct]: reports by module
         """
-        min_date = min_date.replace(tzinfo=mod_datetime.timezone.utc)
-        max_date = max_date.replace(tzinfo=mod_datetime.timezone.utc)
-
-        bills = (
-            Bill.objects.filter(bill_source=module)
-            .filter(is_invoiced=True)
-            .filter(invoice__confirmed_at__range=[min_date, max_date])
+        if self._modules_report is not None:
+            return self._modules_report
+        conditions = self.periods.conditions("invoice__confirmed_at")
+        aggregates = {}
+        for period, condition in conditions.items():
+            aggregates[f"{period}_qty"] = Sum("quantity", filter=condition)
+            aggregates[f"{period}_amount"] = Sum("selling_price", filter=condition)
+        totals = {
+            row.pop("bill_source"): row
+            for row in Bill.objects.filter(
+                is_invoiced=True,
+                invoice__confirmed_at__range=[self.periods.start, self.periods.end],
+            )
             .exclude(invoice__status=str(InvoiceStatus.DRAFT))
-        )
-        total_quantity = sum(bill.quantity for bill in bills)
-        total_amount = sum(bill.selling_price for bill in bills)
-        return SummaryReportStruct(qty=total_quantity, amount=total_amount)
+            .values("bill_source")
+            .annotate(**aggregates)
+            .order_by()
+        }
+        self._modules_report = {}
+        for module in utils.Modules.module_values():
+            row = totals.get(module, {})
+            self._modules_report[module] = PeriodReportStruct(
+                **{
+                    field: SummaryReportStruct(
+                        qty=row.get(f"{period}_qty") or 0,
+                        amount=row.get(f"{period}_amount") or Decimal(0),
+                    )
+                    for field, period in (
+                        ("present", "date"),
+                        ("week_date", "week_date"),
+                        ("month_date", "month_date"),
+                    )
+                }
+            )
+        return self._modules_report
 
     def gen_daily_report(self, module: utils.Modules):
-        today_date = timezone.now()
-        return self.get_summarised_report(
-            module,
-            min_date=today_date,
-            max_date=today_date - mod_datetime.timedelta(days=1),
-        )
+        return self.get_modules_summary()[str(module)].present
 
     def gen_week_date_report(self, module: utils.Modules):
-        end_date = timezone.now()
-        start_date = (
-            end_date
-            if end_date.weekday() == 0
-            else end_date - mod_datetime.timedelta(days=end_date.weekday())
-        )
-        return self.get_summarised_report(
-            module=module, min_date=start_date, max_date=end_date
-        )
+        return self.get_modules_summary()[str(module)].week_date
 
     def gen_month_date_report(self, module: utils.Modules):
-        end_date = timezone.now()
-        start_date = (
-            end_date
-            if end_date.day == 1
-            else end_date - mod_datetime.timedelta(days=(end_date.day - 1))
-        )
-
-        return self.get_summarised_report(
-            module=module, min_date=start_date, max_date=end_date
-        )
+        return self.get_modules_summary()[str(module)].month_date
 
     def generate_modules_report(self) -> List[ReportStruct]:
         """Generates summary report"""
-        modules = utils.Modules.module_values()
-        reports = []
-        for module in modules:
-            present_report = self.gen_daily_report(module)
-            week_report = self.gen_week_date_report(module)
-            month_report = self.gen_month_date_report(module)
-
-            period_report = PeriodReportStruct(
-                present=present_report, week_date=week_report, month_date=month_report
-            )
-
-            module_report = ReportStruct(module=module, report=period_report)
-            reports.append(module_report)
-
-        return reports
+        return [
+            ReportStruct(module=module, report=report)
+            for module, report in self.get_modules_summary().items()
+        ]
 
     def generate_excel_report(self) -> io.BytesIO:
         """Generate excel report of sunnary records"""
@@ -209,11 +213,9 @@ class SummaryReportGenerator(ReportGenAbstract):
         return excel_bytes
 
     def mail_excel_report(self):
-        """Sends Admin mail"""
+        """Queues Admin mail"""
         admin_mail = preferences.AppPreferences().admin_mail
-        print(admin_mail)
         file_object = self.generate_excel_report()
-        print(file_object)
         email_utils = mail_utils.EmailUtil(
             subject="Summary Financial Report",
             body="The financial report has been attached to this mail",
@@ -221,6 +223,5 @@ class SummaryReportGenerator(ReportGenAbstract):
             attachment=file_object,
             file_name="Financial Summary Report.xlsx",
         )
-        email_utils.send_mail()
-        print("mail sent")
+        email_utils.queue_mail()
         return None
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from api.apps.finance import models
+
+# the rollup of bills, as the triggers of migration 0022_daily_revenue
+# compute it from their changes
+ROLLUP_BILLS = """
+INSERT INTO finance_dailyrevenue (
+    day, module, billed_to_type, billed_to_id, is_invoiced, count, quantity,
+    selling_total, cost_total, cleared_total, uncleared_total
+)
+SELECT
+    (serviced_rendered_at AT TIME ZONE %(time_zone)s)::date AS day,
+    bill_source,
+    billed_to_type,
+    billed_to_id,
+    is_invoiced,
+    COUNT(*),
+    SUM(quantity),
+    SUM(selling_price),
+    SUM(cost_price),
+    SUM(CASE WHEN cleared_status = 'CLEARED' THEN selling_price ELSE 0 END),
+    SUM(CASE WHEN cleared_status = 'UNCLEARED' THEN selling_price ELSE 0 END)
+FROM finance_bill
+GROUP BY 1, 2, 3, 4, 5
+"""
+
+
+def rebuild_daily_revenue(alias: str = DEFAULT_DB_ALIAS) -> int:
+    """Rolls up the revenue of all bills again, replacing the rollups kept
+    by the triggers on the bill table. Bills cannot be written while it runs.
+
+    Args:
+        alias [str]: database whose rollups are rebuilt
+
+    Returns:
+        int: number of rollup rows written
+    """
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cursor:
+            # writes to bills wait, so no change is lost or counted twice
+            cursor.execute("LOCK TABLE finance_bill IN SHARE MODE")
+            models.DailyRevenue.objects.using(alias).all().delete()
+            cursor.execute(ROLLUP_BILLS, {"time_zone": settings.TIME_ZONE})
+            return cursor.rowcount
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from api.apps.finance.libs import invoice as invoice_lib
+from api.apps.finance.models import Invoice
+
+
+class Command(BaseCommand):
+    help = (
+        "move the json bill and payment lines of invoices to the invoice line"
+        " tables, run once after migrating"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="invoices converted per transaction",
+        )
+
+    def handle(self, *args, **options):
+        invoices = (
+            Invoice.objects.exclude(legacy_bill_lines=[], legacy_payment_lines=[])
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        converted, last_id = 0, 0
+        while True:
+            invoice_ids = list(invoices.filter(id__gt=last_id)[: options["batch_size"]])
+            if not invoice_ids:
+                break
+            converted += invoice_lib.convert_legacy_lines(invoice_ids)
+            last_id = invoice_ids[-1]
+            self.stdout.write(f"converted invoices up to id {last_id}")
+        self.stdout.write(self.style.SUCCESS(f"{converted} invoices converted"))
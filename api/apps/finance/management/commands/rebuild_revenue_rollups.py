@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.apps.finance.libs import revenue_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        "roll up the daily revenue of all bills again, bills cannot be written"
+        " while it runs"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database", default="default", choices=["default", "sandbox"]
+        )
+
+    def handle(self, *args, **options):
+        rollups = revenue_rollup.rebuild_daily_revenue(options["database"])
+        self.stdout.write(self.style.SUCCESS(f"{rollups} daily revenue rows rebuilt"))
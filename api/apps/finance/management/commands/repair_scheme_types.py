@@ -1,7 +1,12 @@
 from django.core.management.base import BaseCommand
 from typing import List
 
-from api.apps.finance.models import PayerScheme, PayerSchemeType, Bill, Invoice
+from api.apps.finance.models import (
+    PayerScheme,
+    PayerSchemeType,
+    Bill,
+    InvoiceBillLine,
+)
 from api.includes import utils
 
 
@@ -21,16 +26,13 @@ class Command(BaseCommand):
         print("bills scheme fixed")
 
     def __fix_bill_invoice_bills(self):
-        invoices = Invoice.objects.all()
-        for invoice in invoices:
-            bill_lines: List[dict] = invoice.bill_lines
-            for bill in bill_lines:
-                if bill.get("billed_to_type") == "SELF":
-                    bill["billed_to_type"] = PayerSchemeType.SELF_PREPAID
-            invoice.bill_lines = bill_lines
-            invoice.save()
-        else:
-            print("invoices bills fixed")
+        bill_lines: List[InvoiceBillLine] = list(
+            InvoiceBillLine.objects.filter(data__billed_to_type="SELF")
+        )
+        for bill_line in bill_lines:
+            bill_line.data["billed_to_type"] = PayerSchemeType.SELF_PREPAID
+        InvoiceBillLine.objects.bulk_update(bill_lines, ["data"], batch_size=1000)
+        print("invoices bills fixed")
 
     def handle(self, *args, **options):
         self.__fix_scheme_type()
@@ -0,0 +1,52 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:04
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.fields.json
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('finance', '0015_rename_is_service_renderded_patientbillpackageusage_is_service_rendered'),
+    ]
+
+    # bills, invoices and payments looked up by patient id or uhid, and
+    # payments by method and cashier
+    operations = [
+        AddIndexConcurrently(
+            model_name='bill',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('id', 'patient'), name='bill_patient_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='bill',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.fields.json.KeyTextTransform('uhid', 'patient')), name='bill_patient_uhid_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='invoice',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('id', 'patient'), name='invoice_patient_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('id', 'patient'), name='payment_patient_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.fields.json.KeyTextTransform('uhid', 'patient')), name='payment_patient_uhid_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('id', 'payment_method'), name='payment_method_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('name', 'payment_method'), django.db.models.expressions.F('created_at'), name='payment_method_name_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('id', 'created_by'), name='payment_created_by_id_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:08
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('finance', '0016_json_key_indexes'),
+    ]
+
+    # keyset pagination of bills on (transaction_date, id) and of payments
+    # on (created_at, id)
+    operations = [
+        AddIndexConcurrently(
+            model_name='bill',
+            index=models.Index(fields=['transaction_date', 'id'], name='bill_keyset_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['created_at', 'id'], name='payment_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0017_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricelist',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
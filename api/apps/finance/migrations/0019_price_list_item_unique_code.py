@@ -0,0 +1,57 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:25
+
+from django.db import migrations
+
+# the oldest item of a code is the one bills were priced from
+DELETE_DUPLICATE_ITEMS = """
+DELETE FROM finance_pricelistitem duplicate
+USING finance_pricelistitem original
+WHERE duplicate.price_list_id = original.price_list_id
+    AND duplicate.bill_item_code = original.bill_item_code
+    AND duplicate.id > original.id
+"""
+
+# a concurrent build that fails, on a duplicate inserted while it runs or on
+# an interruption, leaves an invalid index behind. It is dropped first, so a
+# failed migration is retried by running it again.
+DROP_INVALID_UNIQUE_CODE = """
+DROP INDEX CONCURRENTLY IF EXISTS pricelistitem_unique_code
+"""
+CREATE_UNIQUE_CODE = """
+CREATE UNIQUE INDEX CONCURRENTLY pricelistitem_unique_code
+ON finance_pricelistitem (price_list_id, bill_item_code)
+"""
+ADD_UNIQUE_CODE = """
+ALTER TABLE finance_pricelistitem
+ADD CONSTRAINT pricelistitem_unique_code UNIQUE USING INDEX pricelistitem_unique_code
+"""
+DROP_UNIQUE_CODE = """
+ALTER TABLE finance_pricelistitem DROP CONSTRAINT pricelistitem_unique_code
+"""
+
+
+class Migration(migrations.Migration):
+    # the unique index is built concurrently, then becomes the constraint, so
+    # price list items stay writable while it is built
+    atomic = False
+
+    dependencies = [
+        ('finance', '0018_price_list_version'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DELETE_DUPLICATE_ITEMS, migrations.RunSQL.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(DROP_INVALID_UNIQUE_CODE, migrations.RunSQL.noop),
+                migrations.RunSQL(CREATE_UNIQUE_CODE, migrations.RunSQL.noop),
+                migrations.RunSQL(ADD_UNIQUE_CODE, DROP_UNIQUE_CODE),
+            ],
+            state_operations=[
+                migrations.AlterUniqueTogether(
+                    name='pricelistitem',
+                    unique_together={('price_list', 'bill_item_code')},
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0019_price_list_item_unique_code'),
+    ]
+
+    operations = [
+        # the json lines are moved to the line tables by convert_invoice_lines
+        migrations.RenameField(
+            model_name='invoice',
+            old_name='bill_lines',
+            new_name='legacy_bill_lines',
+        ),
+        migrations.RenameField(
+            model_name='invoice',
+            old_name='payment_lines',
+            new_name='legacy_payment_lines',
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='legacy_bill_lines',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='legacy_payment_lines',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='lines_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='reserved_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='InvoicePayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('data', models.JSONField(default=dict)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='finance.invoice')),
+                ('payment', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='finance.payment')),
+            ],
+            options={
+                'verbose_name_plural': 'Invoice Payments',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.CreateModel(
+            name='InvoiceBillLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_id', models.UUIDField(default=uuid.uuid4)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('bill_item_code', models.CharField(blank=True, max_length=256, null=True)),
+                ('selling_price', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('quantity', models.IntegerField(default=1)),
+                ('is_reserved', models.BooleanField(default=False)),
+                ('data', models.JSONField(default=dict)),
+                ('bill', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='finance.bill')),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='finance.invoice')),
+            ],
+            options={
+                'verbose_name_plural': 'Invoice Bill Lines',
+                'ordering': ('position', 'id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='invoicebillline',
+            index=models.Index(fields=['invoice', 'position'], name='invoiceline_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicebillline',
+            index=models.Index(fields=['invoice', 'line_id'], name='invoiceline_line_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicebillline',
+            index=models.Index(fields=['invoice', 'bill'], name='invoiceline_bill_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicebillline',
+            index=models.Index(fields=['invoice', 'bill_item_code'], name='invoiceline_item_code_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:52
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('finance', '0020_invoice_lines'),
+    ]
+
+    # the summary report sums the invoices confirmed in a period
+    operations = [
+        AddIndexConcurrently(
+            model_name='invoice',
+            index=models.Index(fields=['confirmed_at'], name='invoice_confirmed_at_idx'),
+        ),
+    ]
@@ -0,0 +1,167 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:44
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+import django.db.models.functions.comparison
+
+# signed revenue of the bills in a transition table of a bill statement
+BILL_CHANGES = """
+SELECT
+    (serviced_rendered_at AT TIME ZONE '{time_zone}')::date AS day,
+    bill_source AS module,
+    billed_to_type,
+    billed_to_id,
+    is_invoiced,
+    {sign} AS count,
+    {sign} * quantity AS quantity,
+    {sign} * selling_price AS selling_total,
+    {sign} * cost_price AS cost_total,
+    CASE WHEN cleared_status = 'CLEARED' THEN {sign} * selling_price ELSE 0 END
+        AS cleared_total,
+    CASE WHEN cleared_status = 'UNCLEARED' THEN {sign} * selling_price ELSE 0 END
+        AS uncleared_total
+FROM {bills}
+"""
+
+# adds the changes of a statement to the rollups in one upsert, in key order
+# so concurrent statements lock the rollups they share in the same order
+APPLY_CHANGES = """
+CREATE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO finance_dailyrevenue AS rollup (
+        day, module, billed_to_type, billed_to_id, is_invoiced, count, quantity,
+        selling_total, cost_total, cleared_total, uncleared_total
+    )
+    SELECT
+        day, module, billed_to_type, billed_to_id, is_invoiced,
+        SUM(count), SUM(quantity), SUM(selling_total), SUM(cost_total),
+        SUM(cleared_total), SUM(uncleared_total)
+    FROM ({changes}) changes
+    GROUP BY day, module, billed_to_type, billed_to_id, is_invoiced
+    HAVING SUM(count) <> 0
+        OR SUM(quantity) <> 0
+        OR SUM(selling_total) <> 0
+        OR SUM(cost_total) <> 0
+        OR SUM(cleared_total) <> 0
+        OR SUM(uncleared_total) <> 0
+    ORDER BY day, module, billed_to_type, billed_to_id, is_invoiced
+    ON CONFLICT (
+        (COALESCE(day, '0001-01-01'::date)),
+        module,
+        billed_to_type,
+        (COALESCE(billed_to_id, 0)),
+        is_invoiced
+    )
+    DO UPDATE SET
+        count = rollup.count + EXCLUDED.count,
+        quantity = rollup.quantity + EXCLUDED.quantity,
+        selling_total = rollup.selling_total + EXCLUDED.selling_total,
+        cost_total = rollup.cost_total + EXCLUDED.cost_total,
+        cleared_total = rollup.cleared_total + EXCLUDED.cleared_total,
+        uncleared_total = rollup.uncleared_total + EXCLUDED.uncleared_total;
+    RETURN NULL;
+END
+$$;
+"""
+
+
+def changes(bills, sign):
+    return BILL_CHANGES.format(time_zone=settings.TIME_ZONE, bills=bills, sign=sign)
+
+
+CREATE_TRIGGERS = [
+    APPLY_CHANGES.format(
+        name="finance_bill_revenue_insert", changes=changes("new_bills", 1)
+    ),
+    APPLY_CHANGES.format(
+        name="finance_bill_revenue_update",
+        changes=changes("new_bills", 1) + "UNION ALL" + changes("old_bills", -1),
+    ),
+    APPLY_CHANGES.format(
+        name="finance_bill_revenue_delete", changes=changes("old_bills", -1)
+    ),
+    """
+    CREATE TRIGGER bill_revenue_insert AFTER INSERT ON finance_bill
+    REFERENCING NEW TABLE AS new_bills
+    FOR EACH STATEMENT EXECUTE FUNCTION finance_bill_revenue_insert()
+    """,
+    """
+    CREATE TRIGGER bill_revenue_update AFTER UPDATE ON finance_bill
+    REFERENCING OLD TABLE AS old_bills NEW TABLE AS new_bills
+    FOR EACH STATEMENT EXECUTE FUNCTION finance_bill_revenue_update()
+    """,
+    """
+    CREATE TRIGGER bill_revenue_delete AFTER DELETE ON finance_bill
+    REFERENCING OLD TABLE AS old_bills
+    FOR EACH STATEMENT EXECUTE FUNCTION finance_bill_revenue_delete()
+    """,
+]
+DROP_TRIGGERS = [
+    "DROP TRIGGER bill_revenue_insert ON finance_bill",
+    "DROP TRIGGER bill_revenue_update ON finance_bill",
+    "DROP TRIGGER bill_revenue_delete ON finance_bill",
+    "DROP FUNCTION finance_bill_revenue_insert()",
+    "DROP FUNCTION finance_bill_revenue_update()",
+    "DROP FUNCTION finance_bill_revenue_delete()",
+]
+
+# bills written from now on are rolled up by the triggers, the existing ones
+# are rolled up while their writes wait
+ROLLUP_BILLS = [
+    "LOCK TABLE finance_bill IN SHARE MODE",
+    """
+    INSERT INTO finance_dailyrevenue (
+        day, module, billed_to_type, billed_to_id, is_invoiced, count, quantity,
+        selling_total, cost_total, cleared_total, uncleared_total
+    )
+    SELECT
+        day, module, billed_to_type, billed_to_id, is_invoiced,
+        SUM(count), SUM(quantity), SUM(selling_total), SUM(cost_total),
+        SUM(cleared_total), SUM(uncleared_total)
+    FROM ({changes}) changes
+    GROUP BY day, module, billed_to_type, billed_to_id, is_invoiced
+    """.format(changes=changes("finance_bill", 1)),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0021_invoice_confirmed_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(blank=True, null=True)),
+                ('module', models.CharField(choices=[('ENCOUNTERS', 'Encounter'), ('IMAGING', 'Imaging'), ('LABORATORY', 'Laboratory'), ('INVENTORY', 'Inventory'), ('PHARMACY', 'Pharmacy'), ('NURSING', 'Nursing'), ('FINANCE', 'Finance'), ('MESSAGING', 'Messaging')], max_length=256)),
+                ('billed_to_type', models.CharField(choices=[('SELF_PREPAID', 'SELF (PREPAID)'), ('SELF_POSTPAID', 'SELF (POSTPAID)'), ('INSURANCE', 'INSURANCE'), ('CORPORATE', 'CORPORATE')], max_length=256)),
+                ('is_invoiced', models.BooleanField(default=False)),
+                ('count', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('selling_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cost_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cleared_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('uncleared_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('billed_to', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='finance.payerscheme')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Revenue',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dailyrevenue',
+            index=models.Index(fields=['day', 'module'], name='dailyrevenue_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrevenue',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('day', django.db.models.expressions.Value(datetime.date(1, 1, 1))), django.db.models.expressions.F('module'), django.db.models.expressions.F('billed_to_type'), django.db.models.functions.comparison.Coalesce('billed_to', django.db.models.expressions.Value(0)), django.db.models.expressions.F('is_invoiced'), name='dailyrevenue_key'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        migrations.RunSQL(ROLLUP_BILLS, migrations.RunSQL.noop),
+    ]
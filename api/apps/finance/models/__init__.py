@@ -4,3 +4,4 @@ from .invoice import *
 from .packages import *
 from .payer import *
 from .payment import *
+from .revenue import *
@@ -1,10 +1,20 @@
 from enum import Enum
 from django.db import models
 
-from api.includes import utils, models as generic_models
+from api.includes import utils, sequences, models as generic_models
 from config.preferences import AppPreferences
 
 
+BILLABLE_ITEM_SEQUENCE = sequences.PeriodSequence(
+    name="finance_billableitem",
+    model="finance.BillableItem",
+    field="item_code",
+    prefix="",
+    period_format=utils.SEC_ID_PERIOD_FORMAT,
+    prefixes=utils.Modules.module_values,
+)
+
+
 class BillableItem(models.Model):
     item_code = models.CharField(max_length=256, unique=True, editable=False)
     description = models.CharField(max_length=256, blank=True, null=True)
@@ -29,12 +39,7 @@ class BillableItem(models.Model):
     def save(self, *args, **kwargs):
         if self.id is None:
             module_prefix = str(utils.Modules.get_module(self.module).value)
-            self.item_code = utils.generate_sec_id(
-                prefix=module_prefix,
-                table_name="finance_billableitem",
-                model=BillableItem,
-                search_field="item_code",
-            )
+            self.item_code = BILLABLE_ITEM_SEQUENCE.next_id(prefix=module_prefix)
         super(BillableItem, self).save(*args, **kwargs)
 
     def update_module_bill_details(
@@ -58,6 +63,9 @@ class PriceList(models.Model):
     updated_by = models.JSONField(default=dict)
     updated_at = models.DateTimeField(auto_now=True)
     meta = models.JSONField(default=dict)
+    # bumped on every change of the price list or its items, see
+    # api.apps.finance.libs.price_index
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name_plural = "Price Lists"
@@ -65,6 +73,14 @@ class PriceList(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        updated = self.id is not None
+        if updated:
+            self.version = models.F("version") + 1
+        super(PriceList, self).save(*args, **kwargs)
+        if updated:
+            self.refresh_from_db(fields=["version"])
+
 
 class PriceListItem(models.Model):
     bill_item_code = models.CharField(max_length=256, null=False, blank=False)
@@ -85,6 +101,7 @@ class PriceListItem(models.Model):
 
     class Meta:
         verbose_name_plural = "Price List Items"
+        unique_together = ("price_list", "bill_item_code")
 
     def __str__(self):
         return self.bill_item_code
@@ -1,11 +1,11 @@
 from enum import Enum
 from typing import Union
 
-from django.db import models
+from django.db import models, transaction
 from pydantic import BaseModel
 
-from api.includes import utils, exceptions
-from api.apps.patient.models import Patient
+from api.includes import utils, exceptions, json_keys
+from api.apps.patient.models import BalanceEntryType, PatientBalanceEntry
 from .payer import PayerScheme, PayerSchemeType
 
 ######################## Enums And Schemas ########################
@@ -83,6 +83,11 @@ class Bill(models.Model):
 
     class Meta:
         verbose_name_plural = "Bills"
+        indexes = [
+            json_keys.key_index("patient", "id", "bill_patient_id_idx"),
+            json_keys.key_index("patient", "uhid", "bill_patient_uhid_idx", upper=True),
+            models.Index(fields=["transaction_date", "id"], name="bill_keyset_idx"),
+        ]
         permissions = (
             ("authorize_bills", "Can authorize insurance bills"),
             ("transfer_bill", "Can transfer bill to different schemes"),
@@ -113,8 +118,6 @@ class Bill(models.Model):
 
     def unreserve(self) -> "Bill":
         """unreserve bill"""
-        patient: Patient = Patient.objects.get(id=self.patient.get("id"))
-
         if not self.is_reserved:
             raise exceptions.BadRequest("Cannot unreserve bill that is not reserved")
         if self.is_invoiced:
@@ -131,17 +134,20 @@ class Bill(models.Model):
                 "Cannot unreserve bills that are not billed to self"
             )
 
-        patient.pay_from_reserve(self.selling_price)
-        patient.add_deposit(self.selling_price)
-        self.is_reserved = False
-        self.cleared_status = str(BillStatus.UNCLEARED)
-        self.save()
+        with transaction.atomic():
+            PatientBalanceEntry.record(
+                self.patient.get("id"),
+                BalanceEntryType.UNRESERVE,
+                deposit_change=self.selling_price,
+                reserve_change=-self.selling_price,
+            )
+            self.is_reserved = False
+            self.cleared_status = str(BillStatus.UNCLEARED)
+            self.save()
         return self
 
     def reserve(self) -> "Bill":
         """reserve bill"""
-        patient: Patient = Patient.objects.get(id=self.patient.get("id"))
-
         if self.is_reserved:
             raise exceptions.BadRequest("Cannot reserve bill that is already reserved")
         if self.is_invoiced:
@@ -157,12 +163,20 @@ class Bill(models.Model):
             raise exceptions.BadRequest(
                 "Cannot reserve bills that are not billed to self"
             )
-        if patient.deposit < self.selling_price:
-            raise exceptions.BadRequest("Not enough deposit to reserve bill")
-
-        # set fields
-        self.is_reserved = True
-        self.cleared_status = str(BillStatus.CLEARED)
-        patient.send_to_reserve(self.selling_price)
-        self.save()
+
+        with transaction.atomic():
+            try:
+                PatientBalanceEntry.record(
+                    self.patient.get("id"),
+                    BalanceEntryType.RESERVE,
+                    deposit_change=-self.selling_price,
+                    reserve_change=self.selling_price,
+                )
+            except exceptions.BadRequest:
+                raise exceptions.BadRequest("Not enough deposit to reserve bill")
+
+            # set fields
+            self.is_reserved = True
+            self.cleared_status = str(BillStatus.CLEARED)
+            self.save()
         return self
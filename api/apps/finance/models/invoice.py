@@ -1,13 +1,25 @@
-import re
+import uuid
+from decimal import Decimal
 from enum import Enum
-from functools import reduce
-from datetime import datetime
+from typing import List
+
 from django.db import models
 
+from api.includes import json_keys, sequences
 from .payer import PayerScheme, PayerSchemeType
 from config import preferences
 
 
+INVOICE_ID_SEQUENCE = sequences.PeriodSequence(
+    name="finance_invoice",
+    model="finance.Invoice",
+    field="inv_id",
+    prefix=lambda: preferences.AppPreferences().invoice_id_prefix_code,
+    period_format="%Y%m",
+    order_by="confirmed_at",
+)
+
+
 class InvoiceStatus(str, Enum):
     DRAFT = "DRAFT"
     OPEN = "OPEN"
@@ -43,8 +55,13 @@ class Invoice(models.Model):
         choices=EncounterInvoiceType.choices(), max_length=256, null=True, blank=True
     )
     patient = models.JSONField(default=dict)
-    bill_lines = models.JSONField(default=list)
-    payment_lines = models.JSONField(default=list)
+    # lines of invoices created before the line tables, moved to the tables
+    # by the convert_invoice_lines command
+    legacy_bill_lines = models.JSONField(default=list, blank=True)
+    legacy_payment_lines = models.JSONField(default=list, blank=True)
+    # running totals of the bill lines, kept by atomic updates as lines change
+    lines_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    reserved_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_charge = models.DecimalField(max_digits=10, decimal_places=2)
     paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     balance = models.DecimalField(max_digits=10, decimal_places=2)
@@ -69,6 +86,10 @@ class Invoice(models.Model):
 
     class Meta:
         verbose_name_plural = "Invoices"
+        indexes = [
+            json_keys.key_index("patient", "id", "invoice_patient_id_idx"),
+            models.Index(fields=["confirmed_at"], name="invoice_confirmed_at_idx"),
+        ]
         permissions = (
             ("add_bill", "Can add bill"),
             ("remove_bill", "Can remove bill"),
@@ -81,6 +102,41 @@ class Invoice(models.Model):
     def __str__(self):
         return str(self.id)
 
+    @property
+    def bill_lines(self) -> List[dict]:
+        """Snapshots of the bills on the invoice, in order"""
+        # invoices not converted yet by convert_invoice_lines have no line rows
+        if self.legacy_bill_lines:
+            return self.legacy_bill_lines
+        if "lines" in getattr(self, "_prefetched_objects_cache", {}):
+            return [line.to_line() for line in self.lines.all()]
+        # invoices are read with thousands of lines, skip building the models
+        return [
+            InvoiceBillLine.as_line(data, line_id)
+            for data, line_id in self.lines.values_list("data", "line_id")
+        ]
+
+    @property
+    def payment_lines(self) -> List[dict]:
+        """Snapshots of the payments made to the invoice, in order"""
+        if self.legacy_payment_lines:
+            return self.legacy_payment_lines
+        return [payment.data for payment in self.payments.all()]
+
+    @property
+    def reserved_amount(self) -> Decimal:
+        """Charge of the reserved bills on the invoice"""
+        if self.legacy_bill_lines:
+            return sum(
+                (
+                    Decimal(str(line.get("selling_price") or 0))
+                    for line in self.legacy_bill_lines
+                    if line.get("is_reserved")
+                ),
+                Decimal(0),
+            )
+        return self.reserved_total
+
     def set_invoice_id(self):
         """
         Generates a unique invoice item
@@ -94,27 +150,123 @@ class Invoice(models.Model):
 
         if str(self.status).casefold() == InvoiceStatus.DRAFT.casefold():
             self.inv_id = None
-            self.save()
+            self.save(update_fields=["inv_id"])
             return None
 
-        PREFIX = preferences.AppPreferences().invoice_id_prefix_code
-        CURRENT_YEAR = str(datetime.utcnow().year)
-        CURRENT_MONTH = str(datetime.utcnow().month).zfill(2)
-        pattern_string = f"{CURRENT_YEAR}{CURRENT_MONTH}"
-        re_pattern = re.compile(f"{pattern_string}(.*)")
-        serial_no = 1
-        invoices = (
-            Invoice.objects.filter(inv_id__isnull=False)
-            .exclude(status=str(InvoiceStatus.DRAFT))
-            .filter(inv_id__contains=pattern_string)
-        )
-        if invoices.count() > 0:
-            latest_invoice = reduce(
-                lambda x, y: x if x.confirmed_at > y.confirmed_at else y, invoices
-            )
-            serial_no = int(re_pattern.findall(latest_invoice.inv_id)[-1]) + 1
-
-        unique_id = f"{PREFIX}{CURRENT_YEAR}{CURRENT_MONTH}{serial_no}"
-        self.inv_id = unique_id
-        self.save()
+        self.inv_id = INVOICE_ID_SEQUENCE.next_id()
+        self.save(update_fields=["inv_id"])
         return self.inv_id
+
+
+class InvoiceBillLine(models.Model):
+    """Bill on an invoice, kept as the snapshot of the bill when invoiced
+    along with the columns lines are looked up and totalled by"""
+
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name="lines")
+    # _id of the line in the api
+    line_id = models.UUIDField(default=uuid.uuid4)
+    position = models.PositiveIntegerField(default=0)
+    # lines added by editing an invoice are not bills
+    bill = models.ForeignKey(
+        "Bill",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    bill_item_code = models.CharField(max_length=256, null=True, blank=True)
+    selling_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    quantity = models.IntegerField(default=1)
+    is_reserved = models.BooleanField(default=False)
+    data = models.JSONField(default=dict)
+
+    class Meta:
+        verbose_name_plural = "Invoice Bill Lines"
+        ordering = ("position", "id")
+        indexes = [
+            models.Index(
+                fields=["invoice", "position"], name="invoiceline_position_idx"
+            ),
+            models.Index(fields=["invoice", "line_id"], name="invoiceline_line_id_idx"),
+            models.Index(fields=["invoice", "bill"], name="invoiceline_bill_idx"),
+            models.Index(
+                fields=["invoice", "bill_item_code"], name="invoiceline_item_code_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return str(self.line_id)
+
+    @classmethod
+    def from_line(cls, line: dict, position: int = 0) -> "InvoiceBillLine":
+        """Creates an unsaved line from a bill line snapshot"""
+        try:
+            line_id = uuid.UUID(str(line["_id"]))
+        except (KeyError, ValueError):
+            line_id = uuid.uuid4()
+        bill_line = cls(line_id=line_id, position=position)
+        bill_line.set_data(line)
+        return bill_line
+
+    @property
+    def charge(self) -> Decimal:
+        return self.selling_price * self.quantity
+
+    @property
+    def reserved_charge(self) -> Decimal:
+        return self.selling_price if self.is_reserved else Decimal(0)
+
+    def set_data(self, line: dict):
+        """Sets the snapshot of the line and the columns read from it"""
+        self.data = {key: value for key, value in line.items() if key != "_id"}
+        self.bill_id = line.get("id")
+        self.bill_item_code = line.get("bill_item_code")
+        self.selling_price = Decimal(str(line.get("selling_price") or 0))
+        quantity = line.get("quantity")
+        self.quantity = 1 if quantity is None else int(quantity)
+        self.is_reserved = bool(line.get("is_reserved"))
+
+    @staticmethod
+    def as_line(data: dict, line_id: uuid.UUID) -> dict:
+        """Snapshot of a line as returned by the api"""
+        return {**data, "_id": str(line_id)}
+
+    def to_line(self) -> dict:
+        return self.as_line(self.data, self.line_id)
+
+
+class InvoicePayment(models.Model):
+    """Payment made to an invoice, kept as the snapshot of the payment"""
+
+    invoice = models.ForeignKey(
+        Invoice, on_delete=models.CASCADE, related_name="payments"
+    )
+    payment = models.ForeignKey(
+        "Payment",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    data = models.JSONField(default=dict)
+
+    class Meta:
+        verbose_name_plural = "Invoice Payments"
+        ordering = ("id",)
+
+    def __str__(self):
+        return str(self.id)
+
+    @classmethod
+    def from_line(cls, payment_line: dict) -> "InvoicePayment":
+        """Creates an unsaved invoice payment from a payment snapshot"""
+        return cls(
+            payment_id=payment_line.get("id"),
+            amount=Decimal(str(payment_line.get("total_amount") or 0)),
+            data=payment_line,
+        )
@@ -8,12 +8,21 @@ from django.utils import timezone
 from django.core.validators import MinValueValidator
 from pydantic import BaseModel, root_validator, Field
 
-from api.includes import utils, models as generic_models, exceptions
+from api.includes import utils, sequences, models as generic_models, exceptions
 from config.preferences import AppPreferences
 from .billable_items import BillableItem
 from .bills import Bill
 
 
+BILL_PACKAGE_SEQUENCE = sequences.PeriodSequence(
+    name="finance_billpackage",
+    model="finance.BillPackage",
+    field="package_code",
+    prefix=lambda: AppPreferences().bill_package_id_prefix_code,
+    period_format=utils.SEC_ID_PERIOD_FORMAT,
+)
+
+
 class BillPackageItemDict(TypedDict):
     billable_item: dict
     quantity: int
@@ -65,12 +74,7 @@ class BillPackage(generic_models.DateHistoryTracker, generic_models.UserHistoryT
     def save(self, *args, **kwargs):
         self._validate_billable_items()
         if self.id is None:
-            self.package_code = utils.generate_sec_id(
-                prefix=AppPreferences().bill_package_id_prefix_code,
-                table_name="finance_billpackage",
-                model=BillPackage,
-                search_field="package_code",
-            )
+            self.package_code = BILL_PACKAGE_SEQUENCE.next_id()
         super(BillPackage, self).save(*args, **kwargs)
 
     def get_billable_item(self, billable_item: int) -> Optional[dict]:
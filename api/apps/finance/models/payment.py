@@ -1,19 +1,26 @@
-import re
 from enum import Enum
-from functools import reduce
 from typing import List, Optional
 
 from django.db import models
-from django.utils import timezone
 from django.contrib.auth.models import User
 from pydantic import BaseModel
 
 from config import preferences
-from api.includes import exceptions, utils
+from api.includes import exceptions, json_keys, sequences, utils
 
 ################## SCHEMAS ##########################
 
 
+CASHBOOK_ID_SEQUENCE = sequences.PeriodSequence(
+    name="finance_cashbook",
+    model="finance.CashBook",
+    field="csb_id",
+    prefix=lambda: preferences.AppPreferences().cashbook_id_prefix_code,
+    period_format="%Y%m",
+    order_by="created_at",
+)
+
+
 class PaymentType(str, Enum):
     DEPOSIT = "DEPOSIT"
     INVOICE = "INVOICE"
@@ -94,6 +101,20 @@ class Payment(models.Model):
 
     class Meta:
         verbose_name_plural = "Payments"
+        indexes = [
+            json_keys.key_index("patient", "id", "payment_patient_id_idx"),
+            json_keys.key_index(
+                "patient", "uhid", "payment_patient_uhid_idx", upper=True
+            ),
+            json_keys.key_index("payment_method", "id", "payment_method_id_idx"),
+            models.Index(
+                json_keys.key_text("payment_method", "name"),
+                "created_at",
+                name="payment_method_name_idx",
+            ),
+            json_keys.key_index("created_by", "id", "payment_created_by_id_idx"),
+            models.Index(fields=["created_at", "id"], name="payment_keyset_idx"),
+        ]
         permissions = (("accept_payment", "Can accept payments"),)
 
     def __str__(self):
@@ -125,8 +146,8 @@ class CashBook(models.Model):
         return self.csb_id
 
     def save(self, *args, **kwargs):
-        if not self.id:
-            self.csb_id
+        if not self.id and not self.csb_id:
+            self.csb_id = CASHBOOK_ID_SEQUENCE.next_id()
         super(CashBook, self).save(*args, **kwargs)
 
     @classmethod
@@ -164,23 +185,6 @@ class CashBook(models.Model):
         if self.csb_id:
             return self.csb_id
 
-        PREFIX = preferences.AppPreferences().cashbook_id_prefix_code
-        CURRENT_YEAR = str(timezone.now().year)
-        CURRENT_MONTH = str(timezone.now().month).zfill(2)
-        pattern_string = f"{CURRENT_YEAR}{CURRENT_MONTH}"
-        re_pattern = re.compile(f"{pattern_string}(.*)")
-        serial_no = 1
-        cashbooks = CashBook.objects.filter(csb_id__isnull=False).filter(
-            csb_id__contains=pattern_string
-        )
-        if cashbooks.count() > 0:
-            latest_cashbook = reduce(
-                lambda csb1, csb2: csb1 if csb1.created_at > csb2.created_at else csb2,
-                cashbooks,
-            )
-            serial_no = int(re_pattern.findall(latest_cashbook.csb_id)[-1]) + 1
-
-        unique_id = f"{PREFIX}{CURRENT_YEAR}{CURRENT_MONTH}{serial_no}"
-        self.csb_id = unique_id
+        self.csb_id = CASHBOOK_ID_SEQUENCE.next_id()
         self.save()
         return self.csb_id
@@ -0,0 +1,59 @@
+import datetime
+
+from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+
+from api.includes import utils
+
+from .payer import PayerScheme, PayerSchemeType
+
+###################### SCHEMA ###########################
+
+
+class DailyRevenue(models.Model):
+    """Rollup of the bills whose service was rendered on a day, by module,
+    payer scheme and invoicing. Rows are kept up to date by triggers on the
+    bill table, which apply every insert, update and delete of bills
+    (including bulk writes) as deltas, see migration 0022_daily_revenue.
+    Bills not yet rendered are rolled up on a null day.
+    """
+
+    day = models.DateField(null=True, blank=True)
+    module = models.CharField(max_length=256, choices=utils.Modules.choices())
+    billed_to_type = models.CharField(max_length=256, choices=PayerSchemeType.choices())
+    billed_to = models.ForeignKey(
+        PayerScheme,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        blank=True,
+        null=True,
+        related_name="+",
+    )
+    is_invoiced = models.BooleanField(default=False)
+    count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    selling_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cleared_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    uncleared_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.module}"
+
+    class Meta:
+        verbose_name_plural = "Daily Revenue"
+        constraints = [
+            # the key the triggers upsert on, null days and payers included
+            models.UniqueConstraint(
+                Coalesce("day", Value(datetime.date.min)),
+                F("module"),
+                F("billed_to_type"),
+                Coalesce("billed_to", Value(0)),
+                F("is_invoiced"),
+                name="dailyrevenue_key",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["day", "module"], name="dailyrevenue_day_idx"),
+        ]
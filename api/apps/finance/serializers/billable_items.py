@@ -133,7 +133,7 @@ class SinglePriceListDetailSerializer(serializers.Serializer):
     selling_price = serializers.DecimalField(
         required=True, max_digits=10, decimal_places=2
     )
-    co_pay = serializers.CharField(required=False)
+    co_pay = CoPaySerializer(required=False)
     is_auth_req = serializers.BooleanField(required=False, default=False)
     is_capitated = serializers.BooleanField(required=False, default=False)
     module = serializers.ChoiceField(required=True, choices=utils.Modules.choices())
@@ -9,6 +9,15 @@ from api.apps.finance.libs import invoice as invoice_lib
 from api.apps.patient import models as patient_models
 from api.includes import utils
 
+# the api returns the lines of an invoice from the line tables, in place of
+# the columns they are moved from and totalled in
+INVOICE_LINE_COLUMNS = (
+    "legacy_bill_lines",
+    "legacy_payment_lines",
+    "lines_total",
+    "reserved_total",
+)
+
 
 class InvoiceSerializer(serializers.ModelSerializer):
     bills = serializers.PrimaryKeyRelatedField(
@@ -21,10 +30,12 @@ class InvoiceSerializer(serializers.ModelSerializer):
     patient = serializers.PrimaryKeyRelatedField(
         queryset=patient_models.Patient.objects.all(), required=True
     )
+    bill_lines = serializers.JSONField(read_only=True)
+    payment_lines = serializers.JSONField(read_only=True)
 
     class Meta:
         model = models.Invoice
-        fields = "__all__"
+        exclude = INVOICE_LINE_COLUMNS
         read_only_fields = (
             "inv_id",
             "invoice_lines",
@@ -96,21 +107,16 @@ class InvoiceSerializer(serializers.ModelSerializer):
 
 class InvoiceResponseSerializer(serializers.ModelSerializer):
     reserved_amount = serializers.SerializerMethodField(read_only=True)
+    bill_lines = serializers.JSONField(read_only=True)
+    payment_lines = serializers.JSONField(read_only=True)
 
     class Meta:
         model = models.Invoice
-        fields = "__all__"
+        exclude = INVOICE_LINE_COLUMNS
         depth = 1
 
     def get_reserved_amount(self, obj: models.Invoice):
-        reserved_bills_amount = sum(
-            [
-                float(bill["selling_price"])
-                for bill in obj.bill_lines
-                if bill.get("is_reserved")
-            ]
-        )
-        return reserved_bills_amount
+        return float(obj.reserved_amount)
 
 
 class InvoiceBillsSerializer(serializers.Serializer):
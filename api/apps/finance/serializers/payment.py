@@ -167,12 +167,9 @@ class BillsPaymentSerializer(serializers.Serializer):
             total_viable_amount = float(total_payments_amount) - float(
                 total_deposit_amount
             )
-            bills_data = [
-                generic_utils.model_to_dict(
-                    instance=bill, exclude_fields={"invoice", "patient"}
-                )
-                for bill in bills
-            ]
+            bills_data = generic_utils.models_to_dicts(
+                bills, exclude_fields={"invoice", "patient"}
+            )
             patient_dict = generic_utils.model_to_dict(patient)
             user = self.context["request"].user
             user_data = generic_utils.trim_user_data(generic_utils.model_to_dict(user))
@@ -1,2 +1,3 @@
 from .bill_item import create_modify_bill_item, delete_bill_item
 from .bills import validate_bill_services, create_bill, bill_nursing_services
+from .price_lists import bump_price_list_version, drop_prices
@@ -3,7 +3,7 @@ from django.dispatch import receiver
 from django.utils import timezone
 
 from api.apps.patient.models import Patient
-from api.includes import exceptions, utils
+from api.includes import exceptions, json_keys, utils
 from config import preferences
 from api.apps.finance.models import (
     BillableItem,
@@ -107,8 +107,9 @@ def create_bill(sender, instance, created, **kwargs):
                 # get all invoice for a patient, in draft, and of the billed_to
                 if not bill.is_invoiced:
                     patient = Patient.objects.get(id=bill.patient.get("id"))
-                    invoices = Invoice.objects.filter(
-                        patient__id=bill.patient.get("id"),
+                    invoices = json_keys.filter_key(
+                        Invoice.objects.all(), "patient", "id", bill.patient.get("id")
+                    ).filter(
                         status=str(InvoiceStatus.DRAFT),
                         scheme_type=bill.billed_to_type,
                     )
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.apps.finance.libs import price_index
+from api.apps.finance.models import PriceList, PriceListItem
+
+
+@receiver(post_save, sender=PriceListItem)
+@receiver(post_delete, sender=PriceListItem)
+def bump_price_list_version(sender, instance, using, **kwargs):
+    """Reloads the prices of the price list of the item in every process"""
+    price_index.bump_version([instance.price_list_id], using)
+
+
+@receiver(post_delete, sender=PriceList)
+def drop_prices(sender, instance, using, **kwargs):
+    """Drops the prices of the price list from this process"""
+    price_index.price_index.invalidate([instance.pk], using)
@@ -1,3 +1,669 @@
+import io
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.apps.finance import models as finance_models
+from api.apps.finance import serializers as finance_serializers
+from api.apps.finance import views as finance_views
+from api.apps.finance.libs import billable_item, billing, price_index, price_list
+from api.apps.finance.libs import invoice as invoice_lib
+from api.apps.finance.libs.reports import summary_report
+from api.apps.laboratory import models as lab_models
+from api.apps.patient import models as patient_models
+from api.apps.patient.libs import balance_ledger
+from api.includes import exceptions, file_utils, utils
+
+
+class BatchBillingTest(TestCase):
+    def setUp(self) -> None:
+        price_index.price_index.invalidate()
+        self.bill_items = [
+            finance_models.BillableItem.objects.create(
+                description=f"Service {index}",
+                selling_price=Decimal(100),
+                module=utils.Modules.NURSING.value,
+            )
+            for index in range(6)
+        ]
+        price_list = finance_models.PriceList.objects.create(name="Tariff")
+        finance_models.PriceListItem.objects.create(
+            price_list=price_list,
+            bill_item_code=self.bill_items[0].item_code,
+            selling_price=Decimal(40),
+            module=utils.Modules.NURSING.value,
+        )
+        self.scheme = finance_models.PayerScheme.objects.create(
+            name="Insurer Scheme",
+            price_list=price_list,
+            payer=finance_models.Payer.objects.create(name="Insurer"),
+            type=finance_models.PayerSchemeType.INSURANCE.value,
+        )
+        self.patient = patient_models.Patient.objects.create(
+            firstname="Ngozi",
+            lastname="Okafor",
+            gender="Female",
+            payment_scheme=[{"payer_scheme": {"id": self.scheme.id}}],
+        )
+        self.patient.add_deposit(Decimal(250))
+
+    def create_bills(self, bill_items: list, billed_to=None) -> list:
+        return billing.Billing.create_bills(
+            module=utils.Modules.NURSING.value,
+            patient=utils.model_to_dict(self.patient),
+            billable_items_qty=[{1: bill_item} for bill_item in bill_items],
+            billed_to=billed_to,
+        )
+
+    def test_bills_are_priced_and_reserved_in_batch(self):
+        responses = self.create_bills(self.bill_items[:4])
+        bills = [response.bill for response in responses]
+        self.assertTrue(all(bill.pk for bill in bills))
+        self.assertEqual(self.scheme, bills[0].billed_to)
+        self.assertEqual(Decimal(40), bills[0].selling_price)
+        self.assertEqual(
+            [False, True, True, False], [bill.is_reserved for bill in bills]
+        )
+        self.patient.refresh_from_db()
+        self.assertEqual(Decimal(50), self.patient.deposit)
+        self.assertEqual(Decimal(200), self.patient.reserve)
+        self.assertEqual([], balance_ledger.reconcile_balances())
+
+    def test_prices_are_indexed_until_the_price_list_changes(self):
+        def price_list_item_queries(context):
+            return [
+                query
+                for query in context.captured_queries
+                if 'FROM "finance_pricelistitem"' in query["sql"]
+            ]
+
+        self.create_bills(self.bill_items[:1])
+        with CaptureQueriesContext(connection) as indexed:
+            response = self.create_bills(self.bill_items[:1])[0]
+        self.assertEqual([], price_list_item_queries(indexed))
+        self.assertEqual(Decimal(40), response.bill.selling_price)
+
+        price_list_item = finance_models.PriceListItem.objects.get()
+        price_list_item.selling_price = Decimal(45)
+        price_list_item.save()
+        with CaptureQueriesContext(connection) as reloaded:
+            response = self.create_bills(self.bill_items[:1])[0]
+        self.assertEqual(1, len(price_list_item_queries(reloaded)))
+        self.assertEqual(Decimal(45), response.bill.selling_price)
+
+    def test_query_count_does_not_grow_with_items(self):
+        self.create_bills(self.bill_items[:1])
+        with CaptureQueriesContext(connection) as few:
+            self.create_bills(self.bill_items[:2])
+        with CaptureQueriesContext(connection) as many:
+            self.create_bills(self.bill_items)
+        self.assertEqual(len(few), len(many))
+
+    def test_package_usages_are_inserted_in_bulk(self):
+        package_items, other_items = self.bill_items[4:], self.bill_items[:4]
+        # created as if its bill had been paid, without billing it
+        finance_models.PatientBillPackageSubscription.objects.bulk_create(
+            [
+                finance_models.PatientBillPackageSubscription(
+                    patient={"id": self.patient.id},
+                    bill_package={
+                        "id": 1,
+                        "billable_items": [
+                            {"billable_item": {"id": bill_item.id}, "quantity": 2}
+                            for bill_item in package_items
+                        ],
+                    },
+                    expiration_date=timezone.now() + timedelta(days=30),
+                )
+            ]
+        )
+        self.create_bills(other_items[:1])
+        with CaptureQueriesContext(connection) as context:
+            responses = self.create_bills(package_items * 3 + other_items[:1])
+        self.assertEqual(
+            [True] * 4 + [False] * 3,
+            [bool(response.bill_package_usage) for response in responses],
+        )
+        self.assertEqual(
+            sorted(bill_item.id for bill_item in package_items * 2),
+            sorted(
+                usage.billable_item["id"]
+                for usage in finance_models.PatientBillPackageUsage.objects.all()
+            ),
+        )
+        inserts = [
+            query
+            for query in context.captured_queries
+            if query["sql"].startswith('INSERT INTO "finance_patientbillpackageusage"')
+        ]
+        self.assertEqual(1, len(inserts))
+
+    def test_billed_to_scheme_must_price_every_item(self):
+        with self.assertRaises(exceptions.BadRequest):
+            self.create_bills(self.bill_items[:2], billed_to=self.scheme)
+        self.assertFalse(finance_models.Bill.objects.exists())
+        response = self.create_bills(self.bill_items[:1], billed_to=self.scheme)[0]
+        self.assertEqual(self.scheme, response.bill.billed_to)
+
+    def test_service_orders_are_billed_or_rejected_together(self):
+        def order(bill_item_code: str) -> lab_models.LabPanelOrder:
+            panel_order = lab_models.LabPanelOrder(
+                patient=utils.model_to_dict(self.patient)
+            )
+            panel_order._bill_item_code, panel_order._quantity = bill_item_code, 1
+            panel_order._name = f"Panel {bill_item_code}"
+            return panel_order
+
+        finance_models.PriceListItem.objects.create(
+            price_list=self.scheme.price_list,
+            bill_item_code=self.bill_items[1].item_code,
+            selling_price=Decimal(60),
+            module=utils.Modules.NURSING.value,
+        )
+        orders = [order(bill_item.item_code) for bill_item in self.bill_items[:2]]
+        billing.Billing.bill_service_orders(
+            orders, utils.Modules.LABORATORY.value, self.scheme
+        )
+        self.assertEqual(
+            [f"Panel {bill_item.item_code}" for bill_item in self.bill_items[:2]],
+            [
+                finance_models.Bill.objects.get(id=panel_order.bill).description
+                for panel_order in orders
+            ],
+        )
+
+        with self.assertRaises(exceptions.NotFoundException):
+            billing.Billing.bill_service_orders(
+                orders + [order("missing")], utils.Modules.LABORATORY.value
+            )
+        self.assertEqual(2, finance_models.Bill.objects.count())
+
+
+class InvoiceLinesTest(TestCase):
+    def setUp(self) -> None:
+        self.patient = patient_models.Patient.objects.create(
+            firstname="Ngozi", lastname="Okafor", gender="Female"
+        )
+        self.user = User.objects.create(username="cashier", is_superuser=True)
+        self.user_data = utils.trim_user_data(utils.model_to_dict(self.user))
+
+    def bill(self, code: str, price: int, **fields) -> finance_models.Bill:
+        return finance_models.Bill.objects.create(
+            bill_item_code=code,
+            description=code,
+            cost_price=0,
+            selling_price=Decimal(price),
+            co_pay=0,
+            cleared_status=finance_models.BillStatus.UNCLEARED.value,
+            bill_source=utils.Modules.NURSING.value,
+            billed_to_type=finance_models.PayerSchemeType.SELF_PREPAID.value,
+            patient=utils.model_to_dict(self.patient),
+            **fields,
+        )
+
+    def invoice_lib(self, invoice=None) -> invoice_lib.Invoice:
+        return invoice_lib.Invoice(
+            patient=self.patient, user_data=self.user_data, invoice=invoice
+        )
+
+    def test_bills_are_added_and_removed_with_running_totals(self):
+        reserved = self.bill("B", 50, is_reserved=True)
+        invoice = self.invoice_lib().create_invoice([self.bill("A", 100), reserved])
+        self.assertEqual(Decimal(150), invoice.lines_total)
+        self.assertEqual(Decimal(50), invoice.reserved_total)
+
+        lib = self.invoice_lib(invoice)
+        lib.add_bills([self.bill("A", 100, quantity=2), self.bill("C", 30)])
+        self.assertEqual(
+            [("A", 3), ("B", 1), ("C", 1)],
+            [(line["bill_item_code"], line["quantity"]) for line in invoice.bill_lines],
+        )
+        self.assertEqual(Decimal(380), invoice.lines_total)
+
+        lib.remove_bills([reserved])
+        self.assertEqual(Decimal(330), invoice.lines_total)
+        self.assertEqual(Decimal(0), invoice.reserved_total)
+        data = finance_serializers.InvoiceResponseSerializer(invoice).data
+        self.assertEqual(invoice.bill_lines, data["bill_lines"])
+        self.assertEqual(0, data["reserved_amount"])
+        self.assertNotIn("lines_total", data)
+
+    def test_edited_bills_replace_the_lines_in_order(self):
+        invoice = self.invoice_lib().create_invoice(
+            [self.bill("A", 100), self.bill("B", 50)]
+        )
+        kept = invoice.bill_lines[1]
+        added_id = str(uuid.uuid4())
+        self.invoice_lib(invoice).edit_bills(
+            [
+                {**kept, "selling_price": "60.00", "quantity": 2},
+                {
+                    "_id": added_id,
+                    "description": "Dressing",
+                    "selling_price": "20.00",
+                    "quantity": 1,
+                },
+            ],
+            self.user,
+        )
+        bill_lines = invoice.bill_lines
+        self.assertEqual([kept["_id"], added_id], [line["_id"] for line in bill_lines])
+        self.assertEqual(kept["id"], bill_lines[0]["id"])
+        self.assertTrue(bill_lines[1]["is_service_rendered"])
+        self.assertEqual(Decimal(140), invoice.lines_total)
+
+    def test_payments_settle_the_running_balance(self):
+        bill = self.bill("A", 100)
+        lib = self.invoice_lib(self.invoice_lib().create_invoice([bill]))
+        lib.confirm_invoice()
+        self.assertEqual(Decimal(100), lib.invoice.balance)
+
+        def pay(amount: int):
+            return lib.add_payments(
+                [
+                    finance_models.PaymentMethodStruct(
+                        payment_method={"name": "cash"}, amount=amount
+                    )
+                ]
+            )
+
+        invoice = pay(40)
+        self.assertEqual(Decimal(40), invoice.paid_amount)
+        self.assertEqual(Decimal(60), invoice.balance)
+        self.assertEqual(finance_models.InvoiceStatus.PARTIALLY_PAID, invoice.status)
+        invoice = pay(60)
+        self.assertEqual(finance_models.InvoiceStatus.PAID, invoice.status)
+        self.assertEqual(
+            ["40.00", "60.00"],
+            [payment["total_amount"] for payment in invoice.payment_lines],
+        )
+        bill.refresh_from_db()
+        self.assertEqual(finance_models.BillStatus.CLEARED, bill.cleared_status)
+
+    def test_legacy_lines_are_converted(self):
+        bill_line = invoice_lib.to_bill_lines([self.bill("A", 100, quantity=2)])[0]
+        invoice = finance_models.Invoice.objects.create(
+            patient=utils.model_to_dict(self.patient),
+            legacy_bill_lines=[{**bill_line, "patient": {"id": self.patient.id}}],
+            legacy_payment_lines=[{"id": 7, "total_amount": "10.00", "audit_log": []}],
+            total_charge=0,
+            balance=0,
+        )
+        call_command("convert_invoice_lines", stdout=io.StringIO())
+        invoice.refresh_from_db()
+        self.assertEqual([], invoice.legacy_bill_lines)
+        self.assertEqual([bill_line], invoice.bill_lines)
+        self.assertEqual([{"id": 7, "total_amount": "10.00"}], invoice.payment_lines)
+        self.assertEqual(Decimal(200), invoice.lines_total)
+        self.assertEqual(0, invoice_lib.convert_legacy_lines([invoice.id]))
+
+    def test_unconverted_invoices_are_returned_from_the_legacy_lines(self):
+        bill_lines = invoice_lib.to_bill_lines(
+            [self.bill("A", 100), self.bill("B", 50, is_reserved=True)]
+        )
+        payment_line = {"id": 7, "total_amount": "10.00", "audit_log": []}
+        invoice = finance_models.Invoice.objects.create(
+            patient=utils.model_to_dict(self.patient),
+            legacy_bill_lines=bill_lines,
+            legacy_payment_lines=[payment_line],
+            total_charge=0,
+            balance=0,
+        )
+        data = finance_serializers.InvoiceResponseSerializer(invoice).data
+        self.assertEqual(bill_lines, data["bill_lines"])
+        self.assertEqual([payment_line], data["payment_lines"])
+        self.assertEqual(50, data["reserved_amount"])
+        self.assertNotIn("legacy_bill_lines", data)
+
+
+class PriceListUploadTest(TestCase):
+    def setUp(self) -> None:
+        self.bill_items = [
+            finance_models.BillableItem.objects.create(
+                description=f"Service {index}",
+                selling_price=Decimal(100),
+                module=utils.Modules.NURSING.value,
+            )
+            for index in range(3)
+        ]
+        self.price_list = finance_models.PriceList.objects.create(name="Tariff")
+        finance_models.PriceListItem.objects.create(
+            price_list=self.price_list,
+            bill_item_code=self.bill_items[0].item_code,
+            selling_price=Decimal(10),
+        )
+
+    def row(self, bill_item_code: str, selling_price, **columns) -> dict:
+        row = {
+            "bill_item_code": bill_item_code,
+            "description": "",
+            "selling_price": selling_price,
+            "co_pay_value": 0,
+            "co_pay_type": "amount",
+            "module": "",
+            "auth_required": False,
+            "capitated": False,
+            "excluded": False,
+            "post_auth_allowed": False,
+        }
+        row.update(columns)
+        return row
+
+    def upload(self, rows: list) -> price_list.PriceListUploadResult:
+        excel_file = file_utils.FileUtils().write_excel_file(rows)
+        return price_list.PriceListLib(
+            self.price_list, {"id": 1}, excel_file=excel_file
+        ).upload()
+
+    def test_valid_rows_are_upserted_and_invalid_rows_reported(self):
+        codes = [bill_item.item_code for bill_item in self.bill_items]
+        version = self.price_list.version
+        result = self.upload(
+            [
+                self.row(codes[0], 20, co_pay_value=10, co_pay_type="Percentage"),
+                self.row(codes[1], 30, auth_required="yes"),
+                self.row("UNKNOWN", 40),
+                self.row(codes[2], "free"),
+                self.row(codes[1], 35),
+            ]
+        )
+        self.assertEqual((1, 1), (result.created, result.updated))
+        self.assertEqual(
+            [
+                (3, codes[1], ["Bill item code is repeated on a later row"]),
+                (4, "UNKNOWN", ["Billable item does not exist"]),
+                (5, codes[2], ["Selling price must be a number"]),
+            ],
+            [(e.row, e.code, e.errors) for e in result.errors],
+        )
+        items = {
+            item.bill_item_code: item
+            for item in finance_models.PriceListItem.objects.filter(
+                price_list=self.price_list
+            )
+        }
+        self.assertEqual(2, len(items))
+        self.assertEqual(Decimal(20), items[codes[0]].selling_price)
+        self.assertEqual({"value": 10.0, "type": "PERCENTAGE"}, items[codes[0]].co_pay)
+        self.assertEqual(Decimal(35), items[codes[1]].selling_price)
+        self.assertEqual(utils.Modules.NURSING.value, items[codes[1]].module)
+        self.assertFalse(items[codes[1]].is_auth_req)
+        self.price_list.refresh_from_db()
+        self.assertGreater(self.price_list.version, version)
+
+    def test_downloaded_price_list_uploads_back(self):
+        lib = price_list.PriceListLib(self.price_list, {"id": 1})
+        with CaptureQueriesContext(connection) as queries:
+            records = list(lib.iter_price_list_items())
+        self.assertEqual(1, len(queries))
+        self.assertEqual(
+            [(self.bill_items[0].item_code, "Service 0", Decimal(10))],
+            [
+                (row["bill_item_code"], row["description"], row["selling_price"])
+                for row in records
+            ],
+        )
+        excel_file = b"".join(file_utils.FileUtils().stream_excel_file(records))
+        result = price_list.PriceListLib(
+            self.price_list, {"id": 1}, excel_file=io.BytesIO(excel_file)
+        ).upload()
+        self.assertEqual((0, 1, []), (result.created, result.updated, result.errors))
+        self.assertEqual({}, finance_models.PriceListItem.objects.get().co_pay)
+
+    def test_items_are_upserted(self):
+        result = price_list.PriceListLib(
+            self.price_list,
+            {"id": 1},
+            price_list_items=[
+                {
+                    "bill_item_code": self.bill_items[0].item_code,
+                    "selling_price": Decimal(15),
+                    "co_pay": {"value": 5.0, "type": "AMOUNT"},
+                    "is_auth_req": True,
+                    "module": utils.Modules.NURSING.value,
+                }
+            ],
+        ).upload()
+        self.assertEqual((0, 1, []), (result.created, result.updated, result.errors))
+        item = finance_models.PriceListItem.objects.get(price_list=self.price_list)
+        self.assertEqual(Decimal(15), item.selling_price)
+        self.assertEqual({"value": 5.0, "type": "AMOUNT"}, item.co_pay)
+        self.assertTrue(item.is_auth_req)
+
+
+class BillableItemUploadTest(TestCase):
+    def setUp(self) -> None:
+        self.bill_items = [
+            finance_models.BillableItem.objects.create(
+                description=f"Service {index}",
+                cost=Decimal(5),
+                selling_price=Decimal(100),
+                module=utils.Modules.NURSING.value,
+            )
+            for index in range(2)
+        ]
+        self.lib = billable_item.BillableItemLib({"id": 1})
+
+    def upload(self, rows: list) -> billable_item.BillableItemUploadResult:
+        excel_file = file_utils.FileUtils().write_excel_file(rows)
+        return self.lib.upload_billable_items_excel(excel_file)
+
+    def test_sheet_is_diffed_and_imported_in_bulk(self):
+        codes = [bill_item.item_code for bill_item in self.bill_items]
+
+        def row(item_code, description, selling_price, module="", cost=5):
+            return {
+                "item_code": item_code,
+                "description": description,
+                "cost": cost,
+                "selling_price": selling_price,
+                "module": module,
+            }
+
+        result = self.upload(
+            [
+                row(codes[0], "Service 0", 120),
+                row(codes[1], "Service 1", 100),
+                row("", "Dressing", 50, module="nursing", cost=None),
+                row("", "Injection", 30, module="Nursing"),
+                row("UNKNOWN", "Service", 10),
+                row("", "Massage", 40),
+            ]
+        )
+        self.assertEqual((2, 1, 1), (result.inserted, result.updated, result.unchanged))
+        self.assertEqual(
+            [
+                (6, "UNKNOWN", ["Billable item does not exist"]),
+                (7, None, ["A valid module is required"]),
+            ],
+            [(e.row, e.code, e.errors) for e in result.errors],
+        )
+        self.bill_items[0].refresh_from_db()
+        self.assertEqual(Decimal(120), self.bill_items[0].selling_price)
+        new_items = finance_models.BillableItem.objects.exclude(item_code__in=codes)
+        self.assertEqual(
+            [
+                ("Dressing", Decimal(0), Decimal(50)),
+                ("Injection", Decimal(5), Decimal(30)),
+            ],
+            sorted(new_items.values_list("description", "cost", "selling_price")),
+        )
+        self.assertEqual(2, len({item.item_code for item in new_items}))
+
+        records = list(self.lib.iter_billable_items())
+        result = self.upload(records)
+        self.assertEqual(
+            (0, 0, 4, []),
+            (result.inserted, result.updated, result.unchanged, result.errors),
+        )
+
+
+class SummaryReportTest(TestCase):
+    def setUp(self) -> None:
+        # a wednesday, the week started on the 12th
+        self.end = timezone.make_aware(datetime(2026, 10, 14, 12))
+        for confirmed_at in (
+            datetime(2026, 10, 14, 9),
+            datetime(2026, 10, 12, 9),
+            datetime(2026, 10, 2, 9),
+            datetime(2026, 9, 30, 9),
+        ):
+            confirmed_at = timezone.make_aware(confirmed_at)
+            invoice = finance_models.Invoice.objects.create(
+                total_charge=20,
+                balance=20,
+                status=finance_models.InvoiceStatus.OPEN.value,
+                confirmed_at=confirmed_at,
+            )
+            finance_models.Bill.objects.create(
+                bill_item_code="A",
+                cost_price=0,
+                selling_price=Decimal(10),
+                quantity=2,
+                cleared_status=finance_models.BillStatus.UNCLEARED.value,
+                bill_source=utils.Modules.NURSING.value,
+                billed_to_type=finance_models.PayerSchemeType.SELF_PREPAID.value,
+                is_invoiced=True,
+                invoice=invoice,
+            )
+            payment = finance_models.Payment.objects.create(
+                payment_method={"name": "cash"}, total_amount=Decimal(20)
+            )
+            finance_models.Payment.objects.filter(id=payment.id).update(
+                created_at=confirmed_at
+            )
+
+    def test_periods_are_summed_in_one_query_per_table(self):
+        generator = summary_report.SummaryReportGenerator(end=self.end)
+        with self.assertNumQueries(3):
+            payments = generator.get_payment_methods_summary()
+            modules = generator.generate_modules_report()
+        cash = next(row for row in payments if row.payment_method == "cash")
+        self.assertEqual(
+            (20, 40, 60),
+            (cash.date_amount, cash.week_date_amount, cash.month_date_amount),
+        )
+        nursing = next(
+            row.report for row in modules if row.module == utils.Modules.NURSING.value
+        )
+        self.assertEqual(
+            [(2, 10), (4, 20), (6, 30)],
+            [
+                (report.qty, report.amount)
+                for report in (nursing.present, nursing.week_date, nursing.month_date)
+            ],
+        )
+        self.assertEqual(len(utils.Modules), len(modules))
+
+
+class RevenueRollupTest(TestCase):
+    def setUp(self) -> None:
+        self.rendered_at = timezone.make_aware(datetime(2026, 10, 14, 9))
+
+    def bill(self, **fields) -> finance_models.Bill:
+        bill = dict(
+            bill_item_code="A",
+            cost_price=Decimal(4),
+            selling_price=Decimal(10),
+            cleared_status=finance_models.BillStatus.UNCLEARED.value,
+            bill_source=utils.Modules.LABORATORY.value,
+            billed_to_type=finance_models.PayerSchemeType.SELF_PREPAID.value,
+            serviced_rendered_at=self.rendered_at,
+            is_invoiced=True,
+            patient={"firstname": "Ada", "uhid": "U1"},
+        )
+        bill.update(fields)
+        return finance_models.Bill(**bill)
+
+    def rollups(self) -> list:
+        return sorted(
+            finance_models.DailyRevenue.objects.exclude(count=0).values_list(
+                "day",
+                "module",
+                "is_invoiced",
+                "count",
+                "quantity",
+                "selling_total",
+                "cost_total",
+                "cleared_total",
+                "uncleared_total",
+            ),
+            key=str,
+        )
+
+    def test_bill_writes_are_rolled_up(self):
+        self.bill().save()
+        finance_models.Bill.objects.bulk_create(
+            [
+                self.bill(quantity=2),
+                self.bill(bill_source=utils.Modules.IMAGING.value),
+                self.bill(serviced_rendered_at=None, is_invoiced=False),
+            ]
+        )
+        bill = finance_models.Bill.objects.filter(quantity=2).get()
+        bill.cleared_status = finance_models.BillStatus.CLEARED.value
+        bill.save()
+        finance_models.Bill.objects.filter(
+            bill_source=utils.Modules.IMAGING.value
+        ).update(is_invoiced=False)
+        self.bill(selling_price=Decimal(7)).save()
+        finance_models.Bill.objects.filter(selling_price=7).delete()
+
+        day = self.rendered_at.date()
+        lab, imaging = utils.Modules.LABORATORY.value, utils.Modules.IMAGING.value
+        expected = sorted(
+            [
+                (day, lab, True, 2, 3, 20, 8, 10, 10),
+                (day, imaging, False, 1, 1, 10, 4, 0, 10),
+                (None, lab, False, 1, 1, 10, 4, 0, 10),
+            ],
+            key=str,
+        )
+        self.assertEqual(expected, self.rollups())
+        call_command("rebuild_revenue_rollups", stdout=io.StringIO())
+        self.assertEqual(expected, self.rollups())
+        # a test case refuses queries to the sandbox, so this runs on it
+        with self.assertRaises(AssertionError):
+            call_command(
+                "rebuild_revenue_rollups", "--database=sandbox", stdout=io.StringIO()
+            )
+        self.assertEqual(expected, self.rollups())
+
+    def test_summary_reads_rollups_unless_filtered_on_patients(self):
+        finance_models.Bill.objects.bulk_create(
+            [self.bill(), self.bill(patient={"firstname": "Bo", "uhid": "U2"})]
+        )
+        user = User.objects.create_user(username="revenue")
+        view = finance_views.RevenueSummaryViewSet.as_view({"get": "list"})
+        factory = APIRequestFactory()
+
+        def summary(**params) -> dict:
+            query = {"date_after": "2026-10-14", "is_earned": "true", **params}
+            request = factory.get("/", query)
+            force_authenticate(request, user)
+            response = view(request)
+            self.assertEqual(200, response.status_code)
+            return {
+                row["module"]: (Decimal(row["total_amount"]), row["count"])
+                for row in response.data
+            }
 
-# Create your tests here.
+        with self.assertNumQueries(1):
+            summary_all = summary()
+        self.assertEqual((20, 2), summary_all[utils.Modules.LABORATORY.value])
+        self.assertEqual(
+            (10, 1), summary(patient_uhid="U2")[utils.Modules.LABORATORY.value]
+        )
+        self.assertEqual(
+            (0, 0),
+            summary(date_before="2026-10-13")[utils.Modules.LABORATORY.value],
+        )
+        self.assertEqual(len(utils.Modules), len(summary_all))
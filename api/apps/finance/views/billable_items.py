@@ -1,6 +1,4 @@
-from django.http import HttpResponse
 from django.contrib.auth.models import User
-from django.db.models import Subquery
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, filters, permissions, status, mixins
 from rest_framework.decorators import action
@@ -8,11 +6,12 @@ from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
 
-from api.includes import exceptions
+from api.includes import exceptions, file_utils
 from api.includes.pagination import CustomPagination
 from api.apps.users import serializers as user_serializers
 from api.apps.patient import models as patient_models
 from api.includes import utils
+from api.apps.finance.libs import price_index
 from api.apps.finance.libs import price_list as price_list_lib
 from api.apps.finance.libs import billable_item as billable_item_lib
 from api.apps.finance import models, serializers
@@ -45,7 +44,13 @@ class BillableItemViewSet(
                 location=OpenApiParameter.QUERY,
                 description="Module",
                 type=OpenApiTypes.STR,
-            )
+            ),
+            OpenApiParameter(
+                name="export_format",
+                location=OpenApiParameter.QUERY,
+                description="Format of exported file, xlsx or csv",
+                type=OpenApiTypes.STR,
+            ),
         ]
     )
     @action(
@@ -62,13 +67,11 @@ class BillableItemViewSet(
         user_data = utils.trim_user_data(utils.model_to_dict(user))
         module = request.query_params.get("module", None)
         billable_util = billable_item_lib.BillableItemLib(user_data)
-        excel_file_bytes = billable_util.get_billable_item_excel(module=module)
-        response = HttpResponse(
-            excel_file_bytes,
-            content_type="application/vnd.ms-excel",
+        return file_utils.export_response(
+            billable_util.iter_billable_items(module=module),
+            "billable_items",
+            file_utils.get_export_format(request.query_params.get("export_format")),
         )
-        response["Content-Disposition"] = "attachment; filename=billable_items.xlsx"
-        return response
 
     @extend_schema(
         operation_id="upload_file",
@@ -95,12 +98,15 @@ class BillableItemViewSet(
         excel_file = request.FILES["file"]
         if not excel_file:
             raise exceptions.BadRequest("No file uploaded")
-        results = billable_util.upload_billable_items_excel(excel_file)
-        results = list(filter(lambda item: item is not None, results))
+        result = billable_util.upload_billable_items_excel(excel_file)
         return Response(
             {
                 "success": "Billable items uploaded successfully",
-                "failed_items": results,
+                "inserted": result.inserted,
+                "updated": result.updated,
+                "unchanged": result.unchanged,
+                "failed_items": result.failed_item_codes,
+                "errors": [error.dict() for error in result.errors],
             }
         )
 
@@ -111,7 +117,13 @@ class BillableItemViewSet(
                 location=OpenApiParameter.QUERY,
                 description="Module",
                 type=OpenApiTypes.STR,
-            )
+            ),
+            OpenApiParameter(
+                name="export_format",
+                location=OpenApiParameter.QUERY,
+                description="Format of exported file, xlsx or csv",
+                type=OpenApiTypes.STR,
+            ),
         ]
     )
     @action(
@@ -127,13 +139,11 @@ class BillableItemViewSet(
         user_data = utils.trim_user_data(utils.model_to_dict(request.user))
         billable_item_util = billable_item_lib.BillableItemLib(user_data)
         module = request.query_params.get("module", None)
-        excel_file_bytes = billable_item_util.get_price_list_excel(module)
-        response = HttpResponse(
-            excel_file_bytes,
-            content_type="application/vnd.ms-excel",
+        return file_utils.export_response(
+            billable_item_util.iter_price_list_template(module),
+            "price_list_items",
+            file_utils.get_export_format(request.query_params.get("export_format")),
         )
-        response["Content-Disposition"] = "attachment; filename=price_list_items.xlsx"
-        return response
 
     @extend_schema(
         request=None,
@@ -170,14 +180,21 @@ class BillableItemViewSet(
                 "Patient has no insurance coverage for billable item"
             )
 
-        price_list_items = models.PriceListItem.objects.filter(
-            bill_item_code=billable_item.item_code
-        )
-        payer_schemes = models.PayerScheme.objects.select_related("price_list").filter(
-            pk__in=[scheme.get("payer_scheme", {}).get("id") for scheme in schemes],
-            price_list__pricelistitem__in=Subquery(price_list_items.values("pk")),
-        )
-        if not payer_schemes.exists():
+        payer_schemes = [
+            payer_scheme
+            for payer_scheme in models.PayerScheme.objects.select_related(
+                "price_list"
+            ).filter(
+                pk__in=[scheme.get("payer_scheme", {}).get("id") for scheme in schemes],
+                price_list__isnull=False,
+            )
+            if price_index.price_index.get(
+                payer_scheme.price_list_id,
+                billable_item.item_code,
+                payer_scheme.price_list.version,
+            )
+        ]
+        if not payer_schemes:
             raise exceptions.NotFoundException(
                 "Patient has no insurance coverage for billable item"
             )
@@ -230,14 +247,14 @@ class PriceListViewSet(viewsets.ModelViewSet):
         price_list_uploader = price_list_lib.PriceListLib(
             price_list, user_data, excel_file=file
         )
-        failed_item_codes = price_list_uploader.upload()
-        failed_item_codes = list(
-            filter(lambda item: item is not None, failed_item_codes)
-        )
+        result = price_list_uploader.upload()
         return Response(
             {
                 "message": "File uploaded successfully",
-                "failed_item_codes": failed_item_codes,
+                "created": result.created,
+                "updated": result.updated,
+                "failed_item_codes": result.failed_item_codes,
+                "errors": [error.dict() for error in result.errors],
             },
             status=201,
         )
@@ -252,18 +269,20 @@ class PriceListViewSet(viewsets.ModelViewSet):
         price_list = self.get_object()
         user = request.user
         user_data = utils.trim_user_data(utils.model_to_dict(user))
-        serializers.PriceListItemBulkSerializer(
-            data=request.data,
-        ).is_valid(raise_exception=True)
-        price_list_items = request.data["items"]
+        serializer = serializers.PriceListItemBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        price_list_items = serializer.validated_data["items"]
         price_list_item_uploader = price_list_lib.PriceListLib(
             price_list, user_data, price_list_items=price_list_items
         )
-        faied_item_codes = price_list_item_uploader.upload()
+        result = price_list_item_uploader.upload()
         return Response(
             {
                 "message": "Price list items created successfully",
-                "failed_item_codes": faied_item_codes,
+                "created": result.created,
+                "updated": result.updated,
+                "failed_item_codes": result.failed_item_codes,
+                "errors": [error.dict() for error in result.errors],
             },
             status=201,
         )
@@ -275,7 +294,13 @@ class PriceListViewSet(viewsets.ModelViewSet):
                 location=OpenApiParameter.QUERY,
                 description="Module",
                 type=OpenApiTypes.STR,
-            )
+            ),
+            OpenApiParameter(
+                name="export_format",
+                location=OpenApiParameter.QUERY,
+                description="Format of exported file, xlsx or csv",
+                type=OpenApiTypes.STR,
+            ),
         ]
     )
     @action(
@@ -287,12 +312,12 @@ class PriceListViewSet(viewsets.ModelViewSet):
     def download_excel(self, request, pk=None):
         price_list = self.get_object()
         module = request.query_params.get("module", None)
-        excel_bytes = price_list_lib.PriceListLib(price_list, request.user).download(
-            module
+        price_list_util = price_list_lib.PriceListLib(price_list, request.user)
+        return file_utils.export_response(
+            price_list_util.iter_price_list_items(module),
+            "price_list",
+            file_utils.get_export_format(request.query_params.get("export_format")),
         )
-        response = HttpResponse(excel_bytes, content_type="application/vnd.ms-excel")
-        response["Content-Disposition"] = "attachment; filename=price_list.xlsx"
-        return response
 
 
 class PriceListItemViewSet(viewsets.ModelViewSet):
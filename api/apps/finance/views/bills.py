@@ -6,7 +6,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth.models import User
 
 from api.includes import exceptions
-from api.includes.pagination import CustomPagination
+from api.includes.pagination import KeysetPagination
 from api.apps.patient import models as patient_models
 from api.includes import utils
 from api.apps.finance import models, serializers
@@ -20,7 +20,8 @@ class BillViewSet(
 ):
     queryset = models.Bill.objects.all()
     serializer_class = serializers.BillSerializer
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
+    keyset_fields = ("transaction_date", "id")
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
     filterset_class = finance_filters.BillFilter
     ordering = ("-id",)
@@ -36,14 +37,14 @@ class BillViewSet(
             raise exceptions.BadRequest("Cannot delete invoiced bill")
 
         if instance.is_reserved:
-            patient = patient_models.Patient.objects.filter(
-                id=instance.patient.get("id")
-            )
-            if patient.exists():
-                patient_obj: patient_models.Patient = patient.first()
-                patient_obj.add_deposit(instance.selling_price)
-                patient_obj.pay_from_reserve(instance.selling_price)
-                patient.save()
+            patient_id = instance.patient.get("id")
+            if patient_models.Patient.objects.filter(id=patient_id).exists():
+                patient_models.PatientBalanceEntry.record(
+                    patient_id,
+                    patient_models.BalanceEntryType.UNRESERVE,
+                    deposit_change=instance.selling_price,
+                    reserve_change=-instance.selling_price,
+                )
 
         return super().destroy(request, *args, **kwargs)
 
@@ -31,6 +31,13 @@ class InvoiceViewSet(
     filterset_class = finance_filters.InvoiceFilter
     ordering = ("-id",)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # actions changing the lines of an invoice read them back after
+        if self.action == "list":
+            return queryset.prefetch_related("lines", "payments")
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ["list", "retrieve"]:
             return serializers.InvoiceResponseSerializer
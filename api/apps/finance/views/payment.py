@@ -1,6 +1,3 @@
-import json
-
-from django.core.serializers.json import DjangoJSONEncoder
 from drf_spectacular.utils import (
     extend_schema,
     OpenApiParameter,
@@ -8,14 +5,13 @@ from drf_spectacular.utils import (
 from drf_spectacular.types import OpenApiTypes
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth.models import User
-from django.http import HttpResponse
 from rest_framework import viewsets, filters, status, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import permissions
 
 from api.includes import exceptions, utils, file_utils
-from api.includes.pagination import CustomPagination
+from api.includes.pagination import CustomPagination, KeysetPagination
 from api.apps.finance import models, serializers
 from api.apps.finance import filters as finance_filters
 from api.apps.finance.libs.reports.payments_report import PaymentsSummaryReportGenerator
@@ -85,7 +81,7 @@ class PaymentViewSet(
 ):
     queryset = models.Payment.objects.all()
     serializer_class = serializers.PaymentSerializer
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
     filterset_class = finance_filters.PaymentFilter
     ordering = ("-id",)
@@ -111,6 +107,12 @@ class PaymentSummaryReportViewset(viewsets.GenericViewSet):
                 description="Print excel",
                 type=OpenApiTypes.BOOL,
             ),
+            OpenApiParameter(
+                name="export_format",
+                location=OpenApiParameter.QUERY,
+                description="Format of exported file, xlsx or csv",
+                type=OpenApiTypes.STR,
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -122,15 +124,11 @@ class PaymentSummaryReportViewset(viewsets.GenericViewSet):
         revenue_summary = PaymentsSummaryReportGenerator(payments=queryset)
         data = revenue_summary.to_response_struct()
         if to_excel:
-            data = revenue_summary.to_report_struct()
-            excel_bytes = file_utils.FileUtils().write_excel_file(data)
-            response = HttpResponse(
-                excel_bytes, content_type="application/vnd.ms-excel"
+            return file_utils.export_response(
+                revenue_summary.to_report_struct(),
+                "summary_payments",
+                file_utils.get_export_format(request.query_params.get("export_format")),
             )
-            response[
-                "Content-Disposition"
-            ] = "attachment; filename=summary_payments.xlsx"
-            return response
         serializer = self.get_serializer_class()(data=data, many=True)
         serializer.is_valid(raise_exception=True)
         return Response(data=serializer.data)
@@ -150,49 +148,34 @@ class PaymentDetailReportViewset(viewsets.GenericViewSet):
                 location=OpenApiParameter.QUERY,
                 description="Print excel",
                 type=OpenApiTypes.BOOL,
-            )
+            ),
+            OpenApiParameter(
+                name="export_format",
+                location=OpenApiParameter.QUERY,
+                description="Format of exported file, xlsx or csv",
+                type=OpenApiTypes.STR,
+            ),
         ]
     )
     def list(self, request, *args):
         """Get reports data"""
         queryset = self.filter_queryset(self.get_queryset())
-        to_excel: bool = utils.str_to_bool(
-            request.query_params.get("to_excel", "false")
-        )
+        to_excel: bool = utils.str_to_bool(request.query_params.get("to_excel"))
+        if to_excel:
+            records = file_utils.iter_serialized_records(
+                queryset,
+                self.get_serializer_class(),
+                context=self.get_serializer_context(),
+            )
+            return file_utils.export_response(
+                records,
+                "payment_detailed",
+                file_utils.get_export_format(request.query_params.get("export_format")),
+            )
 
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            data = serializer.data
-            if not to_excel:
-                return self.get_paginated_response(data)
-            else:
-                serializer = self.get_serializer(queryset, many=True)
-                data = utils.to_report_structure(
-                    json.loads(json.dumps(serializer.data, cls=DjangoJSONEncoder))
-                )
-                excel_bytes = file_utils.FileUtils().write_excel_file(data)
-                response = HttpResponse(
-                    excel_bytes, content_type="application/vnd.ms-excel"
-                )
-                response[
-                    "Content-Disposition"
-                ] = "attachment; filename=detailed_payments.xlsx"
-                return response
-        else:
-            serializer = self.get_serializer(queryset, many=True)
-            data = serializer.data
-            if not to_excel:
-                return Response(data)
-            else:
-                data = utils.to_report_structure(
-                    json.loads(json.dumps(serializer.data, cls=DjangoJSONEncoder))
-                )
-                excel_bytes = file_utils.FileUtils().write_excel_file(data)
-                response = HttpResponse(
-                    excel_bytes, content_type="application/vnd.ms-excel"
-                )
-                response[
-                    "Content-Disposition"
-                ] = "attachment; filename=payment_detailed.xlsx"
-                return response
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
@@ -1,12 +1,12 @@
 from rest_framework import viewsets, permissions, filters
 from rest_framework.request import Request
 from rest_framework.response import Response
-from django.http import HttpResponse
 from drf_spectacular.utils import OpenApiParameter, extend_schema
 from drf_spectacular.types import OpenApiTypes
 from django_filters.rest_framework import DjangoFilterBackend
 
 from api.apps.finance.models.bills import Bill
+from api.apps.finance.models.revenue import DailyRevenue
 from api.apps.finance.serializers.revenue import (
     RevenueSummarySerializer,
     RevenueDetailSerializer,
@@ -15,18 +15,32 @@ from api.apps.finance.libs.reports.revenue_reports import (
     RevenueSummaryReportGenerator,
     RevenueDetailReportGenerator,
 )
-from api.apps.finance.filters import RevenueFilter
+from api.apps.finance.filters import DailyRevenueFilter, RevenueFilter
 from api.includes.pagination import CustomPagination
 from api.includes import file_utils, utils
 
 
 class RevenueSummaryViewSet(viewsets.mixins.ListModelMixin, viewsets.GenericViewSet):
-    queryset = Bill.objects.all()
+    queryset = DailyRevenue.objects.all()
     serializer_class = RevenueSummarySerializer
     pagination_class = CustomPagination
-    permission_classes = [permissions.AllowAny]
+    permission_classes = [permissions.IsAuthenticated]
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
-    filterset_class = RevenueFilter
+    # patients are not rolled up, summaries filtered on them sum the bills
+    bill_filters = ("patient_name", "patient_uhid")
+
+    def sums_bills(self) -> bool:
+        query_params = getattr(self.request, "query_params", {})
+        return any(query_params.get(name) for name in self.bill_filters)
+
+    @property
+    def filterset_class(self):
+        return RevenueFilter if self.sums_bills() else DailyRevenueFilter
+
+    def get_queryset(self):
+        if self.sums_bills():
+            return Bill.objects.all()
+        return super().get_queryset()
 
     @extend_schema(
         parameters=[
@@ -37,6 +51,12 @@ class RevenueSummaryViewSet(viewsets.mixins.ListModelMixin, viewsets.GenericView
                 type=OpenApiTypes.BOOL,
                 default=False,
             ),
+            OpenApiParameter(
+                name="export_format",
+                location=OpenApiParameter.QUERY,
+                description="Format of exported file, xlsx or csv",
+                type=OpenApiTypes.STR,
+            ),
             OpenApiParameter(
                 name="is_earned",
                 location=OpenApiParameter.QUERY,
@@ -44,6 +64,18 @@ class RevenueSummaryViewSet(viewsets.mixins.ListModelMixin, viewsets.GenericView
                 type=OpenApiTypes.BOOL,
                 default=True,
             ),
+            OpenApiParameter(
+                name="patient_name",
+                location=OpenApiParameter.QUERY,
+                description="Patient Name",
+                type=OpenApiTypes.STR,
+            ),
+            OpenApiParameter(
+                name="patient_uhid",
+                location=OpenApiParameter.QUERY,
+                description="Patient UHID",
+                type=OpenApiTypes.STR,
+            ),
         ]
     )
     def list(self, request: Request, *args, **kwargs):
@@ -58,15 +90,11 @@ class RevenueSummaryViewSet(viewsets.mixins.ListModelMixin, viewsets.GenericView
         )
         data = revenue_summary.to_response_struct()
         if to_excel:
-            data = revenue_summary.to_report_struct()
-            excel_bytes = file_utils.FileUtils().write_excel_file(data)
-            response = HttpResponse(
-                excel_bytes, content_type="application/vnd.ms-excel"
+            return file_utils.export_response(
+                revenue_summary.to_report_struct(),
+                "summary_revenue",
+                file_utils.get_export_format(request.query_params.get("export_format")),
             )
-            response[
-                "Content-Disposition"
-            ] = "attachment; filename=summary_revenue.xlsx"
-            return response
         serializer = RevenueSummarySerializer(data=data, many=True)
         serializer.is_valid(raise_exception=True)
         return Response(data=serializer.data)
@@ -88,6 +116,12 @@ class RevenueDetailedViewSet(viewsets.mixins.ListModelMixin, viewsets.GenericVie
                 description="Print excel",
                 type=OpenApiTypes.BOOL,
             ),
+            OpenApiParameter(
+                name="export_format",
+                location=OpenApiParameter.QUERY,
+                description="Format of exported file, xlsx or csv",
+                type=OpenApiTypes.STR,
+            ),
             OpenApiParameter(
                 name="is_earned",
                 location=OpenApiParameter.QUERY,
@@ -108,13 +142,11 @@ class RevenueDetailedViewSet(viewsets.mixins.ListModelMixin, viewsets.GenericVie
         )
         data_set = revenue_detail.to_response_struct()
         if to_excel:
-            data = revenue_detail.to_report_struct()
-            excel_bytes = file_utils.FileUtils().write_excel_file(data)
-            response = HttpResponse(
-                excel_bytes, content_type="application/vnd.ms-excel"
+            return file_utils.export_response(
+                revenue_detail.iter_report_struct(),
+                "detailed_revenue",
+                file_utils.get_export_format(request.query_params.get("export_format")),
             )
-            response["Content-Disposition"] = "attachment; filename=encounters.xlsx"
-            return response
 
         page = self.paginate_queryset(data_set)
         if page is not None:
@@ -4,6 +4,7 @@ from django.db.models import Q
 
 from . import models
 from api.apps.facilities import models as facilities_models
+from api.includes import json_keys
 
 
 class ServiceCenterFilter(FilterSet):
@@ -65,7 +66,7 @@ class ImagingOrderFilter(FilterSet):
         fields = ["patient_uhid", "patient_name", "patient_phone", "img_id"]
 
     def filter_patient_uhid(self, queryset, name, value):
-        return queryset.filter(patient__uhid__iexact=value)
+        return json_keys.filter_key(queryset, "patient", "uhid", value, upper=True)
 
     def filter_patient_name(self, queryset, name, value):
         return queryset.filter(
@@ -75,7 +76,9 @@ class ImagingOrderFilter(FilterSet):
         )
 
     def filter_patient_phone(self, queryset, name, value):
-        return queryset.filter(patient__phone_number__iexact=value)
+        return json_keys.filter_key(
+            queryset, "patient", "phone_number", value, upper=True
+        )
 
     def filter_img_id(self, queryset, name, value):
         return queryset.filter(img_id__iexact=value)
@@ -134,7 +137,7 @@ class ImagingObservationOrderFilter(FilterSet):
         ]
 
     def filter_patient_uhid(self, queryset, name, value):
-        return queryset.filter(patient__uhid__iexact=value)
+        return json_keys.filter_key(queryset, "patient", "uhid", value, upper=True)
 
     def filter_patient_name(self, queryset, name, value):
         return queryset.filter(
@@ -144,7 +147,9 @@ class ImagingObservationOrderFilter(FilterSet):
         )
 
     def filter_patient_phone(self, queryset, name, value):
-        return queryset.filter(patient__phone_number__iexact=value)
+        return json_keys.filter_key(
+            queryset, "patient", "phone_number", value, upper=True
+        )
 
     def filter_status(self, queryset, name, value):
         return queryset.filter(status__iexact=value)
@@ -1,9 +1,21 @@
 from typing import List
+
+from django.db import transaction
+
+from api.apps.finance.libs.billing import Billing
 from api.apps.imaging import models
+from api.includes import utils
 from api.includes.utils import AuditEvent, AuditLog
 
 
 class ImagingObvOrderFactory:
+    """
+    Orders imaging observations for an imaging order. The order and the
+    observations are loaded once for all the observations, the observation
+    orders are billed together and inserted in one query, so the number of
+    queries does not grow with the number of observations.
+    """
+
     def __init__(
         self,
         img_order_id: str,
@@ -24,36 +36,63 @@ class ImagingObvOrderFactory:
         img_obv_record.pop("created_at", None)
         return img_obv_record
 
+    def load_img_obvs(
+        self, img_obvs: List[models.ImagingObservation]
+    ) -> List[models.ImagingObservation]:
+        """Loads the observations with their modalities in one query"""
+        loaded = models.ImagingObservation.objects.select_related("modality").in_bulk(
+            [img_obv.id for img_obv in img_obvs]
+        )
+        return [loaded[img_obv.id] for img_obv in img_obvs]
+
+    def create_img_obv_orders(
+        self, img_obvs: List[models.ImagingObservation]
+    ) -> List[models.ImagingObservationOrder]:
+        """Creates the imaging observation orders of observations, billed"""
+        if not img_obvs:
+            return []
+        img_order_instance = models.ImagingOrder.objects.get(id=self.img_order_id)
+        patient_data = img_order_instance.patient
+
+        img_obv_orders = []
+        for img_obv in self.load_img_obvs(img_obvs):
+            img_obv_data: dict = img_obv.to_dict()
+            img_obv_data = self.__clean_imaging_obv_record(img_obv_data)
+            audit_records = [
+                AuditLog(
+                    user=self.user_data,
+                    event=AuditEvent.CREATE,
+                    fields=self.audit_fields,
+                ).dict()
+            ]
+            img_obv_order = models.ImagingObservationOrder(
+                patient=patient_data,
+                img_order=img_order_instance,
+                img_obv=img_obv_data,
+                status="NEW",
+                audit_log=audit_records,
+            )
+            img_obv_order._payment_scheme = self.payment_scheme
+            img_obv_order._bill_item_code = img_obv.bill_item_code
+            img_obv_order._quantity = 1
+            img_obv_order._name = img_obv.name
+            img_obv_orders.append(img_obv_order)
+
+        with transaction.atomic():
+            Billing.bill_service_orders(
+                img_obv_orders, str(utils.Modules.IMAGING), self.payment_scheme
+            )
+            # inserted in bulk, without the save signals, billed above
+            return models.ImagingObservationOrder.objects.bulk_create(img_obv_orders)
+
     def create_img_obv_order(
         self, img_obv: models.ImagingObservation
     ) -> models.ImagingObservationOrder:
         """Creates an imaging observation order"""
-        img_order_instance = models.ImagingOrder.objects.get(id=self.img_order_id)
-
-        patient_data = img_order_instance.patient
-        img_obv_data: dict = img_obv.to_dict()
-        img_obv_data = self.__clean_imaging_obv_record(img_obv_data)
-        audit_records = [
-            AuditLog(
-                user=self.user_data, event=AuditEvent.CREATE, fields=self.audit_fields
-            ).dict()
-        ]
-
-        img_obv_order: models.ImagingObservationOrder = models.ImagingObservationOrder(
-            patient=patient_data,
-            img_order=img_order_instance,
-            img_obv=img_obv_data,
-            status="NEW",
-            audit_log=audit_records,
-        )
-        img_obv_order._payment_scheme = self.payment_scheme
-        img_obv_order._bill_item_code = img_obv.bill_item_code
-        img_obv_order._quantity = 1
-        img_obv_order._name = img_obv.name
-        img_obv_order.save()
-        return img_obv_order
+        return self.create_img_obv_orders([img_obv])[0]
 
     def populate_img_obv_orders(self):
         """Populates imaging observation orders"""
-        results = [self.create_img_obv_order(img_obv) for img_obv in self.img_obvs]
-        return results
+        return self.create_img_obv_orders(
+            [img_obv for img_obv in self.img_obvs if img_obv is not None]
+        )
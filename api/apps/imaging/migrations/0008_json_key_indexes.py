@@ -0,0 +1,34 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:04
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.fields.json
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('imaging', '0007_imagingobservationorder_bill_package_usage'),
+    ]
+
+    # imaging orders searched by patient uhid or phone number
+    operations = [
+        AddIndexConcurrently(
+            model_name='imagingobservationorder',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.fields.json.KeyTextTransform('uhid', 'patient')), name='imgobvorder_patient_uhid_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='imagingobservationorder',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.fields.json.KeyTextTransform('phone_number', 'patient')), name='imgobvorder_patient_phone_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='imagingorder',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.fields.json.KeyTextTransform('uhid', 'patient')), name='imagingorder_patient_uhid_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='imagingorder',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.fields.json.KeyTextTransform('phone_number', 'patient')), name='imagingorder_patient_phone_idx'),
+        ),
+    ]
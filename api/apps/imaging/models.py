@@ -5,7 +5,9 @@ from django.forms.models import model_to_dict
 from api.apps.finance import models as finance_models
 from api.includes import (
     exceptions,
+    json_keys,
     mail_utils,
+    sequences,
     utils,
     file_utils,
     models as generic_models,
@@ -13,29 +15,22 @@ from api.includes import (
 from config import preferences
 
 
+IMAGING_ORDER_SEQUENCE = sequences.PeriodSequence(
+    name="imaging_imagingorder",
+    model="imaging.ImagingOrder",
+    field="img_id",
+    prefix=lambda: preferences.AppPreferences().imaging_id_prefix_code,
+    period_format="%y%m",
+    padding=6,
+)
+
+
 def generate_imaging_order_id():
-    """Function generates ASN for lab order
+    """Function generates ASN for imaging order
     Uses present datetime and month as prefix
     Restarts counter for each month
     """
-    serial_no = 1
-    config = preferences.AppPreferences()
-    if utils.is_table_exist("imaging_imagingorder"):
-        CURRENT_YEAR = str(datetime.datetime.utcnow().year)[2::]
-        CURRENT_MONTH = str(datetime.datetime.utcnow().month).zfill(2)
-
-        imaging_orders = ImagingOrder.objects.filter(
-            img_id__contains=f"{CURRENT_YEAR}{CURRENT_MONTH}"
-        )
-        if imaging_orders.count() > 0:
-            last_img_order = imaging_orders.latest("id")
-            serial_no = int(last_img_order.img_id[-6:]) + 1
-
-    serial_no = str(serial_no).zfill(6)
-    unique_id = (
-        f"{config.imaging_id_prefix_code}{CURRENT_YEAR}{CURRENT_MONTH}{serial_no}"
-    )
-    return unique_id
+    return IMAGING_ORDER_SEQUENCE.next_id()
 
 
 def generate_imaging_obv_order_id():
@@ -117,6 +112,16 @@ class ImagingOrder(models.Model):
     ordered_datetime = models.DateTimeField(auto_now_add=True)
     ordering_physician = models.CharField(max_length=256, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            json_keys.key_index(
+                "patient", "uhid", "imagingorder_patient_uhid_idx", upper=True
+            ),
+            json_keys.key_index(
+                "patient", "phone_number", "imagingorder_patient_phone_idx", upper=True
+            ),
+        ]
+
     def __str__(self):
         return self.img_id
 
@@ -124,25 +129,16 @@ class ImagingOrder(models.Model):
         return model_to_dict(self)
 
     def mail_report(self):
-        from . import utils as imaging_utils
-
-        try:
-            if self.patient.get("email"):
-                file_object = imaging_utils.generate_img_order_reports(
-                    img_order=self,
-                    header=preferences.AppPreferences().use_img_mail_header,
-                )
-                email_utils = mail_utils.EmailUtil(
-                    subject="Radiology Results",
-                    body="Hello!!\n\n This mail contains an attached copy of your radiology result.\n\nRegards,\nRadiology Team",
-                    receiver_mail=self.patient.get("email"),
-                    attachment=file_object,
-                    file_name="imaging_report.pdf",
-                )
-                email_utils.send_email()
-        except Exception as e:
-            print(e)
-            pass
+        """Queues a mail to patient with the imaging order report"""
+        if self.patient.get("email"):
+            mail_utils.EmailUtil(
+                subject="Radiology Results",
+                body="Hello!!\n\n This mail contains an attached copy of your radiology result.\n\nRegards,\nRadiology Team",
+                receiver_mail=self.patient.get("email"),
+                file_name="imaging_report.pdf",
+                attachment_renderer=IMAGING_ORDER_REPORT_RENDERER,
+                attachment_kwargs={"img_order_id": self.id},
+            ).queue_mail()
 
 
 class ImagingObservationOrder(models.Model):
@@ -162,6 +158,14 @@ class ImagingObservationOrder(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        indexes = [
+            json_keys.key_index(
+                "patient", "uhid", "imgobvorder_patient_uhid_idx", upper=True
+            ),
+            json_keys.key_index(
+                "patient", "phone_number", "imgobvorder_patient_phone_idx", upper=True
+            ),
+        ]
         permissions = (
             ("capture_imaging", "Can capture imaging"),
             ("submit_imaging", "Can submit imaging"),
@@ -191,27 +195,17 @@ class ImagingObservationOrder(models.Model):
 
     def mail_result(self):
         """
-        Function to mail result to patient
+        Queues a mail to patient with the observation result
         """
-        try:
-            from . import utils as imaging_utils
-
-            if self.patient.get("email"):
-                file_object = imaging_utils.generate_img_obv_order_reports(
-                    img_obv_order=self,
-                    header=preferences.AppPreferences().use_img_mail_header,
-                )
-                email_utils = mail_utils.EmailUtil(
-                    subject="Radiology Results",
-                    body="Hello!!\n\n This mail contains an attached copy of your radiology result.\n\nRegards,\nRadiology Team",
-                    receiver_mail=self.patient.get("email"),
-                    attachment=file_object,
-                    file_name="imaging_report.pdf",
-                )
-                email_utils.send_mail()
-        except Exception as e:
-            print(e)
-            pass
+        if self.patient.get("email"):
+            mail_utils.EmailUtil(
+                subject="Radiology Results",
+                body="Hello!!\n\n This mail contains an attached copy of your radiology result.\n\nRegards,\nRadiology Team",
+                receiver_mail=self.patient.get("email"),
+                file_name="imaging_report.pdf",
+                attachment_renderer=IMAGING_OBV_ORDER_REPORT_RENDERER,
+                attachment_kwargs={"img_obv_order_id": self.id},
+            ).queue_mail()
 
     def post_payment_action(self, bill: finance_models.Bill):
         ...
@@ -231,3 +225,29 @@ class ImagingObserverOrderAttachments(
             file_utils.FileUtils().remove_static_file(self.file_path)
         finally:
             return self.delete(*args, **kwargs)
+
+
+IMAGING_ORDER_REPORT_RENDERER = "imaging.img_order_report"
+IMAGING_OBV_ORDER_REPORT_RENDERER = "imaging.img_obv_order_report"
+
+
+@mail_utils.attachment_renderer(IMAGING_ORDER_REPORT_RENDERER)
+def render_img_order_report(img_order_id: int):
+    """Renders the imaging order report attached to radiology mails"""
+    from . import utils as imaging_utils
+
+    return imaging_utils.generate_img_order_reports(
+        img_order=ImagingOrder.objects.get(id=img_order_id),
+        header=preferences.AppPreferences().use_img_mail_header,
+    )
+
+
+@mail_utils.attachment_renderer(IMAGING_OBV_ORDER_REPORT_RENDERER)
+def render_img_obv_order_report(img_obv_order_id: int):
+    """Renders the observation report attached to radiology mails"""
+    from . import utils as imaging_utils
+
+    return imaging_utils.generate_img_obv_order_reports(
+        img_obv_order=ImagingObservationOrder.objects.get(id=img_obv_order_id),
+        header=preferences.AppPreferences().use_img_mail_header,
+    )
@@ -1,3 +1,58 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from api.apps.finance import models as finance_models
+from api.apps.imaging import models as img_models
+from api.apps.imaging.libs import imaging_obv_orders_factory
+from api.apps.patient import models as patient_models
+from api.includes import utils
+
+
+class ImagingObvOrderFactoryTest(TestCase):
+    def setUp(self) -> None:
+        patient = patient_models.Patient.objects.create(
+            firstname="Ada", lastname="Obi", gender="Female"
+        )
+        self.img_order = img_models.ImagingOrder.objects.create(
+            patient=utils.model_to_dict(patient), service_center={}
+        )
+        modality = img_models.Modality.objects.create(name="X-Ray")
+        self.img_obvs = []
+        for index in range(3):
+            img_obv = img_models.ImagingObservation(
+                name=f"Study {index}", modality=modality
+            )
+            # saving an observation creates its billable item
+            img_obv._created_by, img_obv._bill_price, img_obv._cost_price = {}, 80, 0
+            img_obv.save()
+            self.img_obvs.append(img_obv)
+
+    def populate(self, img_obvs: list) -> list:
+        return imaging_obv_orders_factory.ImagingObvOrderFactory(
+            img_order_id=self.img_order.id,
+            img_obvs=img_obvs,
+            user_data={},
+            audit_fields={},
+            payment_scheme=None,
+        ).populate_img_obv_orders()
+
+    def test_obv_orders_are_built_and_billed_in_batch(self):
+        img_obv_orders = self.populate(self.img_obvs)
+
+        self.assertEqual(3, len(img_obv_orders))
+        for index, img_obv_order in enumerate(img_obv_orders):
+            img_obv_order.refresh_from_db()
+            self.assertEqual(f"Study {index}", img_obv_order.img_obv["name"])
+            self.assertEqual("X-Ray", img_obv_order.img_obv["modality"]["name"])
+            self.assertNotIn("audit_log", img_obv_order.img_obv)
+            self.assertEqual(self.img_order.id, img_obv_order.img_order_id)
+            bill = finance_models.Bill.objects.get(id=img_obv_order.bill)
+            self.assertEqual(f"Study {index}", bill.description)
+            self.assertEqual(utils.Modules.IMAGING.value, bill.bill_source)
+
+    def test_query_count_does_not_grow_with_observations(self):
+        with CaptureQueriesContext(connection) as one_obv:
+            self.populate(self.img_obvs[:1])
+        with self.assertNumQueries(len(one_obv)):
+            self.populate(self.img_obvs)
@@ -1,8 +1,7 @@
-import json
+import itertools
 
 from django.http import HttpResponse
 from django.contrib.auth.models import User
-from django.core.serializers.json import DjangoJSONEncoder
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
@@ -11,7 +10,7 @@ from rest_framework.generics import get_object_or_404
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from api.includes import exceptions, file_utils, utils
+from api.includes import catalog_cache, exceptions, file_utils, utils
 from api.includes import pagination
 from config import preferences
 from . import filters as imaging_filters
@@ -86,20 +85,27 @@ class ImagingObservationViewSet(viewsets.ModelViewSet):
     )
     def group_by_modality(self, request):
         """Group Imaging Observation by modality"""
-        modalities = list(
-            ImagingObservation.objects.order_by("modality")
-            .distinct("modality")
-            .values_list("modality", flat=True)
+        return catalog_cache.catalog_response(
+            request, catalog_cache.Catalogs.IMAGING_MODALITIES, img_obvs_by_modality
         )
-        print(modalities)
-        modalities = Modality.objects.filter(id__in=modalities)
-        response_data = []
-        for modality in modalities:
-            img_obvs = ImagingObservation.objects.filter(modality=modality)
-            img_obvs = ImagingObservationSerializer(img_obvs, many=True).data
-            data = {"modality": modality.name, "img_observations": img_obvs}
-            response_data.append(data)
-        return Response(data=response_data, status=status.HTTP_200_OK)
+
+
+def img_obvs_by_modality() -> list:
+    """Imaging observations grouped by modality, loaded in one query"""
+    img_obvs = ImagingObservation.objects.select_related("modality").order_by(
+        "modality_id", "id"
+    )
+    return [
+        {
+            "modality": modality.name,
+            "img_observations": ImagingObservationSerializer(
+                modality_img_obvs, many=True
+            ).data,
+        }
+        for modality, modality_img_obvs in itertools.groupby(
+            img_obvs, key=lambda img_obv: img_obv.modality
+        )
+    ]
 
 
 class ImagingOrderViewSet(viewsets.ModelViewSet):
@@ -292,50 +298,37 @@ class ImagingReportsViewset(viewsets.GenericViewSet):
                 location=OpenApiParameter.QUERY,
                 description="Print excel",
                 type=OpenApiTypes.BOOL,
-            )
+            ),
+            OpenApiParameter(
+                name="export_format",
+                location=OpenApiParameter.QUERY,
+                description="Format of exported file, xlsx or csv",
+                type=OpenApiTypes.STR,
+            ),
         ]
     )
     def list(self, request, *args):
         """Get reports data"""
         queryset = self.filter_queryset(self.get_queryset())
         to_excel: bool = utils.str_to_bool(request.query_params.get("to_excel"))
+        if to_excel:
+            records = file_utils.iter_serialized_records(
+                queryset,
+                self.get_serializer_class(),
+                context=self.get_serializer_context(),
+            )
+            return file_utils.export_response(
+                records,
+                "imaging_reports",
+                file_utils.get_export_format(request.query_params.get("export_format")),
+            )
 
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            data = serializer.data
-            if not to_excel:
-                return self.get_paginated_response(data)
-            else:
-                serializer = self.get_serializer(queryset, many=True)
-                data = utils.to_report_structure(
-                    data=json.loads(json.dumps(serializer.data, cls=DjangoJSONEncoder))
-                )
-                excel_bytes = file_utils.FileUtils().write_excel_file(data)
-                response = HttpResponse(
-                    excel_bytes, content_type="application/vnd.ms-excel"
-                )
-                response[
-                    "Content-Disposition"
-                ] = "attachment; filename=imaging reports.xlsx"
-                return response
-        else:
-            serializer = self.get_serializer(queryset, many=True)
-            data = serializer.data
-            if not to_excel:
-                return Response(data)
-            else:
-                data = utils.to_report_structure(
-                    json.loads(json.dumps(data, cls=DjangoJSONEncoder))
-                )
-                excel_bytes = file_utils.FileUtils().write_excel_file(data)
-                response = HttpResponse(
-                    excel_bytes, content_type="application/vnd.ms-excel"
-                )
-                response[
-                    "Content-Disposition"
-                ] = "attachment; filename=imaging_reports.xlsx"
-                return response
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
 
 
 class ImagingObservationOrderAttachmentsViewSet(viewsets.ModelViewSet):
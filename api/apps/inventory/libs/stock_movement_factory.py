@@ -109,9 +109,9 @@ class StockMovementFactory:
         if store:
             if store.get("type") == models.StoreTypes.STORE:
                 try:
-                    stock = models.Stock.objects.get(
-                        store__id=store.get("id"), product__id=product.get("id")
-                    )
+                    stock = models.Stock.filter_store_product(
+                        store.get("id"), product.get("id")
+                    ).get()
                     store["quantity"] = stock.quantity
                     return store
                 except models.Stock.DoesNotExist:
@@ -0,0 +1,21 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:04
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.fields.json
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0004_alter_category_name_alter_store_type_and_more'),
+    ]
+
+    # the stock of a product in a store
+    operations = [
+        AddIndexConcurrently(
+            model_name='stock',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('id', 'store'), django.db.models.fields.json.KeyTextTransform('id', 'product'), name='stock_store_product_idx'),
+        ),
+    ]
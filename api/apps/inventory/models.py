@@ -1,10 +1,27 @@
 from django.db import models
+from django.db.models import QuerySet
 from django.utils import timezone
 from django.contrib.auth.models import User
 
-from api.includes import utils, exceptions
+from api.includes import utils, exceptions, json_keys, sequences
 from api.includes.models import DateHistoryTracker, UserHistoryTracker
 
+PRODUCT_SEQUENCE = sequences.PeriodSequence(
+    name="inventory_product",
+    model="inventory.Product",
+    field="sec_id",
+    prefix="PRD",
+    period_format=utils.SEC_ID_PERIOD_FORMAT,
+)
+
+STOCK_MOVEMENT_SEQUENCE = sequences.PeriodSequence(
+    name="inventory_stockmovement",
+    model="inventory.StockMovement",
+    field="move_id",
+    prefix="STM",
+    period_format=utils.SEC_ID_PERIOD_FORMAT,
+)
+
 ################# Enums And Schemas #####################
 
 
@@ -90,12 +107,7 @@ class Product(DateHistoryTracker, UserHistoryTracker):
         if not self.generic_drug and self.is_drug:
             raise exceptions.BadRequest("Generic Drug is not set")
         if not self.id:
-            self.sec_id = utils.generate_sec_id(
-                prefix="PRD",
-                table_name="inventory_product",
-                model=Product,
-                search_field="sec_id",
-            )
+            self.sec_id = PRODUCT_SEQUENCE.next_id()
         return super().save(*args, **kwargs)
 
 
@@ -107,10 +119,23 @@ class Stock(DateHistoryTracker):
 
     class Meta:
         verbose_name_plural = "Stocks"
+        indexes = [
+            models.Index(
+                json_keys.key_text("store", "id"),
+                json_keys.key_text("product", "id"),
+                name="stock_store_product_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.store['name']}_{self.product['name']}"
 
+    @classmethod
+    def filter_store_product(cls, store_id: int, product_id: int) -> QuerySet:
+        """Stock of a product in a store, looked up through its index"""
+        stocks = json_keys.filter_key(cls.objects.all(), "store", "id", store_id)
+        return json_keys.filter_key(stocks, "product", "id", product_id)
+
 
 class StockMovementLine(DateHistoryTracker):
     move_id = models.CharField(max_length=256, blank=True, null=True, editable=False)
@@ -234,12 +259,7 @@ class StockMovement(DateHistoryTracker, UserHistoryTracker):
     def save(self, *args, **kwargs) -> None:
         if not self.id:
             self.status = StockMovementStatus.DRAFT
-            self.move_id = utils.generate_sec_id(
-                prefix="STM",
-                table_name="inventory_stockmovement",
-                model=StockMovement,
-                search_field="created_at",
-            )
+            self.move_id = STOCK_MOVEMENT_SEQUENCE.next_id()
         self._validate_stock_movement_type()
         return super().save(*args, **kwargs)
 
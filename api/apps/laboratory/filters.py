@@ -3,6 +3,7 @@ import django_filters
 from django.db.models import Q, QuerySet
 
 from . import models
+from api.includes import json_keys
 
 
 class ServiceCenterFilter(FilterSet):
@@ -70,15 +71,16 @@ class LabOrderFilter(FilterSet):
         method="filter_patient_name", label="Patient Name"
     )
     patient_phone = django_filters.CharFilter(
-        field_name="patient__phone_number", lookup_expr="iexact"
+        method="filter_patient_phone", label="Patient Phone"
     )
     asn = django_filters.CharFilter(field_name="asn", lookup_expr="icontains")
 
     service_center = django_filters.ModelMultipleChoiceFilter(
         label="Service Center",
-        field_name="service_center__id",
+        field_name="service_center",
         to_field_name="id",
         queryset=models.ServiceCenter.objects.all(),
+        method="filter_service_center",
     )
 
     lab_unit = django_filters.CharFilter(method="filter_lab_unit", label="lab_unit_id")
@@ -94,6 +96,16 @@ class LabOrderFilter(FilterSet):
             | Q(patient__middlename__icontains=value)
         )
 
+    def filter_patient_phone(self, queryset, name, value):
+        return json_keys.filter_key(
+            queryset, "patient", "phone_number", value, upper=True
+        )
+
+    def filter_service_center(self, queryset, name, value):
+        if not value:
+            return queryset
+        return json_keys.filter_key(queryset, "service_center", "id", value)
+
     def filter_lab_unit(self, queryset: QuerySet, name, value):
         lab_unit = models.LabUnit.objects.filter(id=int(value))
         if lab_unit.exists():
@@ -176,7 +188,9 @@ class LabPanelOrderFilter(LabReportsFilter):
     )
 
     def filter_patient_phone(self, queryset, name, value):
-        return queryset.filter(patient__phone_number__iexact=value)
+        return json_keys.filter_key(
+            queryset, "patient", "phone_number", value, upper=True
+        )
 
     def filter_worklist(self, queryset, name, value):
         if value:
@@ -1,11 +1,23 @@
 from typing import List
 
+from django.db import transaction
+
+from api.includes import utils
 from api.includes.utils import AuditEvent, AuditLog
+from api.apps.finance.libs.billing import Billing
 from api.apps.patient import models as patient_models
 from api.apps.laboratory import models as lab_models
 
 
 class LabPanelsAndOrders:
+    """
+    Orders lab panels for a lab order. The order, the patient, the panels
+    and their observations are loaded for all the panels at once, the
+    panel orders are billed together and inserted in one query, so the
+    number of queries does not grow with the number of panels or
+    observations.
+    """
+
     def __init__(
         self,
         lab_order_id: str,
@@ -39,10 +51,34 @@ class LabPanelsAndOrders:
         lab_panel["obv"] = modified_observations
         return lab_panel
 
-    def create_lab_panel_order(self, panel: lab_models.LabPanel):
+    def load_panels(
+        self, panels: List[lab_models.LabPanel]
+    ) -> List[lab_models.LabPanel]:
+        """Loads the panels with what their snapshots hold, in one query each
+        for the panels and for the observations of all of them"""
+        loaded = lab_models.LabPanel.objects.select_related(
+            "specimen_type__specimen", "lab_unit"
+        ).in_bulk([panel.id for panel in panels])
+        obv_ids = {obv["id"] for panel in loaded.values() for obv in (panel.obv or [])}
+        observations = lab_models.LabObservation.objects.in_bulk(obv_ids)
+        panels = [loaded[panel.id] for panel in panels]
+        for panel in panels:
+            # observations deleted since the panel was set up are left out
+            panel.obv = [
+                observations[obv["id"]].to_dict()
+                for obv in (panel.obv or [])
+                if obv["id"] in observations
+            ]
+        return panels
+
+    def create_lab_panel_orders(
+        self, panels: List[lab_models.LabPanel]
+    ) -> List[lab_models.LabPanelOrder]:
         """
-        Creates a lab panel order
+        Creates the lab panel orders of panels, billed
         """
+        if not panels:
+            return []
         lab_order_instance = lab_models.LabOrder.objects.get(id=self.lab_order_id)
 
         # get patient details
@@ -50,51 +86,49 @@ class LabPanelsAndOrders:
             id=lab_order_instance.patient.get("id")
         )
         patient_data = patient_instance.to_dict()
-        observations = panel.obv
-        obv_ids = [obv["id"] for obv in observations] if observations else []
-
-        observations = []
-        for id in obv_ids:
-            try:
-                observation: lab_models.LabObservation = (
-                    lab_models.LabObservation.objects.get(id=id)
-                )
-                observation = observation.to_dict()
-                observations.append(observation)
-            except lab_models.LabObservation.DoesNotExist:
-                continue
-
-        panel.obv = observations
-        panel_data = panel.to_dict()
-        panel_data = self.clean_lab_panel_data(panel_data)
-
-        audit_records = [
-            AuditLog(
-                user=self.user_data, event=AuditEvent.CREATE, fields=self.audit_fields
-            ).dict()
-        ]
-
-        lab_order_panel: lab_models.LabPanelOrder = lab_models.LabPanelOrder(
-            patient=patient_data,
-            lab_order=lab_order_instance,
-            status="NEW",
-            panel=panel_data,
-            audit_log=audit_records,
-        )
-        lab_order_panel._payment_scheme = self.payment_scheme
-        lab_order_panel._bill_item_code = panel.bill_item_code
-        lab_order_panel._quantity = 1
-        lab_order_panel._name = panel.name
-        lab_order_panel.save()
-        return lab_order_panel
+
+        panel_orders = []
+        for panel in self.load_panels(panels):
+            panel_data = self.clean_lab_panel_data(panel.to_dict())
+            audit_records = [
+                AuditLog(
+                    user=self.user_data,
+                    event=AuditEvent.CREATE,
+                    fields=self.audit_fields,
+                ).dict()
+            ]
+            lab_order_panel: lab_models.LabPanelOrder = lab_models.LabPanelOrder(
+                patient=patient_data,
+                lab_order=lab_order_instance,
+                status="NEW",
+                panel=panel_data,
+                audit_log=audit_records,
+            )
+            lab_order_panel._payment_scheme = self.payment_scheme
+            lab_order_panel._bill_item_code = panel.bill_item_code
+            lab_order_panel._quantity = 1
+            lab_order_panel._name = panel.name
+            panel_orders.append(lab_order_panel)
+
+        with transaction.atomic():
+            Billing.bill_service_orders(
+                panel_orders, str(utils.Modules.LABORATORY), self.payment_scheme
+            )
+            # inserted in bulk, without the save signals, billed above
+            return lab_models.LabPanelOrder.objects.bulk_create(panel_orders)
+
+    def create_lab_panel_order(
+        self, panel: lab_models.LabPanel
+    ) -> lab_models.LabPanelOrder:
+        """
+        Creates a lab panel order
+        """
+        return self.create_lab_panel_orders([panel])[0]
 
     def populate_lab_panel_orders(self):
         """
         Populates lab panel orders for a lab order
         """
-        results = [
-            self.create_lab_panel_order(panel)
-            for panel in self.lab_panels
-            if panel is not None
-        ]
-        return results
+        return self.create_lab_panel_orders(
+            [panel for panel in self.lab_panels if panel is not None]
+        )
@@ -3,13 +3,12 @@ from typing import List, Optional, Tuple
 
 from dateutil.relativedelta import relativedelta
 from dateutil import parser
-from django.template import Context, Template
+from django.template import Context
 from django.template.loader import render_to_string
 
 from api.apps.laboratory import models
-from api.includes import file_utils, utils
+from api.includes import file_utils, template_cache, utils
 from api.includes import exceptions
-from config.preferences import AppPreferences
 
 
 class LabResultGenerator:
@@ -22,17 +21,23 @@ class LabResultGenerator:
         self.lab_order = lab_order
         self.lab_panel_orders = lab_panel_orders
         self.header = header
+        # preferences the render is formatted with, resolved once for it
+        self.format_settings = utils.FormatSettings.resolve()
         self.lab_order_data: dict = utils.model_to_dict(instance=lab_order)
         self.lab_panel_orders_data: list[dict] = self._get_lab_panel_orders()
 
     @classmethod
     def extract_panel_order_data(
-        cls, lab_order: models.LabOrder, panel_orders: List[models.LabPanelOrder]
+        cls,
+        lab_order: models.LabOrder,
+        panel_orders: List[models.LabPanelOrder],
+        format_settings: utils.FormatSettings = None,
     ) -> List[dict]:
         """
         Prepares data for usage as context by extracting out usefull data from other context
         and inserting those data into prepared context data
         """
+        format_settings = format_settings or utils.FormatSettings.resolve()
         panel_order_data = [
             utils.model_to_dict(lab_panel_order) for lab_panel_order in panel_orders
         ]
@@ -42,8 +47,8 @@ class LabResultGenerator:
                 panel_order.get("audit_log")
             )
             panel_order["asn"] = lab_order.asn
-            panel_order["company_theme_color"] = AppPreferences().company_theme_color
-            panel_order["text_color"] = AppPreferences().text_color
+            panel_order["company_theme_color"] = format_settings.company_theme_color
+            panel_order["text_color"] = format_settings.text_color
         return panel_order_data
 
     @classmethod
@@ -78,13 +83,19 @@ class LabResultGenerator:
             ).filter(status__iexact="approved")
             if not panel_orders.exists():
                 raise exceptions.BadRequest("No approved lab panel orders")
-            return self.extract_panel_order_data(self.lab_order, list(panel_orders))
-        return self.extract_panel_order_data(self.lab_order, self.lab_panel_orders)
+            return self.extract_panel_order_data(
+                self.lab_order, list(panel_orders), self.format_settings
+            )
+        return self.extract_panel_order_data(
+            self.lab_order, self.lab_panel_orders, self.format_settings
+        )
 
     def _render_panel_template(self, panel_order_data: dict):
-        panel_order_data = utils.ContextFormatter(panel_order_data).process()
+        panel_order_data = utils.ContextFormatter(
+            panel_order_data, self.format_settings
+        ).process()
         template_string = panel_order_data.get("panel", {}).get("template")
-        template = Template(template_string)
+        template = template_cache.get_template(template_string)
         context = Context(panel_order_data)
         template_string = template.render(context)
         panel_order_data["panel"]["template"] = template_string
@@ -124,11 +135,11 @@ class LabResultGenerator:
         )
         self.lab_order_data[
             "company_theme_color"
-        ] = AppPreferences().company_theme_color
-        self.lab_order_data["text_color"] = AppPreferences().text_color
-        self.lab_order_data["font_size"] = AppPreferences().font_size
+        ] = self.format_settings.company_theme_color
+        self.lab_order_data["text_color"] = self.format_settings.text_color
+        self.lab_order_data["font_size"] = self.format_settings.font_size
         lab_order_data = utils.ContextFormatter(
-            context_data=self.lab_order_data
+            context_data=self.lab_order_data, format_settings=self.format_settings
         ).process()
         html_content = render_to_string("lab_order_report.html", lab_order_data)
         return html_content
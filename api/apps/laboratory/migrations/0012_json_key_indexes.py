@@ -0,0 +1,26 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:04
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.fields.json
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('laboratory', '0011_alter_labpanel_template'),
+    ]
+
+    # lab orders by service center and panel orders by patient phone number
+    operations = [
+        AddIndexConcurrently(
+            model_name='laborder',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('id', 'service_center'), name='laborder_service_center_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='labpanelorder',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.fields.json.KeyTextTransform('phone_number', 'patient')), name='labpanel_patient_phone_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:08
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('laboratory', '0012_json_key_indexes'),
+    ]
+
+    # keyset pagination of lab panel orders on (created_at, id)
+    operations = [
+        AddIndexConcurrently(
+            model_name='labpanelorder',
+            index=models.Index(fields=['created_at', 'id'], name='labpanel_keyset_idx'),
+        ),
+    ]
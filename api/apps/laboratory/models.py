@@ -1,36 +1,32 @@
+from typing import List
+
 from django.db import models
-import datetime
 from django.forms.models import model_to_dict
 
 from config import preferences
-from api.includes import mail_utils, utils, exceptions
+from api.includes import mail_utils, exceptions, json_keys, sequences
 from . import utils as lab_utils
 
 
 DEFAULT_LAB_PANEL_TEMPLATE = lab_utils.get_default_lab_panel_template()
 
 
+LAB_ORDER_SEQUENCE = sequences.PeriodSequence(
+    name="laboratory_laborder",
+    model="laboratory.LabOrder",
+    field="asn",
+    prefix=lambda: preferences.AppPreferences().lab_id_prefix_code,
+    period_format="%y%m",
+    padding=6,
+)
+
+
 def generate_asn_lab_order():
     """Function generates ASN for lab order
     Uses present datetime and month as prefix
     Restarts counter for each month
     """
-    serial_no = 1
-    config = preferences.AppPreferences()
-    if utils.is_table_exist("laboratory_laborder"):
-        CURRENT_YEAR = str(datetime.datetime.utcnow().year)[2::]
-        CURRENT_MONTH = str(datetime.datetime.utcnow().month).zfill(2)
-
-        lab_orders = LabOrder.objects.filter(
-            asn__contains=f"{CURRENT_YEAR}{CURRENT_MONTH}"
-        )
-        if lab_orders.count() > 0:
-            last_lab_order = lab_orders.latest("id")
-            serial_no = int(last_lab_order.asn[-6:]) + 1
-
-    serial_no = str(serial_no).zfill(6)
-    unique_id = f"{config.lab_id_prefix_code}{CURRENT_YEAR}{CURRENT_MONTH}{serial_no}"
-    return unique_id
+    return LAB_ORDER_SEQUENCE.next_id()
 
 
 class ServiceCenter(models.Model):
@@ -136,30 +132,27 @@ class LabOrder(models.Model):
     ordering_physician = models.CharField(max_length=256, null=True, blank=True)
     doc_path = models.CharField(max_length=256, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            json_keys.key_index(
+                "service_center", "id", "laborder_service_center_id_idx"
+            ),
+        ]
+
     def __str__(self):
         return self.asn
 
     def mail_lab_result(self):
-        """Function sends mail to patient for lab result"""
-        from api.apps.laboratory.libs import LabResultGenerator
-
-        try:
-            result_generator = LabResultGenerator(
-                lab_order=self.lab_order,
-                header=preferences.AppPreferences().use_lab_mail_header,
-            )
-            file_object = result_generator.render_template_to_pdf()
-            if self.patient.get("email"):
-                email_utils = mail_utils.EmailUtil(
-                    subject="Lab Results",
-                    body="Hello!!\nThis mail contains a report of your lab report",
-                    receiver_mail=self.patient.get("email"),
-                    attachment=file_object,
-                    file_name="lab_report.pdf",
-                )
-                email_utils.send_mail()
-        except Exception as e:
-            print(e)
+        """Queues a mail to patient with the lab result"""
+        if self.patient.get("email"):
+            mail_utils.EmailUtil(
+                subject="Lab Results",
+                body="Hello!!\nThis mail contains a report of your lab report",
+                receiver_mail=self.patient.get("email"),
+                file_name="lab_report.pdf",
+                attachment_renderer=LAB_RESULT_RENDERER,
+                attachment_kwargs={"lab_order_id": self.id},
+            ).queue_mail()
 
 
 class LabPanelOrder(models.Model):
@@ -177,6 +170,12 @@ class LabPanelOrder(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        indexes = [
+            json_keys.key_index(
+                "patient", "phone_number", "labpanel_patient_phone_idx", upper=True
+            ),
+            models.Index(fields=["created_at", "id"], name="labpanel_keyset_idx"),
+        ]
         permissions = (
             ("take_specimen", "Can take specimen"),
             ("recieve_specimen", "Can receive specimen"),
@@ -205,24 +204,38 @@ class LabPanelOrder(models.Model):
         ...
 
     def mail_lab_result(self):
-        """Function sends mail to patient for lab result"""
-        from api.apps.laboratory.libs import LabResultGenerator
-
-        try:
-            result_generator = LabResultGenerator(
-                lab_order=self.lab_order,
-                lab_panel_orders=(self,),
-                header=preferences.AppPreferences().use_lab_mail_header,
-            )
-            file_object = result_generator.render_template_to_pdf()
-            if self.patient.get("email"):
-                email_utils = mail_utils.EmailUtil(
-                    subject="Lab Results",
-                    body="Hello!!\nThis mail contains a report of your lab report",
-                    receiver_mail=self.patient.get("email"),
-                    attachment=file_object,
-                    file_name="lab_report.pdf",
-                )
-                email_utils.send_mail()
-        except Exception as e:
-            print(e)
+        """Queues a mail to patient with the lab result of this panel"""
+        if self.patient.get("email"):
+            mail_utils.EmailUtil(
+                subject="Lab Results",
+                body="Hello!!\nThis mail contains a report of your lab report",
+                receiver_mail=self.patient.get("email"),
+                file_name="lab_report.pdf",
+                attachment_renderer=LAB_RESULT_RENDERER,
+                attachment_kwargs={
+                    "lab_order_id": self.lab_order_id,
+                    "lab_panel_order_ids": [self.id],
+                },
+            ).queue_mail()
+
+
+LAB_RESULT_RENDERER = "laboratory.lab_result"
+
+
+@mail_utils.attachment_renderer(LAB_RESULT_RENDERER)
+def render_lab_result(lab_order_id: int, lab_panel_order_ids: List[int] = None):
+    """Renders the lab result pdf attached to lab result mails"""
+    from api.apps.laboratory.libs import LabResultGenerator
+
+    lab_order = LabOrder.objects.get(id=lab_order_id)
+    lab_panel_orders = (
+        tuple(LabPanelOrder.objects.filter(id__in=lab_panel_order_ids))
+        if lab_panel_order_ids
+        else tuple()
+    )
+    result_generator = LabResultGenerator(
+        lab_order=lab_order,
+        lab_panel_orders=lab_panel_orders,
+        header=preferences.AppPreferences().use_lab_mail_header,
+    )
+    return result_generator.render_template_to_pdf()
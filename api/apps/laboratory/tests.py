@@ -1,3 +1,73 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from api.apps.finance import models as finance_models
+from api.apps.laboratory import libs as lab_libs
+from api.apps.laboratory import models as lab_models
+from api.apps.patient import models as patient_models
+from api.includes import utils
+
+
+class LabPanelOrderBuilderTest(TestCase):
+    def setUp(self) -> None:
+        patient = patient_models.Patient.objects.create(
+            firstname="Ada", lastname="Obi", gender="Female"
+        )
+        self.lab_order = lab_models.LabOrder.objects.create(
+            patient=utils.model_to_dict(patient), service_center={}
+        )
+        specimen_type = lab_models.LabSpecimenType.objects.create(
+            name="Blood",
+            color="red",
+            description="",
+            specimen=lab_models.LabSpecimen.objects.create(name="Serum"),
+        )
+        lab_unit = lab_models.LabUnit.objects.create(name="Chemistry")
+        observations = [
+            lab_models.LabObservation.objects.create(
+                name=f"Observation {index}", uom="mg/dl", reference_range={}
+            )
+            for index in range(6)
+        ]
+        self.panels = []
+        for index in range(3):
+            panel = lab_models.LabPanel(
+                name=f"Panel {index}",
+                obv=[{"id": obv.id} for obv in observations[: 2 * (index + 1)]]
+                + [{"id": 0}],
+                specimen_type=specimen_type,
+                lab_unit=lab_unit,
+            )
+            # saving a panel creates its billable item
+            panel._created_by, panel._bill_price, panel._cost_price = {}, 100, 0
+            panel.save()
+            self.panels.append(panel)
+
+    def populate(self, panels: list) -> list:
+        return lab_libs.LabPanelsAndOrders(
+            lab_order_id=self.lab_order.id,
+            lab_panels=panels,
+            user_data={},
+            audit_fields={},
+            payment_scheme=None,
+        ).populate_lab_panel_orders()
+
+    def test_panel_orders_are_built_and_billed_in_batch(self):
+        panel_orders = self.populate(self.panels)
+
+        self.assertEqual(3, len(panel_orders))
+        for index, panel_order in enumerate(panel_orders):
+            panel_order.refresh_from_db()
+            self.assertEqual(f"Panel {index}", panel_order.panel["name"])
+            self.assertEqual(2 * (index + 1), len(panel_order.panel["obv"]))
+            self.assertNotIn("created_at", panel_order.panel["obv"][0])
+            bill = finance_models.Bill.objects.get(id=panel_order.bill)
+            self.assertEqual(f"Panel {index}", bill.description)
+            self.assertEqual(utils.Modules.LABORATORY.value, bill.bill_source)
+
+    def test_query_count_does_not_grow_with_panels(self):
+        with CaptureQueriesContext(connection) as one_panel:
+            self.populate(self.panels[:1])
+        with self.assertNumQueries(len(one_panel)):
+            self.populate(self.panels)
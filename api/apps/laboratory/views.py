@@ -1,4 +1,4 @@
-import json
+import itertools
 
 from rest_framework import viewsets, filters, permissions, status
 from rest_framework.viewsets import mixins
@@ -11,11 +11,10 @@ from drf_spectacular.types import OpenApiTypes
 from rest_framework.decorators import action
 from django.http import HttpResponse
 from django.contrib.auth.models import User
-from django.core.serializers.json import DjangoJSONEncoder
 
 from api.includes import file_utils
-from api.includes.pagination import CustomPagination
-from api.includes import exceptions, utils
+from api.includes.pagination import CustomPagination, KeysetPagination
+from api.includes import catalog_cache, exceptions, utils
 from config import preferences
 from . import filters as lab_filters
 from . import utils as lab_utils
@@ -105,21 +104,25 @@ class LabPanelViewSet(viewsets.ModelViewSet):
     )
     def group_by_unit(self, request):
         """Group lab panels using units"""
-        lab_units = list(
-            models.LabPanel.objects.order_by("lab_unit")
-            .distinct("lab_unit")
-            .values_list("lab_unit", flat=True)
+        return catalog_cache.catalog_response(
+            request, catalog_cache.Catalogs.LAB_UNITS, lab_panels_by_unit
         )
-        lab_units = models.LabUnit.objects.filter(id__in=lab_units)
 
-        response_data = []
-        for unit in lab_units:
-            lab_panels = models.LabPanel.objects.filter(lab_unit=unit)
-            lab_panels = serializers.LabPanelSerializer(lab_panels, many=True).data
-            data = {"lab_unit": unit.name, "lab_panels": lab_panels}
 
-            response_data.append(data)
-        return Response(data=response_data, status=status.HTTP_200_OK)
+def lab_panels_by_unit() -> list:
+    """Lab panels grouped by unit, loaded in one query"""
+    lab_panels = models.LabPanel.objects.select_related("lab_unit").order_by(
+        "lab_unit_id", "id"
+    )
+    return [
+        {
+            "lab_unit": unit.name,
+            "lab_panels": serializers.LabPanelSerializer(panels, many=True).data,
+        }
+        for unit, panels in itertools.groupby(
+            lab_panels, key=lambda panel: panel.lab_unit
+        )
+    ]
 
 
 class LabOrderViewSet(viewsets.ModelViewSet):
@@ -199,7 +202,7 @@ class LabPanelOrderViewSet(
 ):
     queryset = models.LabPanelOrder.objects.all()
     serializer_class = serializers.LabPanelOrderSerializer
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
     filter_backends = [
         filters.OrderingFilter,
         DjangoFilterBackend,
@@ -375,47 +378,34 @@ class LabReportsViewset(viewsets.GenericViewSet):
                 location=OpenApiParameter.QUERY,
                 description="Print excel",
                 type=OpenApiTypes.BOOL,
-            )
+            ),
+            OpenApiParameter(
+                name="export_format",
+                location=OpenApiParameter.QUERY,
+                description="Format of exported file, xlsx or csv",
+                type=OpenApiTypes.STR,
+            ),
         ]
     )
     def list(self, request, *args):
         """Get reports data"""
         queryset = self.filter_queryset(self.get_queryset())
-        to_excel: bool = request.query_params.get("to_excel")
+        to_excel: bool = utils.str_to_bool(request.query_params.get("to_excel"))
+        if to_excel:
+            records = file_utils.iter_serialized_records(
+                queryset,
+                self.get_serializer_class(),
+                context=self.get_serializer_context(),
+            )
+            return file_utils.export_response(
+                records,
+                "lab_reports",
+                file_utils.get_export_format(request.query_params.get("export_format")),
+            )
 
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            data = serializer.data
-            if not to_excel:
-                return self.get_paginated_response(data)
-            else:
-                serializer = self.get_serializer(queryset, many=True)
-                data = utils.to_report_structure(
-                    json.loads(json.dumps(serializer.data, cls=DjangoJSONEncoder))
-                )
-                excel_bytes = file_utils.FileUtils().write_excel_file(data)
-                response = HttpResponse(
-                    excel_bytes, content_type="application/vnd.ms-excel"
-                )
-                response[
-                    "Content-Disposition"
-                ] = "attachment; filename=lab_reports.xlsx"
-                return response
-        else:
-            serializer = self.get_serializer(queryset, many=True)
-            data = serializer.data
-            if not to_excel:
-                return Response(data)
-            else:
-                data = utils.to_report_structure(
-                    json.loads(json.dumps(data, cls=DjangoJSONEncoder))
-                )
-                excel_bytes = file_utils.FileUtils().write_excel_file(data)
-                response = HttpResponse(
-                    excel_bytes, content_type="application/vnd.ms-excel"
-                )
-                response[
-                    "Content-Disposition"
-                ] = "attachment; filename=lab_reports.xlsx"
-                return response
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
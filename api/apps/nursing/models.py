@@ -7,7 +7,7 @@ from django.contrib.auth.models import User
 from django.utils.crypto import get_random_string
 from pydantic import BaseModel, root_validator, Field
 
-from api.includes import exceptions, utils
+from api.includes import exceptions, sequences, utils
 from api.includes.models import DateHistoryTracker, UserHistoryTracker
 from config import preferences
 
@@ -19,6 +19,14 @@ NURSING_TASK_ID_PREFIX = (
     f"{preferences.AppPreferences().nursing_task_activity_id_prefix_code}"
 )
 
+NURSING_ORDER_SEQUENCE = sequences.PeriodSequence(
+    name="nursing_nursingorder",
+    model="nursing.NursingOrder",
+    field="order_id",
+    prefix=lambda: preferences.AppPreferences().nursing_task_id_prefix_code,
+    period_format=utils.SEC_ID_PERIOD_FORMAT,
+)
+
 
 class NursingOrderStatus(models.TextChoices):
     OPEN = "OPEN"
@@ -190,12 +198,7 @@ class NursingOrder(DateHistoryTracker, UserHistoryTracker):
     def save(self, *args, **kwargs) -> None:
         validate_nursing_tasks(self.tasks)
         if self._state.adding:
-            self.order_id = utils.generate_sec_id(
-                prefix=preferences.AppPreferences().nursing_task_id_prefix_code,
-                table_name="nursing_nursingorder",
-                model=NursingOrder,
-                search_field="order_id",
-            )
+            self.order_id = NURSING_ORDER_SEQUENCE.next_id()
         else:
             if self.status in [
                 NursingOrderStatus.CANCELLED,
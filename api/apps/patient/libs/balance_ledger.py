@@ -0,0 +1,81 @@
+from decimal import Decimal
+from typing import Callable, List, Optional
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from pydantic import BaseModel
+
+from api.apps.patient import models
+
+
+class BalanceMismatch(BaseModel):
+    patient_id: int
+    deposit: Decimal
+    reserve: Decimal
+    ledger_deposit: Decimal
+    ledger_reserve: Decimal
+
+
+def _ledger_total(field: str) -> Coalesce:
+    total = (
+        models.PatientBalanceEntry.objects.filter(patient=OuterRef("pk"))
+        .values("patient")
+        .annotate(total=Sum(field))
+        .values("total")
+    )
+    return Coalesce(
+        Subquery(total), Decimal(0), output_field=DecimalField(decimal_places=2)
+    )
+
+
+def ledger_balances(patients=None):
+    """Patients annotated with the balances replayed from their ledger
+
+    Args:
+        patients [QuerySet]: patients to replay, all by default
+
+    Returns:
+        QuerySet: dicts of patient id, balances and ledger balances
+    """
+    if patients is None:
+        patients = models.Patient.objects.all()
+    return patients.annotate(
+        ledger_deposit=_ledger_total("deposit_change"),
+        ledger_reserve=_ledger_total("reserve_change"),
+    ).values("id", "deposit", "reserve", "ledger_deposit", "ledger_reserve")
+
+
+def reconcile_balances(
+    fix: bool = False, log: Optional[Callable[[BalanceMismatch], None]] = None
+) -> List[BalanceMismatch]:
+    """Replays the balance ledger and compares it with the patient balances
+
+    Args:
+        fix [bool]: sets the balances of mismatching patients to the ledger
+            balances, with the patient row locked against balance changes
+        log [Callable]: called with each mismatch
+
+    Returns:
+        List[BalanceMismatch]: patients whose balances are not their ledger's
+    """
+    mismatches: List[BalanceMismatch] = []
+    patients = ledger_balances().exclude(
+        deposit=F("ledger_deposit"), reserve=F("ledger_reserve")
+    )
+    for balances in patients.order_by("id").iterator():
+        if fix:
+            with transaction.atomic():
+                patient = models.Patient.objects.select_for_update().filter(
+                    id=balances["id"]
+                )
+                balances = ledger_balances(patient).get()
+                patient.update(
+                    deposit=balances["ledger_deposit"],
+                    reserve=balances["ledger_reserve"],
+                )
+        mismatch = BalanceMismatch(patient_id=balances.pop("id"), **balances)
+        mismatches.append(mismatch)
+        if log:
+            log(mismatch)
+    return mismatches
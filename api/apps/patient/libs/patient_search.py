@@ -0,0 +1,97 @@
+"""
+Ranked patient search for the front desk.
+
+Patients are searched by their search text, their names, UHID and phone
+number in lower case, which has a pg_trgm GIN index on the same expression
+(see migration 0009_patient_search). It is not stored, so it stays out of
+serializers and snapshots; queries reach it through search_text().
+"""
+import re
+from typing import List
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q, TextField
+from django.db.models.expressions import RawSQL
+
+from api.includes import exceptions
+from api.apps.patient import models
+
+SEARCH_FIELDS = (
+    "id",
+    "uhid",
+    "salutation",
+    "firstname",
+    "middlename",
+    "lastname",
+    "gender",
+    "date_of_birth",
+    "phone_number",
+    "email",
+    "payment_scheme",
+)
+MAX_LIMIT = 100
+
+PHONE_PATTERN = re.compile(r"\+?\d[\d\s-]*")
+PHONE_SEPARATORS = re.compile(r"[\s-]")
+
+
+# the expression of the search index, queries only use the index when they
+# search on the same expression
+SEARCH_TEXT = """lower(regexp_replace(trim(
+    coalesce({table}.firstname, '') || ' ' || coalesce({table}.middlename, '') || ' '
+    || coalesce({table}.lastname, '') || ' ' || coalesce({table}.uhid, '') || ' '
+    || coalesce({table}.phone_number, '')
+), '[[:space:]]+', ' ', 'g'))"""
+
+
+def search_text() -> RawSQL:
+    table = f'"{models.Patient._meta.db_table}"'
+    return RawSQL(SEARCH_TEXT.format(table=table), (), output_field=TextField())
+
+
+def search_patients(term: str, limit: int = 20) -> List[models.Patient]:
+    """Searches patients by name, UHID or phone number
+
+    A term shaped like a phone number or a UHID is first looked up as a
+    prefix of those columns. Otherwise, or when that finds nothing, the
+    patients are ranked by the trigram similarity of the term to words
+    of their search text.
+
+    Args:
+        term [str]: text typed at the front desk
+        limit [int]: maximum number of patients returned
+
+    Returns:
+        List[Patient]: best matches first, with only SEARCH_FIELDS loaded
+
+    Raises:
+        BadRequest: If the term is empty
+    """
+    term = " ".join(term.split())
+    if not term:
+        raise exceptions.BadRequest("Search term is required")
+    limit = max(1, min(limit, MAX_LIMIT))
+    queryset = models.Patient.objects.only(*SEARCH_FIELDS)
+
+    if PHONE_PATTERN.fullmatch(term):
+        phone = PHONE_SEPARATORS.sub("", term)
+        matches = queryset.filter(phone_number__startswith=phone)
+        matches = list(matches.order_by("phone_number", "id")[:limit])
+        if matches:
+            return matches
+    elif " " not in term and any(char.isdigit() for char in term):
+        matches = queryset.filter(uhid__startswith=term.upper())
+        matches = list(matches.order_by("uhid")[:limit])
+        if matches:
+            return matches
+
+    text = term.lower()
+    matches = (
+        queryset.alias(search_text=search_text())
+        .filter(
+            Q(search_text__contains=text) | Q(search_text__trigram_word_similar=text)
+        )
+        .annotate(rank=TrigramWordSimilarity(text, search_text()))
+        .order_by("-rank", "id")
+    )
+    return list(matches[:limit])
@@ -15,6 +15,7 @@ class Command(BaseCommand):
         # clear all patient records
         patients = patient_models.Patient.objects.all()
         patients.update(deposit=0, reserve=0, payment_scheme=[])
+        patient_models.PatientBalanceEntry.objects.all().delete()
         self.stdout.write(self.style.SUCCESS("Patient records updated"))
 
         # clear all laboaatory models
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from api.apps.patient.libs import balance_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "replay the patient balance ledger and report patients whose deposit"
+        " or reserve differ from it"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="set the balances of mismatching patients to their ledger's",
+        )
+
+    def log_mismatch(self, mismatch: balance_ledger.BalanceMismatch):
+        self.stdout.write(
+            self.style.WARNING(
+                f"patient {mismatch.patient_id}:"
+                f" deposit {mismatch.deposit} ledger {mismatch.ledger_deposit},"
+                f" reserve {mismatch.reserve} ledger {mismatch.ledger_reserve}"
+            )
+        )
+
+    def handle(self, *args, **options):
+        mismatches = balance_ledger.reconcile_balances(
+            fix=options["fix"], log=self.log_mismatch
+        )
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("patient balances match the ledger"))
+        elif options["fix"]:
+            self.stdout.write(
+                self.style.SUCCESS(f"{len(mismatches)} patient balances fixed")
+            )
+        else:
+            self.stdout.write(
+                self.style.ERROR(f"{len(mismatches)} patient balances mismatch")
+            )
@@ -0,0 +1,42 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:11
+
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+# the index is on the search text expression of api.apps.patient.libs
+# .patient_search, which must stay the same for queries to use the index
+CREATE_SEARCH_INDEX = """
+CREATE INDEX CONCURRENTLY patient_search_trgm_idx
+ON patient_patient USING gin ((
+    lower(regexp_replace(trim(
+        coalesce(firstname, '') || ' ' || coalesce(middlename, '') || ' '
+        || coalesce(lastname, '') || ' ' || coalesce(uhid, '') || ' '
+        || coalesce(phone_number, '')
+    ), '[[:space:]]+', ' ', 'g'))
+) gin_trgm_ops)
+"""
+DROP_SEARCH_INDEX = "DROP INDEX CONCURRENTLY IF EXISTS patient_search_trgm_idx"
+
+
+class Migration(migrations.Migration):
+    # the search index is on an expression, not a stored column, so building
+    # it concurrently, outside a transaction, neither rewrites the patient
+    # table nor blocks writes to it
+    atomic = False
+
+    dependencies = [
+        ('patient', '0008_alter_patient_date_of_birth'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(CREATE_SEARCH_INDEX, DROP_SEARCH_INDEX),
+        AddIndexConcurrently(
+            model_name='patient',
+            index=models.Index(fields=['uhid'], name='patient_uhid_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='patient',
+            index=models.Index(fields=['phone_number'], name='patient_phone_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# existing balances open the ledger of each patient
+OPEN_LEDGER = """
+INSERT INTO patient_patientbalanceentry
+    (patient_id, entry_type, deposit_change, reserve_change, created_at)
+SELECT id, 'OPENING_BALANCE', deposit, reserve, now()
+FROM patient_patient
+WHERE deposit <> 0 OR reserve <> 0
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0009_patient_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientBalanceEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('OPENING_BALANCE', 'OPENING_BALANCE'), ('DEPOSIT', 'DEPOSIT'), ('RESERVE', 'RESERVE'), ('UNRESERVE', 'UNRESERVE'), ('PAY_FROM_RESERVE', 'PAY_FROM_RESERVE'), ('PAY_FROM_DEPOSIT', 'PAY_FROM_DEPOSIT'), ('REFUND_TO_RESERVE', 'REFUND_TO_RESERVE')], max_length=50)),
+                ('deposit_change', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('reserve_change', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_entries', to='patient.patient')),
+            ],
+            options={
+                'verbose_name_plural': 'Patient Balance Entries',
+            },
+        ),
+        migrations.RunSQL(OPEN_LEDGER, migrations.RunSQL.noop),
+    ]
@@ -1,28 +1,31 @@
-import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Optional, Union
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 
-from api.includes import utils
+from api.includes import exceptions, utils, sequences, snapshots
 from api.apps.core import models as core_models
 from config import preferences
 
 # Create your models here.
 
 
-def generate_uhid():
-    config = preferences.AppPreferences()
-    serial_no = 1
-    if utils.is_table_exist("patient_patient"):
-        CURRENT_YEAR = str(datetime.datetime.utcnow().year)[2::]
-        patients = Patient.objects.filter(uhid__contains=str(CURRENT_YEAR))
-        if patients.count() > 0:
-            last_patient = patients.latest("id")
-            serial_no = int(last_patient.uhid[-6:]) + 1
+UHID_SEQUENCE = sequences.PeriodSequence(
+    name="patient_patient",
+    model="patient.Patient",
+    field="uhid",
+    prefix=lambda: preferences.AppPreferences().patient_prefix_code,
+    period_format="%y",
+    padding=6,
+)
+
 
-    serial_no = str(serial_no).zfill(6)
-    unique_id = f"{config.patient_prefix_code}{CURRENT_YEAR}{serial_no}"
-    return unique_id
+def generate_uhid():
+    """Generates patient UHID, counter restarts each year"""
+    return UHID_SEQUENCE.next_id()
 
 
 class Patient(models.Model):
@@ -57,6 +60,19 @@ class Patient(models.Model):
     class Meta:
         verbose_name_plural = "Patients"
         permissions = (("patient_deposit", "Can deposit to patient"),)
+        # prefix searches, see libs.patient_search
+        indexes = [
+            models.Index(
+                fields=["uhid"],
+                name="patient_uhid_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+            models.Index(
+                fields=["phone_number"],
+                name="patient_phone_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
 
     def to_dict(self):
         patient_data: dict = utils.model_to_dict(self)
@@ -71,26 +87,139 @@ class Patient(models.Model):
     def __str__(self):
         return self.full_name()
 
+    def change_balance(
+        self,
+        entry_type: "BalanceEntryType",
+        deposit_change: Union[Decimal, float] = 0,
+        reserve_change: Union[Decimal, float] = 0,
+    ) -> Optional["PatientBalanceEntry"]:
+        """Records a balance change and reloads the balances"""
+        entry = PatientBalanceEntry.record(
+            self.id, entry_type, deposit_change, reserve_change
+        )
+        self.refresh_from_db(fields=["deposit", "reserve"])
+        return entry
+
     def add_deposit(self, amount: float):
-        self.deposit += amount
-        self.save()
+        self.change_balance(BalanceEntryType.DEPOSIT, deposit_change=amount)
 
     def send_to_reserve(self, amount: float):
-        self.deposit -= amount
-        self.reserve += amount
-        self.save()
+        self.change_balance(
+            BalanceEntryType.RESERVE, deposit_change=-amount, reserve_change=amount
+        )
+
+    def release_reserve(self, amount: float):
+        self.change_balance(
+            BalanceEntryType.UNRESERVE, deposit_change=amount, reserve_change=-amount
+        )
 
     def pay_from_reserve(self, amount: float):
-        self.reserve -= amount
-        self.save()
+        self.change_balance(BalanceEntryType.PAY_FROM_RESERVE, reserve_change=-amount)
 
     def pay_from_deposit(self, amount: float):
-        self.deposit -= amount
-        self.save()
+        self.change_balance(BalanceEntryType.PAY_FROM_DEPOSIT, deposit_change=-amount)
 
     def refund_to_reserve(self, amount: float):
-        self.reserve += amount
-        self.save()
+        self.change_balance(BalanceEntryType.REFUND_TO_RESERVE, reserve_change=amount)
+
+
+class BalanceEntryType(str, Enum):
+    OPENING_BALANCE = "OPENING_BALANCE"
+    DEPOSIT = "DEPOSIT"
+    RESERVE = "RESERVE"
+    UNRESERVE = "UNRESERVE"
+    PAY_FROM_RESERVE = "PAY_FROM_RESERVE"
+    PAY_FROM_DEPOSIT = "PAY_FROM_DEPOSIT"
+    REFUND_TO_RESERVE = "REFUND_TO_RESERVE"
+
+    @classmethod
+    def choices(cls):
+        return tuple((i.name, i.value) for i in cls)
+
+    def __str__(self):
+        return self.value
+
+
+class PatientBalanceEntry(models.Model):
+    """
+    Append only ledger of the changes to patient deposit and reserve.
+    Patient.deposit and Patient.reserve hold the current balances, the sum
+    of the entries, see the reconcile_patient_balances command.
+    """
+
+    patient = models.ForeignKey(
+        Patient, on_delete=models.CASCADE, related_name="balance_entries"
+    )
+    entry_type = models.CharField(max_length=50, choices=BalanceEntryType.choices())
+    deposit_change = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    reserve_change = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Patient Balance Entries"
+
+    def __str__(self):
+        return f"{self.entry_type} {self.patient_id}"
+
+    @classmethod
+    def record(
+        cls,
+        patient_id: int,
+        entry_type: BalanceEntryType,
+        deposit_change: Union[Decimal, float] = 0,
+        reserve_change: Union[Decimal, float] = 0,
+    ) -> Optional["PatientBalanceEntry"]:
+        """Changes the balances of a patient and appends the change to the ledger
+
+        Only the balance columns are updated, in place, so concurrent changes
+        add up. The update keeps the patient row locked until the transaction
+        ends and does not apply if a debit is more than the balance.
+
+        Args:
+            patient_id [int]: id of the patient
+            entry_type [BalanceEntryType]: reason of the change
+            deposit_change [Decimal]: amount added to the deposit, negative
+                for a debit
+            reserve_change [Decimal]: amount added to the reserve, negative
+                for a debit
+
+        Returns:
+            PatientBalanceEntry: the ledger entry, None if nothing changes
+
+        Raises:
+            BadRequest: If a debit is more than the balance
+            NotFoundException: If the patient does not exist
+        """
+        deposit_change = Decimal(str(deposit_change))
+        reserve_change = Decimal(str(reserve_change))
+        if not deposit_change and not reserve_change:
+            return None
+        sufficient = {}
+        if deposit_change < 0:
+            sufficient["deposit__gte"] = -deposit_change
+        if reserve_change < 0:
+            sufficient["reserve__gte"] = -reserve_change
+
+        with transaction.atomic():
+            updated = Patient.objects.filter(id=patient_id, **sufficient).update(
+                deposit=F("deposit") + deposit_change,
+                reserve=F("reserve") + reserve_change,
+            )
+            if not updated:
+                if not Patient.objects.filter(id=patient_id).exists():
+                    raise exceptions.NotFoundException("Patient not found")
+                if "deposit__gte" in sufficient:
+                    raise exceptions.BadRequest("Not enough deposit")
+                raise exceptions.BadRequest("Not enough reserve")
+            # the update does not save the patient, snapshots taken before
+            # it hold the old balances
+            snapshots.forget(Patient, patient_id)
+            return cls.objects.create(
+                patient_id=patient_id,
+                entry_type=str(entry_type),
+                deposit_change=deposit_change,
+                reserve_change=reserve_change,
+            )
 
 
 class PatientFile(models.Model):
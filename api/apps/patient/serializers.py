@@ -12,6 +12,7 @@ from api.includes import file_utils, utils
 from api.apps.finance import models as finance_models
 from api.apps.finance import utils as finance_utils
 from api.includes import exceptions
+from .libs import patient_search
 from .models import Patient, PatientFile
 
 MAX_PATIENT_FILE_SIZE: int = 20_000_000
@@ -75,6 +76,14 @@ class PatientSerializer(serializers.ModelSerializer):
         return value
 
 
+class PatientSearchSerializer(serializers.ModelSerializer):
+    """Patient search result, without the profile picture"""
+
+    class Meta:
+        model = Patient
+        fields = patient_search.SEARCH_FIELDS
+
+
 class DepositSerializer(serializers.Serializer):
     amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=True)
     payment_method = serializers.PrimaryKeyRelatedField(
@@ -1,3 +1,78 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from api.apps.patient import models as patient_models
+from api.apps.patient.libs import balance_ledger, patient_search
+from api.includes import exceptions, snapshots, utils
+
+
+class PatientSearchTest(TestCase):
+    def setUp(self) -> None:
+        self.patients = [
+            patient_models.Patient.objects.create(
+                firstname=firstname,
+                middlename=None,
+                lastname=lastname,
+                gender="Female",
+                phone_number=phone_number,
+            )
+            for firstname, lastname, phone_number in (
+                ("Ngozi", "Okafor", "08031112222"),
+                ("Amaka", "Okoro", "08094445555"),
+            )
+        ]
+
+    def search(self, term: str) -> list:
+        return [patient.id for patient in patient_search.search_patients(term)]
+
+    def test_prefixes_and_names_find_patients(self):
+        ngozi, amaka = self.patients
+        self.assertEqual([amaka.id], self.search("0809 444"))
+        self.assertEqual([ngozi.id], self.search(ngozi.uhid.lower()))
+        self.assertEqual([ngozi.id], self.search("  ngozi   OKAFOR "))
+        self.assertIn(amaka.id, self.search("okoro"))
+        with self.assertRaises(exceptions.BadRequest):
+            patient_search.search_patients(" ")
+
+
+class BalanceLedgerTest(TestCase):
+    def setUp(self) -> None:
+        self.patient = patient_models.Patient.objects.create(
+            firstname="Ngozi", lastname="Okafor", gender="Female"
+        )
+
+    def test_balance_changes_are_recorded_and_replayed(self):
+        self.patient.add_deposit(Decimal("1000"))
+        self.patient.send_to_reserve(Decimal("400"))
+        self.patient.pay_from_reserve(Decimal("150"))
+        self.assertEqual((Decimal(600), Decimal(250)), self.balances())
+        with self.assertRaises(exceptions.BadRequest):
+            self.patient.pay_from_deposit(Decimal("601"))
+        self.assertEqual((Decimal(600), Decimal(250)), self.balances())
+        self.assertEqual(3, self.patient.balance_entries.count())
+        self.assertEqual([], balance_ledger.reconcile_balances())
+
+        patient_models.Patient.objects.filter(id=self.patient.id).update(deposit=0)
+        mismatches = balance_ledger.reconcile_balances(fix=True)
+        self.assertEqual([self.patient.id], [m.patient_id for m in mismatches])
+        self.assertEqual(Decimal(600), mismatches[0].ledger_deposit)
+        self.assertEqual([], balance_ledger.reconcile_balances())
+
+    def test_balance_changes_drop_memoized_snapshots(self):
+        with snapshots.snapshot_memo():
+            before = utils.model_to_dict(self.patient)
+            patient_models.PatientBalanceEntry.record(
+                self.patient.id,
+                patient_models.BalanceEntryType.DEPOSIT,
+                deposit_change=Decimal("250"),
+            )
+            self.patient.refresh_from_db()
+            after = utils.model_to_dict(self.patient)
+
+        self.assertEqual(Decimal(before["deposit"]), Decimal(0))
+        self.assertEqual(Decimal(after["deposit"]), Decimal(250))
+
+    def balances(self):
+        self.patient.refresh_from_db()
+        return self.patient.deposit, self.patient.reserve
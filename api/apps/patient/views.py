@@ -1,7 +1,5 @@
-import json
 import os
 
-from django.core.serializers.json import DjangoJSONEncoder
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db import transaction
 from drf_spectacular.utils import (
@@ -19,8 +17,9 @@ from rest_framework.decorators import action
 from api.apps.finance import serializers as finance_serializers
 from api.includes.pagination import CustomPagination
 from api.includes import exceptions
-from api.includes import file_utils
+from api.includes import file_utils, utils
 from .filters import PatientFilter, PatientReportFilter, PatientFileFilter
+from .libs import patient_search
 from . import models
 from . import serializers
 
@@ -34,6 +33,37 @@ class PatientViewSet(viewsets.ModelViewSet):
     ordering_fields = ["firstname", "lastname", "uhid", "id"]
     ordering = ["id"]
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                location=OpenApiParameter.QUERY,
+                description="Name, UHID or phone number",
+                type=OpenApiTypes.STR,
+                required=True,
+            ),
+            OpenApiParameter(
+                name="limit",
+                location=OpenApiParameter.QUERY,
+                description=f"Maximum results, {patient_search.MAX_LIMIT} at most",
+                type=OpenApiTypes.INT,
+            ),
+        ],
+        responses=serializers.PatientSearchSerializer(many=True),
+    )
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """Patients ranked by how well they match the search term"""
+        try:
+            limit = int(request.query_params.get("limit", 20))
+        except ValueError:
+            raise exceptions.BadRequest("limit must be a number")
+        patients = patient_search.search_patients(
+            request.query_params.get("q", ""), limit
+        )
+        serializer = serializers.PatientSearchSerializer(patients, many=True)
+        return Response(serializer.data)
+
     # get patient by uhid
     @action(detail=False, methods=["get"], url_path="uhid/(?P<uhid>[^/.]+)")
     def get_by_uhid(self, request, uhid):
@@ -118,41 +148,38 @@ class PatientsReportsViewSet(viewsets.GenericViewSet):
                 location=OpenApiParameter.QUERY,
                 description="Print excel",
                 type=OpenApiTypes.BOOL,
-            )
+            ),
+            OpenApiParameter(
+                name="export_format",
+                location=OpenApiParameter.QUERY,
+                description="Format of exported file, xlsx or csv",
+                type=OpenApiTypes.STR,
+            ),
         ]
     )
     def list(self, request, *args):
         """Get reports data"""
         queryset = self.filter_queryset(self.get_queryset())
-        to_excel: bool = request.query_params.get("to_excel")
+        to_excel: bool = utils.str_to_bool(request.query_params.get("to_excel"))
+        if to_excel:
+            records = file_utils.iter_serialized_records(
+                queryset,
+                self.get_serializer_class(),
+                context=self.get_serializer_context(),
+                report_structure=False,
+            )
+            return file_utils.export_response(
+                records,
+                "patients",
+                file_utils.get_export_format(request.query_params.get("export_format")),
+            )
 
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            data = serializer.data
-            if not to_excel:
-                return self.get_paginated_response(data)
-            else:
-                data = json.loads(json.dumps(data, cls=DjangoJSONEncoder))
-                excel_bytes = file_utils.FileUtils().write_excel_file(data)
-                response = HttpResponse(
-                    excel_bytes, content_type="application/vnd.ms-excel"
-                )
-                response["Content-Disposition"] = "attachment; filename=patients.xlsx"
-                return response
-        else:
-            serializer = self.get_serializer(queryset, many=True)
-            data = serializer.data
-            if not to_excel:
-                return Response(data)
-            else:
-                data = json.loads(json.dumps(data, cls=DjangoJSONEncoder))
-                excel_bytes = file_utils.FileUtils().write_excel_file(data)
-                response = HttpResponse(
-                    excel_bytes, content_type="application/vnd.ms-excel"
-                )
-                response["Content-Disposition"] = "attachment; filename=patients.xlsx"
-                return response
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
 
 
 @extend_schema_view(
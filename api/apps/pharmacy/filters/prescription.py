@@ -4,6 +4,7 @@ import django_filters
 
 from api.apps.pharmacy import models
 from api.apps.inventory import models as inv_models
+from api.includes import json_keys
 
 
 class PrescriptionFilter(FilterSet):
@@ -19,13 +20,12 @@ class PrescriptionFilter(FilterSet):
     patient_name = django_filters.CharFilter(
         method="filter_patient_name", label="Patient Name"
     )
-    store = (
-        django_filters.ModelMultipleChoiceFilter(
-            label="Stores",
-            field_name="store__id",
-            to_field_name="id",
-            queryset=inv_models.Store.objects.all(),
-        ),
+    store = django_filters.ModelMultipleChoiceFilter(
+        label="Stores",
+        field_name="store",
+        to_field_name="id",
+        queryset=inv_models.Store.objects.all(),
+        method="filter_store",
     )
 
     class Meta:
@@ -38,8 +38,14 @@ class PrescriptionFilter(FilterSet):
             "date",
             "fulfilled_date",
             "cancelled_date",
+            "store",
         )
 
+    def filter_store(self, queryset: QuerySet, name, value):
+        if not value:
+            return queryset
+        return json_keys.filter_key(queryset, "store", "id", value)
+
     def filter_patient_name(self, queryset: QuerySet, name, value):
         return queryset.filter(
             Q(patient__firstname__icontains=value)
@@ -5,10 +5,10 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from dateutil import parser
 from django.template.loader import render_to_string
-from django.template import Template, Context
+from django.template import Context
 
 from api.apps.pharmacy import models
-from api.includes import file_utils, utils
+from api.includes import file_utils, template_cache, utils
 from config.preferences import AppPreferences
 
 
@@ -26,13 +26,11 @@ class PrescriptionResultGenerator:
         )
         self.prescription.patient["age"] = time_difference.years
 
-    def _get_context_data(self):
+    def _get_context_data(self, format_settings: utils.FormatSettings) -> dict:
         self._inject_patient_age()
         prescription_data: dict = utils.model_to_dict(self.prescription)
         prescription_data["confirmed_at"] = self.prescription.confirmed_at
-        prescription_data = utils.format_template_context(prescription_data)
-        context = Context(prescription_data)
-        return context
+        return utils.format_template_context(prescription_data, format_settings)
 
     def _render_header(self) -> Optional[str]:
         header_str = file_utils.FileUtils().read_header()
@@ -40,19 +38,23 @@ class PrescriptionResultGenerator:
             return header_str
         return None
 
-    def _render_html(self, template_str: str):
-        template = Template(template_str)
-        context = self._get_context_data()
-        return template.render(context=context)
+    def _render_html(self, template_str: str, context_data: dict):
+        template = template_cache.get_template(template_str)
+        # a context of its own, tags setting variables do not leak across
+        return template.render(context=Context(context_data.copy()))
 
     def render_to_html(self) -> str:
+        # preferences the render is formatted with, resolved once for it
+        format_settings = utils.FormatSettings.resolve()
+        context_data = self._get_context_data(format_settings)
+        preferences = AppPreferences()
         render_context = {
             "header": self._render_header(),
-            "body": self._render_html(AppPreferences().prescription_body),
-            "footer": self._render_html(AppPreferences().prescription_footer),
-            "company_theme_color": AppPreferences().company_theme_color,
-            "text_color": AppPreferences().text_color,
-            "font_size": AppPreferences().font_size,
+            "body": self._render_html(preferences.prescription_body, context_data),
+            "footer": self._render_html(preferences.prescription_footer, context_data),
+            "company_theme_color": format_settings.company_theme_color,
+            "text_color": format_settings.text_color,
+            "font_size": format_settings.font_size,
         }
         html_content = render_to_string("prescription_main.html", render_context)
         return html_content
@@ -0,0 +1,21 @@
+# Generated by Django 4.0.4 on 2026-10-17 01:04
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.fields.json
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('pharmacy', '0004_pharmacystore'),
+    ]
+
+    # prescriptions of a store
+    operations = [
+        AddIndexConcurrently(
+            model_name='prescription',
+            index=models.Index(django.db.models.fields.json.KeyTextTransform('id', 'store'), name='prescription_store_id_idx'),
+        ),
+    ]
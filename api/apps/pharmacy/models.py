@@ -7,11 +7,19 @@ from django.utils import timezone
 from django.utils.crypto import get_random_string
 from pydantic import BaseModel, Field
 
-from api.includes import utils, exceptions, mail_utils
+from api.includes import utils, exceptions, json_keys, mail_utils, sequences
 from api.includes.models import DateHistoryTracker, UserHistoryTracker
 from api.apps.inventory import models as inv_models
 from config import preferences
 
+PRESCRIPTION_SEQUENCE = sequences.PeriodSequence(
+    name="pharmacy_prescription",
+    model="pharmacy.Prescription",
+    field="prc_id",
+    prefix=lambda: preferences.AppPreferences().prescription_id_prefix_code,
+    period_format=utils.SEC_ID_PERIOD_FORMAT,
+)
+
 ###########################################
 ########## Enums and Choices
 ###########################################
@@ -213,6 +221,7 @@ class Prescription(DateHistoryTracker, UserHistoryTracker):
 
     class Meta:
         verbose_name_plural = "Prescriptions"
+        indexes = [json_keys.key_index("store", "id", "prescription_store_id_idx")]
         permissions = (
             ("confirm_prescription", "Can confirm prescription"),
             ("cancel_prescription", "Can cancel prescription"),
@@ -225,12 +234,7 @@ class Prescription(DateHistoryTracker, UserHistoryTracker):
 
     def save(self, *args, **kwargs):
         if not self.id:
-            self.prc_id = utils.generate_sec_id(
-                prefix=preferences.AppPreferences().prescription_id_prefix_code,
-                table_name="pharmacy_prescription",
-                model=Prescription,
-                search_field="prc_id",
-            )
+            self.prc_id = PRESCRIPTION_SEQUENCE.next_id()
         else:
             old_object = Prescription.objects.get(id=self.id)
             if old_object.status != PrescriptionStatus.NEW:
@@ -287,16 +291,29 @@ class Prescription(DateHistoryTracker, UserHistoryTracker):
             raise exceptions.PermissionDenied(
                 "Inadequate Permissions to mail prescription"
             )
-        pdf_file = self.to_pdf()
+        if self.status != PrescriptionStatus.CONFIRMED:
+            raise exceptions.BadRequest("Prescription is not confirmed")
         if self.patient.get("email"):
-            try:
-                email_utils = mail_utils.EmailUtil(
-                    subject="Prescriptions",
-                    body="Hello!!\nThis mail contains a file containing your prescriptions",
-                    receiver_mail=self.patient.get("email"),
-                    attachment=pdf_file,
-                    file_name="lab_report.pdf",
-                )
-                email_utils.send_mail()
-            except Exception as e:
-                raise exceptions.ServerError("Unable to send mail")
+            mail_utils.EmailUtil(
+                subject="Prescriptions",
+                body="Hello!!\nThis mail contains a file containing your prescriptions",
+                receiver_mail=self.patient.get("email"),
+                file_name="lab_report.pdf",
+                attachment_renderer=PRESCRIPTION_PDF_RENDERER,
+                attachment_kwargs={"prescription_id": self.id},
+            ).queue_mail()
+
+
+PRESCRIPTION_PDF_RENDERER = "pharmacy.prescription_pdf"
+
+
+@mail_utils.attachment_renderer(PRESCRIPTION_PDF_RENDERER)
+def render_prescription_pdf(prescription_id: int):
+    """Renders the prescription pdf attached to prescription mails"""
+    from .libs.prescription_result_generator import PrescriptionResultGenerator
+
+    result_generator = PrescriptionResultGenerator(
+        Prescription.objects.get(id=prescription_id),
+        preferences.AppPreferences().use_presc_mail_header,
+    )
+    return result_generator.render_to_pdf()
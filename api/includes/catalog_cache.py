@@ -0,0 +1,91 @@
+"""
+Caching of the catalogs loaded by every ordering screen, lab panels grouped
+by unit and imaging observations grouped by modality.
+
+Each catalog has a version stamp in core.CatalogVersion, replaced by
+statement level triggers on the tables of the catalog (migration core
+0012_catalogversion), so any write, bulk ones included, moves it. A catalog
+is cached per database alias and stamp, and served with the stamp as its
+ETag: a request costs one query for the stamp, and clients sending the ETag
+back in If-None-Match get a 304 while the catalog is unchanged.
+"""
+from enum import Enum
+from typing import Callable, List
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import parse_etags, patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from config.middlewares.db_routing import get_current_db
+
+
+class Catalogs(str, Enum):
+    LAB_UNITS = "lab_units"
+    IMAGING_MODALITIES = "imaging_modalities"
+
+    def __str__(self):
+        return self.value
+
+
+def catalog_version(catalog: Catalogs) -> str:
+    """Current version stamp of a catalog"""
+    version_model = apps.get_model("core", "CatalogVersion")
+    # created by migration core 0012_catalogversion, or on the first write
+    version, _ = version_model.objects.get_or_create(name=str(catalog))
+    return version.version.hex
+
+
+def cached_catalog(catalog: Catalogs, version: str, build: Callable[[], List]):
+    """Data of a catalog at a version, built on a cache miss
+
+    Args:
+        catalog [Catalogs]: catalog to get
+        version [str]: version stamp of the catalog
+        build [Callable]: builds the data of the catalog
+
+    Returns:
+        List: data of the catalog
+    """
+    key = f"catalog:{get_current_db()}:{catalog}:{version}"
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+    return data
+
+
+def catalog_response(
+    request: Request, catalog: Catalogs, build: Callable[[], List]
+) -> Response:
+    """Serves a catalog, or a 304 when the client already has its version
+
+    Args:
+        request [Request]: request for the catalog
+        catalog [Catalogs]: catalog to serve
+        build [Callable]: builds the data of the catalog
+
+    Returns:
+        Response: catalog data with its ETag
+    """
+    version = catalog_version(catalog)
+    etag = f'"{version}"'
+    # weak comparison, as for conditional GETs
+    if_none_match = {
+        tag[2:] if tag.startswith("W/") else tag
+        for tag in parse_etags(request.headers.get("If-None-Match", ""))
+    }
+    if etag in if_none_match or "*" in if_none_match:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(
+            data=cached_catalog(catalog, version, build), status=status.HTTP_200_OK
+        )
+    response["ETag"] = etag
+    # clients revalidate every time, the database is picked by a header
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Db-Type"])
+    return response
@@ -0,0 +1,106 @@
+import email.parser
+import email.policy
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+_MESSAGES_PATH = re.compile(r"^/v3/[^/]+/messages$")
+
+
+class _MailgunRequestHandler(BaseHTTPRequestHandler):
+    server: "FakeMailgunServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status: int, body: str):
+        payload = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _parse_message(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        content = self.rfile.read(length)
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: "
+            + self.headers.get("Content-Type", "").encode()
+            + b"\r\n\r\n"
+            + content
+        )
+        fields, attachments = {}, []
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename():
+                attachments.append(
+                    {
+                        "name": name,
+                        "file_name": part.get_filename(),
+                        "content": part.get_payload(decode=True),
+                    }
+                )
+            else:
+                fields[name] = part.get_content().strip("\r\n")
+        return {"fields": fields, "attachments": attachments}
+
+    def do_POST(self):
+        if not _MESSAGES_PATH.match(self.path):
+            return self._respond(404, '{"message": "Not found"}')
+        status = self.server.pop_failure()
+        if status:
+            return self._respond(status, '{"message": "Fake failure"}')
+        if "multipart/form-data" in self.headers.get("Content-Type", ""):
+            message = self._parse_message()
+        else:
+            message = {"fields": {}, "attachments": []}
+        message["path"] = self.path
+        self.server.record(message)
+        self._respond(200, '{"id": "<fake@mailgun>", "message": "Queued. Thank you."}')
+
+
+class FakeMailgunServer(ThreadingHTTPServer):
+    """
+    Local stand in for the Mailgun messages endpoint, for tests and
+    development. Posted messages are recorded in `messages` and
+    `fail_next` makes the following requests fail with the given status.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _MailgunRequestHandler)
+        self.messages: List[dict] = []
+        self._failures: List[int] = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, count: int = 1, status: int = 500):
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def pop_failure(self) -> int:
+        with self._lock:
+            return self._failures.pop(0) if self._failures else 0
+
+    def record(self, message: dict):
+        with self._lock:
+            self.messages.append(message)
+
+    def start(self) -> "FakeMailgunServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="fake-mailgun", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -1,30 +1,60 @@
-import io, os, base64
+import io, os, base64, csv, itertools, json, tempfile
+from decimal import Decimal
 from enum import Enum
-from typing import List, Optional
-import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import shutil
 import pandas
-import pdfkit
+import xlsxwriter
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
 from django.template.loader import render_to_string
 
-from api.includes import utils
-from .pdf_generator import PDFGenerator
+from api.includes import exceptions, metrics, utils
+from .pdf_generator import pdf_renderer_pool
 
 from pydantic import BaseModel
 
+# rows serialized at a time by streaming exports
+EXPORT_CHUNK_SIZE = 1000
+# bytes handed to the client per iteration of a streaming export
+EXPORT_STREAM_BLOCK_SIZE = 64 * 1024
+
 
 class ExcelFileContent(BaseModel):
     headers: List[str] = []
     body: List[dict] = []
 
 
+class SheetRowError(BaseModel):
+    """Reasons a row of an uploaded sheet was not imported"""
+
+    row: int
+    code: Optional[str]
+    errors: List[str]
+
+
 class SheetRecord(BaseModel):
     sheet_name: str
     data: List[dict]
 
 
+class ExportFormat(str, Enum):
+    XLSX = "xlsx"
+    CSV = "csv"
+
+    def __str__(self):
+        return self.value
+
+
+EXPORT_CONTENT_TYPES = {
+    ExportFormat.XLSX: "application/vnd.ms-excel",
+    ExportFormat.CSV: "text/csv",
+}
+
+
 class StaticFolderType(str, Enum):
     PATIENT = "PATIENT"
 
@@ -45,47 +75,29 @@ class FileUtils:
         logo = self.get_logo_base_64()
         if not logo:
             return None
-        data = {"logo": self.get_logo_base_64(), "company": utils.get_company_data()}
+        data = {"logo": logo, "company": utils.get_company_data()}
         html_content = render_to_string("header.html", data)
         return html_content
 
-    def _get_pdf_kit_options(self, header_html: str = None):
-        options = {
-            "page-size": "A4",
-            "encoding": "UTF-8",
-            # 'header-html': header_html
-        }
-        if header_html:
-            header = tempfile.NamedTemporaryFile(suffix=".html", delete=False)
-            header_html_bytes = bytes(header_html, "utf-8")
-            header.write(header_html_bytes)
-            header.flush()
-            options["header-html"] = header.name
-            return options, header
-        return options, None
-
-    def convert_html_to_pdf(self, html_content: str, header_html: str = None):
-        """Gets html content and file name and convert to html
+    def convert_html_to_pdf(
+        self, html_content: str, header_html: str = None, footer_html: str = None
+    ):
+        """Converts html content to pdf on the shared pdf renderer pool
 
         Args:
             html_content [str]: html string content
+            header_html [str]: html repeated at the top of every page
+            footer_html [str]: html repeated at the bottom of every page
 
         Returns:
-            str: relative file path of the generated pdf content
+            bytes: pdf content
         """
-        options, header = self._get_pdf_kit_options(header_html)
-        print(options)
-        pdf_file_blob = pdfkit.from_string(html_content, verbose=True, options=options)
-        if header_html:
-            print(os.path.exists(header.name))
-            os.remove(options["header-html"])
-            print(os.path.exists(header.name))
-        if header:
-            header.close()
+        pdf_file_blob = pdf_renderer_pool.render(
+            html_content, header_html=header_html, footer_html=footer_html
+        )
         if pdf_file_blob:
             return pdf_file_blob
         raise IOError("pdf failed to create")
-        # return PDFGenerator(html_content).generate_pdf()
 
     def get_logo_base_64(self) -> Optional[str]:
         """Gets logo and converts image to base 64"""
@@ -108,7 +120,7 @@ class FileUtils:
             pandas.DataFrame: excel dataframe
         """
         try:
-            excel_file = pandas.read_excel(file_path)
+            excel_file = self.read_excel_dataframe(file_path)
             columns: pandas.Index = excel_file.columns
             headers = [column.title() for column in columns]
             body = excel_file.to_dict(orient="records")
@@ -116,6 +128,17 @@ class FileUtils:
         except ValueError as e:
             raise e
 
+    def read_excel_dataframe(self, file_path: str) -> pandas.DataFrame:
+        """Reads the first sheet of an excel file, for column wise processing
+
+        Args:
+            file_path [str]: excel file path or file object
+
+        Returns:
+            pandas.DataFrame: excel dataframe
+        """
+        return pandas.read_excel(file_path)
+
     def write_excel_file(self, data: List[dict]):
         """Writes excel file
 
@@ -125,10 +148,11 @@ class FileUtils:
         Returns:
             bytes: excel file content
         """
-        dataframe = pandas.DataFrame(data)
-        excel_file = io.BytesIO()
-        dataframe.to_excel(excel_file, index=False)
-        excel_file.seek(0)
+        with metrics.EXCEL_EXPORT_DURATION.time(format=ExportFormat.XLSX):
+            dataframe = pandas.DataFrame(data)
+            excel_file = io.BytesIO()
+            dataframe.to_excel(excel_file, index=False)
+            excel_file.seek(0)
         return excel_file
 
     def write_multiple_sheets(self, *data: SheetRecord):
@@ -137,18 +161,85 @@ class FileUtils:
         Returns:
             bytes: excel file content
         """
-        excel_file = io.BytesIO()
-        writer = pandas.ExcelWriter(excel_file, engine="openpyxl")
-        dataframes = [
-            (pandas.DataFrame(sheet.data), sheet.sheet_name) for sheet in data
-        ]
-        excel_sheets = [
-            frame[0].to_excel(writer, sheet_name=frame[1]) for frame in dataframes
-        ]
-        writer.save()
-        excel_file.seek(0)
+        with metrics.EXCEL_EXPORT_DURATION.time(format=ExportFormat.XLSX):
+            excel_file = io.BytesIO()
+            writer = pandas.ExcelWriter(excel_file, engine="openpyxl")
+            dataframes = [
+                (pandas.DataFrame(sheet.data), sheet.sheet_name) for sheet in data
+            ]
+            excel_sheets = [
+                frame[0].to_excel(writer, sheet_name=frame[1]) for frame in dataframes
+            ]
+            writer.close()
+            excel_file.seek(0)
         return excel_file
 
+    def _to_cell(self, value):
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        if isinstance(value, Decimal):
+            return float(value)
+        return str(value)
+
+    def stream_excel_file(self, records: Iterable[dict]) -> Iterator[bytes]:
+        """Writes records to an excel file one row at a time
+
+        Rows are flushed to disk as they are written, so memory use does
+        not grow with the number of records. The header is taken from the
+        keys of the first record.
+
+        Args:
+            records [Iterable[dict]]: records, consumed lazily
+
+        Returns:
+            Iterator[bytes]: blocks of the excel file content
+        """
+        with tempfile.TemporaryFile() as excel_file:
+            workbook = xlsxwriter.Workbook(
+                excel_file, {"constant_memory": True, "strings_to_urls": False}
+            )
+            worksheet = workbook.add_worksheet()
+            header_format = workbook.add_format({"bold": True, "border": 1})
+            headers = None
+            for row, record in enumerate(records, start=1):
+                if headers is None:
+                    headers = list(record)
+                    worksheet.write_row(0, 0, headers, header_format)
+                worksheet.write_row(
+                    row, 0, [self._to_cell(record.get(key)) for key in headers]
+                )
+            workbook.close()
+            excel_file.seek(0)
+            while True:
+                block = excel_file.read(EXPORT_STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                yield block
+
+    def stream_csv_file(self, records: Iterable[dict]) -> Iterator[bytes]:
+        """Writes records to a csv file, yielding content as it is written
+
+        Args:
+            records [Iterable[dict]]: records, consumed lazily
+
+        Returns:
+            Iterator[bytes]: blocks of the csv file content
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        headers = None
+        for record in records:
+            if headers is None:
+                headers = list(record)
+                writer.writerow(headers)
+            writer.writerow([self._to_cell(record.get(key)) for key in headers])
+            if buffer.tell() >= EXPORT_STREAM_BLOCK_SIZE:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
     def upload_static_file(
         self,
         folder_type: StaticFolderType,
@@ -246,3 +337,109 @@ class FileUtils:
             raise FileNotFoundError("Directory does not exist")
         shutil.rmtree(folder_dir, ignore_errors=True, onerror=None)
         return None
+
+
+def sheet_row_errors(
+    codes: pandas.Series, checks: Iterable[Tuple[pandas.Series, str]]
+) -> List[SheetRowError]:
+    """Collects the errors of the rows of an uploaded sheet
+
+    Args:
+        codes [pandas.Series]: code identifying each row, by row number
+        checks [Iterable[Tuple[pandas.Series, str]]]: mask of the rows
+            failing a check, with the error reported for them
+
+    Returns:
+        List[SheetRowError]: errors of the failing rows, by row number
+    """
+    row_errors: Dict[int, List[str]] = {}
+    for failed, message in checks:
+        for row in codes.index[failed]:
+            row_errors.setdefault(row, []).append(message)
+    return [
+        SheetRowError(row=row, code=codes[row] or None, errors=messages)
+        for row, messages in sorted(row_errors.items())
+    ]
+
+
+def get_export_format(value: Optional[str]) -> ExportFormat:
+    """Parses the export_format query parameter, defaults to xlsx
+
+    Raises:
+        BadRequest: when the format is not supported
+    """
+    try:
+        return ExportFormat((value or ExportFormat.XLSX).lower())
+    except ValueError:
+        raise exceptions.BadRequest(
+            f"Invalid export format, expected one of {[str(f) for f in ExportFormat]}"
+        )
+
+
+def iter_serialized_records(
+    records: Iterable,
+    serializer_class=None,
+    context: dict = None,
+    report_structure: bool = True,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[dict]:
+    """Serializes records for export a chunk at a time
+
+    Querysets are read with a server side cursor so only `chunk_size`
+    instances are held in memory at once.
+
+    Args:
+        records: queryset or iterable of instances
+        serializer_class: serializer used to represent each instance, records
+            already read as dicts, with .values(), are exported as read
+        context [dict]: serializer context
+        report_structure [bool]: converts keys and dates with utils.to_report_structure
+        chunk_size [int]: instances serialized at a time
+
+    Returns:
+        Iterator[dict]: json compatible records
+    """
+    if isinstance(records, QuerySet):
+        # pin the database now, the response is consumed after the view returns
+        records = records.using(records.db).iterator(chunk_size=chunk_size)
+    instances = iter(records)
+    while True:
+        chunk = list(itertools.islice(instances, chunk_size))
+        if not chunk:
+            break
+        data = chunk
+        if serializer_class is not None:
+            data = serializer_class(chunk, many=True, context=context or {}).data
+            data = json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+        if report_structure:
+            data = utils.to_report_structure(data)
+        yield from data
+
+
+def export_response(
+    records: Iterable[dict],
+    file_name: str,
+    export_format: ExportFormat = ExportFormat.XLSX,
+) -> StreamingHttpResponse:
+    """Streams records to the client as an excel or csv file
+
+    Args:
+        records [Iterable[dict]]: records, consumed while the response is sent
+        file_name [str]: file name without extension
+        export_format [ExportFormat]: file format
+
+    Returns:
+        StreamingHttpResponse: file download response
+    """
+    file_util = FileUtils()
+    if export_format == ExportFormat.CSV:
+        content = file_util.stream_csv_file(records)
+    else:
+        content = file_util.stream_excel_file(records)
+    response = StreamingHttpResponse(
+        metrics.EXCEL_EXPORT_DURATION.time_iterator(content, format=export_format),
+        content_type=EXPORT_CONTENT_TYPES[export_format],
+    )
+    file_name = f"{file_name}.{export_format}"
+    response["Content-Disposition"] = f"attachment; filename={file_name}"
+    return response
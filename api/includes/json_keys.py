@@ -0,0 +1,84 @@
+"""
+Indexed lookups on keys of JSON snapshot columns.
+
+Records keep snapshots of related rows (patient, created_by, store, ...)
+in JSON columns and lists filter on their keys. A lookup such as
+``patient__id=1`` compares jsonb values and ``patient__uhid__iexact``
+casts the key, so neither can use an index on the key. Models declare
+indexes with ``key_index`` and filters go through ``filter_key``; both
+build the same expression, the key as text, upper cased for case
+insensitive keys, which lets postgres match the filter to the index.
+"""
+from typing import Any
+
+from django.db import models
+from django.db.models import ExpressionWrapper, QuerySet
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Upper
+
+
+def key_text(field: str, key: str, upper: bool = False) -> models.Func:
+    """The text of a key of a JSON column, as indexed by key_index"""
+    expression = KeyTextTransform(key, field)
+    return Upper(expression) if upper else expression
+
+
+def key_index(field: str, key: str, name: str, upper: bool = False) -> models.Index:
+    """Expression index on a key of a JSON column"""
+    return models.Index(key_text(field, key, upper), name=name)
+
+
+def _key_value(value: Any, upper: bool) -> str:
+    if isinstance(value, models.Model):
+        value = value.pk
+    value = str(value)
+    return value.upper() if upper else value
+
+
+def filter_key(
+    queryset: QuerySet, field: str, key: str, value: Any, upper: bool = False
+) -> QuerySet:
+    """Filters a queryset on a key of a JSON column, through its key_index
+
+    Args:
+        queryset [QuerySet]: queryset to filter
+        field [str]: JSON column
+        key [str]: key of the JSON objects
+        value [Any]: value or model instance, a list of them matches any,
+            None matches a missing key
+        upper [bool]: compares case insensitively
+
+    Returns:
+        QuerySet: filtered queryset
+    """
+    alias = f"{field}_{key}_{'upper' if upper else 'text'}"
+    # compared as text, a json output field would encode the values as json
+    expression = ExpressionWrapper(
+        key_text(field, key, upper), output_field=models.TextField()
+    )
+    queryset = queryset.alias(**{alias: expression})
+    if value is None:
+        return queryset.filter(**{f"{alias}__isnull": True})
+    if isinstance(value, (list, tuple, set, QuerySet)):
+        values = [_key_value(item, upper) for item in value]
+        return queryset.filter(**{f"{alias}__in": values})
+    return queryset.filter(**{alias: _key_value(value, upper)})
+
+
+def append_items(field: str, items: list) -> models.Func:
+    """A JSON array column with items appended, in the database
+
+    Args:
+        field [str]: JSON array column
+        items [list]: items to append
+
+    Returns:
+        Func: expression to update the column to
+    """
+    return models.Func(
+        models.F(field),
+        models.Value(items, output_field=models.JSONField()),
+        arg_joiner=" || ",
+        template="(%(expressions)s)",
+        output_field=models.JSONField(),
+    )
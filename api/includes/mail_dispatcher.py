@@ -0,0 +1,169 @@
+import datetime
+import logging
+import threading
+from typing import Dict, Iterable, List
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.apps.core.models import MailOutbox, MailOutboxStatus
+from api.includes import mail_utils
+from config.middlewares.db_routing import ThreadLocal
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_OUTBOX_CONFIG = {
+    "BATCH_SIZE": 20,
+    "MAX_ATTEMPTS": 8,
+    "RETRY_BASE_DELAY": 30,
+    "RETRY_MAX_DELAY": 3600,
+    "LEASE": 300,
+    "POLL_INTERVAL": 5,
+    "TIMEOUT": 30,
+}
+
+
+class MailOutboxDispatcher:
+    """
+    Drains the mail outbox of every database.
+
+    Pending mails are claimed in batches with SELECT ... FOR UPDATE SKIP
+    LOCKED and leased for LEASE seconds, so several dispatchers can run
+    side by side. Mails that fail are retried with an exponential backoff
+    and marked dead after MAX_ATTEMPTS attempts or when the provider
+    rejects them outright.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_attempts: int,
+        retry_base_delay: int,
+        retry_max_delay: int,
+        lease: int,
+        timeout: int,
+        base_url: str = None,
+        databases: Iterable[str] = None,
+    ):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.lease = lease
+        self.timeout = timeout
+        self.base_url = base_url
+        self.databases = list(databases or settings.DATABASES)
+        self.session = mail_utils.get_mail_session(pool_size=batch_size)
+
+    @classmethod
+    def from_settings(cls, **overrides) -> "MailOutboxDispatcher":
+        config = {**_DEFAULT_OUTBOX_CONFIG, **getattr(settings, "MAIL_OUTBOX", {})}
+        kwargs = dict(
+            batch_size=config["BATCH_SIZE"],
+            max_attempts=config["MAX_ATTEMPTS"],
+            retry_base_delay=config["RETRY_BASE_DELAY"],
+            retry_max_delay=config["RETRY_MAX_DELAY"],
+            lease=config["LEASE"],
+            timeout=config["TIMEOUT"],
+        )
+        kwargs.update({key: value for key, value in overrides.items() if value})
+        return cls(**kwargs)
+
+    def get_retry_delay(self, attempts: int) -> int:
+        """Seconds to wait before the next attempt of a mail that failed `attempts` times"""
+        return min(self.retry_base_delay * 2 ** (attempts - 1), self.retry_max_delay)
+
+    def claim_batch(self, alias: str) -> List[MailOutbox]:
+        """Locks and leases the next batch of due mails of a database"""
+        now = timezone.now()
+        with transaction.atomic(using=alias):
+            mails = list(
+                MailOutbox.objects.using(alias)
+                .select_for_update(skip_locked=True)
+                .filter(status=MailOutboxStatus.PENDING, next_attempt_at__lte=now)
+                .filter(Q(locked_until__isnull=True) | Q(locked_until__lte=now))
+                .order_by("next_attempt_at")[: self.batch_size]
+            )
+            MailOutbox.objects.using(alias).filter(
+                id__in=[mail.id for mail in mails]
+            ).update(locked_until=now + datetime.timedelta(seconds=self.lease))
+        return mails
+
+    def _is_permanent_failure(self, error: Exception) -> bool:
+        response = getattr(error, "response", None)
+        if response is None:
+            return False
+        return 400 <= response.status_code < 500 and response.status_code != 429
+
+    def send(self, alias: str, mail: MailOutbox) -> bool:
+        """Sends one claimed mail and records the outcome
+
+        Returns:
+            bool: True when the mail was sent
+        """
+        email_util = mail_utils.EmailUtil(
+            subject=mail.subject,
+            body=mail.body,
+            receiver_mail=mail.receiver_mail,
+            attachment=bytes(mail.attachment) if mail.attachment else None,
+            file_name=mail.file_name,
+            attachment_renderer=mail.attachment_renderer,
+            attachment_kwargs=mail.attachment_kwargs,
+        )
+        attempts = mail.attempts + 1
+        try:
+            email_util.send_mail(
+                session=self.session, base_url=self.base_url, timeout=self.timeout
+            )
+        except Exception as e:
+            logger.warning("mail outbox %s:%s failed: %s", alias, mail.id, e)
+            is_dead = attempts >= self.max_attempts or (
+                isinstance(e, requests.HTTPError) and self._is_permanent_failure(e)
+            )
+            MailOutbox.objects.using(alias).filter(id=mail.id).update(
+                status=MailOutboxStatus.DEAD if is_dead else MailOutboxStatus.PENDING,
+                attempts=attempts,
+                next_attempt_at=timezone.now()
+                + datetime.timedelta(seconds=self.get_retry_delay(attempts)),
+                locked_until=None,
+                last_error=str(e),
+                updated_at=timezone.now(),
+            )
+            return False
+        MailOutbox.objects.using(alias).filter(id=mail.id).update(
+            status=MailOutboxStatus.SENT,
+            attempts=attempts,
+            locked_until=None,
+            last_error=None,
+            sent_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        return True
+
+    def dispatch_once(self) -> Dict[str, int]:
+        """Sends one batch of due mails from every database
+
+        Returns:
+            Dict[str, int]: number of mails sent per database
+        """
+        sent = {}
+        for alias in self.databases:
+            # attachment renderers query through the db router
+            setattr(ThreadLocal, "DB", alias)
+            sent[alias] = sum(
+                self.send(alias, mail) for mail in self.claim_batch(alias)
+            )
+        return sent
+
+    def run(self, poll_interval: int, stop_event: threading.Event = None):
+        """Dispatches mails until `stop_event` is set, sleeping
+        `poll_interval` seconds whenever the outboxes are drained
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            sent = self.dispatch_once()
+            if not any(sent.values()):
+                stop_event.wait(poll_interval)
@@ -1,7 +1,44 @@
-from requests_futures.sessions import FuturesSession
+from typing import Callable, Dict, Optional
 
+import requests
+from requests.adapters import HTTPAdapter
+
+from api.includes import metrics
 from config import preferences
 
+MAIL_REQUEST_TIMEOUT = 30
+
+ATTACHMENT_RENDERERS: Dict[str, Callable[..., bytes]] = {}
+
+
+def attachment_renderer(name: str):
+    """Registers a function that renders a mail attachment at dispatch time.
+    The function is called with the attachment kwargs saved on the outbox
+    row and must return the attachment bytes.
+    """
+
+    def decorator(func: Callable[..., bytes]):
+        ATTACHMENT_RENDERERS[name] = func
+        return func
+
+    return decorator
+
+
+def render_attachment(name: str, **kwargs) -> bytes:
+    renderer = ATTACHMENT_RENDERERS.get(name)
+    if renderer is None:
+        raise KeyError(f"No attachment renderer registered as {name}")
+    return renderer(**kwargs)
+
+
+def get_mail_session(pool_size: int = 10) -> requests.Session:
+    """Creates a keep alive session for talking to the mail provider"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
 class EmailUtil:
     def __init__(
@@ -11,36 +48,84 @@ class EmailUtil:
         receiver_mail: str,
         attachment: bytes = None,
         file_name: str = None,
+        attachment_renderer: str = None,
+        attachment_kwargs: dict = None,
     ):
-        app_conf = preferences.AppPreferences()
         self.subject = subject
         self.body = body
         self.receiver_mail: str = receiver_mail
         self.attachment: bytes = attachment
         self.file_name: str = file_name
-        self.company_mail: str = app_conf.company_mail
-        self.mail_domain: str = app_conf.mail_domain
-        self.mail_api_key: str = app_conf.mail_api_key
-        self.mail_provider_base_url: str = app_conf.mail_provider_base_url
-
-    def send_mail(self):
-        """Send the email with or without attachment"""
-        session = FuturesSession()
-        url = f"{self.mail_provider_base_url}/v3/{self.mail_domain}/messages"
-        data = session.post(
-            url,
-            auth=("api", self.mail_api_key),
-            files=(
-                [("attachment", (self.file_name, self.attachment))]
-                if self.attachment
-                else None
-            ),
-            data={
-                "from": self.company_mail,
-                "to": self.receiver_mail,
-                "subject": self.subject,
-                "body": self.body,
-                "text": self.body,
-            },
+        self.attachment_renderer: Optional[str] = attachment_renderer
+        self.attachment_kwargs: dict = attachment_kwargs or {}
+
+    def queue_mail(self):
+        """Saves the mail to the outbox, it is sent by the outbox dispatcher
+        once the current transaction commits
+
+        Returns:
+            MailOutbox: queued mail
+        """
+        from api.apps.core.models import MailOutbox
+
+        attachment = self.attachment
+        if hasattr(attachment, "getvalue"):
+            attachment = attachment.getvalue()
+        return MailOutbox.objects.create(
+            subject=self.subject,
+            body=self.body,
+            receiver_mail=self.receiver_mail,
+            file_name=self.file_name,
+            attachment=attachment,
+            attachment_renderer=self.attachment_renderer,
+            attachment_kwargs=self.attachment_kwargs,
         )
-        return data
+
+    def get_attachment(self) -> Optional[bytes]:
+        if self.attachment is None and self.attachment_renderer:
+            self.attachment = render_attachment(
+                self.attachment_renderer, **self.attachment_kwargs
+            )
+        return self.attachment
+
+    def send_mail(
+        self,
+        session: requests.Session = None,
+        base_url: str = None,
+        timeout: int = MAIL_REQUEST_TIMEOUT,
+    ) -> requests.Response:
+        """Sends the email with or without attachment
+
+        Args:
+            session [requests.Session]: session to reuse connections from
+            base_url [str]: overrides the mail provider base url
+            timeout [int]: seconds to wait for the mail provider
+
+        Raises:
+            requests.RequestException: when the provider rejects the mail
+        """
+        app_conf = preferences.AppPreferences()
+        session = session or get_mail_session(pool_size=1)
+        base_url = base_url or app_conf.mail_provider_base_url
+        url = f"{base_url}/v3/{app_conf.mail_domain}/messages"
+        attachment = self.get_attachment()
+        with metrics.MAIL_SEND_DURATION.time_outcome():
+            response = session.post(
+                url,
+                auth=("api", app_conf.mail_api_key),
+                files=(
+                    [("attachment", (self.file_name, attachment))]
+                    if attachment
+                    else None
+                ),
+                data={
+                    "from": app_conf.company_mail,
+                    "to": self.receiver_mail,
+                    "subject": self.subject,
+                    "body": self.body,
+                    "text": self.body,
+                },
+                timeout=timeout,
+            )
+            response.raise_for_status()
+        return response
@@ -0,0 +1,390 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_TIME_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+_LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict) -> _LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def values(self) -> dict:
+        """Copy of the values observed in this process, by label values"""
+        raise NotImplementedError
+
+    def merge(self, values: dict, key: _LabelValues, state):
+        """Adds the state of one label set to values"""
+        raise NotImplementedError
+
+    def collect(self, values: dict) -> List[str]:
+        raise NotImplementedError
+
+    def render(self, values: Optional[dict] = None) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.collect(self.values() if values is None else values),
+        ]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[_LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, values: dict, key: _LabelValues, state):
+        values[key] = values.get(key, 0) + state
+
+    def collect(self, values: dict) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self, *args, buckets: Iterable[float] = DEFAULT_TIME_BUCKETS, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: count of observations per bucket, sum, total count
+        self._values: Dict[_LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the time spent in the block, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def time_outcome(self, **labels):
+        """Observes the time spent in the block with an outcome label of
+        ok, or error when the block raises
+        """
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            self.observe(time.perf_counter() - start, outcome=outcome, **labels)
+
+    def time_iterator(self, iterator: Iterable, **labels) -> Iterator:
+        """Observes the time taken to exhaust an iterator, from the first
+        request for an item
+        """
+        start = time.perf_counter()
+        try:
+            yield from iterator
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def values(self) -> dict:
+        with self._lock:
+            return {
+                key: [list(state[0]), state[1], state[2]]
+                for key, state in self._values.items()
+            }
+
+    def merge(self, values: dict, key: _LabelValues, state):
+        current = values.get(key)
+        if current is None:
+            values[key] = [list(state[0]), state[1], state[2]]
+            return
+        current[0] = [a + b for a, b in zip(current[0], state[0])]
+        current[1] += state[1]
+        current[2] += state[2]
+
+    def collect(self, values: dict) -> List[str]:
+        lines = []
+        for key, (bucket_counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(
+                self.buckets + (float("inf"),), bucket_counts
+            ):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.labelnames + ("le",), key + (_format_value(bound),)
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class QueryRecorder:
+    """Execute wrapper counting SQL queries and the time spent on them"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+    @contextmanager
+    def record(self):
+        """Records the queries run on the current thread's connections
+        within the block
+        """
+        from django.db import connections
+
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process, rendered in the prometheus text format.
+
+    Without a directory each process serves only its own values, which is
+    right for a single process server. Under several worker processes a
+    scrape reaches one worker at random, so give the registry a directory
+    shared by the workers: each process writes a snapshot of its values
+    there at most every flush_interval seconds and render sums the
+    snapshots of every process. Snapshots of exited processes are kept so
+    counters never go down; clear the directory when the server restarts.
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 1):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._flushed_at = 0.0
+        self._snapshot_pid = None
+        self._snapshot_path = None
+
+    def configure(self, directory: Optional[str], flush_interval: float = 1):
+        """Shares the values of this process through directory
+
+        Args:
+            directory [str]: directory shared by the worker processes, None
+                to serve the values of this process only
+            flush_interval [float]: seconds between two snapshots of a process
+        """
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory or None
+        self.flush_interval = flush_interval
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_TIME_BUCKETS,
+    ):
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets=buckets)
+        )
+
+    def _get_metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def _get_snapshot_path(self) -> str:
+        # a forked worker must not overwrite the snapshot of its parent
+        pid = os.getpid()
+        if self._snapshot_pid != pid:
+            self._snapshot_pid = pid
+            self._snapshot_path = os.path.join(
+                self.directory, f"{pid}-{uuid.uuid4().hex}.json"
+            )
+        return self._snapshot_path
+
+    def flush(self):
+        """Writes the values of this process to the shared directory"""
+        if not self.directory:
+            return
+        snapshot = {
+            metric.name: [[list(key), state] for key, state in metric.values().items()]
+            for metric in self._get_metrics()
+        }
+        path = self._get_snapshot_path()
+        # readers must never see a partly written snapshot
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(f"{path}.tmp", path)
+        self._flushed_at = time.monotonic()
+
+    def flush_if_due(self):
+        if (
+            self.directory
+            and time.monotonic() - self._flushed_at >= self.flush_interval
+        ):
+            self.flush()
+
+    def _get_values(self) -> Dict[str, dict]:
+        metrics = self._get_metrics()
+        if not self.directory:
+            return {metric.name: metric.values() for metric in metrics}
+
+        self.flush()
+        by_name = {metric.name: metric for metric in metrics}
+        values = {name: {} for name in by_name}
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, states in snapshot.items():
+                metric = by_name.get(name)
+                if metric is None:
+                    continue
+                for key, state in states:
+                    metric.merge(values[name], tuple(key), state)
+        return values
+
+    def render(self) -> str:
+        """Metrics in the prometheus text exposition format"""
+        values = self._get_values()
+        lines = []
+        for metric in self._get_metrics():
+            lines.extend(metric.render(values[metric.name]))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total",
+    "Requests handled, by url pattern, method and status",
+    ("route", "method", "status"),
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "Wall time spent building responses",
+    ("route", "method"),
+)
+HTTP_REQUEST_DB_QUERIES = registry.histogram(
+    "http_request_db_queries",
+    "SQL queries run per request",
+    ("route", "method"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+HTTP_REQUEST_DB_DURATION = registry.histogram(
+    "http_request_db_duration_seconds",
+    "Time spent running SQL queries per request",
+    ("route", "method"),
+)
+HTTP_RESPONSE_SIZE = registry.histogram(
+    "http_response_size_bytes",
+    "Size of response bodies",
+    ("route", "method"),
+    buckets=SIZE_BUCKETS,
+)
+PDF_RENDER_DURATION = registry.histogram(
+    "pdf_render_duration_seconds",
+    "Time spent rendering html to pdf, including waiting for a browser",
+    ("outcome",),
+)
+EXCEL_EXPORT_DURATION = registry.histogram(
+    "excel_export_duration_seconds",
+    "Time spent writing spreadsheet exports",
+    ("format",),
+)
+MAIL_SEND_DURATION = registry.histogram(
+    "mail_send_duration_seconds",
+    "Latency of posting mails to the mail provider",
+    ("outcome",),
+)
@@ -1,11 +1,126 @@
+import base64
+import binascii
+import hashlib
+import json
+import math
+from enum import Enum
+from typing import List, Optional, OrderedDict, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-from typing import OrderedDict
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CountMode(str, Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    CACHED = "cached"
+
+    def __str__(self):
+        return self.value
+
+
+def estimate_count(queryset: QuerySet) -> int:
+    """Number of rows of a queryset as estimated by the query planner"""
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_queryset(queryset: QuerySet, mode: CountMode = CountMode.EXACT) -> int:
+    """Counts the rows of a queryset
+
+    Args:
+        queryset [QuerySet]: queryset to count
+        mode [CountMode]: EXACT runs a COUNT(*). ESTIMATED takes the planner
+            estimate, counting exactly when the estimate is small enough
+            for that to be cheap. CACHED reuses an exact count of the same
+            query for a while.
+
+    Returns:
+        int: number of rows
+    """
+    config = settings.PAGINATION_COUNT
+    if mode == CountMode.ESTIMATED:
+        estimate = estimate_count(queryset)
+        if estimate >= config["ESTIMATE_THRESHOLD"]:
+            return estimate
+    elif mode == CountMode.CACHED:
+        sql, params = queryset.query.sql_with_params()
+        query = f"{queryset.db}:{sql}:{params}".encode()
+        key = f"pagination_count:{hashlib.sha1(query).hexdigest()}"
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, config["CACHE_TIMEOUT"])
+        return count
+    return queryset.count()
+
+
+class CountPaginator(DjangoPaginator):
+    """Django paginator counting the objects with a CountMode. Pages past
+    an inexact count are still served, and may be empty.
+    """
+
+    def __init__(self, *args, count_mode: CountMode = CountMode.EXACT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_mode = count_mode
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        return count_queryset(self.object_list, self.count_mode)
+
+    def validate_number(self, number):
+        if self.count_mode == CountMode.EXACT:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise self.PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise self.EmptyPage("That page number is less than 1")
+        return number
+
+    def page(self, number):
+        if self.count_mode == CountMode.EXACT:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom : bottom + self.per_page], number, self
+        )
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = "size"
+    count_query_param = "count"
+
+    def get_count_mode(self, request) -> CountMode:
+        try:
+            return CountMode(request.query_params.get(self.count_query_param, "exact"))
+        except ValueError:
+            return CountMode.EXACT
+
+    def django_paginator_class(self, object_list, per_page):
+        return CountPaginator(object_list, per_page, count_mode=self.count_mode)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_mode = self.get_count_mode(request)
+        return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data):
         response_data = OrderedDict(
@@ -21,3 +136,134 @@ class CustomPagination(PageNumberPagination):
         response = Response(response_data)
 
         return response
+
+
+class KeysetPagination(CustomPagination):
+    """
+    Pagination which switches from page numbers to keyset pagination when
+    the client sends a cursor (an empty one for the first page). Pages are
+    then ordered newest first on keyset_fields, a timestamp then a unique
+    field, and fetched with a range condition on those fields instead of
+    an OFFSET, so that deep pages cost as much as the first one. Views may
+    set keyset_fields to name their own timestamp field.
+
+    The response keeps the envelope of CustomPagination, with no
+    current_page and next and previous links carrying cursors.
+    """
+
+    cursor_query_param = "cursor"
+    keyset_fields: Sequence[str] = ("created_at", "id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor = request.query_params.get(self.cursor_query_param)
+        if self.cursor is None:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.count_mode = self.get_count_mode(request)
+        self.fields = tuple(getattr(view, "keyset_fields", self.keyset_fields))
+        self.size = self.get_page_size(request)
+        self.queryset = queryset
+        position, reverse = self.decode_cursor(queryset, self.cursor)
+
+        ordering = [f"{field}" if reverse else f"-{field}" for field in self.fields]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position, reverse))
+        rows = list(queryset[: self.size + 1])
+        has_more = len(rows) > self.size
+        rows = rows[: self.size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = self.get_position(rows[-1])
+            if position is not None and (has_more or not reverse):
+                self.previous_position = self.get_position(rows[0])
+        return rows
+
+    def after(self, position: List, reverse: bool) -> Q:
+        """Rows after a position in the page order, newest first unless
+        reversed. The bound on the first field lets its index serve the
+        range.
+        """
+        lookup = "gt" if reverse else "lt"
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            equal = {name: value for name, value in zip(self.fields, position[:index])}
+            condition |= Q(**equal, **{f"{field}__{lookup}": position[index]})
+        bound = {f"{self.fields[0]}__{lookup}e": position[0]}
+        return Q(**bound) & condition
+
+    def get_position(self, instance) -> List:
+        return [getattr(instance, field) for field in self.fields]
+
+    def encode_cursor(self, position: List, reverse: bool) -> str:
+        values = [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in position
+        ]
+        data = json.dumps({"p": values, "r": reverse}, default=str)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, queryset: QuerySet, cursor: str):
+        """Returns the position and direction a cursor points at
+
+        Raises:
+            NotFound: If the cursor is invalid
+        """
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            opts = queryset.model._meta
+            position = [
+                opts.get_field(field).to_python(value)
+                for field, value in zip(self.fields, data["p"])
+            ]
+            if len(position) != len(self.fields):
+                raise ValueError("Cursor does not match the page ordering")
+            return position, bool(data["r"])
+        except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+            raise NotFound("Invalid cursor")
+
+    def get_link(self, position: Optional[List], reverse: bool) -> Optional[str]:
+        if position is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(position, reverse)
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor is None:
+            return super().get_paginated_response(data)
+        total_count = count_queryset(self.queryset, self.count_mode)
+        response_data = OrderedDict(
+            [
+                ("total_count", total_count),
+                ("total_pages", math.ceil(total_count / self.size) or 1),
+                ("current_page", None),
+                ("next", self.get_link(self.next_position, False)),
+                ("previous", self.get_link(self.previous_position, True)),
+                ("results", data),
+            ]
+        )
+        return Response(response_data)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append(
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Cursor of the page, empty for the first page",
+                "schema": {"type": "string"},
+            }
+        )
+        return parameters
@@ -1,87 +1,215 @@
 import asyncio
-from io import BytesIO
-from typing import Union
+import os
+import threading
+from concurrent import futures
+from typing import Optional
 
-from django.template import Context
-from django.template import Template
+from django.conf import settings
 from pyppeteer import launch
 
+from api.includes import exceptions, metrics
+
 _DEFAULT_VIEWPORT_WIDTH = 1620
 _DEFAULT_VIEWPORT_HEIGHT = 1080
 
-_DEFAULT_HEADER_TEMPLATE = ""
-_DEFAULT_FOOTER_TEMPLATE = ""
+_DEFAULT_HEADER_TEMPLATE = "<span></span>"
+_DEFAULT_FOOTER_TEMPLATE = "<span></span>"
+
+_DEFAULT_POOL_CONFIG = {
+    "CONCURRENCY": 2,
+    "TIMEOUT": 60,
+    "MAX_JOBS_PER_WORKER": 200,
+    "MAX_PENDING": 20,
+    "QUEUE_TIMEOUT": 30,
+}
 
 
-class PDFGenerator:
+class _BrowserWorker:
     """
-    Generates Portable Document File (PDF) for a page using the page's HTML string.
-    Generates PNG file for images for a age using a page's HTML string
+    Wraps one long lived headless chromium process.
+    The browser is started on first use and restarted after it has
+    rendered `max_jobs` documents or failed to render one.
+    """
+
+    def __init__(self, max_jobs: int):
+        self.max_jobs = max_jobs
+        self.jobs = 0
+        self.browser = None
+
+    async def _get_browser(self):
+        if self.browser is None:
+            self.browser = await launch(
+                {
+                    "args": ["--no-sandbox"],
+                    "headless": True,
+                    "defaultViewport": {
+                        "width": _DEFAULT_VIEWPORT_WIDTH,
+                        "height": _DEFAULT_VIEWPORT_HEIGHT,
+                        "deviceScaleFactor": 1,
+                    },
+                    "handleSIGINT": False,
+                    "handleSIGTERM": False,
+                    "handleSIGHUP": False,
+                    "autoClose": True,
+                }
+            )
+            self.jobs = 0
+        return self.browser
+
+    async def render(self, html_string: str, pdf_options: dict) -> bytes:
+        browser = await self._get_browser()
+        page = await browser.newPage()
+        try:
+            await page.setContent(html_string)
+            await page.waitForSelector("body")
+            return await page.pdf(pdf_options)
+        finally:
+            self.jobs += 1
+            await page.close()
+
+    @property
+    def is_exhausted(self) -> bool:
+        return self.jobs >= self.max_jobs
+
+    async def close(self):
+        browser, self.browser = self.browser, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+
+class PDFRendererPool:
+    """
+    Renders HTML to PDF on a pool of persistent headless chromium processes.
+
+    Jobs run on an event loop owned by a background thread of the current
+    process, so browsers are started once instead of once per document.
+    At most CONCURRENCY documents render at a time, MAX_PENDING more may
+    wait for a free browser and callers beyond that wait QUEUE_TIMEOUT
+    seconds before the pool reports it is busy.
     """
 
     def __init__(
         self,
-        html_string: str,
-        viewport_width=_DEFAULT_VIEWPORT_WIDTH,
-        viewport_height=_DEFAULT_VIEWPORT_HEIGHT,
-        **pdf_options
+        concurrency: int,
+        timeout: int,
+        max_jobs_per_worker: int,
+        max_pending: int,
+        queue_timeout: int,
     ):
-        """
-        Parameters
-        :param template: The HTML string of Django template object
-        :param context: A Django render context instance that will be used to render the template
-        :param viewport_width: Width of the viewport that the page will be rendered
-        :param viewport_height: Height of the viewport that the page will be rendered
-        :param pdf_options: Extra pdf generation options that will be passed to pyppeteer pdf generation API
-        """
-        self.html_string = html_string
-        self.viewport_width = viewport_width
-        self.viewport_height = viewport_height
-        self.pdf_options = pdf_options
-        self.pdf_options.setdefault("format", "A4")
-        self.pdf_options.setdefault("displayHeaderFooter", True)
-        self.pdf_options.setdefault("printBackground", False)
-        self.pdf_options.setdefault("landscape", False)
-        self.pdf_options.setdefault("headerTemplate", _DEFAULT_HEADER_TEMPLATE)
-        self.pdf_options.setdefault("footerTemplate", _DEFAULT_FOOTER_TEMPLATE)
-        # self.pdf_options.setdefault(
-        #     "margin ",
-        #     {
-        #         "top": "60px",
-        #         "right": "60px",
-        #         "bottom": "20px",
-        #         "left": "60px",
-        #     },
-        # )
-        self._rendered_html = ""
-
-    def generate_pdf(self) -> BytesIO:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(concurrency + max_pending)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self._idle_workers: Optional[asyncio.Queue] = None
+
+    @classmethod
+    def from_settings(cls) -> "PDFRendererPool":
+        config = {**_DEFAULT_POOL_CONFIG, **getattr(settings, "PDF_RENDERER_POOL", {})}
+        return cls(
+            concurrency=config["CONCURRENCY"],
+            timeout=config["TIMEOUT"],
+            max_jobs_per_worker=config["MAX_JOBS_PER_WORKER"],
+            max_pending=config["MAX_PENDING"],
+            queue_timeout=config["QUEUE_TIMEOUT"],
+        )
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Starts the pool event loop once per process (again after a fork)"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(
+                        target=loop.run_forever, name="pdf-renderer", daemon=True
+                    ).start()
+                    self._idle_workers = None
+                    self._loop = loop
+                    self._pid = os.getpid()
+        return self._loop
+
+    def _get_idle_workers(self) -> asyncio.Queue:
+        if self._idle_workers is None:
+            self._idle_workers = asyncio.Queue()
+            for _ in range(self.concurrency):
+                self._idle_workers.put_nowait(
+                    _BrowserWorker(max_jobs=self.max_jobs_per_worker)
+                )
+        return self._idle_workers
+
+    async def _render(self, html_string: str, pdf_options: dict) -> bytes:
+        idle_workers = self._get_idle_workers()
+        worker: _BrowserWorker = await idle_workers.get()
         try:
-            return loop.run_until_complete(self._render_pdf())
+            pdf = await asyncio.wait_for(
+                worker.render(html_string, pdf_options), timeout=self.timeout
+            )
+            if worker.is_exhausted:
+                await worker.close()
+            return pdf
+        except BaseException:
+            # the browser may be wedged, start a fresh one for the next job
+            await worker.close()
+            raise
         finally:
-            loop.close()
-
-    async def _render_pdf(self) -> BytesIO:
-        browser = await launch(
-            {
-                "args": ["--no-sandbox"],
-                "headless": True,
-                "defaultViewport": {
-                    "width": self.viewport_width,
-                    "height": self.viewport_height,
-                    "deviceScaleFactor": 1,
-                },
-                "handleSIGINT": False,
-                "handleSIGTERM": False,
-                "handleSIGHUP": False,
-                "autoClose": False,
-            }
-        )
-        page = await browser.newPage()
-        await page.setContent(self.html_string)
-        await page.waitForSelector("body", options={"timeout": 0})
-        buffer = await page.pdf(**self.pdf_options)
-        await browser.close()
-        return BytesIO(buffer)
+            idle_workers.put_nowait(worker)
+
+    def render(
+        self,
+        html_string: str,
+        header_html: str = None,
+        footer_html: str = None,
+        **pdf_options,
+    ) -> bytes:
+        """Renders html to pdf
+
+        Args:
+            html_string [str]: html content of the document
+            header_html [str]: html repeated at the top of every page
+            footer_html [str]: html repeated at the bottom of every page
+            pdf_options: extra pyppeteer page.pdf options
+
+        Returns:
+            bytes: pdf content
+
+        Raises:
+            ServerError: when the pool is busy or rendering times out
+        """
+        options = {
+            "format": "A4",
+            "printBackground": True,
+            "landscape": False,
+            "displayHeaderFooter": bool(header_html or footer_html),
+            "headerTemplate": header_html or _DEFAULT_HEADER_TEMPLATE,
+            "footerTemplate": footer_html or _DEFAULT_FOOTER_TEMPLATE,
+            "margin": {
+                "top": "30mm" if header_html else "10mm",
+                "bottom": "20mm" if footer_html else "10mm",
+                "left": "10mm",
+                "right": "10mm",
+            },
+            **pdf_options,
+        }
+        with metrics.PDF_RENDER_DURATION.time_outcome():
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                raise exceptions.ServerError("PDF renderer is busy, try again later")
+            try:
+                future = asyncio.run_coroutine_threadsafe(
+                    self._render(html_string, options), self._get_loop()
+                )
+                try:
+                    return future.result(timeout=self.queue_timeout + self.timeout)
+                except (asyncio.TimeoutError, futures.TimeoutError):
+                    future.cancel()
+                    raise exceptions.ServerError("PDF rendering timed out")
+            finally:
+                self._slots.release()
+
+
+pdf_renderer_pool = PDFRendererPool.from_settings()
@@ -0,0 +1,173 @@
+"""
+Allocation of human readable serial ids (UHIDs, order ids, invoice ids etc).
+
+Serials are kept in core.SequenceCounter, one row per sequence, prefix and
+period. A serial is taken with a single upsert on the unique key, which row
+locks the counter until the surrounding transaction ends, so allocation is
+O(1) and safe across concurrent workers.
+"""
+from typing import Callable, Dict, Iterable, List, Union
+
+from django.apps import apps
+from django.db import connections, router
+from django.db.models import F
+from django.utils import timezone
+
+
+SEQUENCES: Dict[str, "PeriodSequence"] = {}
+
+
+def _counter_model():
+    return apps.get_model("core", "SequenceCounter")
+
+
+def allocate(key: str, count: int = 1, seed: Callable[[], int] = None) -> range:
+    """Reserves `count` consecutive serials of a counter
+
+    Args:
+        key [str]: counter key
+        count [int]: number of serials to reserve
+        seed [Callable]: returns the last serial already in use, called
+            only when the counter does not exist yet
+
+    Returns:
+        range: reserved serials
+    """
+    counter_model = _counter_model()
+    table = counter_model._meta.db_table
+    using = router.db_for_write(counter_model)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET value = value + %s, updated_at = now() "
+            "WHERE key = %s RETURNING value",
+            [count, key],
+        )
+        row = cursor.fetchone()
+        if row is None:
+            start = seed() if seed else 0
+            cursor.execute(
+                f"INSERT INTO {table} (key, value, updated_at) "
+                "VALUES (%s, %s, now()) ON CONFLICT (key) DO UPDATE "
+                f"SET value = {table}.value + %s, updated_at = now() "
+                "RETURNING value",
+                [key, start + count, count],
+            )
+            row = cursor.fetchone()
+    last_value = row[0]
+    return range(last_value - count + 1, last_value + 1)
+
+
+def seed_counter(key: str, value: int) -> int:
+    """Raises a counter to at least `value`, creating it when missing"""
+    counter_model = _counter_model()
+    table = counter_model._meta.db_table
+    using = router.db_for_write(counter_model)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (key, value, updated_at) "
+            "VALUES (%s, %s, now()) ON CONFLICT (key) DO UPDATE "
+            f"SET value = GREATEST({table}.value, EXCLUDED.value), "
+            "updated_at = now() RETURNING value",
+            [key, value],
+        )
+        return cursor.fetchone()[0]
+
+
+class PeriodSequence:
+    """
+    A family of id counters of the form {prefix}{period}{serial}
+
+    The period is the current date formatted with `period_format` (e.g. "%y%m"),
+    so counters restart each period. Counters that do not exist yet are seeded
+    from the latest existing id of `model` so that switching over from
+    table scans never reissues an id.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        field: str,
+        prefix: Union[str, Callable[[], str]],
+        period_format: str = "",
+        padding: int = 0,
+        order_by: str = "id",
+        prefixes: Callable[[], Iterable[str]] = None,
+    ):
+        """
+        Args:
+            name [str]: unique sequence name, usually the table name
+            model [str]: "app_label.ModelName" holding the ids
+            field [str]: model field holding the ids
+            prefix [str|Callable]: default id prefix
+            period_format [str]: strftime format of the period part
+            padding [int]: zero padding of the serial
+            order_by [str]: field used to find the latest id when seeding
+            prefixes [Callable]: every prefix in use, for seeding
+        """
+        self.name = name
+        self.model = model
+        self.field = field
+        self.prefix = prefix
+        self.period_format = period_format
+        self.padding = padding
+        self.order_by = order_by
+        self.prefixes = prefixes
+        SEQUENCES[name] = self
+
+    def get_prefix(self, prefix: str = None) -> str:
+        if prefix is not None:
+            return prefix
+        return self.prefix() if callable(self.prefix) else self.prefix
+
+    def get_period(self) -> str:
+        if not self.period_format:
+            return ""
+        return timezone.now().strftime(self.period_format)
+
+    def get_prefixes(self) -> List[str]:
+        if self.prefixes:
+            return list(self.prefixes())
+        return [self.get_prefix()]
+
+    def key(self, id_prefix: str) -> str:
+        return f"{self.name}:{id_prefix}"
+
+    def latest_serial(self, id_prefix: str) -> int:
+        """Serial of the latest stored id starting with id_prefix, 0 if none"""
+        model = apps.get_model(self.model)
+        latest_id = (
+            model.objects.filter(**{f"{self.field}__startswith": id_prefix})
+            .order_by(F(self.order_by).desc(nulls_last=True))
+            .values_list(self.field, flat=True)
+            .first()
+        )
+        serial = str(latest_id or "")[len(id_prefix) :]
+        return int(serial) if serial.isdigit() else 0
+
+    def format(self, id_prefix: str, serial: int) -> str:
+        return f"{id_prefix}{str(serial).zfill(self.padding)}"
+
+    def next_ids(self, count: int, prefix: str = None) -> List[str]:
+        """Allocates `count` consecutive ids"""
+        id_prefix = f"{self.get_prefix(prefix)}{self.get_period()}"
+        serials = allocate(
+            self.key(id_prefix),
+            count=count,
+            seed=lambda: self.latest_serial(id_prefix),
+        )
+        return [self.format(id_prefix, serial) for serial in serials]
+
+    def next_id(self, prefix: str = None) -> str:
+        return self.next_ids(1, prefix=prefix)[0]
+
+    def seed(self) -> Dict[str, int]:
+        """Seeds the current period counters of every prefix from stored ids"""
+        period = self.get_period()
+        seeded = {}
+        for prefix in self.get_prefixes():
+            id_prefix = f"{prefix}{period}"
+            key = self.key(id_prefix)
+            seeded[key] = seed_counter(key, self.latest_serial(id_prefix))
+        return seeded
+
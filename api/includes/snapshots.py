@@ -0,0 +1,218 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Type
+
+from django.db import models
+from django.db.models import prefetch_related_objects
+from django.db.models.signals import post_delete, post_save
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework_recursive.fields import RecursiveField
+
+# models whose snapshots are reused within a request, see snapshot_memo
+MEMO_MODELS = ("auth.User", "patient.Patient")
+
+_MemoKey = Tuple[str, object, FrozenSet[str], Optional[str]]
+
+_local = threading.local()
+
+
+def _json_key(key) -> str:
+    """Converts a dict key the way json.dumps does"""
+    if isinstance(key, str):
+        return key
+    if key is True:
+        return "true"
+    if key is False:
+        return "false"
+    if key is None:
+        return "null"
+    if isinstance(key, float):
+        return float.__repr__(key)
+    return str(key)
+
+
+def to_json_safe(value):
+    """Copies serializer output into plain dicts and lists"""
+    if isinstance(value, dict):
+        return {_json_key(key): to_json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_safe(item) for item in value]
+    return value
+
+
+def _build_serializer_class(
+    model: Type[models.Model], exclude_fields: FrozenSet[str]
+) -> Type[serializers.ModelSerializer]:
+    class Serializer(serializers.ModelSerializer):
+        if hasattr(model, "parent"):
+            parent = RecursiveField(allow_null=True)
+
+        class Meta:
+            depth = 1
+            exclude = tuple(exclude_fields)
+
+    Serializer.Meta.model = model
+    return Serializer
+
+
+class SnapshotPlan:
+    """
+    Field extraction plan of one model and excluded field set.
+    Building a depth=1 ModelSerializer and its fields costs far more than
+    serializing an instance, so the fields are resolved once per plan and
+    walked the way Serializer.to_representation does. Output matches
+    serializing with a fresh serializer and round tripping through json.
+    """
+
+    def __init__(self, model: Type[models.Model], exclude_fields: FrozenSet[str]):
+        self.model = model
+        self.exclude_fields = exclude_fields
+        serializer = _build_serializer_class(model, exclude_fields)()
+        self.fields = [
+            (field.field_name, field) for field in serializer._readable_fields
+        ]
+        relations = {
+            field.name
+            for field in model._meta.get_fields()
+            if (field.is_relation and not field.auto_created and field.concrete)
+            or (field.many_to_many and not field.auto_created)
+        }
+        self.relations = [name for name, _ in self.fields if name in relations]
+
+    def _to_representation(self, instance: models.Model) -> dict:
+        data = {}
+        for field_name, field in self.fields:
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            check_for_none = (
+                attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            )
+            if check_for_none is None:
+                data[field_name] = None
+            else:
+                data[field_name] = field.to_representation(attribute)
+        return to_json_safe(data)
+
+    def snapshot(self, instance: models.Model) -> dict:
+        return self._to_representation(instance)
+
+    def snapshot_many(self, instances: List[models.Model]) -> List[dict]:
+        """Snapshots instances, fetching their related objects in bulk"""
+        if self.relations:
+            prefetch_related_objects(instances, *self.relations)
+        return [self._to_representation(instance) for instance in instances]
+
+
+_plans: Dict[Tuple[Type[models.Model], FrozenSet[str]], SnapshotPlan] = {}
+_plans_lock = threading.Lock()
+
+
+def get_plan(
+    model: Type[models.Model], exclude_fields: Iterable[str] = ()
+) -> SnapshotPlan:
+    key = (model, frozenset(exclude_fields))
+    plan = _plans.get(key)
+    if plan is None:
+        with _plans_lock:
+            plan = _plans.get(key)
+            if plan is None:
+                plan = _plans[key] = SnapshotPlan(*key)
+    return plan
+
+
+def _get_memo() -> Optional[Dict[_MemoKey, dict]]:
+    return getattr(_local, "memo", None)
+
+
+def _memo_key(
+    instance: models.Model, exclude_fields: FrozenSet[str]
+) -> Optional[_MemoKey]:
+    label = instance._meta.label
+    if label not in MEMO_MODELS or instance.pk is None:
+        return None
+    return (label, instance.pk, exclude_fields, instance._state.db)
+
+
+@contextmanager
+def snapshot_memo():
+    """Reuses snapshots of MEMO_MODELS instances taken inside the block.
+    Entries of an instance are dropped whenever it is saved or deleted.
+    """
+    previous = _get_memo()
+    _local.memo = {} if previous is None else previous
+    try:
+        yield
+    finally:
+        _local.memo = previous
+
+
+def forget(model: Type[models.Model], pk) -> None:
+    """Drops memoized snapshots of a row, for writes that do not save the
+    instance (queryset updates) and so do not drop them on their own
+
+    Args:
+        model [Type[models.Model]]: model of the row
+        pk: primary key of the row
+    """
+    memo = _get_memo()
+    if memo:
+        label = model._meta.label
+        for key in list(memo):
+            if key[0] == label and key[1] == pk:
+                memo.pop(key, None)
+
+
+def _forget_instance(sender, instance: models.Model, **kwargs):
+    forget(sender, instance.pk)
+
+
+for _label in MEMO_MODELS:
+    post_save.connect(
+        _forget_instance, sender=_label, dispatch_uid=f"snapshot_memo_save_{_label}"
+    )
+    post_delete.connect(
+        _forget_instance, sender=_label, dispatch_uid=f"snapshot_memo_delete_{_label}"
+    )
+
+
+def snapshot(instance: models.Model, exclude_fields: Iterable[str] = ()) -> dict:
+    """Json safe dict of a model instance, related objects one level deep
+
+    Args:
+        instance [models.Model]: instance to snapshot
+        exclude_fields [Iterable[str]]: fields left out of the snapshot
+
+    Returns:
+        dict: snapshot
+    """
+    exclude_fields = frozenset(exclude_fields)
+    memo = _get_memo()
+    key = _memo_key(instance, exclude_fields) if memo is not None else None
+    if key is not None and key in memo:
+        return to_json_safe(memo[key])
+    data = get_plan(type(instance), exclude_fields).snapshot(instance)
+    if key is not None:
+        memo[key] = to_json_safe(data)
+    return data
+
+
+def snapshot_many(
+    instances: Iterable[models.Model], exclude_fields: Iterable[str] = ()
+) -> List[dict]:
+    """Snapshots a list of instances of one model
+
+    Args:
+        instances [Iterable[models.Model]]: instances to snapshot
+        exclude_fields [Iterable[str]]: fields left out of the snapshots
+
+    Returns:
+        List[dict]: snapshots in the order of instances
+    """
+    instances = list(instances)
+    if not instances:
+        return []
+    return get_plan(type(instances[0]), exclude_fields).snapshot_many(instances)
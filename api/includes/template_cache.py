@@ -0,0 +1,57 @@
+"""
+Compiled django templates of template sources kept in the database, lab
+panel templates and the prescription body and footer preferences.
+
+Sources are compiled once per process and kept by a hash of their content,
+so a source that changes is compiled again on its next render and a stale
+compiled template is never served. Older sources that are still rendered,
+as lab panel orders keep the template of their panel as it was ordered,
+keep their compiled template. The least recently rendered templates are
+dropped past TEMPLATE_CACHE_SIZE.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.template import Template
+
+_templates: "OrderedDict[str, Template]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def source_key(source: str) -> str:
+    """Key of a template source, a hash of its content"""
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def get_template(source: str) -> Template:
+    """Compiled template of a template source
+
+    Args:
+        source [str]: django template source
+
+    Returns:
+        Template: template compiled from the source
+    """
+    # sources are taken as strings, as Template does
+    source = str(source)
+    key = source_key(source)
+    with _lock:
+        template = _templates.get(key)
+        if template is not None:
+            _templates.move_to_end(key)
+            return template
+    # compiled outside the lock, a race only compiles a source twice
+    template = Template(source)
+    with _lock:
+        _templates[key] = template
+        while len(_templates) > settings.TEMPLATE_CACHE_SIZE:
+            _templates.popitem(last=False)
+    return template
+
+
+def clear():
+    """Drops all compiled templates"""
+    with _lock:
+        _templates.clear()
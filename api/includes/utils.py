@@ -1,7 +1,6 @@
-import re, json, string, pytz
+import string, pytz
 from datetime import datetime, timezone
 from enum import Enum
-from functools import reduce
 from typing import Mapping, Union, Set, TypeVar, Type, Iterable, Dict
 
 from django.db import connection, models
@@ -10,11 +9,9 @@ from django.db.models import Model
 from django.db.models.query import QuerySet
 from dateutil import parser
 from django.utils import timezone
-from pydantic import BaseModel, ValidationError, Field
-from rest_framework_recursive.fields import RecursiveField
-from rest_framework import serializers
+from pydantic import BaseModel, ValidationError, Field, PrivateAttr
 
-from api.includes import exceptions
+from api.includes import exceptions, snapshots
 from config.preferences import AppPreferences
 
 
@@ -22,6 +19,9 @@ DJANGO_MODEL = TypeVar("DJANGO_MODEL", bound=Model)
 PYDANTIC_SCHEMA = TypeVar("PYDANTIC_SCHEMA", bound=BaseModel)
 
 
+SEC_ID_PERIOD_FORMAT = "%Y%m"
+
+
 def jsonfield_default_value():
     return dict(vitals=[], ros=[], exam=[], diag=[], orders={}, plan=[])
 
@@ -103,14 +103,34 @@ def parse_to_timezone_aware(date: datetime):
     return date.replace(tzinfo=pytz.utc).astimezone(local_tz)
 
 
-def format_template_context(context_data: dict):
+def parse_datetime(value: str) -> datetime:
+    """Parses a datetime string, ISO 8601 ones (as snapshots hold them)
+    without going through dateutil"""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return parser.parse(value)
+
+
+def format_template_context(
+    context_data: dict, format_settings: "FormatSettings" = None
+):
     datetime_suffix = ("_at", "_datetime", "_on", "_date")
+    dateformat = (
+        format_settings.dateformat
+        if format_settings
+        else AppPreferences().company_dateformat
+    )
+
+    def format_value(value: Union[str, datetime, None]) -> Union[str, None]:
+        if value is None:
+            return value
+        if not isinstance(value, datetime):
+            value = parse_datetime(value)
+        return value.strftime(dateformat)
+
     return {
-        key: (
-            value
-            if not str(key).endswith(datetime_suffix)
-            else parser.parse(value).strftime(AppPreferences().company_dateformat)
-        )
+        key: (value if not str(key).endswith(datetime_suffix) else format_value(value))
         for key, value in context_data.items()
     }
 
@@ -182,19 +202,19 @@ def model_to_dict(instance, exclude_fields: Set = set(), **kwargs):
     """
     Convert a model instance to dict.
     """
+    parsed_data: dict = snapshots.snapshot(instance, exclude_fields)
+    parsed_data.update(kwargs)
+    return parsed_data
 
-    class Serializer(serializers.ModelSerializer):
-        if hasattr(instance, "parent"):
-            parent = RecursiveField(allow_null=True)
-
-        class Meta:
-            model = type(instance)
-            depth = 1
-            exclude = tuple(exclude_fields)
 
-    data = Serializer(instance).data
-    parsed_data: dict = json.loads(json.dumps(data))
-    parsed_data.update(kwargs)
+def models_to_dicts(instances: Iterable, exclude_fields: Set = set(), **kwargs):
+    """
+    Convert model instances of one model to dicts, fetching related
+    objects in bulk.
+    """
+    parsed_data = snapshots.snapshot_many(instances, exclude_fields)
+    for data in parsed_data:
+        data.update(kwargs)
     return parsed_data
 
 
@@ -221,45 +241,6 @@ def to_12_hour_format(date_time: datetime) -> str:
     return date_time.strftime(format)
 
 
-def generate_sec_id(
-    prefix: str,
-    table_name: str,
-    model: Type[DJANGO_MODEL],
-    search_field: str,
-    **filters,
-) -> str:
-    """
-    Creates a date generated id
-
-    Args:
-        prefix: prefix for item code
-
-    Returns:
-        str: item code
-    """
-    CURRENT_YEAR = str(timezone.now().year)
-    CURRENT_MONTH = str(timezone.now().month).zfill(2)
-    pattern_string = f"{CURRENT_YEAR}{CURRENT_MONTH}"
-    re_pattern = re.compile(f"{pattern_string}(.*)")
-    serial_no = 1
-
-    if is_table_exist(table_name):
-        if model.objects.count() > 0:
-            filter_kwargs = {
-                f"{search_field}__contains": f"{CURRENT_YEAR}{CURRENT_MONTH}",
-                **filters,
-            }
-            objects = model.objects.filter(**filter_kwargs)
-            if objects.count() > 0:
-                last_object = reduce(
-                    lambda obj1, obj2: obj1 if obj1.id > obj2.id else obj2, objects
-                )
-                search_value = getattr(last_object, search_field)
-                serial_no = int(re_pattern.findall(search_value)[-1]) + 1
-    unique_id = f"{prefix}{CURRENT_YEAR}{CURRENT_MONTH}{serial_no}"
-    return unique_id
-
-
 def validate_schema(data: Mapping, schema: Type[PYDANTIC_SCHEMA]):
     try:
         if not isinstance(data, Mapping):
@@ -326,15 +307,56 @@ class Modules(str, Enum):
         return self.value
 
 
+class FormatSettings(BaseModel):
+    """Formatting preferences of a render, resolved once for all of it.
+    Datetimes are formatted once per value for the render.
+    """
+
+    dateformat: str
+    timezone: str
+    company_theme_color: str
+    text_color: str
+    font_size: str
+    _tzinfo = PrivateAttr(default=None)
+    _formatted_datetimes: Dict[str, str] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def resolve(cls) -> "FormatSettings":
+        preferences = AppPreferences()
+        return cls(
+            dateformat=preferences.company_dateformat,
+            timezone=preferences.company_timezone,
+            company_theme_color=preferences.company_theme_color,
+            text_color=preferences.text_color,
+            font_size=preferences.font_size,
+        )
+
+    def format_datetime(self, value: str) -> str:
+        """Formats a UTC datetime string in the company timezone and format"""
+        formatted = self._formatted_datetimes.get(value)
+        if formatted is None:
+            if self._tzinfo is None:
+                self._tzinfo = pytz.timezone(self.timezone)
+            formatted = (
+                parse_datetime(value)
+                .replace(tzinfo=pytz.utc)
+                .astimezone(self._tzinfo)
+                .strftime(self.dateformat)
+            )
+            self._formatted_datetimes[value] = formatted
+        return formatted
+
+
 class ContextFormatter:
-    def __init__(self, context_data: dict) -> None:
+    def __init__(
+        self, context_data: dict, format_settings: FormatSettings = None
+    ) -> None:
         self.context_data = context_data.copy()
         self.datetime_suffix = ("_at", "_datetime", "_on", "_date")
+        self.format_settings = format_settings or FormatSettings.resolve()
 
     def _format_datetime(self, value: str) -> str:
-        return parse_to_timezone_aware(parser.parse(value)).strftime(
-            AppPreferences().company_dateformat
-        )
+        return self.format_settings.format_datetime(value)
 
     def _process_value(
         self, key: str, value: Union[str, list, dict]
@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from api.includes import metrics
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _count_bytes(content, route: str, method: str):
+    size = 0
+    try:
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+    finally:
+        metrics.HTTP_RESPONSE_SIZE.observe(size, route=route, method=method)
+
+
+class MetricsMiddleware:
+    """
+    Records the wall time, SQL queries, response size and status of each
+    request, labelled by the url pattern the request resolved to.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed()
+        metrics.registry.configure(
+            getattr(settings, "METRICS_DIR", None),
+            getattr(settings, "METRICS_FLUSH_INTERVAL", 1),
+        )
+        self.get_response = get_response
+
+    def get_route(self, request) -> str:
+        resolver_match = getattr(request, "resolver_match", None)
+        if resolver_match is None:
+            return UNMATCHED_ROUTE
+        route = resolver_match.route or resolver_match.view_name or UNMATCHED_ROUTE
+        # router patterns are regular expressions, keep the readable part
+        return route.replace("^", "").replace("$", "")
+
+    def __call__(self, request):
+        recorder = metrics.QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        route = self.get_route(request)
+        method = request.method
+        metrics.HTTP_REQUESTS.inc(
+            route=route, method=method, status=response.status_code
+        )
+        metrics.HTTP_REQUEST_DURATION.observe(duration, route=route, method=method)
+        metrics.HTTP_REQUEST_DB_QUERIES.observe(
+            recorder.count, route=route, method=method
+        )
+        metrics.HTTP_REQUEST_DB_DURATION.observe(
+            recorder.duration, route=route, method=method
+        )
+        if response.streaming:
+            response.streaming_content = _count_bytes(
+                response.streaming_content, route, method
+            )
+        else:
+            metrics.HTTP_RESPONSE_SIZE.observe(
+                len(response.content), route=route, method=method
+            )
+        metrics.registry.flush_if_due()
+        return response
@@ -0,0 +1,12 @@
+from api.includes import snapshots
+
+
+class SnapshotMemoMiddleware:
+    """Reuses model snapshots of users and patients within a request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with snapshots.snapshot_memo():
+            return self.get_response(request)
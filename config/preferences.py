@@ -1,14 +1,24 @@
 import base64
+import logging
+import os
+import select
+import threading
+import time
 from enum import Enum
-from typing import Tuple, Union, Optional
+from typing import Any, Dict, List, Tuple, Union, Optional
 from django.template.loader import render_to_string
 
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from django.conf import settings
 from decouple import config as env_vars
 from pydantic import BaseModel
-from django.db import models
+from django.db import connections, models, transaction
 
 from api.includes.templates import TemplatePathReader
+from config.middlewares.db_routing import get_current_db
+
+logger = logging.getLogger(__name__)
 
 
 class AppPreferencesDataTypes(models.TextChoices):
@@ -310,11 +320,176 @@ APP_PREFERENCES: Tuple[PreferencesStruct] = (
 )
 
 
+PREFERENCES_BY_NAME: Dict[str, PreferencesStruct] = {
+    preference.name: preference for preference in APP_PREFERENCES
+}
+
+PREFERENCES_CHANGED_CHANNEL = "app_preferences_changed"
+
+
+def get_preferences_title(config_struct: PreferencesStruct) -> str:
+    return config_struct.name.upper().replace("_", " ")
+
+
+class PreferencesCache:
+    """Process local store of database backed app preferences.
+
+    Values are kept per database alias (default/sandbox) and loaded in a
+    single query the first time an alias is read. Entries are dropped when
+    a preference row changes, either directly in this process or through a
+    postgres NOTIFY sent by another worker, and expire after
+    PREFERENCES_CACHE_TIMEOUT seconds as a safety net.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Dict[str, Any]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._listener: Optional["PreferencesChangeListener"] = None
+        self._listener_pid: Optional[int] = None
+
+    def get(self, config_struct: PreferencesStruct):
+        alias = get_current_db()
+        values = self._values.get(alias)
+        if values is None or self._is_expired(alias):
+            values = self._load(alias)
+        if config_struct.name not in values:
+            values[config_struct.name] = self._get_create(alias, config_struct)
+        return values[config_struct.name]
+
+    def invalidate(self, alias: str = None):
+        """Drops cached values of one database alias or all of them"""
+        with self._lock:
+            if alias is None:
+                self._values.clear()
+                self._loaded_at.clear()
+            else:
+                self._values.pop(alias, None)
+                self._loaded_at.pop(alias, None)
+
+    def _is_expired(self, alias: str) -> bool:
+        timeout = getattr(settings, "PREFERENCES_CACHE_TIMEOUT", None)
+        if not timeout:
+            return False
+        return time.monotonic() - self._loaded_at.get(alias, 0) > timeout
+
+    def _load(self, alias: str) -> Dict[str, Any]:
+        from api.apps.core.models import AppPreferences as preferences_model
+
+        self._start_listener()
+        with self._lock:
+            rows = {
+                (row.title, row.category): row
+                for row in preferences_model.objects.using(alias).all()
+            }
+            values = {}
+            for config_struct in APP_PREFERENCES:
+                if config_struct.env:
+                    continue
+                row = rows.get(
+                    (get_preferences_title(config_struct), config_struct.category.value)
+                )
+                if row is None:
+                    values[config_struct.name] = self._get_create(alias, config_struct)
+                else:
+                    values[config_struct.name] = self._to_value(row)
+            self._values[alias] = values
+            self._loaded_at[alias] = time.monotonic()
+            return values
+
+    def _get_create(self, alias: str, config_struct: PreferencesStruct):
+        from api.apps.core.models import AppPreferences as preferences_model
+
+        preferences, created = preferences_model.objects.using(alias).get_or_create(
+            title=get_preferences_title(config_struct),
+            category=config_struct.category,
+            defaults=config_struct.to_dict(),
+        )
+        return self._to_value(preferences)
+
+    @staticmethod
+    def _to_value(preferences):
+        data_type = AppPreferencesDataTypes.get_type(preferences.type)
+        return data_type(preferences.value)
+
+    def _start_listener(self):
+        """Starts the change listener once per process (again after a fork)"""
+        if not getattr(settings, "PREFERENCES_LISTEN_CHANGES", False):
+            return
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener = PreferencesChangeListener(
+                cache=self, aliases=list(settings.DATABASES)
+            )
+            self._listener.start()
+            self._listener_pid = os.getpid()
+
+
+class PreferencesChangeListener(threading.Thread):
+    """Listens for preference changes sent by other processes through
+    postgres NOTIFY and invalidates the cache of the notified alias.
+    """
+
+    POLL_TIMEOUT = 5
+    RETRY_DELAY = 10
+
+    def __init__(self, cache: PreferencesCache, aliases: List[str]):
+        super().__init__(name="preferences-listener", daemon=True)
+        self.cache = cache
+        self.aliases = aliases
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except (psycopg2.Error, OSError) as e:
+                logger.warning(f"preferences listener disconnected: {e}")
+            # notifications may have been missed while disconnected
+            self.cache.invalidate()
+            time.sleep(self.RETRY_DELAY)
+
+    def _listen(self):
+        listeners = {}
+        try:
+            for alias in self.aliases:
+                conn = psycopg2.connect(**connections[alias].get_connection_params())
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {PREFERENCES_CHANGED_CHANNEL}")
+                listeners[conn] = alias
+
+            while True:
+                readable, _, _ = select.select(
+                    list(listeners), [], [], self.POLL_TIMEOUT
+                )
+                for conn in readable:
+                    conn.poll()
+                    while conn.notifies:
+                        conn.notifies.pop(0)
+                        self.cache.invalidate(listeners[conn])
+        finally:
+            for conn in listeners:
+                conn.close()
+
+
+preferences_cache = PreferencesCache()
+
+
+def notify_preferences_changed(alias: str):
+    """Invalidates cached preferences of an alias in every worker process.
+    Both the local invalidation and the NOTIFY take effect on commit.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [PREFERENCES_CHANGED_CHANNEL, alias])
+    transaction.on_commit(lambda: preferences_cache.invalidate(alias), using=alias)
+
+
 class AppPreferences:
     def __getattribute__(self, name):
-        config_prop = next(
-            (prop for prop in APP_PREFERENCES if prop.name == name), None
-        )
+        config_prop = PREFERENCES_BY_NAME.get(name)
         if config_prop:
             if config_prop.env:
                 return env_vars(
@@ -322,21 +497,9 @@ class AppPreferences:
                     default=config_prop.default,
                     cast=AppPreferencesDataTypes.get_type(config_prop.type.value),
                 )
-            return self._get_create_app_preferences(config_prop)
+            return preferences_cache.get(config_prop)
         return super(AppPreferences, self).__getattribute__(name)
 
     @property
     def company_logo(self):
         ...
-
-    def _get_create_app_preferences(self, config_struct: PreferencesStruct):
-        from api.apps.core.models import AppPreferences as preferences_model
-
-        title = config_struct.name.upper().replace("_", " ")
-        preferences, created = preferences_model.objects.get_or_create(
-            title=title,
-            category=config_struct.category,
-            defaults=config_struct.to_dict(),
-        )
-        data_type = AppPreferencesDataTypes.get_type(preferences.type)
-        return data_type(preferences.value)
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # Third Party Apps
     "django_filters",
     "rest_framework",
@@ -65,6 +66,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "config.middlewares.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -75,6 +77,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "config.middlewares.db_routing.DBRouterMiddleware",
+    "config.middlewares.snapshot_memo.SnapshotMemoMiddleware",
     #"config.middlewares.license_middleware.LicenseMiddleware",
 ]
 
@@ -202,6 +205,67 @@ SCHEDULER_CONFIG = {
 }
 SCHEDULER_AUTOSTART = True
 
+# Reports are rendered to pdf on a per process pool of persistent headless
+# chromium browsers, see api.includes.pdf_generator
+PDF_RENDERER_POOL = {
+    "CONCURRENCY": config("pdf_renderer_concurrency", default=2, cast=int),
+    "TIMEOUT": config("pdf_renderer_timeout", default=60, cast=int),
+    "MAX_JOBS_PER_WORKER": config("pdf_renderer_max_jobs", default=200, cast=int),
+    "MAX_PENDING": config("pdf_renderer_max_pending", default=20, cast=int),
+    "QUEUE_TIMEOUT": config("pdf_renderer_queue_timeout", default=30, cast=int),
+}
+
+# App preferences are cached in each process and invalidated through
+# postgres LISTEN/NOTIFY when a preference changes. The timeout bounds
+# staleness should a notification be missed.
+PREFERENCES_CACHE_TIMEOUT = config("preferences_cache_timeout", default=300, cast=int)
+PREFERENCES_LISTEN_CHANGES = config(
+    "preferences_listen_changes", default=True, cast=bool
+)
+
+# Requests, pdf renders, exports and mails are measured in each process
+# and served on /metrics, see api.includes.metrics. When the server runs
+# several worker processes, METRICS_DIR must name a directory shared by the
+# workers, emptied on restart, so that /metrics sums every worker.
+METRICS_ENABLED = config("metrics_enabled", default=True, cast=bool)
+METRICS_DIR = config("metrics_dir", default="") or None
+METRICS_FLUSH_INTERVAL = config("metrics_flush_interval", default=1, cast=float)
+# /metrics and /healthz answer only requests bearing this token, and no
+# request at all while it is empty
+MONITORING_TOKEN = config("monitoring_token", default="")
+
+# Mails are written to the core MailOutbox table and sent by the
+# dispatch_mail_outbox command, see api.includes.mail_dispatcher
+MAIL_OUTBOX = {
+    "BATCH_SIZE": config("mail_outbox_batch_size", default=20, cast=int),
+    "MAX_ATTEMPTS": config("mail_outbox_max_attempts", default=8, cast=int),
+    "RETRY_BASE_DELAY": config("mail_outbox_retry_base_delay", default=30, cast=int),
+    "RETRY_MAX_DELAY": config("mail_outbox_retry_max_delay", default=3600, cast=int),
+    "LEASE": config("mail_outbox_lease", default=300, cast=int),
+    "POLL_INTERVAL": config("mail_outbox_poll_interval", default=5, cast=int),
+    "TIMEOUT": config("mail_outbox_timeout", default=30, cast=int),
+}
+
+# List pages may count their rows from the planner estimate (?count=estimated)
+# or reuse a cached exact count (?count=cached), see api.includes.pagination.
+# Estimates under the threshold are replaced by an exact count.
+PAGINATION_COUNT = {
+    "ESTIMATE_THRESHOLD": config(
+        "pagination_estimate_threshold", default=10000, cast=int
+    ),
+    "CACHE_TIMEOUT": config("pagination_count_cache_timeout", default=60, cast=int),
+}
+
+# Catalogs loaded by the ordering screens are cached per database and
+# version stamp, see api.includes.catalog_cache. A write to a catalog moves
+# its stamp, the timeout only bounds how long old versions are kept.
+CATALOG_CACHE_TIMEOUT = config("catalog_cache_timeout", default=3600, cast=int)
+
+# Templates stored in the database (lab panel templates, the prescription
+# body and footer) are compiled once per process, see
+# api.includes.template_cache
+TEMPLATE_CACHE_SIZE = config("template_cache_size", default=256, cast=int)
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 CORS_ALLOW_HEADERS = list(default_headers) + [
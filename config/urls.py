@@ -6,8 +6,13 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 
+from api.apps.core.views import healthz, metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    # Monitoring endpoints
+    path("metrics", metrics_view, name="metrics"),
+    path("healthz", healthz, name="healthz"),
     # Swagger documentation endpoint
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     # Optional UI: